@@ -0,0 +1,120 @@
+# benchmarks/bench_cache.py - Scene and result cache hit/miss latency
+"""
+Benchmark cache hits and misses on the demo data path.
+
+Scenes are demo index rasters in the quantized ``INDEX_EVALSCRIPT`` layout
+(int16 indices plus a uint8 clear mask), pre-generated so that a miss
+measures the cache's own work (lookup, write, publish, reopen) and not the
+fetch. Each codec is run against its own scratch ``SceneCache``; ``hit``
+opens the entry, ``hit_read`` also reads every pixel of it. The result
+cache is measured with an in-process ``MemoryStore`` for the local LRU tier
+and for the shared tier (pickled values). Latencies are p50/p95 in ms.
+
+    python -m benchmarks.bench_cache --size 512 --scenes 20
+    python -m benchmarks.bench_cache --codecs none zstd lz4
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_timeseries import BBOX, latency_ms  # noqa: E402
+from utils.demo_mode import DemoDataLoader  # noqa: E402
+from utils.evalscripts import INDEX_EVALSCRIPT, quantize_indices  # noqa: E402
+from utils.result_cache import MemoryStore, ResultCache  # noqa: E402
+from utils.scene_cache import SceneCache, scene_key  # noqa: E402
+
+
+def make_scenes(size, count):
+    loader = DemoDataLoader()
+    days = [(date(2024, 6, 1) + timedelta(days=5 * i)).isoformat() for i in range(count)]
+    return [(day, quantize_indices(loader.get_demo_indices(BBOX, (size, size), date.fromisoformat(day))))
+            for day in days]
+
+
+def run_scene_cache(root, codec, scenes, hits):
+    cache = SceneCache(os.path.join(root, codec), codec=codec)
+    misses, opens, reads = [], [], []
+    for day, bands in scenes:
+        start = time.perf_counter()
+        cache.get_or_fetch(BBOX, day, day, INDEX_EVALSCRIPT, lambda bands=bands: bands)
+        misses.append(time.perf_counter() - start)
+    for _ in range(hits):
+        for day, _bands in scenes:
+            start = time.perf_counter()
+            cached = cache.get_or_fetch(BBOX, day, day, INDEX_EVALSCRIPT, None)
+            opens.append(time.perf_counter() - start)
+            for array in cached.values():
+                np.asarray(array).sum(dtype=np.int64)
+            reads.append(time.perf_counter() - start)
+
+    meta = cache.get(scene_key(BBOX, scenes[0][0], scenes[0][0], INDEX_EVALSCRIPT))[1]
+    raw = sum(array.nbytes for array in scenes[0][1].values())
+    return {
+        "codec": meta["codec"],
+        "miss": latency_ms(misses),
+        "hit": latency_ms(opens),
+        "hit_read": latency_ms(reads),
+        "disk_ratio": round(meta["nbytes"] / raw, 3),
+    }
+
+
+def run_result_cache(entries, hits):
+    """``get_or_compute`` on a farm-analysis sized result."""
+    value = {
+        "status": {"status": "Healthy", "ndvi": 0.64},
+        "means": {"ndvi": 0.64, "ndwi": -0.1, "savi": 0.41, "evi": 0.38},
+        "clear_fraction": 0.93,
+        "pest_risk": 27.0,
+    }
+    result = {}
+    for tier, local in (("local", True), ("shared", False)):
+        cache = ResultCache(MemoryStore(), local_entries=entries if local else 0)
+        keys = [cache.key("bench", i) for i in range(entries)]
+        misses, found = [], []
+        for key in keys:
+            start = time.perf_counter()
+            cache.get_or_compute(key, lambda: value, local=local)
+            misses.append(time.perf_counter() - start)
+        for _ in range(hits):
+            for key in keys:
+                start = time.perf_counter()
+                cache.get_or_compute(key, lambda: value, local=local)
+                found.append(time.perf_counter() - start)
+        result[tier] = {"miss": latency_ms(misses), "hit": latency_ms(found)}
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=512, help="scene edge in pixels")
+    parser.add_argument("--scenes", type=int, default=20)
+    parser.add_argument("--hits", type=int, default=5, help="hit passes over all scenes")
+    parser.add_argument("--codecs", nargs="*", default=["none", "zstd"])
+    parser.add_argument("--entries", type=int, default=1000, help="result cache entries")
+    args = parser.parse_args(argv)
+
+    scenes = make_scenes(args.size, args.scenes)
+    with tempfile.TemporaryDirectory(prefix="bench-cache-") as tmp:
+        scene = {codec: run_scene_cache(tmp, codec, scenes, args.hits) for codec in args.codecs}
+
+    result = {
+        "benchmark": "cache",
+        "size": args.size,
+        "scenes": args.scenes,
+        "scene_cache": scene,
+        "result_cache": run_result_cache(args.entries, args.hits),
+    }
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
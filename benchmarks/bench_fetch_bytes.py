@@ -0,0 +1,138 @@
+# benchmarks/bench_fetch_bytes.py - Download volume of band vs quantized index requests
+"""
+Compare the bytes downloaded per scene by the per-product requests with the
+single quantized index evalscript.
+
+``legacy`` models the separate requests for a date: NDVI and NDWI
+(FLOAT32, 1 band each), true colour (UINT8, 3 bands) and the raw bands
+(FLOAT32, 5 bands). ``quantized`` is ``INDEX_EVALSCRIPT``: all indices as
+INT16 plus a UINT8 clear mask in one request. Payloads are built from demo
+scenes; ``raw_bytes`` is the uncompressed raster size and ``deflate_bytes``
+what a deflate-compressed GeoTIFF would roughly carry. Also reports the
+quantization error against float32 indices.
+
+    python -m benchmarks.bench_fetch_bytes --size 512 --dates 6
+    python -m benchmarks.bench_fetch_bytes --live   # Sentinel Hub, counts bytes_fetched
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import zlib
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import BANDS_SCRIPT, NDVI_SCRIPT, NDWI_SCRIPT, TRUE_COLOR_SCRIPT  # noqa: E402
+from utils import metrics  # noqa: E402
+from utils.demo_mode import DemoDataLoader  # noqa: E402
+from utils.evalscripts import decode_index_response, quantize_indices  # noqa: E402
+from utils.indices import INDEX_NAMES, SpectralIndices  # noqa: E402
+
+BBOX = [31.20, 30.00, 31.25, 30.05]
+TAR_OVERHEAD = 512  # header per member
+
+
+def legacy_payloads(bands, indices):
+    """The arrays returned by the four per-product requests of one date."""
+    rgb = np.clip(np.stack([bands["B04"], bands["B03"], bands["B02"]]) * 2.5 * 255, 0, 255)
+    return {
+        "ndvi": indices["ndvi"][None].astype(np.float32),
+        "ndwi": indices["ndwi"][None].astype(np.float32),
+        "true_color": rgb.astype(np.uint8),
+        "bands": np.stack([bands[name] for name in ("B02", "B03", "B04", "B08", "SCL")]).astype(np.float32),
+    }
+
+
+def measure(payloads, members=1):
+    raw = sum(array.nbytes for array in payloads.values())
+    deflate = sum(len(zlib.compress(array.tobytes(), 6)) for array in payloads.values())
+    overhead = TAR_OVERHEAD * len(payloads) if members > 1 else 0
+    return {"raw_bytes": raw + overhead, "deflate_bytes": deflate + overhead}
+
+
+def run_offline(size, dates):
+    loader = DemoDataLoader()
+    totals = {"legacy": {"raw_bytes": 0, "deflate_bytes": 0}, "quantized": {"raw_bytes": 0, "deflate_bytes": 0}}
+    max_error = 0.0
+    decode_s = 0.0
+    for offset in range(dates):
+        bands = loader.get_demo_satellite_data(BBOX, size, date(2024, 6, 1) + timedelta(days=5 * offset))
+        indices = SpectralIndices.calculate_all_tiled(
+            bands["B04"], bands["B03"], bands["B02"], bands["B08"], scl=bands["SCL"]
+        )
+        quantized = quantize_indices(indices)
+        start = time.perf_counter()
+        decoded = decode_index_response(quantized)
+        decode_s += time.perf_counter() - start
+        for name in INDEX_NAMES:
+            error = np.abs(decoded[name] - indices[name])
+            if np.isfinite(error).any():
+                max_error = max(max_error, float(np.nanmax(error)))
+
+        for mode, payloads, members in (
+            ("legacy", legacy_payloads(bands, indices), 1),
+            ("quantized", quantized, 2),
+        ):
+            for key, value in measure(payloads, members).items():
+                totals[mode][key] += value
+
+    totals["legacy"]["requests"] = 4 * dates
+    totals["quantized"]["requests"] = dates
+    return totals, {"max_abs_error": round(max_error, 6), "decode_ms_per_scene": round(decode_s / dates * 1000, 2)}
+
+
+def run_live(size, dates):
+    """Fetch both variants from Sentinel Hub into an empty scene cache and read ``bytes_fetched``."""
+    import tempfile
+
+    from utils.satellite import SentinelHubClient
+    from utils.scene_cache import SceneCache
+
+    client = SentinelHubClient(cache=SceneCache(tempfile.mkdtemp(prefix="bench-fetch-")))
+    days = [(date.today() - timedelta(days=5 * (offset + 1))).isoformat() for offset in range(dates)]
+    totals = {}
+    for mode in ("legacy", "quantized"):
+        metrics.reset()
+        for day in days:
+            if mode == "legacy":
+                for script in (NDVI_SCRIPT, NDWI_SCRIPT, TRUE_COLOR_SCRIPT, BANDS_SCRIPT):
+                    client.fetch_satellite_data(BBOX, day, day, script, size=size)
+            else:
+                client.fetch_index_data(BBOX, day, day, size=size)
+        counters = metrics.snapshot()["counters"]
+        totals[mode] = {
+            "bytes_fetched": counters.get(("bytes_fetched", (("source", "sentinelhub"),)), 0),
+            "requests": dates * (4 if mode == "legacy" else 1),
+        }
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=512, help="scene width/height in pixels")
+    parser.add_argument("--dates", type=int, default=6)
+    parser.add_argument("--live", action="store_true", help="download from Sentinel Hub (needs credentials)")
+    args = parser.parse_args(argv)
+
+    size = (args.size, args.size)
+    result = {"benchmark": "fetch_bytes", "size": args.size, "dates": args.dates}
+    if args.live:
+        totals = run_live(size, args.dates)
+        key = "bytes_fetched"
+    else:
+        totals, quality = run_offline(size, args.dates)
+        result.update(quality)
+        key = "deflate_bytes"
+    result.update(totals)
+    if totals["quantized"][key]:
+        result["reduction"] = round(totals["legacy"][key] / totals["quantized"][key], 2)
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
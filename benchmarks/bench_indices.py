@@ -0,0 +1,119 @@
+# benchmarks/bench_indices.py - Throughput and peak memory of index computation
+"""
+Benchmark the tiled band-math engine on a synthetic Sentinel-2 scene.
+
+Bands are written as uint16 memory maps (like L2A DNs) so the input does not
+have to be resident, and outputs go to on-disk ``.npy`` maps. Reports
+pixels/sec, peak RSS of the process and anonymous RSS. Memory-mapped pages
+count towards peak RSS but are reclaimable page cache, so ``rss_anon_mb`` is
+the figure that has to fit in the container limit.
+
+    python -m benchmarks.bench_indices --size 10980 --tile-size 1024
+    python -m benchmarks.bench_indices --size 4096 --mode per-index
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.indices import SpectralIndices, allocate_index_outputs  # noqa: E402
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def rss_anon_mb():
+    """Anonymous (non file-backed) resident memory; None off Linux."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def make_bands(directory, size, seed=0):
+    rng = np.random.default_rng(seed)
+    bands = {}
+    for name in ("red", "green", "blue", "nir"):
+        band = np.lib.format.open_memmap(
+            os.path.join(directory, f"{name}.npy"), mode="w+",
+            dtype=np.uint16, shape=(size, size)
+        )
+        for y in range(0, size, 1024):
+            band[y:y + 1024] = rng.integers(0, 10000, band[y:y + 1024].shape)
+        band.flush()
+        del band
+        bands[name] = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+    return bands
+
+
+def run_tiled(bands, tile_size, out_dir):
+    out = allocate_index_outputs(bands["red"].shape, directory=out_dir)
+    SpectralIndices.calculate_all_tiled(
+        bands["red"], bands["green"], bands["blue"], bands["nir"],
+        tile_size=tile_size, out=out, scale_factor=1e-4
+    )
+    for raster in out.values():
+        raster.flush()
+
+
+def run_per_index(bands):
+    red, green, blue, nir = (bands[name] * np.float32(1e-4)
+                             for name in ("red", "green", "blue", "nir"))
+    SpectralIndices.calculate_ndvi(red, nir)
+    SpectralIndices.calculate_ndwi(green, nir)
+    SpectralIndices.calculate_savi(red, nir)
+    SpectralIndices.calculate_evi(blue, red, nir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=4096, help="scene edge in pixels")
+    parser.add_argument("--tile-size", type=int, default=1024)
+    parser.add_argument("--mode", choices=["tiled", "per-index"], default="tiled")
+    parser.add_argument("--workdir", default=None, help="scratch directory for memmaps")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(dir=args.workdir) as tmp:
+        bands = make_bands(tmp, args.size)
+        rss_before = peak_rss_mb()
+
+        start = time.perf_counter()
+        if args.mode == "tiled":
+            run_tiled(bands, args.tile_size, os.path.join(tmp, "out"))
+        else:
+            run_per_index(bands)
+        elapsed = time.perf_counter() - start
+        anon = rss_anon_mb()
+
+    pixels = args.size * args.size
+    result = {
+        "benchmark": "indices",
+        "mode": args.mode,
+        "size": args.size,
+        "tile_size": args.tile_size if args.mode == "tiled" else None,
+        "seconds": round(elapsed, 3),
+        "pixels_per_sec": round(pixels / elapsed),
+        "peak_rss_mb_before": round(rss_before, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "rss_anon_mb": round(anon, 1) if anon is not None else None,
+    }
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+# benchmarks/bench_load.py - Concurrent dashboard sessions load driver
+"""
+Headless load test: N concurrent Streamlit sessions rerunning ``app.py``.
+
+Sessions are driven with Streamlit's ``AppTest``. ``AppTest`` keeps its
+runtime in a process-global that every run resets, so each simulated
+session runs in its own (spawned) process. Every session process first
+warms up — one session that visits each tab, so imports, compiled
+templates and ``st.cache_*`` are loaded as in a running server — then all
+start together: one cold run and ``--reruns`` reruns, switching to the next
+analysis tab every time (what a user clicking through the dashboard costs).
+Runs offline in demo mode; caches, history, job queue and state files go to
+a scratch directory shared by all sessions, and one worker service
+(``python -m utils.jobs worker``) with ``--job-workers`` workers serves the
+analysis jobs, as the ``worker`` container does in docker-compose.
+
+Reports p50/p95 latency of the first runs and of the reruns, throughput,
+the resident memory of a warmed-up process (``rss_baseline_mb``), what one
+more session keeps resident after its reruns (``rss_per_session_mb``) and by
+how much it raises the peak (``peak_rss_per_session_mb``), p50 over sessions.
+Retained memory is at the noise level of the allocator and can come out
+slightly negative when a session reuses memory freed during the warm-up.
+
+    python -m benchmarks.bench_load --sessions 8 --reruns 10
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCRATCH_ENV = {
+    "SCENE_CACHE_DIR": "scenes",
+    "HISTORY_DB_PATH": "history.sqlite",
+    "JOB_QUEUE_PATH": "jobs.sqlite",
+    "PDF_CACHE_DIR": "pdf",
+    "WEATHER_STORE_PATH": "weather.npz",
+    "PEST_STATE_PATH": "pest_state.npz",
+    "ANOMALY_STATE_PATH": "anomaly_state.npz",
+}
+
+
+def rss_mb():
+    """Current resident memory of this process; None off Linux."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def configure(workdir):
+    """Point every on-disk store at ``workdir``; must run before ``config`` is imported."""
+    os.environ["DEMO_MODE"] = "true"
+    os.environ["JOB_EMBEDDED_WORKERS"] = "0"
+    for name, path in SCRATCH_ENV.items():
+        os.environ[name] = os.path.join(workdir, path)
+
+
+def session(index, reruns, tabs):
+    """Run one session; returns ``(app, first_s, rerun_s, errors)``."""
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=300)
+    if tabs:
+        app.session_state["active_tab"] = tabs[index % len(tabs)]
+    start = time.perf_counter()
+    app.run()
+    first = time.perf_counter() - start
+    samples = []
+    tabs = tabs or [tab.label for tab in app.tabs]
+    for rerun in range(reruns):
+        app.session_state["active_tab"] = tabs[(index + rerun + 1) % len(tabs)]
+        start = time.perf_counter()
+        app.run()
+        samples.append(time.perf_counter() - start)
+    return app, first, samples, [str(error.value) for error in app.exception]
+
+
+def session_process(index, reruns, barrier, results):
+    """Warm up, wait for the other sessions, then run the measured session."""
+    tabs = [tab.label for tab in session(index, 0, None)[0].tabs]
+    warm = session(index, len(tabs) - 1, tabs)[0]  # kept alive, like an idle session
+    gc.collect()
+    baseline, baseline_peak = rss_mb(), peak_rss_mb()
+
+    barrier.wait()
+    app, first, samples, errors = session(index, reruns, tabs)
+    gc.collect()
+    results.put({
+        "first": first, "reruns": samples, "errors": errors, "rss_baseline": baseline,
+        "retained": rss_mb() - baseline if baseline is not None else None,
+        "peak": peak_rss_mb() - baseline_peak,
+    })
+    del warm, app
+
+
+def _percentile(values, q):
+    import numpy as np
+
+    return round(float(np.percentile(values, q)), 3) if len(values) else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--reruns", type=int, default=10, help="reruns per session after the cold run")
+    parser.add_argument("--job-workers", type=int, default=2, help="analysis worker processes")
+    parser.add_argument("--workdir", default=None, help="parent of the scratch directory")
+    args = parser.parse_args(argv)
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix="bench-load-", dir=args.workdir) as tmp:
+        configure(tmp)
+        service = subprocess.Popen(
+            [sys.executable, "-m", "utils.jobs", "worker", "--workers", str(args.job_workers)], cwd=ROOT
+        )
+        barrier, results = context.Barrier(args.sessions + 1), context.Queue()
+        sessions = [
+            context.Process(target=session_process, args=(i, args.reruns, barrier, results), daemon=True)
+            for i in range(args.sessions)
+        ]
+        try:
+            for process in sessions:
+                process.start()
+            barrier.wait()
+            start = time.perf_counter()
+            runs = [results.get() for _ in sessions]
+            wall = time.perf_counter() - start
+            for process in sessions:
+                process.join()
+        finally:
+            for process in sessions:
+                if process.is_alive():
+                    process.terminate()
+            service.terminate()
+            service.wait()
+
+    first = [run["first"] for run in runs]
+    reruns = [sample for run in runs for sample in run["reruns"]]
+    retained = [run["retained"] for run in runs if run["retained"] is not None]
+    result = {
+        "benchmark": "load",
+        "sessions": args.sessions,
+        "reruns": args.reruns,
+        "job_workers": args.job_workers,
+        "first_run_p50_s": _percentile(first, 50),
+        "first_run_p95_s": _percentile(first, 95),
+        "rerun_p50_s": _percentile(reruns, 50),
+        "rerun_p95_s": _percentile(reruns, 95),
+        "runs_per_sec": round((len(first) + len(reruns)) / wall, 2),
+        "rss_baseline_mb": _percentile([run["rss_baseline"] for run in runs if run["retained"] is not None], 50),
+        "rss_per_session_mb": _percentile(retained, 50),
+        "peak_rss_per_session_mb": _percentile([run["peak"] for run in runs], 50),
+        "errors": sorted({error for run in runs for error in run["errors"]}),
+    }
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
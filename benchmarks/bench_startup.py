@@ -0,0 +1,101 @@
+# benchmarks/bench_startup.py - Dashboard cold start and rerun timings
+"""
+Measure what a Streamlit session pays before the dashboard is usable.
+
+Every import is timed in a fresh interpreter (after ``import streamlit``,
+which the server has already loaded), so the numbers are cold-start costs
+that can be compared across releases. The app itself is driven headlessly
+with Streamlit's ``AppTest`` in another fresh interpreter: one cold script
+run followed by ``--reruns`` reruns (what every widget interaction costs).
+
+    python -m benchmarks.bench_startup --reruns 20
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = [
+    "folium", "streamlit_folium", "plotly.graph_objects", "plotly.express", "pandas",
+    "utils.metrics", "utils.indices", "utils.satellite", "utils.arabic_nlg", "utils.demo_mode",
+    "utils.history_store", "utils.tiles", "utils.zonal", "utils.weather", "utils.jobs",
+    "utils.session_store",
+    "ui.farm_map", "ui.analysis", "ui.spectral", "ui.irrigation", "ui.fertilizer",
+    "ui.pests", "ui.report",
+]
+
+IMPORT_SNIPPET = """
+import time, streamlit
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+APP_SNIPPET = """
+import json, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({path!r}, default_timeout=120)
+start = time.perf_counter()
+app.run()
+first = time.perf_counter() - start
+reruns = []
+for _ in range({reruns}):
+    start = time.perf_counter()
+    app.run()
+    reruns.append(time.perf_counter() - start)
+print(json.dumps({{"first": first, "reruns": reruns, "errors": [str(e.value) for e in app.exception]}}))
+"""
+
+
+def _python(code, env=None):
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env,
+        capture_output=True, text=True, check=True
+    )
+    return result.stdout.strip().splitlines()[-1]
+
+
+def time_import(module):
+    """Seconds to import ``module`` in a fresh interpreter."""
+    return float(_python(IMPORT_SNIPPET.format(module=module)))
+
+
+def time_app(reruns, env=None):
+    return json.loads(_python(APP_SNIPPET.format(path=os.path.join(ROOT, "app.py"), reruns=reruns), env))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--skip-app", action="store_true", help="only time imports")
+    args = parser.parse_args(argv)
+
+    imports = {module: round(time_import(module), 3) for module in args.modules}
+    result = {
+        "benchmark": "startup",
+        "python": sys.version.split()[0],
+        "imports_s": dict(sorted(imports.items(), key=lambda item: -item[1])),
+    }
+
+    if not args.skip_app:
+        env = dict(os.environ, DEMO_MODE="true")
+        app = time_app(args.reruns, env)
+        reruns = sorted(app["reruns"])
+        result.update({
+            "first_run_s": round(app["first"], 3),
+            "rerun_median_s": round(statistics.median(reruns), 3) if reruns else None,
+            "rerun_p95_s": round(reruns[min(len(reruns) - 1, int(len(reruns) * 0.95))], 3) if reruns else None,
+            "errors": app["errors"],
+        })
+
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
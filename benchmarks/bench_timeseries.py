@@ -0,0 +1,143 @@
+# benchmarks/bench_timeseries.py - Time-series analysis latency on demo history
+"""
+Benchmark the time-series paths behind the spectral and pest tabs.
+
+Everything runs on the demo generators (``DemoDataLoader``), so no network
+is needed: per-farm history is loaded into a scratch ``HistoryStore`` and
+queried back, relative-change anomalies are detected per farm, per-pixel
+change maps are computed over a demo NDVI stack, and the streaming anomaly
+and pest trackers are updated for a batch of farms. Reports p50/p95
+latencies in milliseconds and throughput.
+
+    python -m benchmarks.bench_timeseries --farms 200 --days 90 --size 512
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import CROPS_CONFIG  # noqa: E402
+from utils.anomaly import StreamingAnomalyDetector  # noqa: E402
+from utils.demo_mode import DemoDataLoader  # noqa: E402
+from utils.history_store import HistoryStore  # noqa: E402
+from utils.indices import TimeSeriesAnalysis  # noqa: E402
+from utils.pest_risk import PestRiskTracker  # noqa: E402
+
+BBOX = [31.20, 30.00, 31.25, 30.05]
+END = date(2024, 9, 30)
+
+
+def latency_ms(samples):
+    """p50/p95/mean of a list of durations in seconds, in milliseconds."""
+    samples = np.asarray(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "mean_ms": round(float(samples.mean()), 3),
+    }
+
+
+def run_history(path, farms, days):
+    loader = DemoDataLoader()
+    store = HistoryStore(path)
+    dates = [END - timedelta(days=days - 1 - i) for i in range(days)]
+
+    start = time.perf_counter()
+    for i in range(farms):
+        farm_id = f"F{i:05d}"
+        store.update(farm_id, dates, lambda new, farm_id=farm_id: loader.get_demo_index_stats(farm_id, new))
+    load_s = time.perf_counter() - start
+
+    queries, detections, series = [], [], []
+    for i in range(farms):
+        start = time.perf_counter()
+        history = store.query(f"F{i:05d}", days=days, end=END)
+        queries.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        TimeSeriesAnalysis.detect_anomalies(history["mean"])
+        detections.append(time.perf_counter() - start)
+        series.append(history["mean"])
+    store.close()
+    return {
+        "rows_per_sec": round(farms * days * 2 / load_s),
+        "query": latency_ms(queries),
+        "detect_anomalies": latency_ms(detections),
+    }, np.array(series, dtype=np.float32)
+
+
+def run_pixel_anomalies(size, scenes, repeats):
+    dates = [END - timedelta(days=5 * (scenes - 1 - i)) for i in range(scenes)]
+    stack = DemoDataLoader().get_demo_ndvi_stack(BBOX, dates, (size, size))
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        TimeSeriesAnalysis.detect_pixel_anomalies(stack)
+        samples.append(time.perf_counter() - start)
+    result = latency_ms(samples)
+    result["megapixels_per_sec"] = round(stack.size / 1e6 / float(np.median(samples)), 1)
+    return result
+
+
+def run_streaming(series):
+    """Replay the history day by day through the streaming detectors."""
+    farms, days = series.shape
+    keys = [f"F{i:05d}" for i in range(farms)]
+    crops = [list(CROPS_CONFIG)[i % len(CROPS_CONFIG)] for i in range(farms)]
+    rng = np.random.default_rng(0)
+    tmax = 30 + rng.normal(0, 3, (days, farms)).astype(np.float32)
+    anomaly, pests = StreamingAnomalyDetector(), PestRiskTracker()
+    anomaly_s, pest_s = [], []
+    for t in range(days):
+        day = END.toordinal() - days + 1 + t
+        start = time.perf_counter()
+        anomaly.update(keys, series[:, t], day=day, crops=crops)
+        anomaly_s.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        pests.update(keys, tmax[t], tmax[t] - 12, day=day, crops=crops, ndvi=series[:, t])
+        pest_s.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    pests.forecast(keys, tmax[:7].T, tmax[:7].T - 12, crops)
+    forecast_s = time.perf_counter() - start
+    return {
+        "anomaly_update": latency_ms(anomaly_s),
+        "pest_update": latency_ms(pest_s),
+        "pest_forecast_ms": round(forecast_s * 1000, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--farms", type=int, default=200)
+    parser.add_argument("--days", type=int, default=90, help="history length per farm")
+    parser.add_argument("--size", type=int, default=512, help="NDVI stack edge in pixels")
+    parser.add_argument("--scenes", type=int, default=12, help="scenes in the NDVI stack")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        history, series = run_history(os.path.join(tmp, "history.sqlite"), args.farms, args.days)
+
+    result = {
+        "benchmark": "timeseries",
+        "farms": args.farms,
+        "days": args.days,
+        "size": args.size,
+        "scenes": args.scenes,
+        "history": history,
+        "pixel_anomalies": run_pixel_anomalies(args.size, args.scenes, args.repeats),
+        "streaming": run_streaming(series),
+    }
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# benchmarks/run_suite.py - Run every benchmark and collect one comparable JSON
+"""
+Run the offline benchmark suite and write one JSON document per commit.
+
+Each benchmark runs in a fresh interpreter (so peak RSS and import costs are
+its own) with ``DEMO_MODE=true`` and every cache, store and queue pointed
+at a scratch directory: nothing is downloaded and the local stores are not
+touched. Scenes come from ``DEMO_DATA_PATH`` when it exists and are
+synthesized otherwise (recorded as ``demo_data``). The document carries the
+git commit, Python version and host so runs can be compared;
+``--compare`` prints the relative change of every metric against an older
+document (``ratio`` = new / old).
+
+    python -m benchmarks.run_suite --output bench-$(git rev-parse --short HEAD).json
+    python -m benchmarks.run_suite --quick --only indices_1024 timeseries
+    python -m benchmarks.run_suite --output new.json --compare bench-main.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_load import SCRATCH_ENV  # noqa: E402
+from config import DEMO_DATA_PATH  # noqa: E402
+
+# name -> (module, full args, --quick args)
+SUITE = {
+    "indices_1024": ("bench_indices", ["--size", "1024"], ["--size", "1024"]),
+    "indices_4096": ("bench_indices", ["--size", "4096"], ["--size", "2048"]),
+    "indices_10980": ("bench_indices", ["--size", "10980"], None),
+    "timeseries": ("bench_timeseries", [], ["--farms", "50", "--days", "60", "--size", "256"]),
+    "reports": ("bench_reports", ["--farms", "20000"], ["--farms", "2000"]),
+    "reports_pdf": ("bench_reports", ["--mode", "pdf", "--farms", "50"], ["--mode", "pdf", "--farms", "10"]),
+    "cache": ("bench_cache", [], ["--scenes", "5", "--hits", "3"]),
+    "fetch_bytes": ("bench_fetch_bytes", [], ["--dates", "2"]),
+    "startup": ("bench_startup", ["--reruns", "10"], ["--reruns", "3", "--modules", "utils.indices", "ui.analysis"]),
+    "load": ("bench_load", ["--sessions", "8", "--reruns", "10"], ["--sessions", "2", "--reruns", "3"]),
+}
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+
+def run_benchmark(module, args, env):
+    """Run ``benchmarks.<module>`` and return its JSON result."""
+    completed = subprocess.run(
+        [sys.executable, "-m", f"benchmarks.{module}", *args], cwd=ROOT, env=env,
+        capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        return {"benchmark": module, "error": completed.stderr.strip().splitlines()[-1:]}
+    # the result is the JSON object at the end of stdout
+    output = completed.stdout
+    start = 0 if output.startswith("{") else output.index("\n{") + 1
+    return json.loads(output[start:])
+
+
+def flatten(result, prefix=""):
+    """Numeric leaves of a result as ``{"a.b.c": value}``."""
+    values = {}
+    for key, value in result.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[name] = value
+    return values
+
+
+def compare(old, new):
+    """Metrics that changed between two suite documents."""
+    changes = {}
+    for name, result in new["results"].items():
+        before = flatten(old.get("results", {}).get(name, {}))
+        for key, value in flatten(result).items():
+            if key in before and before[key] != value:
+                changes[f"{name}.{key}"] = {
+                    "old": before[key],
+                    "new": value,
+                    "ratio": round(value / before[key], 3) if before[key] else None,
+                }
+    return changes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--only", nargs="*", choices=sorted(SUITE), help="subset of benchmarks")
+    parser.add_argument("--quick", action="store_true", help="smaller inputs (smoke test)")
+    parser.add_argument("--output", help="write the suite JSON here")
+    parser.add_argument("--compare", help="earlier suite JSON to compare against")
+    args = parser.parse_args(argv)
+
+    document = {
+        "suite": "agri-mind",
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "quick": args.quick,
+        "demo_data": DEMO_DATA_PATH if os.path.exists(os.path.join(ROOT, DEMO_DATA_PATH)) else "synthetic",
+        "results": {},
+    }
+    for name in args.only or SUITE:
+        module, full, quick = SUITE[name]
+        bench_args = quick if args.quick else full
+        if bench_args is None:
+            continue
+        with tempfile.TemporaryDirectory(prefix=f"bench-{name}-") as tmp:
+            env = dict(os.environ, DEMO_MODE="true")
+            env.update({key: os.path.join(tmp, path) for key, path in SCRATCH_ENV.items()})
+            start = time.perf_counter()
+            result = run_benchmark(module, bench_args, env)
+        result["suite_seconds"] = round(time.perf_counter() - start, 2)
+        document["results"][name] = result
+        print(f"{name}: {result['suite_seconds']}s", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        document["baseline_commit"] = baseline.get("commit")
+        document["changes"] = compare(baseline, document)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(document, handle, indent=2)
+    print(json.dumps(document, indent=2))
+    return document
+
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,25 @@ OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY", "")
 # ==================== APPLICATION SETTINGS ====================
 DEMO_MODE = os.getenv("DEMO_MODE", "true").lower() == "true"
 API_RATE_LIMIT = float(os.getenv("API_RATE_LIMIT", "1"))  # requests per second
+SATELLITE_BACKEND = os.getenv("SATELLITE_BACKEND", "sentinelhub").lower()  # "sentinelhub" | "stac"
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "8"))  # parallel async requests
+FETCH_MAX_RETRIES = int(os.getenv("FETCH_MAX_RETRIES", "4"))  # on 429/5xx and timeouts
+FETCH_TIMEOUT_SECONDS = float(os.getenv("FETCH_TIMEOUT_SECONDS", "120"))  # per async request attempt
 CACHE_TTL_HOURS = int(os.getenv("CACHE_TTL_HOURS", "6"))
+TIMING_REPORT = os.getenv("TIMING_REPORT", "false").lower() == "true"  # sidebar startup/rerun timings
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Prometheus /metrics from the dashboard; 0 = off
+PROFILE_MODE = os.getenv("PROFILE_MODE", "").lower()  # "cprofile" or "pyinstrument": dump every run
+PROFILE_DIR = os.getenv("PROFILE_DIR", "cache/profiles")
+
+# ==================== PROCESSING SETTINGS ====================
+INDEX_TILE_SIZE = int(os.getenv("INDEX_TILE_SIZE", "1024"))  # pixels per tile edge
+# Quantized index rasters: int16 = round(value * INDEX_QUANT_SCALE), nodata sentinel
+INDEX_QUANT_SCALE = 10000
+INDEX_QUANT_NODATA = -32768
+# Stored rasters: compressed in blocks of INDEX_CHUNK_ROWS rows (zstd, lz4, zlib or none;
+# zstd/lz4 fall back to zlib when the module is not installed)
+INDEX_CODEC = os.getenv("INDEX_CODEC", "zstd")
+INDEX_CHUNK_ROWS = int(os.getenv("INDEX_CHUNK_ROWS", "256"))
 
 # ==================== LOCATION DEFAULTS ====================
 DEFAULT_LAT = float(os.getenv("DEFAULT_LAT", "30.3869"))
@@ -39,6 +57,10 @@ CROPS_CONFIG = {
         "optimal_water": (-0.1, 0.2),
         "growing_season": (90, 150),  # days
         "irrigation_interval": 10,  # days
+        "kc": (0.7, 1.15, 0.3),  # FAO-56 crop coefficient: initial, mid-season, end
+        "kc_stages": (0.15, 0.25, 0.40, 0.20),  # initial, development, mid, late (season fractions)
+        "taw_mm": 120,  # total available water in the root zone
+        "depletion_fraction": 0.55,  # share of TAW used before the crop is stressed
         "fertilizer_schedule": ["Planting", "Tillering", "Boot", "Grain Fill"],
         "pest_risks": ["Aphids", "Hessian Flies", "Armyworms"]
     },
@@ -48,6 +70,10 @@ CROPS_CONFIG = {
         "optimal_water": (0.0, 0.3),
         "growing_season": (365, 365),  # perennial
         "irrigation_interval": 7,  # days
+        "kc": (0.7, 0.65, 0.7),
+        "kc_stages": (0.25, 0.25, 0.25, 0.25),
+        "taw_mm": 140,
+        "depletion_fraction": 0.5,
         "fertilizer_schedule": ["Spring Growth", "Flowering", "Fruit Dev", "Pre-Harvest"],
         "pest_risks": ["Scale Insects", "Whiteflies", "Citrus Leaf Miners"]
     },
@@ -57,6 +83,10 @@ CROPS_CONFIG = {
         "optimal_water": (-0.1, 0.2),
         "growing_season": (60, 90),  # days
         "irrigation_interval": 3,  # days
+        "kc": (0.6, 1.15, 0.8),
+        "kc_stages": (0.20, 0.30, 0.30, 0.20),
+        "taw_mm": 80,
+        "depletion_fraction": 0.4,
         "fertilizer_schedule": ["Flowering", "Fruit Set", "Fruit Dev", "Ripening"],
         "pest_risks": ["Whiteflies", "Spider Mites", "Tomato Hornworms", "Fusarium Wilt"]
     },
@@ -66,6 +96,10 @@ CROPS_CONFIG = {
         "optimal_water": (-0.05, 0.25),
         "growing_season": (110, 140),  # days
         "irrigation_interval": 8,  # days
+        "kc": (0.3, 1.2, 0.6),
+        "kc_stages": (0.17, 0.28, 0.33, 0.22),
+        "taw_mm": 130,
+        "depletion_fraction": 0.55,
         "fertilizer_schedule": ["V4 Stage", "V12 Stage", "Tasseling", "Silking"],
         "pest_risks": ["European Corn Borers", "Armyworms", "Cutworms"]
     }
@@ -78,6 +112,23 @@ IRRIGATION_TYPES = {
     "محوري": "Pivot"  # Center pivot
 }
 
+# ==================== PEST MODELS ====================
+# Degree-day development per pest: lower/upper thresholds (°C) and degree-days
+# per generation. Every name in CROPS_CONFIG "pest_risks" needs an entry.
+PEST_MODELS = {
+    "Aphids": {"base_c": 4.4, "upper_c": 30.0, "generation_dd": 125},
+    "Hessian Flies": {"base_c": 7.0, "upper_c": 30.0, "generation_dd": 390},
+    "Armyworms": {"base_c": 10.9, "upper_c": 35.0, "generation_dd": 560},
+    "Scale Insects": {"base_c": 11.7, "upper_c": 37.8, "generation_dd": 550},
+    "Whiteflies": {"base_c": 10.0, "upper_c": 33.0, "generation_dd": 300},
+    "Citrus Leaf Miners": {"base_c": 12.0, "upper_c": 35.0, "generation_dd": 260},
+    "Spider Mites": {"base_c": 10.0, "upper_c": 35.0, "generation_dd": 140},
+    "Tomato Hornworms": {"base_c": 10.0, "upper_c": 35.0, "generation_dd": 700},
+    "Fusarium Wilt": {"base_c": 15.0, "upper_c": 33.0, "generation_dd": 400},
+    "European Corn Borers": {"base_c": 10.0, "upper_c": 30.0, "generation_dd": 610},
+    "Cutworms": {"base_c": 10.4, "upper_c": 35.0, "generation_dd": 545},
+}
+
 # ==================== SPECTRAL INDICES THRESHOLDS ====================
 NDVI_THRESHOLDS = {
     "healthy_min": 0.6,
@@ -111,6 +162,27 @@ ELECTRICITY_RATES = {
 }
 
 # ==================== SENTINEL HUB SETTINGS ====================
+SENTINELHUB_BASE_URL = os.getenv("SENTINELHUB_BASE_URL", "https://services.sentinel-hub.com")
+SENTINELHUB_TOKEN_URL = os.getenv(
+    "SENTINELHUB_TOKEN_URL",
+    f"{SENTINELHUB_BASE_URL}/auth/realms/main/protocol/openid-connect/token"
+)
+
+# ==================== STAC / COG BACKEND ====================
+# STAC API URL, or a local directory of STAC item JSON files (stub catalog)
+STAC_API_URL = os.getenv("STAC_API_URL", "https://earth-search.aws.element84.com/v1")
+STAC_COLLECTION = os.getenv("STAC_COLLECTION", "sentinel-2-l2a")
+# band name -> asset key, in BANDS_SCRIPT output order
+STAC_ASSETS = {
+    "B02": "blue",
+    "B03": "green",
+    "B04": "red",
+    "B08": "nir",
+    "SCL": "scl",
+}
+STAC_CHUNK_SIZE = int(os.getenv("STAC_CHUNK_SIZE", "1024"))  # dask chunk edge (pixels)
+STAC_READ_THREADS = int(os.getenv("STAC_READ_THREADS", "8"))  # parallel COG window reads
+
 SENTINEL_BANDS = {
     "B1": "Coastal aerosol",
     "B2": "Blue",
@@ -189,14 +261,108 @@ function evaluatePixel(sample) {
 }
 """
 
+# Raw bands for SAVI/EVI and the tiled index engine (reflectance 0-1),
+# plus the L2A scene classification (SCL) used for cloud masking
+BANDS_SCRIPT = """
+//VERSION=3
+function setup() {
+  return {
+    input: [{
+      bands: ["B02", "B03", "B04", "B08", "SCL"]
+    }],
+    output: {
+      bands: 5,
+      sampleType: "FLOAT32"
+    }
+  };
+}
+
+function evaluatePixel(sample) {
+  return [sample.B02, sample.B03, sample.B04, sample.B08, sample.SCL];
+}
+"""
+
+# SCL classes treated as invalid: no data, saturated, cloud shadow,
+# cloud (medium/high probability), thin cirrus, snow
+SCL_INVALID_CLASSES = (0, 1, 3, 8, 9, 10, 11)
+SCENE_MAX_CLOUD_COVER = 60   # % - acquisitions above this are never fetched
+SCENE_WINDOW_DAYS = 5        # one (least cloudy) acquisition per window
+
 # ==================== TIME RANGES ====================
 HISTORICAL_DAYS = 30
 FORECAST_DAYS = 7
 ANOMALY_THRESHOLD = 0.15  # 15% change in NDVI
+ANOMALY_EWMA_ALPHA = 0.3  # weight of the newest scene in the streaming baseline
+ANOMALY_ZSCORE = 3.0      # flag deviations beyond 3 EW standard deviations
+ANOMALY_MIN_OBS = 5       # observations before z-score flags are trusted
+PEST_ACTIVITY_ALPHA = 0.3  # weight of the newest day in the pest activity average
+CHANGE_MAP_WINDOW = 5     # past scenes in each pixel's rolling baseline
+CHANGE_MAP_BUDGET_MB = int(os.getenv("CHANGE_MAP_BUDGET_MB", "256"))
+
+# ==================== BATCH PROCESSING ====================
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 2)))
+BATCH_MAX_GROUP_SPAN_DEG = 0.1  # max width/height of a shared scene (~10 km)
+SCENE_RESOLUTION_M = 10  # Sentinel-2 native resolution
 
 # ==================== CACHE SETTINGS ====================
 CACHE_VERSION = "v1"
+SCENE_CACHE_DIR = os.getenv("SCENE_CACHE_DIR", "cache/scenes")
+SCENE_CACHE_MAX_GB = float(os.getenv("SCENE_CACHE_MAX_GB", "5"))  # disk budget
+SCENE_CACHE_CODEC = os.getenv("SCENE_CACHE_CODEC", "none")  # "none" = memory-mapped .npy
+SCENE_CACHE_SWEEP_SECONDS = int(os.getenv("SCENE_CACHE_SWEEP_SECONDS", "300"))  # full eviction sweep interval
 DEMO_DATA_PATH = "demo_data/wadi_el_natrun_demo.tif"
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", "cache/history.sqlite")
+ANOMALY_STATE_PATH = os.getenv("ANOMALY_STATE_PATH", "cache/anomaly_state.npz")
+PEST_STATE_PATH = os.getenv("PEST_STATE_PATH", "cache/pest_state.npz")
+# Shared result cache: redis://host:6379/0, or empty for a per-process store
+RESULT_CACHE_URL = os.getenv("RESULT_CACHE_URL", "")
+RESULT_CACHE_LOCAL_ENTRIES = int(os.getenv("RESULT_CACHE_LOCAL_ENTRIES", "512"))  # in-process LRU
+RESULT_CACHE_MAX_VALUE_MB = float(os.getenv("RESULT_CACHE_MAX_VALUE_MB", "64"))  # larger values stay local
+# Bounds of the in-process store used when RESULT_CACHE_URL is empty (LRU)
+RESULT_CACHE_MEMORY_ENTRIES = int(os.getenv("RESULT_CACHE_MEMORY_ENTRIES", "4096"))
+RESULT_CACHE_MEMORY_MB = float(os.getenv("RESULT_CACHE_MEMORY_MB", "256"))
+
+# ==================== SESSION MEMORY ====================
+# Arrays a session keeps live in the scene cache; session state only holds
+# handles. Resident copies are evicted LRU beyond these budgets.
+SESSION_BUDGET_MB = float(os.getenv("SESSION_BUDGET_MB", "32"))  # per browser session
+SESSION_GLOBAL_BUDGET_MB = float(os.getenv("SESSION_GLOBAL_BUDGET_MB", "512"))  # all sessions of a process
+SESSION_IDLE_MINUTES = float(os.getenv("SESSION_IDLE_MINUTES", "30"))  # then a session's copies are dropped
+SESSION_ARRAY_MIN_KB = 64  # smaller arrays are kept resident only
+
+# ==================== MAP TILES ====================
+# Public URL of the tile service as seen by the browser; empty disables layers
+TILE_SERVER_URL = os.getenv("TILE_SERVER_URL", "")
+TILE_SERVER_PORT = int(os.getenv("TILE_SERVER_PORT", "8502"))
+TILE_CACHE_MAX_MB = int(os.getenv("TILE_CACHE_MAX_MB", "128"))  # encoded PNG LRU
+
+# ==================== WEATHER ====================
+# Forecast grid over Egypt [min_lon, min_lat, max_lon, max_lat]; one API
+# request per node per update cycle (python -m utils.weather ingest)
+WEATHER_GRID_BBOX = (24.5, 22.0, 35.0, 31.75)
+WEATHER_GRID_STEP_DEG = float(os.getenv("WEATHER_GRID_STEP_DEG", "0.25"))
+WEATHER_STORE_PATH = os.getenv("WEATHER_STORE_PATH", "cache/weather.npz")
+WEATHER_SOURCE = os.getenv("WEATHER_SOURCE", "openweather")  # openweather, demo or a fixture dir
+WEATHER_UPDATE_HOURS = int(os.getenv("WEATHER_UPDATE_HOURS", "6"))  # nodes fresher than this are skipped
+WEATHER_RATE_LIMIT = float(os.getenv("WEATHER_RATE_LIMIT", "1"))  # requests per second
+OPENWEATHER_URL = "https://api.openweathermap.org/data/3.0/onecall"
+
+# ==================== PDF EXPORT ====================
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "cache/pdf")
+PDF_CACHE_MAX_MB = int(os.getenv("PDF_CACHE_MAX_MB", "512"))  # rendered PDFs/zips on disk
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))  # rendering processes of python -m utils.pdf_export
+# TrueType font with Arabic glyphs (Dockerfile installs fonts-dejavu-core)
+PDF_FONT_PATH = os.getenv("PDF_FONT_PATH", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+
+# ==================== ANALYSIS JOBS ====================
+# Queue shared by the dashboard and the worker service (python -m utils.jobs worker)
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "cache/jobs.sqlite")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))  # processes of the worker service
+# Worker processes the dashboard starts itself; 0 when a worker service runs
+JOB_EMBEDDED_WORKERS = int(os.getenv("JOB_EMBEDDED_WORKERS", "2"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "60"))  # renewed while a job runs
+JOB_MAX_ATTEMPTS = 3         # claims of a job whose worker died before it is failed
+JOB_POLL_SECONDS = 0.2       # idle workers and waiting callers poll this often
 
 # ==================== UI THEME ====================
 THEME_CONFIG = {
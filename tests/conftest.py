@@ -0,0 +1,67 @@
+# tests/conftest.py - Offline test setup: demo mode and scratch stores
+"""
+Every cache, store and queue points at a scratch directory before
+``config`` is imported, so tests never touch ``cache/`` or the network.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCRATCH = tempfile.mkdtemp(prefix="agrimind-tests-")
+os.environ.update({
+    "DEMO_MODE": "true",
+    "RESULT_CACHE_URL": "",
+    "SCENE_CACHE_DIR": os.path.join(SCRATCH, "scenes"),
+    "HISTORY_DB_PATH": os.path.join(SCRATCH, "history.sqlite"),
+    "JOB_QUEUE_PATH": os.path.join(SCRATCH, "jobs.sqlite"),
+    "PDF_CACHE_DIR": os.path.join(SCRATCH, "pdf"),
+    "WEATHER_STORE_PATH": os.path.join(SCRATCH, "weather.npz"),
+    "PEST_STATE_PATH": os.path.join(SCRATCH, "pest_state.npz"),
+    "ANOMALY_STATE_PATH": os.path.join(SCRATCH, "anomaly_state.npz"),
+})
+
+
+class FakeSatelliteClient:
+    """Live-client stand-in: flat index rasters (``value``) for every clear date."""
+
+    def __init__(self, value=0.5, clear_dates=("2024-09-10", "2024-09-15", "2024-09-20")):
+        self.value = value
+        self.clear_dates = list(clear_dates)
+        self.fetched = []
+
+    def get_clear_dates(self, bbox, date_from, date_to, **kwargs):
+        return self.clear_dates
+
+    def fetch_index_data(self, bbox, date_from, date_to, size=None):
+        import numpy as np
+        from utils.evalscripts import quantize_indices
+        from utils.indices import INDEX_NAMES
+
+        self.fetched.append((str(date_from), str(date_to)))
+        width, height = size
+        return quantize_indices({name: np.full((height, width), self.value, dtype=np.float32)
+                                 for name in INDEX_NAMES})
+
+
+WEATHER_FIXTURES = os.path.join(ROOT, "fixtures", "weather")
+
+
+@pytest.fixture
+def weather_store(tmp_path):
+    """WeatherStore with the fixture forecasts (0.25° nodes, lat 30.00-30.75, lon 30.00-31.00)."""
+    from utils.weather import FixtureSource, WeatherGrid, WeatherStore
+
+    grid = WeatherGrid(bbox=(30.0, 30.0, 31.0, 30.75), step=0.25)
+    store = WeatherStore(str(tmp_path / "weather.npz"), grid)
+    assert store.ingest(FixtureSource(WEATHER_FIXTURES), grid.all_nodes(), now=1.0) == 20
+    return store
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(SCRATCH, ignore_errors=True)
@@ -0,0 +1,75 @@
+# tests/test_anomaly.py - Streaming per-farm NDVI anomaly detector
+from datetime import date
+
+import numpy as np
+
+from utils.anomaly import (
+    ANOMALY_BELOW_OPTIMAL, ANOMALY_CHANGE, ANOMALY_ZSCORE_FLAG, StreamingAnomalyDetector
+)
+
+WHEAT = "قمح"   # optimal NDVI 0.5-0.8
+
+
+def test_welford_matches_numpy():
+    series = np.random.default_rng(0).uniform(0.3, 0.8, size=(3, 40))
+    detector = StreamingAnomalyDetector()
+    for day, values in enumerate(series.T, start=1):
+        detector.update(["a", "b", "c"], values, day=day)
+    for key, values in zip("abc", series):
+        state = detector.state(key)
+        assert state["count"] == 40
+        np.testing.assert_allclose(state["mean"], values.mean(), rtol=1e-5)
+        np.testing.assert_allclose(state["std"] ** 2, np.var(values, ddof=1), rtol=1e-4)
+
+
+def test_ewma_and_zscore_flag_a_planted_drop():
+    detector = StreamingAnomalyDetector(alpha=0.3)
+    stable = 0.7 + 0.01 * np.sin(np.arange(12))
+    for day, value in enumerate(stable, start=1):
+        assert detector.update(["farm"], [value], day=day, crops=[WHEAT])[0] == 0
+    ewma = stable[0]
+    for value in stable[1:]:
+        ewma += 0.3 * (value - ewma)
+    np.testing.assert_allclose(detector.state("farm")["ewma"], ewma, rtol=1e-5)
+
+    # a 40% drop: relative change, many EW standard deviations, below the crop's range
+    flags = detector.update(["farm"], [0.42], day=13)
+    assert flags[0] == ANOMALY_CHANGE | ANOMALY_ZSCORE_FLAG | ANOMALY_BELOW_OPTIMAL
+
+
+def test_updates_are_idempotent_per_day():
+    detector = StreamingAnomalyDetector()
+    detector.update(["a", "b"], [0.6, 0.7], day=date(2024, 9, 10))
+    detector.update(["a", "b"], [0.1, np.nan], day=date(2024, 9, 10))   # same day again
+    detector.update(["a"], [0.1], day=date(2024, 9, 5))                  # an older scene
+    detector.update(["b"], [np.nan], day=date(2024, 9, 15))              # cloudy: ignored
+    a, b = detector.state("a"), detector.state("b")
+    assert a["count"] == 1 and a["mean"] == np.float32(0.6) and a["last_day"] == date(2024, 9, 10)
+    assert b["count"] == 1 and b["last_day"] == date(2024, 9, 10)
+
+
+def test_capacity_grows_past_1024_keys():
+    detector = StreamingAnomalyDetector()
+    keys = [f"farm{i}" for i in range(1500)]
+    values = np.linspace(0.2, 0.8, 1500)
+    detector.update(keys[:1000], values[:1000], day=1)
+    detector.update(keys, values, day=2)
+    assert len(detector) == 1500 and len(detector.count) == 2048
+    assert detector.state("farm10")["count"] == 2 and detector.state("farm1499")["count"] == 1
+    np.testing.assert_allclose(detector.state("farm1499")["mean"], values[1499], rtol=1e-6)
+
+
+def test_save_load_round_trip(tmp_path):
+    detector = StreamingAnomalyDetector()
+    for day in range(1, 8):
+        detector.update(["a", "b"], [0.5 + 0.01 * day, 0.7 - 0.02 * day], day=day, crops=[WHEAT, None])
+    path = str(tmp_path / "anomaly.npz")
+    detector.save(path)
+
+    loaded = StreamingAnomalyDetector.load(path)
+    assert len(loaded) == 2
+    for key in "ab":
+        assert loaded.state(key) == detector.state(key)
+    # both continue identically
+    assert (loaded.update(["a", "b"], [0.3, 0.9], day=8) == detector.update(["a", "b"], [0.3, 0.9], day=8)).all()
+    assert len(StreamingAnomalyDetector.load(str(tmp_path / "missing.npz"))) == 0
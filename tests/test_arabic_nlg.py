@@ -0,0 +1,121 @@
+# tests/test_arabic_nlg.py - Compiled report templates against the original f-string reports
+import io
+import itertools
+import json
+
+import pytest
+
+from config import CROPS_CONFIG, IRRIGATION_TYPES, WATER_EFFICIENCY
+from utils.arabic_nlg import (
+    CROP_ADVICE, DEFAULT_ADVICE, LINE, STATUS_TITLES, ArabicReportGenerator, CompiledTemplate
+)
+
+STATUSES = [
+    {"status": "Healthy", "emoji": "✅", "description": "النبات كويس", "ndvi": 0.72, "ndwi": 0.31},
+    {"status": "Needs Attention", "emoji": "⚠️", "ndvi": 0.41},
+    {"status": "Critical", "emoji": "🚨", "description": "إجهاد شديد", "ndvi": 0.12, "ndwi": -0.2},
+    {"status": "Unknown", "emoji": "☁️", "ndvi": None, "ndwi": None},
+    {},
+]
+CROPS = [*CROPS_CONFIG, "بطاطس"]
+IRRIGATION = [*IRRIGATION_TYPES, "رش", None]
+
+
+def fstring_summary(status, crop_name, area, water_need_score=None, irrigation_type=None,
+                    pest_risk_score=None, pests=None):
+    """The report as the hand-written f-string generator produced it."""
+    def header(title):
+        return f"┏{LINE}┓\n  {title}\n┗{LINE}┛"
+
+    crop_en = CROPS_CONFIG.get(crop_name, {}).get("en_name", crop_name)
+    state = status.get("status", "Healthy")
+    lines = [
+        header(f"🌾 تقرير صحة المحصول - {crop_name} ({crop_en})"),
+        f"📏 المساحة: {area} فدان",
+        f"{status.get('emoji', '✅')} الحالة: {STATUS_TITLES.get(state, state)}",
+    ]
+    if status.get("description"):
+        lines.append(f"💬 {status['description']}")
+    if status.get("ndvi") is not None:
+        lines.append(f"🌱 مؤشر الخضرة (NDVI): {status['ndvi']}")
+    if status.get("ndwi") is not None:
+        lines.append(f"💧 مؤشر المية (NDWI): {status['ndwi']}")
+    lines.append(LINE)
+    lines.append(f"💡 {CROP_ADVICE.get(CROPS_CONFIG.get(crop_name, {}).get('en_name'), DEFAULT_ADVICE)}")
+    sections = ["\n".join(lines)]
+
+    if water_need_score is not None and irrigation_type is not None:
+        if water_need_score >= 60:
+            advice = "🚨 الأرض عطشانة، اروي النهارده أو بكرة بالكتير"
+        elif water_need_score >= 30:
+            advice = "⚠️ اروي خلال يومين تلاتة"
+        else:
+            advice = "✅ الري تمام، كمل على نفس الجدول"
+        method = IRRIGATION_TYPES.get(irrigation_type, irrigation_type)
+        efficiency = WATER_EFFICIENCY.get(str(method).lower())
+        lines = [header("💧 توصية الري"), advice, f"🚿 نوع الري: {irrigation_type}"]
+        if efficiency is not None:
+            lines.append(f"📊 كفاءة الري: {int(efficiency * 100)}%")
+        if crop_name in CROPS_CONFIG:
+            lines.append(f"📅 الري كل {CROPS_CONFIG[crop_name]['irrigation_interval']} أيام تقريباً")
+        sections.append("\n".join(lines))
+
+    if pest_risk_score is not None:
+        if pest_risk_score >= 60:
+            level = "🔴 خطر عالي - افحص الزرعة النهارده"
+        elif pest_risk_score >= 30:
+            level = "🟡 خطر متوسط - راقب كويس"
+        else:
+            level = "🟢 خطر قليل - كمل متابعة عادية"
+        lines = [header("🐛 تنبيه الآفات"), level]
+        lines.extend(f"  • {pest}" for pest in pests or CROPS_CONFIG.get(crop_name, {}).get("pest_risks", []))
+        sections.append("\n".join(lines))
+    return "\n\n".join(sections)
+
+
+def farms():
+    combos = itertools.product(STATUSES, CROPS, IRRIGATION, (None, 10, 45, 80), (None, 5, 35, 90))
+    for number, (status, crop, irrigation, water, pest) in enumerate(combos):
+        yield {
+            "farm_id": f"farm{number}", "status": status, "crop": crop, "size_feddan": 2.5,
+            "water_need_score": water, "irrigation_type": irrigation, "pest_risk": pest,
+            "pests": ["المن"] if number % 3 == 0 else None,
+        }
+
+
+def test_summary_is_byte_identical_to_the_fstring_report():
+    generator = ArabicReportGenerator()
+    for farm in farms():
+        args = (farm["status"], farm["crop"], farm["size_feddan"], farm["water_need_score"],
+                farm["irrigation_type"], farm["pest_risk"], farm["pests"])
+        assert generator.generate_summary_report(*args).encode() == fstring_summary(*args).encode(), farm
+
+
+def test_render_many_matches_per_farm_calls():
+    generator = ArabicReportGenerator()
+    expected = [
+        (farm["farm_id"], generator.generate_summary_report(
+            farm["status"], farm["crop"], farm["size_feddan"], farm["water_need_score"],
+            farm["irrigation_type"], farm["pest_risk"], farm["pests"]))
+        for farm in farms()
+    ]
+    assert generator.render_many(farms()) == expected
+
+    sink = io.StringIO()
+    assert generator.render_many(farms(), out=sink) == len(expected)
+    lines = [json.loads(line) for line in sink.getvalue().splitlines()]
+    assert [(line["farm_id"], line["report"]) for line in lines] == expected
+
+    received = []
+    generator.render_many(farms(), out=lambda farm_id, report: received.append((farm_id, report)))
+    assert received == expected
+
+
+def test_template_fields():
+    template = CompiledTemplate("{name!r} = {value:.2f} ({value}) {{literal}}")
+    assert template.fields == ["name", "value"]
+    assert template.render(name="x", value=0.5, extra=1) == f"{'x'!r} = {0.5:.2f} ({0.5}) {{literal}}"
+    with pytest.raises(TypeError):
+        template.render(name="x")
+    with pytest.raises(ValueError):
+        CompiledTemplate("{status[title]}")
@@ -0,0 +1,131 @@
+# tests/test_async_fetch.py - Async fetcher against a local stub process API
+import asyncio
+import time
+
+import numpy as np
+from aiohttp import web
+
+from utils import satellite
+from utils.async_fetch import AsyncSceneFetcher, FetchError, TokenBucket
+from utils.scene_cache import SceneCache
+
+
+class StubProcessApi:
+    """
+    Process-API stand-in: ``failures[tag]`` lists what the first requests
+    carrying that payload tag get (an HTTP status or ``"slow"``), then 200
+    with the tag as body.
+    """
+
+    def __init__(self, failures=None):
+        self.failures = {tag: list(steps) for tag, steps in (failures or {}).items()}
+        self.requests = []
+
+    async def handle(self, request):
+        payload = await request.json()
+        tag = payload["tag"]
+        self.requests.append((tag, time.monotonic()))
+        steps = self.failures.get(tag)
+        step = steps.pop(0) if steps else 200
+        if step == "slow":
+            await asyncio.sleep(1.0)
+        elif step != 200:
+            return web.Response(status=step, text="try again", headers={"Retry-After": "0"})
+        return web.Response(body=tag.encode())
+
+
+async def serve(api, fetch):
+    app = web.Application()
+    app.router.add_post("/api/v1/process", api.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    try:
+        return await fetch(f"http://127.0.0.1:{port}")
+    finally:
+        await runner.cleanup()
+
+
+def run_fetcher(api, payloads, **kwargs):
+    async def fetch(base_url):
+        options = {"rate": 100, "backoff_base": 0.01, "max_retries": 2, **kwargs}
+        async with AsyncSceneFetcher(f"{base_url}/api/v1/process", lambda: "token", **options) as fetcher:
+            return await fetcher.fetch_all(payloads), fetcher.stats
+    return asyncio.run(serve(api, fetch))
+
+
+def test_retries_rate_limits_server_errors_and_timeouts():
+    api = StubProcessApi({"a": [429], "b": [503, 502], "c": ["slow"], "d": [400]})
+    bodies, stats = run_fetcher(api, [{"tag": tag} for tag in "abcd"], timeout=0.3)
+    assert bodies[:3] == [b"a", b"b", b"c"]
+    assert isinstance(bodies[3], FetchError) and bodies[3].status == 400
+    assert stats["retries"] == 4
+
+
+def test_gives_up_after_max_retries():
+    api = StubProcessApi({"a": [503, 503, 503]})
+    bodies, _ = run_fetcher(api, [{"tag": "a"}])
+    assert isinstance(bodies[0], FetchError) and bodies[0].status == 503
+    assert len(api.requests) == 3
+
+
+def test_requests_are_paced_by_the_token_bucket():
+    api = StubProcessApi()
+    bodies, _ = run_fetcher(api, [{"tag": str(i)} for i in range(15)], rate=10)
+    assert len(bodies) == 15
+    times = sorted(t for _, t in api.requests)
+    # a burst of 10 tokens, then one request per 0.1 s
+    assert times[-1] - times[0] >= 0.4
+
+
+def test_token_bucket_rate():
+    async def drain(bucket, n):
+        start = time.monotonic()
+        for _ in range(n):
+            await bucket.acquire()
+        return time.monotonic() - start
+    assert asyncio.run(drain(TokenBucket(rate=20, capacity=1), 5)) >= 0.18
+
+
+def test_fetch_many_reads_and_fills_the_scene_cache(tmp_path, monkeypatch):
+    api = StubProcessApi()
+    monkeypatch.setattr(satellite, "decode_tiff", lambda body: np.frombuffer(body, dtype=np.uint8)[None])
+
+    def tagged(self, bbox, date_from, date_to, script, *args):
+        return {"tag": f"{date_from}:{script}"}
+    monkeypatch.setattr(satellite.SentinelHubClient, "build_process_request", tagged)
+
+    async def fetch(base_url):
+        client = satellite.SentinelHubClient(base_url=base_url, cache=SceneCache(str(tmp_path)))
+        client._get_access_token = lambda: "token"
+        first = await client.fetch_many_async([0, 0, 1, 1], ["2024-09-01", "2024-09-06"], {"ndvi": "s"})
+        second = await client.fetch_many_async([0, 0, 1, 1], ["2024-09-01", "2024-09-06"], {"ndvi": "s"})
+        return client, first, second
+    client, first, second = asyncio.run(serve(api, fetch))
+
+    assert len(api.requests) == 2      # the second call is served from the scene cache
+    assert bytes(second[("2024-09-01", "ndvi")][0]) == b"2024-09-01:s"
+    assert bytes(first[("2024-09-06", "ndvi")][0]) == bytes(second[("2024-09-06", "ndvi")][0])
+    # the sync path reads the same entries
+    cached = client.cache.get_or_fetch([0, 0, 1, 1], "2024-09-06", "2024-09-06", "s", lambda: 1 / 0)
+    assert bytes(cached["data"][0]) == b"2024-09-06:s"
+
+
+def test_fetch_many_uses_the_shared_tier(tmp_path, monkeypatch):
+    api = StubProcessApi()
+    monkeypatch.setattr(satellite, "RESULT_CACHE_URL", "memory://")
+    monkeypatch.setattr(satellite, "decode_tiff", lambda body: np.frombuffer(body, dtype=np.uint8)[None])
+    # another replica fetched this scene
+    shared = {"data": np.array([[7]], dtype=np.uint8)}
+    satellite.shared_fetch([0, 0, 2, 2], "2024-09-01", "2024-09-01", "s", lambda: shared)()
+
+    async def fetch(base_url):
+        client = satellite.SentinelHubClient(base_url=base_url, cache=SceneCache(str(tmp_path)))
+        client._get_access_token = lambda: "token"
+        return await client.fetch_many_async([0, 0, 2, 2], ["2024-09-01"], {"ndvi": "s"})
+    result = asyncio.run(serve(api, fetch))
+
+    assert api.requests == []
+    assert result[("2024-09-01", "ndvi")][0, 0] == 7
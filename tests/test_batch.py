@@ -0,0 +1,55 @@
+# tests/test_batch.py - Batch runner checkpoints
+import csv
+import json
+from datetime import datetime, timedelta
+
+from utils import batch
+
+FARMS = [
+    {"farm_id": "a", "lat": 30.10, "lon": 31.20},
+    {"farm_id": "b", "lat": 30.40, "lon": 31.50},
+]
+
+
+def test_resume_ignores_checkpoints_of_other_inputs(tmp_path):
+    farms_path, output = str(tmp_path / "farms.csv"), str(tmp_path / "results.jsonl")
+    with open(farms_path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.DictWriter(handle, fieldnames=list(FARMS[0]))
+        writer.writeheader()
+        writer.writerows(FARMS)
+
+    farms = batch.load_farms(farms_path)
+    today = datetime.now().date()
+    current = batch._inputs_key(farms[0], today - timedelta(days=10), today, True)
+    yesterday = batch._inputs_key(farms[1], today - timedelta(days=11), today - timedelta(days=1), True)
+    with open(f"{output}.checkpoint.jsonl", "w", encoding="utf-8") as handle:
+        for key, farm_id in ((current, "a"), (yesterday, "b")):
+            result = {"farm_id": farm_id, "lat": 0.0, "lon": 0.0, "crop": farms[0]["crop"],
+                      "ndvi": 0.9, "marker": "checkpoint"}
+            handle.write(json.dumps({"inputs": key, "result": result}) + "\n")
+        handle.write(json.dumps({"farm_id": "b", "marker": "old format"}) + "\n")
+
+    summary = batch.run_batch(farms_path, output, workers=1, days=10, demo=True)
+    assert summary["resumed"] == 1 and summary["processed"] == 1
+
+    with open(output, encoding="utf-8") as handle:
+        results = {result["farm_id"]: result for result in map(json.loads, handle)}
+    assert results["a"]["marker"] == "checkpoint"       # same day and inputs: reused
+    assert "marker" not in results["b"]                  # yesterday's line: analysed again
+
+
+def test_csv_results_spread_pest_risks_over_columns(tmp_path):
+    path = str(tmp_path / "results.csv")
+    batch._write_results(path, [
+        {"farm_id": "a", "pest_risk": 60, "pest_risks": {"Aphids": 60, "Hessian Flies": 42}},
+        {"farm_id": "b", "pest_risk": 35, "pest_risks": {"Whiteflies": 35}},
+        {"farm_id": "c", "pest_risks": {}},
+    ])
+    with open(path, newline="", encoding="utf-8") as handle:
+        rows = list(csv.DictReader(handle))
+    assert list(rows[0]) == ["farm_id", "pest_risk", "pest_aphids_risk", "pest_hessian_flies_risk",
+                             "pest_whiteflies_risk"]
+    assert rows[0]["pest_hessian_flies_risk"] == "42" and rows[0]["pest_whiteflies_risk"] == ""
+    assert rows[1]["pest_whiteflies_risk"] == "35"
+    assert rows[2] == {"farm_id": "c", "pest_risk": "", "pest_aphids_risk": "",
+                       "pest_hessian_flies_risk": "", "pest_whiteflies_risk": ""}
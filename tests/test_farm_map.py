@@ -0,0 +1,57 @@
+# tests/test_farm_map.py - Map layers from analysis jobs, live scenes outside demo mode
+import numpy as np
+from streamlit.testing.v1 import AppTest
+
+from tests.conftest import ROOT, FakeSatelliteClient
+from ui import farm_map
+from utils import jobs, satellite
+
+
+def open_layers(app):
+    next(s for s in app.selectbox if s.label.startswith("🗺️")).select("ndvi")
+    next(c for c in app.checkbox if "NDVI" in c.label).check()
+    return app.run()
+
+
+def test_map_layers_use_live_scenes(monkeypatch):
+    client = FakeSatelliteClient()
+    published = []
+    monkeypatch.setattr(satellite, "get_satellite_client", lambda: client)
+    monkeypatch.setattr(farm_map, "DEMO_MODE", False)
+    monkeypatch.setattr(farm_map, "TILE_SERVER_URL", "http://tiles.test")
+    # the analysis workers' part, run in this process
+    submitted = []
+    monkeypatch.setattr(farm_map, "job_result",
+                        lambda task, message, **params: submitted.append(task) or jobs.run_task(task, params))
+    monkeypatch.setattr("utils.tiles.publish_index_layer",
+                        lambda bbox, rasters, label: published.append((label, rasters())) or "layer")
+
+    def demo_used(*args, **kwargs):
+        raise AssertionError("demo data used outside demo mode")
+    monkeypatch.setattr("utils.demo_mode.DemoDataLoader.get_demo_indices", demo_used)
+    monkeypatch.setattr("utils.demo_mode.DemoDataLoader.get_demo_ndvi_stack", demo_used)
+
+    app = open_layers(AppTest.from_file(f"{ROOT}/app.py", default_timeout=60).run())
+    assert not app.exception
+    assert submitted[-2:] == ["index_layer", "change_map"]
+
+    label, rasters = published[-1]
+    assert not str(label).startswith("demo")
+    assert float(np.nanmean(rasters["ndvi"])) == 0.5
+    # the change map stack reads every clear acquisition (from the scene cache when fetched)
+    assert {("2024-09-10", "2024-09-10"), ("2024-09-20", "2024-09-20")} <= set(client.fetched)
+
+
+def test_map_layers_render_pending_while_jobs_run(monkeypatch):
+    monkeypatch.setattr(farm_map, "TILE_SERVER_URL", "http://tiles.test")
+    monkeypatch.setattr(farm_map, "job_result", lambda task, message, **params: None)
+
+    def computed_inline(*args, **kwargs):
+        raise AssertionError("heavy work in the script thread")
+    for name in ("utils.tiles.publish_index_layer", "utils.batch.fetch_ndvi_stack",
+                 "utils.batch.fetch_scene_indices"):
+        monkeypatch.setattr(name, computed_inline)
+
+    app = open_layers(AppTest.from_file(f"{ROOT}/app.py", default_timeout=60).run())
+    assert not app.exception
+    assert not any("صافية" in info.value for info in app.info)
@@ -0,0 +1,64 @@
+# tests/test_history.py - Per-farm index history filled from acquisitions
+from datetime import datetime, timedelta
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from tests.conftest import ROOT, FakeSatelliteClient
+from utils import history_store, jobs, satellite
+from utils.history_store import HistoryStore, history_key
+
+BBOX = [31.2, 30.0, 31.21, 30.01]
+
+
+@pytest.fixture
+def live(tmp_path, monkeypatch):
+    """Fresh history store, a fake live catalog with two recent clear scenes, demo data forbidden."""
+    store = HistoryStore(str(tmp_path / "history.sqlite"))
+    monkeypatch.setattr(history_store, "_store", store)
+    today = datetime.now().date()
+    client = FakeSatelliteClient(value=0.25, clear_dates=[str(today - timedelta(days=7)),
+                                                          str(today - timedelta(days=2))])
+    monkeypatch.setattr(satellite, "get_satellite_client", lambda: client)
+
+    def demo_used(*args, **kwargs):
+        raise AssertionError("demo statistics used outside demo mode")
+    monkeypatch.setattr("utils.demo_mode.DemoDataLoader.get_demo_index_stats", demo_used)
+    return store, client, today
+
+
+def test_live_history_holds_only_acquisition_days(live):
+    store, client, today = live
+    assert jobs.index_history("farm", BBOX, str(today), days=30, demo=False) == 2
+    history = store.query("farm", "ndvi", days=30, end=today)
+    assert history["date"] == [today - timedelta(days=7), today - timedelta(days=2)]
+    assert history["mean"].tolist() == pytest.approx([0.25, 0.25], abs=1e-3)
+    # already stored: nothing is fetched again
+    fetched = len(client.fetched)
+    assert jobs.index_history("farm", BBOX, str(today), days=30, demo=False) == 0
+    assert len(client.fetched) == fetched
+
+
+def test_demo_history_is_namespaced(tmp_path, monkeypatch):
+    store = HistoryStore(str(tmp_path / "history.sqlite"))
+    monkeypatch.setattr(history_store, "_store", store)
+    jobs.index_history("farm", BBOX, "2024-09-30", days=30, demo=True)
+    demo = store.query(history_key("farm", demo=True), "ndvi", days=30, end=datetime(2024, 9, 30).date())
+    assert len(demo["date"]) == 6       # the demo catalog's 5-day acquisitions
+    assert store.latest_date("farm") is None
+
+
+def test_live_render_never_writes_demo_rows(live, monkeypatch):
+    store, _, today = live
+    from ui import spectral
+
+    monkeypatch.setattr(spectral, "DEMO_MODE", False)
+    monkeypatch.setattr(spectral, "job_result", lambda task, message, **params: jobs.run_task(task, params))
+    app = AppTest.from_file(f"{ROOT}/app.py", default_timeout=60).run()
+    assert not app.exception
+
+    farm_id = next(row[0] for row in store._conn.execute("SELECT DISTINCT farm_id FROM index_history"))
+    assert not farm_id.startswith("demo:")
+    assert store.query(farm_id, "ndvi", days=30, end=today)["date"] == [today - timedelta(days=7),
+                                                                         today - timedelta(days=2)]
+    assert store._conn.execute("SELECT COUNT(*) FROM index_history WHERE farm_id LIKE 'demo:%'").fetchone()[0] == 0
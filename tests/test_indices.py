@@ -0,0 +1,51 @@
+# tests/test_indices.py - Health classification and scores on cloud-masked scenes
+from datetime import date
+
+import numpy as np
+
+from config import CROPS_CONFIG
+from utils import batch
+from utils.indices import SpectralIndices, TimeSeriesAnalysis
+
+CROP = next(iter(CROPS_CONFIG))
+
+
+def test_all_nan_scene_has_no_status_or_scores():
+    masked = np.full((16, 16), np.nan, dtype=np.float32)
+    status = SpectralIndices.classify_health_status(masked, masked)
+    assert status["status"] == "Unknown"
+    assert status["ndvi"] is None and status["ndwi"] is None
+    assert TimeSeriesAnalysis.predict_pest_risk(masked, CROP) is None
+    assert TimeSeriesAnalysis.forecast_irrigation_need(masked, [0.0], CROP) is None
+
+
+def test_partly_masked_scene_uses_valid_pixels():
+    ndvi = np.full((16, 16), 0.8, dtype=np.float32)
+    ndvi[:8] = np.nan
+    status = SpectralIndices.classify_health_status(ndvi)
+    assert status["status"] == "Healthy" and status["ndvi"] == 0.8
+    assert TimeSeriesAnalysis.predict_pest_risk(ndvi, CROP) == 15
+
+
+def test_cloudy_farm_does_not_fail_its_group(monkeypatch):
+    """One fully masked farm gets an "Unknown" result; its neighbour is analysed."""
+    shape = (20, 40)
+    ndvi = np.full(shape, 0.7, dtype=np.float32)
+    ndvi[:, :20] = np.nan  # western half clouded
+    indices = {"ndvi": ndvi, "ndwi": ndvi * 0.3, "clear": ~np.isnan(ndvi)}
+    monkeypatch.setattr(batch, "fetch_scene_indices", lambda *args: dict(indices))
+
+    farms = [
+        {"farm_id": "cloudy", "lat": 30.0, "lon": 31.0, "crop": CROP, "size_feddan": 5.0,
+         "bbox": [31.0, 30.0, 31.05, 30.05]},
+        {"farm_id": "clear", "lat": 30.0, "lon": 31.15, "crop": CROP, "size_feddan": 5.0,
+         "bbox": [31.15, 30.0, 31.2, 30.05]},
+    ]
+    group = {"bbox": [31.0, 30.0, 31.2, 30.05], "farms": farms}
+    cloudy, clear = batch.process_group(group, date(2024, 9, 1), date(2024, 9, 10), demo=True)
+
+    assert cloudy["status"] == "Unknown"
+    assert cloudy["ndvi"] is None and cloudy["pest_risk"] is None
+    assert cloudy["clear_fraction"] == 0.0
+    assert cloudy["report"]
+    assert clear["status"] != "Unknown" and clear["ndvi"] == 0.7
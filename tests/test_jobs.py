@@ -0,0 +1,60 @@
+# tests/test_jobs.py - Job queue and the dashboard's embedded workers
+import time
+
+from streamlit.testing.v1 import AppTest
+
+from tests.conftest import ROOT, FakeSatelliteClient
+from utils import jobs, satellite
+
+
+def test_dashboard_job_runs_end_to_end():
+    """app.py starts the embedded worker service and the health job completes."""
+    app = AppTest.from_file(f"{ROOT}/app.py", default_timeout=120)
+    try:
+        deadline = time.monotonic() + 90
+        while True:
+            app.run()
+            assert not app.exception
+            markdown = " ".join(element.value for element in app.markdown)
+            if "NDVI:" in markdown or any("صافية" in w.value for w in app.warning):
+                break
+            assert time.monotonic() < deadline, jobs.get_job_queue().counts()
+            time.sleep(0.5)
+        assert jobs._embedded is not None and jobs._embedded.poll() is None
+        assert jobs.get_job_queue().counts()["done"] >= 1
+    finally:
+        jobs._stop_embedded()
+
+
+def test_identical_jobs_are_queued_once(tmp_path):
+    queue = jobs.JobQueue(str(tmp_path / "jobs.sqlite"))
+    first = queue.submit("scene_index", bbox=[31.2, 30.0, 31.21, 30.01], day="2024-09-30")
+    second = queue.submit("scene_index", bbox=[31.2, 30.0, 31.21, 30.01], day="2024-09-30")
+    assert first == second
+    assert queue.counts()["queued"] == 1
+
+
+def test_scene_index_reads_live_scenes_outside_demo_mode(monkeypatch):
+    client = FakeSatelliteClient(value=0.25)
+    monkeypatch.setattr(satellite, "get_satellite_client", lambda: client)
+    raster = jobs.scene_index([31.2, 30.0, 31.21, 30.01], "2024-09-30", demo=False)
+    assert client.fetched == [("2024-09-20", "2024-09-20")]
+    assert abs(float(raster.mean()) - 0.25) < 1e-3
+
+
+def test_requeued_job_result_is_not_stale(tmp_path, monkeypatch):
+    from ui import jobs as ui_jobs
+
+    queue = jobs.JobQueue(str(tmp_path / "jobs.sqlite"))
+    monkeypatch.setattr(ui_jobs, "get_job_queue", lambda: queue)
+    params = {"bbox": [0, 0, 1, 1], "day": "2024-09-30"}
+    results = []
+    for value in ("first", "second"):
+        ttl, queue.result_ttl_seconds = queue.result_ttl_seconds, 0
+        time.sleep(0.01)
+        job_id = queue.submit("scene_index", **params)   # the first result expired: requeued
+        queue.result_ttl_seconds = ttl
+        claimed = queue.claim("test")
+        queue.finish(claimed[0], "test", result=value)
+        results.append(ui_jobs.job_result("scene_index", **params))
+    assert claimed[0] == job_id and results == ["first", "second"]
@@ -0,0 +1,78 @@
+# tests/test_pdf_export.py - Bulk PDF export and its CLI
+import csv
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utils import batch, pdf_export
+from utils.pdf_export import PdfExporter
+
+FARMS = [
+    {"farm_id": "clear", "lat": 30.10, "lon": 31.20},
+    {"farm_id": "cloudy", "lat": 30.20, "lon": 31.30},
+]
+
+
+def write_csv(path):
+    with open(path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.DictWriter(handle, fieldnames=list(FARMS[0]))
+        writer.writeheader()
+        writer.writerows(FARMS)
+    return str(path)
+
+
+class ThreadQueue:
+    """``JobQueue.submit_future`` stand-in that renders in this process's threads."""
+
+    def __init__(self):
+        self.pool = ThreadPoolExecutor(2)
+
+    def submit_future(self, task, **params):
+        return self.pool.submit(pdf_export._render_to_cache, params["inputs"], params["path"])
+
+
+def test_bulk_export_keeps_a_fully_clouded_farm(tmp_path, monkeypatch):
+    fetch_scene_bands = batch.fetch_scene_bands
+
+    def clouded(bbox, date_from, date_to, demo):
+        bands = fetch_scene_bands(bbox, date_from, date_to, demo)
+        if bbox[1] > 30.15:     # the cloudy farm: every pixel masked as cloud
+            return tuple(np.full_like(band, np.nan, dtype=np.float32) for band in bands[:4]) + (
+                np.full_like(bands[4], 9),)
+        return bands
+    monkeypatch.setattr(batch, "fetch_scene_bands", clouded)
+
+    farms = batch.load_farms(write_csv(tmp_path / "farms.csv"))
+    exporter = PdfExporter(cache_dir=str(tmp_path / "pdf"), queue=ThreadQueue())
+    status = exporter.wait(exporter.submit_bulk(farms, day="2024-09-30", demo=True), timeout=120)
+
+    assert status["state"] == "done" and status["errors"] == []
+    with zipfile.ZipFile(status["path"]) as archive:
+        assert sorted(archive.namelist()) == ["clear_2024-09-30.pdf", "cloudy_2024-09-30.pdf"]
+
+
+def test_cli_demo_flag_defaults_to_demo_mode(tmp_path, monkeypatch):
+    submitted = []
+
+    class RecordingExporter:
+        def __init__(self, workers):
+            pass
+
+        def submit_bulk(self, farms, history_days, demo):
+            submitted.append(demo)
+            return "job"
+
+        def status(self, job_id):
+            return {"state": "failed", "total": 2, "done": 2, "errors": []}
+
+        def shutdown(self):
+            pass
+
+    monkeypatch.setattr(pdf_export, "PdfExporter", RecordingExporter)
+    farms, output = write_csv(tmp_path / "farms.csv"), str(tmp_path / "reports.zip")
+    for demo_mode, flags, expected in ((False, [], False), (True, [], True),
+                                       (False, ["--demo"], True), (True, ["--no-demo"], False)):
+        monkeypatch.setattr(pdf_export, "DEMO_MODE", demo_mode)
+        pdf_export.main([farms, output, *flags])
+        assert submitted[-1] is expected
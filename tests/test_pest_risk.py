@@ -0,0 +1,52 @@
+# tests/test_pest_risk.py - Degree-day pest risk tracker
+import numpy as np
+
+from tests.test_weather import load_fixture
+from utils.pest_risk import PEST_NAMES, PestRiskTracker, degree_days
+
+WHEAT = "قمح"   # hosts Aphids, Hessian Flies and Armyworms (pests 0..2)
+
+
+def test_pest_risk_on_fixture_weather(weather_store):
+    dates, values = weather_store.interpolate([30.0], [30.0], ["temp_max", "temp_min"])
+    days = load_fixture("30.00_30.00.json")["daily"]
+    tmax = np.array([day["temp"]["max"] for day in days])
+    tmin = np.array([day["temp"]["min"] for day in days])
+
+    # 25.98 / 15.86 °C: mean 20.92 minus each pest's base temperature
+    np.testing.assert_allclose(degree_days([25.98], [15.86])[0, :3], [16.52, 13.92, 10.02], atol=1e-4)
+
+    tracker = PestRiskTracker()
+    forecast = tracker.forecast(["farm"], values["temp_max"], values["temp_min"], [WHEAT])
+    for i, day in enumerate(dates):
+        risk = tracker.update(["farm"], values["temp_max"][:, i], values["temp_min"][:, i], day=day, crops=[WHEAT])
+    # average method, Tmax cut off at 30 / 30 / 35 °C
+    base, upper = np.array([4.4, 7.0, 10.9]), np.array([30.0, 30.0, 35.0])
+    expected = ((np.minimum(tmax[:, None], upper) + tmin[:, None]) / 2 - base).sum(axis=0)
+    np.testing.assert_allclose(tracker.gdd[0, :3], expected, atol=1e-3)
+    assert risk[0, :3].tolist() == [60, 42, 31] and not risk[0, 3:].any()
+    # the forecast over the same days projects the same risk without updating the state
+    assert forecast[0, -1].tolist() == risk[0].tolist()
+
+    # updates are idempotent per day
+    again = tracker.update(["farm"], [40.0], [30.0], day=dates[-1])
+    assert again.tolist() == risk.tolist()
+
+
+def test_state_grows_and_survives_a_round_trip(tmp_path):
+    tracker = PestRiskTracker(capacity=4)
+    keys = [f"farm{i}" for i in range(10)]
+    tracker.update(keys, np.full(10, 28.0), np.full(10, 16.0), day=1, crops=[WHEAT] * 10,
+                   ndvi=np.linspace(0.1, 0.7, 10))
+    tracker.update(keys[:5], np.full(5, 31.0), np.full(5, 18.0), day=2)
+    assert len(tracker) == 10 and tracker.state("farm0")["days"] == 2 and tracker.state("farm9")["days"] == 1
+
+    path = str(tmp_path / "pest_state.npz")
+    tracker.save(path)
+    loaded = PestRiskTracker.load(path)
+    assert len(loaded) == 10
+    np.testing.assert_array_equal(loaded.risk(), tracker.risk())
+    assert loaded.farm_pests("farm3") == tracker.farm_pests("farm3")
+    # NDVI under the crop's optimal range adds stress
+    assert tracker.risk()[5, 0] > tracker.risk()[9, 0]
+    assert set(tracker.farm_pests("farm0")) == {PEST_NAMES[0], PEST_NAMES[1], PEST_NAMES[2]}
@@ -0,0 +1,81 @@
+# tests/test_quantize.py - int16 index encoding, statistics and chunked storage
+import numpy as np
+import pytest
+
+from config import INDEX_QUANT_NODATA, INDEX_QUANT_SCALE
+from utils.history_store import raster_stats
+from utils.quantize import (
+    QUANT_LIMIT, dequantize, load_chunked, load_indices, quantize, quantized_stats, read_meta,
+    save_chunked, save_indices
+)
+
+
+def index_raster(shape=(300, 200), seed=0):
+    raster = np.random.default_rng(seed).uniform(-1, 1, size=shape).astype(np.float32)
+    raster[::7, ::5] = np.nan
+    return raster
+
+
+def test_round_trip_error_is_within_half_a_step():
+    raster = index_raster()
+    quantized = quantize(raster)
+    assert quantized.dtype == np.int16
+    decoded = dequantize(quantized)
+    assert decoded.dtype == np.float32
+    valid = ~np.isnan(raster)
+    assert np.array_equal(np.isnan(decoded), ~valid)
+    # float32 arithmetic adds a little on top of the half step
+    assert np.abs(decoded[valid] - raster[valid]).max() <= 0.5 / INDEX_QUANT_SCALE + 1e-6
+
+
+def test_nodata_mask_and_saturation():
+    raster = np.array([[0.25, np.nan], [5.0, -5.0]], dtype=np.float32)
+    quantized = quantize(raster)
+    assert quantized.tolist() == [[2500, INDEX_QUANT_NODATA], [QUANT_LIMIT, -QUANT_LIMIT]]
+
+    decoded = dequantize(quantized, mask=np.array([[1, 1], [0, 1]], dtype=np.uint8))
+    assert decoded[0, 0] == np.float32(0.25)
+    assert np.isnan(decoded[0, 1]) and np.isnan(decoded[1, 0])      # nodata, then masked out
+
+    out = np.full((2, 2), 7.0, dtype=np.float32)
+    assert dequantize(quantized, out=out) is out
+
+    empty = quantized_stats(np.full((4, 4), INDEX_QUANT_NODATA, dtype=np.int16))
+    assert empty["valid_fraction"] == 0.0 and empty["mean"] is None and empty["p50"] is None
+
+
+def test_stats_match_the_decoded_floats():
+    raster = index_raster(seed=1)
+    quantized = quantize(raster)
+    stats = quantized_stats(quantized)
+    expected = raster_stats(dequantize(quantized))
+    for column, value in expected.items():
+        assert stats[column] == pytest.approx(value, abs=1e-6), column
+    decoded = dequantize(quantized)
+    assert stats["min"] == pytest.approx(np.nanmin(decoded), abs=1e-7)
+    assert stats["max"] == pytest.approx(np.nanmax(decoded), abs=1e-7)
+
+
+@pytest.mark.parametrize("codec", ["zstd", "lz4", "zlib", "none"])
+def test_chunked_round_trip(tmp_path, codec):
+    path = str(tmp_path / "bands.npz")
+    arrays = {
+        "ndvi": index_raster((300, 40)),
+        "scl": np.arange(300 * 40, dtype=np.uint8).reshape(300, 40),
+        "stack": np.arange(3 * 50 * 8, dtype=np.int16).reshape(3, 50, 8),
+    }
+    save_chunked(path, arrays, codec, chunk_rows=64)
+    stored = read_meta(path)["codec"]
+    assert stored in (codec, "zlib")     # zlib stands in for a missing module
+
+    loaded = load_chunked(path)[0]
+    for name, array in arrays.items():
+        assert loaded[name].dtype == array.dtype
+        np.testing.assert_array_equal(loaded[name], array)
+    # a row range decodes only the overlapping chunks
+    rows = load_chunked(path, ["ndvi"], rows=slice(60, 130))[0]["ndvi"]
+    np.testing.assert_array_equal(rows, arrays["ndvi"][60:130])
+
+    save_indices(path, {"ndvi": arrays["ndvi"]}, codec, chunk_rows=64)
+    assert load_indices(path, quantized=True)["ndvi"].tolist() == quantize(arrays["ndvi"]).tolist()
+    np.testing.assert_array_equal(load_indices(path)["ndvi"], dequantize(quantize(arrays["ndvi"])))
@@ -0,0 +1,112 @@
+# tests/test_result_cache.py - Shared result cache and its in-process store
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import result_cache, satellite
+from utils.result_cache import MISSING, MemoryStore, ResultCache
+
+
+def test_memory_store_is_bounded():
+    store = MemoryStore(max_entries=3, max_bytes=1000)
+    for i in range(5):
+        store.set(f"k{i}", b"x" * 10)
+    assert len(store) == 3 and store.get("k0") is None
+
+    store.get("k2")                     # most recently used now
+    store.set("big", b"x" * 990)        # over the byte budget: evicts k3, k4
+    assert store.get("k3") is None and store.get("k4") is None
+    assert store.get("k2") is not None and store.get("big") is not None
+    assert store.nbytes == 1000
+
+
+def test_memory_store_drops_expired_entries_on_write(monkeypatch):
+    monkeypatch.setattr(result_cache, "EXPIRY_SWEEP_SECONDS", 0)
+    store = MemoryStore()
+    store.set("short", b"x" * 100, ttl=0.01)
+    store.set("long", b"y" * 100, ttl=60)
+    time.sleep(0.02)
+    store.set("other", b"z")            # never reads "short" again
+    assert len(store) == 2 and store.nbytes == 101
+
+
+def test_scenes_skip_the_in_process_shared_tier(monkeypatch):
+    fetch = lambda: {"data": b"scene"}  # noqa: E731
+    monkeypatch.setattr(satellite, "RESULT_CACHE_URL", "")
+    assert satellite.shared_fetch([0, 0, 1, 1], "2024-01-01", "2024-01-02", "s", fetch) is fetch
+    monkeypatch.setattr(satellite, "RESULT_CACHE_URL", "memory://")
+    assert satellite.shared_fetch([0, 0, 1, 1], "2024-01-01", "2024-01-02", "s", fetch) is not fetch
+
+
+def test_concurrent_misses_compute_once():
+    cache = ResultCache(MemoryStore())
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"value": 42}
+
+    key = cache.key("test", "single-flight")
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: cache.get_or_compute(key, compute), range(8)))
+    assert len(calls) == 1 and all(result == {"value": 42} for result in results)
+    assert cache.stats["computed"] == 1
+
+
+def test_replicas_share_one_computation():
+    """Two caches on one store (two replicas) compute a key once."""
+    store = MemoryStore()
+    first, second = ResultCache(store), ResultCache(store)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return "scene"
+
+    key = first.key("test", "replicas")
+    with ThreadPoolExecutor(2) as pool:
+        results = list(pool.map(lambda cache: cache.get_or_compute(key, compute), (first, second)))
+    assert results == ["scene", "scene"] and len(calls) == 1
+
+
+def test_stale_lock_expires(monkeypatch):
+    """A replica that crashed holding the lock delays others until the lock TTL only."""
+    monkeypatch.setattr(result_cache, "LOCK_TTL_SECONDS", 0.2)
+    cache = ResultCache(MemoryStore())
+    key = cache.key("test", "crashed")
+    cache.store.add(f"{key}:lock", b"crashed-owner", result_cache.LOCK_TTL_SECONDS)
+
+    start = time.monotonic()
+    assert cache.get_or_compute(key, lambda: "computed", wait_timeout=5) == "computed"
+    assert 0.15 <= time.monotonic() - start < 2
+    assert cache.store.get(f"{key}:lock") is None
+
+
+def test_values_expire_after_ttl():
+    cache = ResultCache(MemoryStore(), ttl_seconds=0.05)
+    key = cache.key("test", "ttl")
+    cache.set(key, "old")
+    assert cache.get(key) == "old"
+    time.sleep(0.06)
+    assert cache.get(key) is MISSING and cache.get(key, local=False) is MISSING
+    assert cache.get_or_compute(key, lambda: "new") == "new"
+
+
+def test_version_bump_orphans_entries():
+    store = MemoryStore()
+    old, new = ResultCache(store, version="v1"), ResultCache(store, version="v2")
+    old.set(old.key("zonal", "farm"), "v1 stats")
+    assert new.key("zonal", "farm") != old.key("zonal", "farm")
+    assert new.get(new.key("zonal", "farm")) is MISSING
+
+
+def test_oversized_values_stay_local():
+    store = MemoryStore()
+    cache = ResultCache(store, max_value_bytes=1024)
+    small, large = cache.key("test", "small"), cache.key("test", "large")
+    cache.set(small, b"x" * 100)
+    cache.set(large, b"x" * 10_000)
+    assert store.get(small) is not None and store.get(large) is None
+    assert cache.get(large) == b"x" * 10_000                         # local tier only
+    assert ResultCache(store).get(large) is MISSING                  # other replicas miss
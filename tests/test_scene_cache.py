@@ -0,0 +1,93 @@
+# tests/test_scene_cache.py - Memory-mapped scene cache: reads, TTL, LRU and concurrent writers
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from utils import scene_cache
+from utils.scene_cache import META_FILE, SceneCache
+
+BAND = np.arange(64 * 64, dtype=np.float32).reshape(64, 64)
+
+
+def test_hit_is_a_read_only_memory_map(tmp_path):
+    cache = SceneCache(str(tmp_path), codec="none")
+    cache.put("scene", {"ndvi": BAND, "scl": BAND.astype(np.uint8)}, {"source": "test"})
+
+    bands, meta = cache.get("scene")
+    assert isinstance(bands["ndvi"], np.memmap) and not bands["ndvi"].flags.writeable
+    assert bands["ndvi"].filename.startswith(str(tmp_path))
+    np.testing.assert_array_equal(bands["ndvi"], BAND)
+    assert bands["scl"].dtype == np.uint8
+    assert meta["source"] == "test" and meta["bands"] == ["ndvi", "scl"]
+
+
+def test_expired_entries_miss_and_are_swept(tmp_path, monkeypatch):
+    cache = SceneCache(str(tmp_path), codec="none", ttl_hours=1)
+    cache.put("scene", {"ndvi": BAND})
+    assert cache.get("scene") is not None
+
+    later = time.time() + 2 * 3600
+    monkeypatch.setattr(scene_cache.time, "time", lambda: later)
+    assert cache.get("scene") is None
+    cache.evict()
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction_keeps_the_budget(tmp_path):
+    entry = SceneCache(str(tmp_path / "probe"), codec="none").put("probe", {"ndvi": BAND})[1]["nbytes"]
+    cache = SceneCache(str(tmp_path / "cache"), codec="none", max_bytes=2 * entry)
+    cache.put("old", {"ndvi": BAND})
+    cache.put("used", {"ndvi": BAND})
+    now = time.time()
+    os.utime(os.path.join(cache._entry_dir("old"), META_FILE), (now - 60, now - 60))
+    os.utime(os.path.join(cache._entry_dir("used"), META_FILE), (now - 120, now - 120))
+    cache.get("used")                   # a hit refreshes the LRU timestamp
+
+    cache.put("new", {"ndvi": BAND})    # over budget: sweeps right away
+    assert cache.get("old") is None
+    assert cache.get("used") is not None and cache.get("new") is not None
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_put_sweeps_only_when_due(tmp_path, monkeypatch):
+    cache = SceneCache(str(tmp_path), codec="none", sweep_seconds=300)
+    sweeps = []
+    evict = cache.evict
+    monkeypatch.setattr(cache, "evict", lambda: sweeps.append(1) or evict())
+
+    for i in range(5):
+        cache.put(f"scene{i}", {"ndvi": BAND})
+    assert len(sweeps) == 1             # the first write sizes the cache, the rest fit the budget
+    cache._last_sweep -= 300
+    cache.put("scene5", {"ndvi": BAND})
+    assert len(sweeps) == 2
+
+
+def _write_keys(root, value, barrier):
+    cache = SceneCache(root, codec="none", sweep_seconds=0)
+    barrier.wait()
+    for i in range(20):
+        cache.put(f"key{i:02d}", {"ndvi": np.full((64, 64), value, dtype=np.float32)}, {"writer": value})
+
+
+def test_two_processes_writing_the_same_keys(tmp_path):
+    root = str(tmp_path)
+    SceneCache(root)                    # create the tree before the writers race
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(2)
+    writers = [context.Process(target=_write_keys, args=(root, value, barrier)) for value in (1.0, 2.0)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join(60)
+        assert writer.exitcode == 0
+
+    cache = SceneCache(root)
+    assert cache.stats()["entries"] == 20
+    for i in range(20):
+        bands, meta = cache.get(f"key{i:02d}")
+        # one writer's entry, never a mix of both
+        np.testing.assert_array_equal(bands["ndvi"], np.full((64, 64), meta["writer"], dtype=np.float32))
+    assert os.listdir(os.path.join(root, "tmp")) == []
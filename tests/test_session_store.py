@@ -0,0 +1,64 @@
+# tests/test_session_store.py - Session values spilled to the scene cache
+import numpy as np
+
+from utils.scene_cache import SceneCache
+from utils.session_store import SessionStore
+
+
+def test_rerun_replaces_the_unkeyed_cache_entry(tmp_path):
+    cache = SceneCache(str(tmp_path))
+    store = SessionStore(cache=cache, session_budget=0, min_array_bytes=1)
+
+    for value in (1.0, 2.0, 3.0):               # one view rerun three times
+        handle = store.put("s1", "map_data", np.full((32, 32), value))
+    assert cache.stats()["entries"] == 1
+    # nothing resident (zero budget): reopened from the replaced entry
+    assert float(store.get("s1", handle).mean()) == 3.0
+
+    other = store.put("s2", "map_data", np.zeros((32, 32)))
+    assert other.key != handle.key and cache.stats()["entries"] == 2
+
+
+def test_keyed_arrays_are_shared_between_sessions(tmp_path):
+    cache = SceneCache(str(tmp_path))
+    store = SessionStore(cache=cache, min_array_bytes=1)
+    first = store.put("s1", "ndvi", np.ones((8, 8)), key=("farm", "2024-09-30"))
+    second = store.put("s2", "ndvi", np.ones((8, 8)), key=("farm", "2024-09-30"))
+    assert first.key == second.key and cache.stats()["entries"] == 1
+
+
+def test_unchanged_rerun_skips_the_cache_write(tmp_path, monkeypatch):
+    cache = SceneCache(str(tmp_path))
+    store = SessionStore(cache=cache, min_array_bytes=1)
+    writes = []
+    put = cache.put
+    monkeypatch.setattr(cache, "put", lambda key, bands, meta=None: writes.append(key) or put(key, bands, meta))
+
+    value = np.full((32, 32), 1.0)
+    handle = store.put("s1", "map_data", value)
+    assert store.put("s1", "map_data", value) is handle          # same resident object
+    store.put("s1", "map_data", np.full((32, 32), 1.0))          # recomputed, equal contents
+    assert len(writes) == 1
+    store.put("s1", "map_data", np.full((32, 32), 2.0))
+    assert len(writes) == 2
+
+    cache.invalidate(handle.key)                                 # evicted from the scene cache
+    handle = store.put("s1", "map_data", np.full((32, 32), 2.0))
+    assert len(writes) == 3 and float(cache.get(handle.key)[0]["data"].mean()) == 2.0
+
+
+def test_ended_and_idle_sessions_release_their_cache_entries(tmp_path):
+    cache = SceneCache(str(tmp_path))
+    store = SessionStore(cache=cache, min_array_bytes=1, idle_seconds=3600)
+    private = store.put("s1", "map_data", np.ones((8, 8)))
+    shared = store.put("s1", "ndvi", np.ones((8, 8)), key=("farm", "2024-09-30"))
+    store.put("s2", "map_data", np.zeros((8, 8)))
+    assert cache.stats()["entries"] == 3
+
+    store.drop("s1")
+    assert cache.get(private.key) is None and cache.get(shared.key) is not None
+    assert store.usage()["sessions"].keys() == {"s2"}
+
+    store.idle_seconds, store._next_idle_check = 0, 0.0           # s2 has gone idle
+    store.put("s3", "note", "text")
+    assert cache.stats()["entries"] == 1 and store.usage()["sessions"].keys() == {"s3"}
@@ -0,0 +1,83 @@
+# tests/test_stac.py - STAC backend over a local catalog of generated COGs
+import json
+
+import numpy as np
+import pytest
+
+from config import STAC_ASSETS
+from utils.scene_cache import SceneCache
+from utils.stac import LocalCatalog, StacSceneClient
+
+GRID_BOUNDS = (31.0, 30.0, 31.064, 30.064)   # 64 x 64 px at 0.001 deg
+SIZE = 64
+
+
+def write_item(directory, item_id, day, cloud_cover, bbox=GRID_BOUNDS):
+    item = {
+        "type": "Feature", "id": item_id, "collection": "sentinel-2-l2a", "bbox": list(bbox),
+        "properties": {"datetime": f"{day}T00:00:00Z", "eo:cloud_cover": cloud_cover},
+        "assets": {"red": {"href": f"{item_id}_red.tif"}},
+    }
+    (directory / f"{item_id}.json").write_text(json.dumps(item))
+
+
+def test_local_catalog_search_and_clear_dates(tmp_path):
+    write_item(tmp_path, "a", "2024-09-01", 5.0)
+    write_item(tmp_path, "b", "2024-09-03", 60.0)
+    write_item(tmp_path, "c", "2024-09-08", 12.0)
+    write_item(tmp_path, "far", "2024-09-08", 0.0, bbox=(40.0, 40.0, 40.1, 40.1))
+
+    catalog = LocalCatalog(str(tmp_path))
+    found = catalog.search("sentinel-2-l2a", [31.01, 30.01, 31.02, 30.02], "2024-09-01", "2024-09-08")
+    assert [item["id"] for item in found] == ["a", "b", "c"]
+    assert found[0]["assets"]["red"]["href"] == str(tmp_path / "a_red.tif")
+
+    client = StacSceneClient(api_url=str(tmp_path), cache=SceneCache(str(tmp_path / "cache")))
+    bbox = [31.01, 30.01, 31.02, 30.02]
+    assert client.get_clear_dates(bbox, "2024-09-01", "2024-09-08", window_days=5,
+                                  max_cloud_cover=20) == ["2024-09-01", "2024-09-08"]
+
+
+def write_cog(path, data):
+    import rasterio
+    from rasterio.enums import Resampling
+    from rasterio.transform import from_bounds
+
+    with rasterio.open(
+        path, "w", driver="GTiff", width=SIZE, height=SIZE, count=1, dtype=data.dtype,
+        crs="EPSG:4326", transform=from_bounds(*GRID_BOUNDS, SIZE, SIZE),
+        tiled=True, blockxsize=16, blockysize=16, compress="deflate",
+    ) as dataset:
+        dataset.write(data, 1)
+        dataset.build_overviews([2, 4], Resampling.average)
+
+
+def test_windowed_read_of_local_cogs(tmp_path, monkeypatch):
+    pytest.importorskip("rasterio")
+    pytest.importorskip("stackstac")
+    from utils.stac import write_local_item
+
+    columns = np.tile(np.arange(SIZE, dtype=np.uint16), (SIZE, 1))
+    for item_id, day, offset in (("old", "2024-09-01", 1000), ("new", "2024-09-06", 0)):
+        paths = {}
+        for band, asset in STAC_ASSETS.items():
+            path = str(tmp_path / f"{item_id}_{asset}.tif")
+            data = np.full((SIZE, SIZE), 4, dtype=np.uint16) if band == "SCL" else columns + offset
+            write_cog(path, data)
+            paths[asset] = path
+        write_local_item(str(tmp_path / "catalog"), item_id, day, paths)
+
+    client = StacSceneClient(api_url=str(tmp_path / "catalog"), cache=SceneCache(str(tmp_path / "cache")))
+    window = [31.016, 30.016, 31.048, 30.048]     # columns 16..47 of the grid
+    data = client.fetch_satellite_data(window, "2024-09-01", "2024-09-06", size=(32, 32))
+
+    assert data.shape == (len(STAC_ASSETS), 32, 32)
+    red = data[list(STAC_ASSETS).index("B04")]
+    # columns 16..47 of the latest item (the older one is offset by 1000)
+    np.testing.assert_array_equal(red, np.tile(np.arange(16, 48, dtype=np.float32), (32, 1)))
+    assert np.all(data[list(STAC_ASSETS).index("SCL")] == 4)
+
+    # served from the scene cache afterwards
+    monkeypatch.setattr(client, "load_cube", lambda *args, **kwargs: pytest.fail("read again"))
+    again = client.fetch_satellite_data(window, "2024-09-01", "2024-09-06", size=(32, 32))
+    np.testing.assert_array_equal(again, data)
@@ -0,0 +1,65 @@
+# tests/test_water_balance.py - Vectorized irrigation scheduler on fixture weather
+from datetime import date
+
+import numpy as np
+import pytest
+
+from utils.water_balance import IrrigationScheduler
+
+WHEAT = "قمح"
+
+
+def scheduler_for(weather_store, farms, points):
+    dates, values = weather_store.interpolate(*zip(*points), ["temp_max", "temp_min", "rain"])
+    weather = {"temp": values["temp_max"], "temp_min": values["temp_min"], "rain": values["rain"]}
+    return IrrigationScheduler(farms, weather, dates)
+
+
+def test_water_balance_on_fixture_weather(weather_store):
+    dates, values = weather_store.interpolate([30.0, 30.25], [30.0, 30.0], ["temp_max", "temp_min", "rain"])
+    farms = [
+        # irrigated 9 days ago: the 10-day wheat interval triggers on day 0
+        {"farm_id": "dry", "crop": WHEAT, "lat": 30.0, "irrigation_type": "غمر",
+         "days_after_planting": 10, "days_since_irrigation": 9, "ndwi": 0.3},
+        # 7.04 mm of rain on day 0 covers the day's ETc
+        {"farm_id": "rain", "crop": WHEAT, "lat": 30.25, "irrigation_type": "تنقيط",
+         "days_after_planting": 10, "days_since_irrigation": 0, "ndwi": 0.3},
+    ]
+    scheduler = IrrigationScheduler(
+        farms, {"temp": values["temp_max"], "temp_min": values["temp_min"], "rain": values["rain"]}, dates
+    )
+    assert list(scheduler.depletion0) == [0.0, 0.0]
+
+    # Hargreaves at 30°N on 17 October (Ra = 27.10 MJ m-2 day-1): 25.98 / 15.86 °C
+    assert scheduler.et0[0, 0] == pytest.approx(3.133, abs=1e-3)
+    assert scheduler.etc[0, 0] == pytest.approx(0.7 * 3.133, abs=1e-3)    # initial-stage Kc
+
+    assert scheduler.farm_schedule("dry")[0] == {
+        "date": date(2026, 10, 17), "gross_mm": round(scheduler.etc[0, 0] / 0.6, 1),
+        "volume_m3_per_feddan": round(scheduler.etc[0, 0] / 0.6 * 4.2, 1),
+        "trigger": 2, "rain_mm": 0.0, "etc_mm": round(float(scheduler.etc[0, 0]), 2),
+    }
+    assert scheduler.depletion[1, 0] == 0.0 and scheduler.farm_schedule("rain") == []
+    # depletion on rain-free days grows by that day's ETc
+    np.testing.assert_allclose(scheduler.depletion[0, 1], scheduler.etc[0, 1])
+
+
+def test_incremental_updates_match_a_full_recompute(weather_store):
+    farms = [{"farm_id": str(i), "crop": WHEAT, "lat": 30.0, "irrigation_type": "غمر",
+              "days_after_planting": 10, "days_since_irrigation": i} for i in range(4)]
+    points = [(30.0, 30.0), (30.0, 30.25), (30.25, 30.5), (30.75, 31.0)]
+    scheduler = scheduler_for(weather_store, farms, points)
+    scheduler.update_weather(3, rain=60.0, farm_ids=["1", "2"])
+    scheduler.update_ndwi(["0", "3"], [0.1, 0.4])
+    assert scheduler.depletion[1, 3] == 0.0         # 48 mm effective rain refills the root zone
+
+    # the same inputs from scratch
+    dates, values = weather_store.interpolate(*zip(*points), ["temp_max", "temp_min", "rain"])
+    values["rain"][[1, 2], 3] = 60.0
+    farms[0]["ndwi"], farms[3]["ndwi"] = 0.1, 0.4
+    full = IrrigationScheduler(
+        farms, {"temp": values["temp_max"], "temp_min": values["temp_min"], "rain": values["rain"]}, dates
+    )
+    np.testing.assert_allclose(scheduler.depletion, full.depletion)
+    np.testing.assert_array_equal(scheduler.trigger, full.trigger)
+    assert scheduler.need_scores().tolist() == full.need_scores().tolist()
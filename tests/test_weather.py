@@ -0,0 +1,40 @@
+# tests/test_weather.py - Fixture-backed weather ingest and interpolation
+import json
+import os
+from datetime import date
+
+import numpy as np
+
+from tests.conftest import WEATHER_FIXTURES
+from utils import weather
+from utils.weather import parse_onecall
+
+
+def load_fixture(name):
+    with open(os.path.join(WEATHER_FIXTURES, name), encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def test_fixtures_parse_and_interpolate(weather_store):
+    first, values = parse_onecall(load_fixture("30.25_30.00.json"))
+    assert first == date(2026, 10, 17)     # 22:00 UTC plus the +2 h offset
+    assert values["rain"][:2] == [7.04, 0.0]
+
+    dates, values = weather_store.interpolate([30.0, 30.125], [30.0, 30.125], ["temp_max", "temp_min", "rain"])
+    assert dates[0] == date(2026, 10, 17) and len(dates) == 8
+    # on a node: the node's own forecast
+    np.testing.assert_allclose(values["temp_max"][0, :2], [25.98, 28.87], atol=1e-4)
+    np.testing.assert_allclose(values["temp_min"][0, :2], [15.86, 17.42], atol=1e-4)
+    # between four nodes: their mean
+    np.testing.assert_allclose(values["temp_max"][1, 0], (25.98 + 28.33 + 26.53 + 27.07) / 4, atol=1e-4)
+    np.testing.assert_allclose(values["rain"][1, 0], 7.04 / 4, atol=1e-4)
+
+
+def test_farm_forecast_reads_the_store(weather_store, monkeypatch):
+    monkeypatch.setattr(weather, "get_weather_store", lambda: weather_store)
+    forecast = weather.farm_forecast(30.0, 30.0, days=3, today=date(2026, 10, 17))
+    assert forecast["source"] == "grid"
+    assert forecast["date"] == [date(2026, 10, 18), date(2026, 10, 19), date(2026, 10, 20)]
+    assert forecast["temp"][:1] == [28.9] and forecast["temp_min"][:1] == [17.4]   # 28.87 / 17.42
+    # no forecast beyond the fixtures: demo data
+    assert weather.farm_forecast(30.0, 30.0, days=3, today=date(2026, 10, 30))["source"] == "demo"
@@ -0,0 +1,31 @@
+# tests/test_zonal.py - Zonal statistics of overlapping boundaries
+import numpy as np
+
+from utils.result_cache import MemoryStore, ResultCache
+from utils.zonal import ZonalStatsCache, rasterize_layers
+
+BBOX = [0.0, 0.0, 1.0, 1.0]
+SHAPE = (100, 100)
+
+
+def square(x0, y0, x1, y1):
+    return {"type": "Polygon", "coordinates": [[[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]]}
+
+
+def test_overlapping_polygons_keep_all_pixels():
+    first = square(0.1, 0.1, 0.9, 0.9)    # 80 x 80 px
+    second = square(0.5, 0.1, 0.9, 0.9)   # inside the first
+    third = square(0.9, 0.9, 1.0, 1.0)    # disjoint, shares a layer
+    raster = np.full(SHAPE, 0.5)
+
+    layers = rasterize_layers([first, second, third], BBOX, SHAPE)
+    assert [members for _, members in layers] == [[0, 2], [1]]
+
+    zonal = ZonalStatsCache(ResultCache(MemoryStore(), local_entries=0))
+    batched = zonal.get_many("scene", "ndvi", raster, BBOX, [first, second, third])
+    assert [stats["pixels"] for stats in batched] == [6400, 3200, 100]
+
+    # cached stats of the first polygon do not depend on its batch neighbours
+    alone = ZonalStatsCache(ResultCache(MemoryStore(), local_entries=0))
+    assert alone.get_many("scene", "ndvi", raster, BBOX, [first]) == batched[:1]
+    assert zonal.get_many("scene", "ndvi", raster, BBOX, [first])[0]["pixels"] == 6400
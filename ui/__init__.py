@@ -0,0 +1,9 @@
+# ui/__init__.py - Dashboard views
+"""
+Sections of the Streamlit dashboard, one module per tab or panel.
+
+Each module exposes ``render(farm)`` where ``farm`` is the dict built from
+the sidebar inputs (location, farm id, crop, size, irrigation type, date
+range). ``app.py`` imports a view only when it is rendered, so heavy
+dependencies (folium, plotly, pandas) load with the view that needs them.
+"""
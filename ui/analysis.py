@@ -0,0 +1,95 @@
+# ui/analysis.py - Quick analysis panel next to the map
+from datetime import datetime
+
+import streamlit as st
+
+from config import DEMO_MODE
+from ui.jobs import job_result
+
+
+def render_zonal_stats(farm, drawn_polygons):
+    """Zonal NDVI statistics table for polygons drawn on the map."""
+    import pandas as pd
+    from utils.zonal import geometries_bbox, get_zonal_stats
+
+    latitude, longitude = farm["latitude"], farm["longitude"]
+    st.markdown("#### 📐 إحصائيات الحدود المرسومة")
+    zones_bbox = geometries_bbox(drawn_polygons)
+    scene_bbox = tuple(round(v, 3) for v in (
+        min(zones_bbox[0], longitude - 0.02), min(zones_bbox[1], latitude - 0.02),
+        max(zones_bbox[2], longitude + 0.02), max(zones_bbox[3], latitude + 0.02)
+    ))
+    day = str(datetime.now().date())
+    scene_id = f"{scene_bbox}:{day}:{'demo' if DEMO_MODE else 'live'}"
+    ndvi_raster = job_result(
+        "scene_index", "جاري حساب NDVI للمنطقة...",
+        bbox=list(scene_bbox), day=day, index="ndvi", demo=DEMO_MODE
+    )
+    if ndvi_raster is None:
+        return
+    zones = get_zonal_stats(scene_id, "ndvi", ndvi_raster, scene_bbox, drawn_polygons)
+    st.dataframe(pd.DataFrame([
+        {
+            "الحد": i + 1,
+            "بكسل": zone["pixels"],
+            "NDVI متوسط": zone["mean"],
+            "P10": zone["p10"],
+            "P90": zone["p90"],
+            "مساحة مجهدة %": None if zone["stressed_fraction"] is None
+            else round(zone["stressed_fraction"] * 100, 1),
+        }
+        for i, zone in enumerate(zones)
+    ]), use_container_width=True, hide_index=True)
+
+
+def render_health(farm):
+    """Health status of the farm's latest clear scene, computed by the analysis workers."""
+    from utils.batch import farm_bbox
+
+    bbox = farm_bbox(farm["latitude"], farm["longitude"], farm["farm_size_feddan"])
+    analysis = job_result(
+        "farm_analysis", "جاري تحليل صورة القمر الصناعي...",
+        bbox=[round(v, 6) for v in bbox], crop=farm["crop_type"],
+        day=str(datetime.now().date()), demo=DEMO_MODE
+    )
+    if analysis is None:
+        return
+    health_status = analysis["status"]
+    if health_status is None:
+        st.warning("☁️ لا توجد صورة صافية للمزرعة في آخر 10 أيام")
+        return
+    
+    status_class = "status-healthy" if health_status["status"] == "Healthy" else \
+                   "status-warning" if health_status["status"] == "Needs Attention" else \
+                   "status-critical"
+    
+    st.markdown(f"""
+    <div class="{status_class}" style="padding: 15px; border-radius: 5px;">
+        <h3>{health_status['emoji']} {health_status['status']}</h3>
+        <p>NDVI: {health_status['ndvi']}</p>
+        <p>NDWI: {health_status['ndwi']}</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+
+def render(farm, map_data=None):
+    st.subheader("📊 تحليل سريع")
+    
+    # Health status
+    st.markdown("#### صحة المحصول")
+    render_health(farm)
+    
+    # Zonal statistics for farm boundaries drawn on the map
+    drawn_polygons = [
+        feature["geometry"]
+        for feature in (map_data or {}).get("all_drawings") or []
+        if (feature.get("geometry") or {}).get("type") in ("Polygon", "MultiPolygon")
+    ]
+    if drawn_polygons:
+        render_zonal_stats(farm, drawn_polygons)
+    
+    # Key recommendations
+    st.markdown("#### التوصيات الرئيسية")
+    st.success("✅ الري: منتظم")
+    st.info("ℹ️ السماد: جرعة طبيعية")
+    st.warning("⚠️ مراقبة: لا توجد تهديدات حالياً")
@@ -0,0 +1,81 @@
+# ui/farm_map.py - Interactive farm map panel
+import folium
+from datetime import datetime
+
+import streamlit as st
+from streamlit_folium import st_folium
+
+from config import DEFAULT_ZOOM, TILE_SERVER_URL, CHANGE_MAP_WINDOW, DEMO_MODE
+from ui.jobs import job_result
+from ui.session import remember
+from utils.metrics import span
+
+
+def render(farm):
+    """Map with farm marker, optional index/change layers and drawing tools; returns st_folium data."""
+    latitude, longitude = farm["latitude"], farm["longitude"]
+    st.subheader("📍 خريطة المزرعة التفاعلية")
+    
+    # Create folium map
+    m = folium.Map(
+        location=[latitude, longitude],
+        zoom_start=DEFAULT_ZOOM,
+        tiles="OpenStreetMap"
+    )
+    
+    # Add farm marker
+    folium.Marker(
+        location=[latitude, longitude],
+        popup=f"🚜 {farm['crop_type']}<br>مساحة: {farm['farm_size_feddan']} فدان",
+        tooltip="مزرعتك",
+        icon=folium.Icon(color="green", icon="leaf")
+    ).add_to(m)
+    
+    # Index layers are served as XYZ tiles so only tiles in view are loaded
+    if TILE_SERVER_URL:
+        index_layer = st.selectbox("🗺️ طبقة المؤشر:", ["None", "ndvi", "ndwi"])
+        if index_layer != "None":
+            # scene fetch and index computation run on the analysis workers,
+            # which publish the layer to the tile cache
+            layer_bbox = [longitude - 0.05, latitude - 0.05, longitude + 0.05, latitude + 0.05]
+            layer_id = job_result(
+                "index_layer", "جاري تجهيز طبقة المؤشر...",
+                bbox=[round(v, 6) for v in layer_bbox], day=str(datetime.now().date()), demo=DEMO_MODE
+            )
+            if layer_id is not None:
+                folium.TileLayer(
+                    tiles=f"{TILE_SERVER_URL}/tiles/{layer_id}/{index_layer}/{{z}}/{{x}}/{{y}}.png",
+                    attr="Agri-Mind / Copernicus Sentinel-2",
+                    name=index_layer.upper(),
+                    overlay=True,
+                    max_zoom=18
+                ).add_to(m)
+    
+    # Per-pixel NDVI change vs each pixel's rolling baseline
+    show_change = st.checkbox("🔍 عرض خريطة التغير في NDVI", value=False)
+    if show_change:
+        from utils.change_maps import folium_change_overlay
+        
+        view_bbox = [longitude - 0.01, latitude - 0.01, longitude + 0.01, latitude + 0.01]
+        # computed by the analysis workers from the cached scene history
+        change = job_result(
+            "change_map", "جاري حساب خريطة التغير...",
+            bbox=[round(v, 6) for v in view_bbox], day=str(datetime.now().date()),
+            window=CHANGE_MAP_WINDOW, demo=DEMO_MODE
+        )
+        if change is not None and change.size:
+            folium_change_overlay(change, view_bbox).add_to(m)
+        elif change is not None:
+            st.info("☁️ لا توجد صور صافية كافية لحساب خريطة التغير")
+    
+    # Add drawing tools
+    from folium.plugins import Draw
+    Draw(export=True).add_to(m)
+    
+    # Display map
+    with span("ui.folium_map"):
+        map_data = st_folium(m, width=500, height=500)
+    remember("map_data", map_data)
+    
+    st.caption("💡 ارسم حدود المزرعة على الخريطة أو اختر نقطة")
+    return map_data
@@ -0,0 +1,43 @@
+# ui/fertilizer.py - Fertilizer and nutrition tab
+import pandas as pd
+import streamlit as st
+
+FERTILIZER_PLAN = pd.DataFrame({
+    "المرحلة": ["البذر", "التفريغ", "الإزهار", "الإثمار"],
+    "السماد الموصى": ["NPK 10-10-10", "Urea + معادن", "P + K", "K + Zn"],
+    "الكمية/فدان": ["2 كيس", "1.5 كيس", "1 كيس", "0.5 كيس"],
+    "المسافة (يوم)": [0, 21, 45, 65]
+})
+
+
+def render(farm):
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader("🥗 مرحلة النمو الحالية")
+        
+        growth_stage = st.select_slider(
+            "اختر مرحلة النمو:",
+            options=["Germination", "Vegetative", "Flowering", "Fruiting", "Maturity"],
+            value="Vegetative"
+        )
+        
+        st.metric("صحة المحصول (NDVI):", "0.68", "ممتازة")
+    
+    with col2:
+        st.subheader("📊 توصيات السماد")
+        
+        fertilizer_types = {
+            "النيتروجين (N)": "أساسي ⭐⭐⭐",
+            "الفسفور (P)": "جيد ⭐⭐",
+            "البوتاسيوم (K)": "جيد ⭐⭐",
+            "الكالسيوم (Ca)": "وقائي ⭐"
+        }
+        
+        for nutrient, level in fertilizer_types.items():
+            st.write(f"{nutrient}: {level}")
+    
+    # Detailed fertilizer plan
+    st.subheader("📋 خطة التسميد التفصيلية")
+    
+    st.dataframe(FERTILIZER_PLAN, use_container_width=True, hide_index=True)
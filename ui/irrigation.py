@@ -0,0 +1,87 @@
+# ui/irrigation.py - Irrigation and water tab
+import pandas as pd
+import streamlit as st
+
+from config import IRRIGATION_TYPES
+from utils.water_balance import TRIGGER_DEPLETION, IrrigationScheduler
+from utils.weather import farm_forecast
+
+NEED_LEVELS = ((60, "عالية"), (30, "متوسطة"), (0, "منخفضة"))
+
+
+def farm_scheduler(farm, forecast):
+    """Single-farm IrrigationScheduler on the forecast shown in the tab."""
+    farm = {
+        "farm_id": farm["farm_id"],
+        "crop": farm["crop_type"],
+        "lat": farm["latitude"],
+        "irrigation_type": farm["irrigation_type"],
+        **{key: farm[key] for key in ("ndwi", "days_after_planting") if key in farm},
+    }
+    weather = {name: [forecast[name]] for name in ("temp", "temp_min", "rain") if name in forecast}
+    return IrrigationScheduler([farm], weather, forecast["date"])
+
+
+def schedule_table(events):
+    if not events:
+        return pd.DataFrame({
+            "التاريخ": ["-"], "الكمية (م³/فدان)": [0], "الملاحظات": ["مفيش ري مطلوب الأيام الجاية"]
+        })
+    notes = []
+    for event in events:
+        if event["trigger"] == TRIGGER_DEPLETION:
+            notes.append("أولوية عالية")
+        elif event["rain_mm"] > 0:
+            notes.append("قد ينخفض حسب الأمطار")
+        else:
+            notes.append("عادي")
+    return pd.DataFrame({
+        "التاريخ": [event["date"].strftime("%d/%m") for event in events],
+        "الكمية (م³/فدان)": [event["volume_m3_per_feddan"] for event in events],
+        "الملاحظات": notes,
+    })
+
+
+def forecast_table(forecast):
+    labels = ["غداً", "بعد غد"] + [f"+{i} أيام" for i in range(3, len(forecast["date"]) + 1)]
+    return pd.DataFrame({
+        "day": labels[:len(forecast["date"])],
+        "temp": forecast["temp"],
+        "rain": forecast["rain"],
+    })
+
+
+def render(farm):
+    irrigation_type = farm["irrigation_type"]
+    forecast = farm_forecast(farm["latitude"], farm["longitude"])
+    scheduler = farm_scheduler(farm, forecast)
+    events = scheduler.farm_schedule(farm["farm_id"])
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader("💧 احتياجات الري")
+        
+        water_need_score = int(scheduler.need_scores()[0])  # 0-100 scale
+        level = next(label for threshold, label in NEED_LEVELS if water_need_score >= threshold)
+        st.metric("درجة احتياج الري:", f"{water_need_score}%", level)
+        
+        next_irrigation = events[0]["date"].strftime("%d/%m") if events else "مش محتاج ري الأيام الجاية"
+        st.markdown("#### الملاحظات:")
+        st.info(f"""
+        • نوع الري: {IRRIGATION_TYPES[irrigation_type]}
+        • كفاءة الري: {scheduler.efficiency[0]:.0%}
+        • البخر-نتح المتوقع: {scheduler.etc[0].mean():.1f} مم/يوم
+        • الري الجاي: {next_irrigation}
+        """)
+    
+    with col2:
+        st.subheader("☔ توقعات الطقس")
+        
+        st.dataframe(forecast_table(forecast), use_container_width=True, hide_index=True)
+        if forecast["source"] == "demo":
+            st.caption("بيانات تجريبية - شغّل `python -m utils.weather ingest` لتحميل التوقعات")
+    
+    # Irrigation schedule
+    st.subheader("📅 جدول الري الموصى به")
+    
+    st.dataframe(schedule_table(events), use_container_width=True, hide_index=True)
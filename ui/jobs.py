@@ -0,0 +1,42 @@
+# ui/jobs.py - Analysis worker jobs from dashboard views
+"""
+Views hand heavy work to the analysis workers (``utils.jobs``) instead of
+computing it in the script thread. ``job_result()`` submits the job (shared
+with every session asking for the same thing) and returns its result once
+it is done; until then a small fragment polls the queue, so the rest of the
+page renders and stays interactive.
+"""
+import streamlit as st
+
+from utils.jobs import JobFailed, get_job_queue
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def _load_result(job_id, finished):
+    # a job id is recomputed after the result TTL, so one unpickled copy is
+    # shared per run of the job (``finished`` of its status)
+    return get_job_queue().result(job_id, timeout=0)
+
+
+@st.fragment(run_every=1)
+def _poll(job_id, message):
+    status = get_job_queue().status(job_id)
+    if status is None or status["state"] in ("done", "failed"):
+        st.rerun()
+    st.info(f"⏳ {message}")
+
+
+def job_result(task, message="جاري التحليل...", **params):
+    """Result of ``task(**params)``, or None while it is pending (or failed, with an error shown)."""
+    job_id = get_job_queue().submit(task, **params)
+    status = get_job_queue().status(job_id)
+    if status["state"] == "done":
+        try:
+            return _load_result(job_id, status["finished"])
+        except (JobFailed, KeyError, TimeoutError):  # requeued or purged since the status read
+            pass
+    elif status["state"] == "failed":
+        st.error(f"❌ تعذر التحليل: {status['error']}")
+        return None
+    _poll(job_id, message)
+    return None
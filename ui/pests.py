@@ -0,0 +1,78 @@
+# ui/pests.py - Pest management tab
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+from config import CROPS_CONFIG
+from utils.metrics import span
+from utils.pest_risk import PEST_NAMES, get_pest_tracker, risk_level
+from utils.water_balance import DIURNAL_RANGE_C
+from utils.weather import farm_forecast
+
+PEST_CONTROL_TABLE = pd.DataFrame({
+    "الآفة": ["التربس", "العناكب", "الذباب الأبيض"],
+    "المكافحة الميكانيكية": ["الري الكثيف", "إزالة الأوراق المصابة", "الشباك الصفراء"],
+    "المكافحة البيولوجية": ["الحشرات المفترسة", "العناكب المفترسة", "الطفيليات"],
+    "المكافحة الكيميائية": ["عند الضرورة", "Acaricides", "Insecticides"]
+})
+
+
+@st.cache_resource(show_spinner=False, max_entries=101)
+def risk_gauge(pest_risk_score):
+    """Pest risk gauge (shared object, never mutated after construction)."""
+    fig = go.Figure(go.Indicator(
+        mode="gauge+number",
+        value=pest_risk_score,
+        title={"text": "درجة المخاطرة"},
+        gauge={
+            "axis": {"range": [0, 100]},
+            "bar": {"color": "#FFB74D"},
+            "steps": [
+                {"range": [0, 30], "color": "#C8E6C9"},
+                {"range": [30, 60], "color": "#FFE0B2"},
+                {"range": [60, 100], "color": "#FFCDD2"}
+            ]
+        }
+    ))
+    fig.update_layout(height=300)
+    return fig
+
+
+def pest_forecast(farm):
+    """``(days, pests)`` projected risk for the farm over the weather forecast."""
+    forecast = farm_forecast(farm["latitude"], farm["longitude"])
+    tmax = np.asarray(forecast["temp"], dtype=np.float64)
+    tmin = np.asarray(forecast.get("temp_min", tmax - DIURNAL_RANGE_C), dtype=np.float64)
+    tracker = get_pest_tracker()
+    risks = tracker.forecast([farm["farm_id"]], [tmax], [tmin], [farm["crop_type"]])[0]
+    return risks, farm["farm_id"] in tracker
+
+
+def render(farm):
+    risks, tracked = pest_forecast(farm)
+    pests = [(PEST_NAMES.index(pest), pest) for pest in CROPS_CONFIG[farm["crop_type"]]["pest_risks"]]
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader("🐛 تقييم مخاطر الآفات")
+        
+        pest_risk_score = int(risks[0].max())  # 0-100
+        
+        with span("ui.plotly_chart"):
+            st.plotly_chart(risk_gauge(pest_risk_score), use_container_width=True)
+        if not tracked:
+            st.caption("الموسم لسه متسجلش - المخاطر محسوبة من توقعات الطقس بس")
+    
+    with col2:
+        st.subheader("⚠️ التحذيرات الحالية")
+        
+        for p, pest in sorted(pests, key=lambda item: -int(risks[0, item[0]])):
+            icon, level = risk_level(risks[0, p])
+            trend = "بيزيد الأيام الجاية" if risks[-1, p] >= risks[0, p] + 5 else "مستقر"
+            st.markdown(f"{icon} **{pest}**: {level} ({risks[0, p]}%) - {trend}")
+    
+    # Pest management recommendations
+    st.subheader("🛡️ توصيات المكافحة المتكاملة")
+    
+    st.dataframe(PEST_CONTROL_TABLE, use_container_width=True, hide_index=True)
@@ -0,0 +1,129 @@
+# ui/report.py - Comprehensive farm report tab
+import os
+import tempfile
+
+import streamlit as st
+
+from utils.arabic_nlg import get_report_generator
+from utils.pdf_export import get_pdf_exporter
+from utils.result_cache import cached
+
+
+@cached("health_report")
+def health_report(status, description, emoji, crop_type, farm_size_feddan):
+    """Arabic health report text, shared across sessions and replicas."""
+    health_status = {"status": status, "description": description, "emoji": emoji}
+    return get_report_generator().generate_health_report(health_status, crop_type, farm_size_feddan)
+
+
+def pdf_farm(farm):
+    """Dashboard farm dict in the batch/CSV field names used by PDF export."""
+    return {
+        "farm_id": farm["farm_id"],
+        "lat": farm["latitude"],
+        "lon": farm["longitude"],
+        "crop": farm["crop_type"],
+        "size_feddan": farm["farm_size_feddan"],
+        "irrigation_type": farm["irrigation_type"],
+    }
+
+
+def _read_file(path):
+    with open(path, "rb") as handle:
+        return handle.read()
+
+
+@st.fragment(run_every=1)
+def _poll_export(job_id):
+    # Only this fragment reruns while the worker pool renders; the full
+    # script reruns once to swap the progress bar for the download button.
+    status = get_pdf_exporter().status(job_id)
+    if status is None or status["state"] in ("done", "failed"):
+        st.rerun()
+    st.progress(status["progress"], text=f"⏳ جاري تحضير التقرير... {status['done']}/{status['total']}")
+
+
+def render_export_job(state_key):
+    """Progress, download button or error for the export job kept in session state."""
+    job_id = st.session_state.get(state_key)
+    status = get_pdf_exporter().status(job_id) if job_id else None
+    if status is None:
+        return
+    if status["state"] in ("queued", "running"):
+        _poll_export(job_id)
+        return
+    for error in status["errors"]:
+        st.warning(f"⚠️ {error}")
+    if status["state"] == "done":
+        st.download_button(
+            "💾 حفظ الملف", data=lambda: _read_file(status["path"]), file_name=status["name"],
+            mime="application/zip" if status["name"].endswith(".zip") else "application/pdf",
+            key=f"{state_key}_download", use_container_width=True
+        )
+    else:
+        st.error("❌ تعذر تحضير التقرير")
+
+
+def render_bulk_export():
+    """Zip of PDF reports for every farm of a cooperative (CSV or GeoJSON upload)."""
+    from utils.batch import load_farms
+
+    with st.expander("🏘️ تقارير الجمعية الزراعية (PDF لكل مزرعة)"):
+        upload = st.file_uploader("ملف المزارع (CSV أو GeoJSON):", type=["csv", "geojson", "json"])
+        if upload is not None and st.button("📦 تحضير كل التقارير", use_container_width=True):
+            suffix = os.path.splitext(upload.name)[1].lower()
+            with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as handle:
+                handle.write(upload.getvalue())
+            try:
+                farms = load_farms(handle.name)
+            except (KeyError, ValueError) as exc:
+                st.error(f"❌ ملف غير صالح: {exc}")
+                farms = None
+            finally:
+                os.remove(handle.name)
+            if farms:
+                name = os.path.splitext(upload.name)[0]
+                st.session_state["pdf_bulk_job"] = get_pdf_exporter().submit_bulk(farms, name=name)
+        render_export_job("pdf_bulk_job")
+
+
+def render(farm):
+    crop_type, farm_size_feddan = farm["crop_type"], farm["farm_size_feddan"]
+    st.subheader("📋 التقرير الشامل للمزرعة")
+    
+    # Generate Arabic report
+    report = health_report("Healthy", "الحمد لله المحصول بخير", "✅", crop_type, farm_size_feddan)
+    st.markdown(f"```\n{report}\n```")
+    
+    # Sustainability metrics
+    st.subheader("♻️ مؤشرات الاستدامة")
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        water_savings = farm_size_feddan * 15  # m³
+        st.metric("💧 توفير المياه", f"{water_savings} م³/موسم", "↓ 35%")
+    
+    with col2:
+        carbon_saved = farm_size_feddan * 0.5  # tonnes CO2
+        st.metric("🌍 تقليل الانبعاثات", f"{carbon_saved} طن CO₂", "↓ 40%")
+    
+    with col3:
+        cost_savings = farm_size_feddan * 800  # EGP
+        st.metric("💰 توفير التكاليف", f"₤ {cost_savings}", "↓ 30%")
+    
+    # Export report
+    st.markdown("---")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        if st.button("📥 تحميل التقرير (PDF)", use_container_width=True):
+            st.session_state["pdf_job"] = get_pdf_exporter().submit(pdf_farm(farm))
+        render_export_job("pdf_job")
+    
+    with col2:
+        if st.button("📧 إرسال عبر البريد", use_container_width=True):
+            st.success("✅ تم إرسال التقرير إلى بريدك")
+
+    render_bulk_export()
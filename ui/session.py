@@ -0,0 +1,43 @@
+# ui/session.py - Session state backed by the bounded session store
+"""
+Views keep rasters and other sizeable values out of ``st.session_state``:
+``remember()`` hands the value to the process-wide ``SessionStore``
+(``utils.session_store``) and keeps only its handle in session state,
+``recall()`` resolves it again (None once it was evicted and is gone), and
+``session_value()`` combines both with a compute function for values
+derived from inputs.
+"""
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from utils.session_store import get_session_store
+
+STATE_PREFIX = "_handle:"
+
+
+def session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "bare"
+
+
+def remember(name, value, key=None):
+    """Store ``value`` as ``name`` of this session (``key``: shareable scene cache key parts)."""
+    handle = get_session_store().put(session_id(), name, value, key)
+    st.session_state[STATE_PREFIX + name] = (key, handle)
+    return value
+
+
+def recall(name, key=None):
+    """The value last remembered as ``name`` with the same ``key``, or None."""
+    stored_key, handle = st.session_state.get(STATE_PREFIX + name, (None, None))
+    if handle is None or stored_key != key:
+        return None
+    return get_session_store().get(session_id(), handle)
+
+
+def session_value(name, key, compute):
+    """``compute()`` once per ``key`` for this session, kept within the session memory budget."""
+    value = recall(name, key)
+    if value is None:
+        value = remember(name, compute(), key)
+    return value
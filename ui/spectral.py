@@ -0,0 +1,94 @@
+# ui/spectral.py - Spectral analysis tab
+from datetime import datetime
+
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import streamlit as st
+
+from config import HISTORICAL_DAYS, CACHE_TTL_HOURS, DEMO_MODE
+from ui.jobs import job_result
+from utils.history_store import get_history_store, history_key
+from utils.metrics import span
+
+INDICES_TABLE = pd.DataFrame({
+    "Index": ["NDVI", "NDWI", "SAVI", "EVI"],
+    "Value": [0.68, -0.12, 0.65, 0.52],
+    "Status": ["✅ Healthy", "⚠️ Normal", "✅ Good", "✅ Excellent"]
+})
+
+
+# Figures are cached as shared objects (never mutated after construction):
+# unpickling a Plotly figure from st.cache_data costs more than building it.
+@st.cache_resource(show_spinner=False, max_entries=64)
+def ndvi_gauge(value, reference):
+    fig = go.Figure()
+    fig.add_trace(go.Indicator(
+        mode="gauge+number+delta",
+        value=value,
+        title={"text": "NDVI"},
+        delta={"reference": reference},
+        gauge={
+            "axis": {"range": [-1, 1]},
+            "bar": {"color": "#2E7D32"},
+            "steps": [
+                {"range": [-1, 0.3], "color": "#FFCDD2"},
+                {"range": [0.3, 0.6], "color": "#FFE0B2"},
+                {"range": [0.6, 1], "color": "#C8E6C9"}
+            ]
+        }
+    ))
+    fig.update_layout(height=300)
+    return fig
+
+
+@st.cache_resource(show_spinner=False, ttl=CACHE_TTL_HOURS * 3600, max_entries=256)
+def ndvi_history_figure(key, history_days, today):
+    """NDVI trend of the stored history ``key`` for the last ``history_days`` days up to ``today``."""
+    # A range read of stored daily statistics; the ``index_history`` job
+    # adds new acquisitions before the figure is built.
+    history = get_history_store().query(key, "ndvi", days=history_days, end=today)
+
+    fig = px.line(
+        x=history["date"],
+        y=history["mean"],
+        labels={"x": "التاريخ", "y": "قيمة NDVI"},
+        title=f"تطور NDVI خلال آخر {history_days} يوم"
+    )
+    fig.add_hline(y=0.6, line_dash="dash", line_color="green", annotation_text="Healthy Threshold")
+    return fig
+
+
+def render(farm):
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.subheader("📊 مؤشرات النبات")
+        st.dataframe(INDICES_TABLE, use_container_width=True, hide_index=True)
+
+    with col2:
+        st.subheader("📉 رسم بياني للمؤشرات")
+        with span("ui.plotly_chart"):
+            st.plotly_chart(ndvi_gauge(0.68, 0.63), use_container_width=True)
+
+    # Time series comparison
+    history_days = st.select_slider(
+        "الفترة (يوم):",
+        options=[7, 14, 30, 60, 90, 180],
+        value=HISTORICAL_DAYS
+    )
+    st.subheader(f"📈 مقارنة زمنية ({history_days} يوم)")
+    from utils.batch import farm_bbox
+
+    today = datetime.now().date()
+    bbox = farm_bbox(farm["latitude"], farm["longitude"], farm["farm_size_feddan"])
+    added = job_result(
+        "index_history", "جاري تحميل سجل NDVI...",
+        farm_id=farm["farm_id"], bbox=[round(v, 6) for v in bbox], day=str(today),
+        days=history_days, demo=DEMO_MODE
+    )
+    if added is None:
+        return
+    figure = ndvi_history_figure(history_key(farm["farm_id"], DEMO_MODE), history_days, today)
+    with span("ui.plotly_chart"):
+        st.plotly_chart(figure, use_container_width=True)
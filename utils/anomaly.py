@@ -0,0 +1,180 @@
+# utils/anomaly.py - Streaming NDVI anomaly detection
+"""
+Online anomaly detection for many farms at once.
+
+``StreamingAnomalyDetector`` keeps a few numbers per farm (or per pixel
+block): Welford running mean/variance, an EWMA with exponentially weighted
+variance, the last observation day and the crop's optimal NDVI range from
+``CROPS_CONFIG``. Each new scene updates all farms in one vectorized call in
+O(1) per observation, so alerts for 100k+ fields never reload their history.
+State is saved as a compact ``.npz`` file.
+"""
+import os
+from datetime import date
+
+import numpy as np
+
+from config import (
+    CROPS_CONFIG, ANOMALY_THRESHOLD, ANOMALY_EWMA_ALPHA, ANOMALY_ZSCORE,
+    ANOMALY_MIN_OBS
+)
+
+# Flag bits returned by ``update()``
+ANOMALY_CHANGE = 1      # |x - EWMA| / |EWMA| > ANOMALY_THRESHOLD
+ANOMALY_ZSCORE_FLAG = 2  # |x - EWMA| > ANOMALY_ZSCORE * EW std
+ANOMALY_BELOW_OPTIMAL = 4
+ANOMALY_ABOVE_OPTIMAL = 8
+
+_FLOAT_FIELDS = ("mean", "m2", "ewma", "ewvar", "base_low", "base_high")
+
+
+class StreamingAnomalyDetector:
+    """Per-farm O(1) anomaly state updated one scene at a time."""
+
+    def __init__(self, threshold=ANOMALY_THRESHOLD, alpha=ANOMALY_EWMA_ALPHA,
+                 z_threshold=ANOMALY_ZSCORE, min_obs=ANOMALY_MIN_OBS, capacity=1024):
+        self.threshold = threshold
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.min_obs = min_obs
+        self._index = {}
+        self._keys = []
+        self._size = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = getattr(self, "count", None)
+        new_state = {name: np.full(capacity, np.nan, dtype=np.float32) for name in _FLOAT_FIELDS}
+        new_state["count"] = np.zeros(capacity, dtype=np.int32)
+        new_state["last_day"] = np.full(capacity, -1, dtype=np.int32)
+        if old is not None:
+            for name, array in new_state.items():
+                array[:self._size] = getattr(self, name)[:self._size]
+        for name, array in new_state.items():
+            setattr(self, name, array)
+
+    def __len__(self):
+        return self._size
+
+    # ==================== REGISTRATION ====================
+
+    def _positions(self, keys, crops=None):
+        """Array positions for ``keys``, registering unknown ones."""
+        positions = np.empty(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys):
+            pos = self._index.get(key)
+            if pos is None:
+                if self._size == len(self.count):
+                    self._allocate(len(self.count) * 2)
+                pos = self._size
+                self._index[key] = pos
+                self._keys.append(key)
+                self._size += 1
+                crop = crops[i] if crops is not None else None
+                if crop in CROPS_CONFIG:
+                    self.base_low[pos], self.base_high[pos] = CROPS_CONFIG[crop]["optimal_ndvi"]
+            positions[i] = pos
+        return positions
+
+    # ==================== UPDATE ====================
+
+    def update(self, keys, values, day=None, crops=None):
+        """
+        Add one observation per key and return anomaly flag bits per key.
+
+        ``values`` are mean NDVI (NaN = cloudy / no data, ignored). ``day``
+        (date or ordinal) makes updates idempotent: keys already updated on
+        or after ``day`` are skipped. ``crops`` is only used for keys seen
+        for the first time.
+        """
+        positions = self._positions(keys, crops)
+        values = np.asarray(values, dtype=np.float32)
+        day = day.toordinal() if isinstance(day, date) else (day if day is not None else date.today().toordinal())
+
+        fresh = ~np.isnan(values) & (self.last_day[positions] < day)
+        pos, x = positions[fresh], values[fresh]
+        flags = np.zeros(len(positions), dtype=np.uint8)
+        flags[fresh] = self._flags(pos, x)
+
+        # Welford running mean / variance
+        count = self.count[pos] + 1
+        first = count == 1
+        mean = np.where(first, 0.0, self.mean[pos]).astype(np.float32)
+        delta = x - mean
+        mean += delta / count
+        m2 = np.where(first, 0.0, self.m2[pos]) + delta * (x - mean)
+
+        # EWMA with exponentially weighted variance
+        ewma = np.where(first, x, self.ewma[pos])
+        diff = x - ewma
+        incr = self.alpha * diff
+        ewvar = np.where(first, 0.0, (1 - self.alpha) * (self.ewvar[pos] + diff * incr))
+
+        self.count[pos] = count
+        self.mean[pos] = mean
+        self.m2[pos] = m2
+        self.ewma[pos] = ewma + incr
+        self.ewvar[pos] = ewvar
+        self.last_day[pos] = day
+        return flags
+
+    def _flags(self, pos, x):
+        flags = np.zeros(len(pos), dtype=np.uint8)
+        seen = self.count[pos] > 0
+        ewma = self.ewma[pos]
+        deviation = np.abs(x - ewma)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = deviation / np.abs(ewma)
+            z = deviation / np.sqrt(self.ewvar[pos])
+        flags[seen & (change > self.threshold)] |= ANOMALY_CHANGE
+        stable = seen & (self.count[pos] >= self.min_obs) & (self.ewvar[pos] > 0)
+        flags[stable & (z > self.z_threshold)] |= ANOMALY_ZSCORE_FLAG
+        flags[x < self.base_low[pos]] |= ANOMALY_BELOW_OPTIMAL
+        flags[x > self.base_high[pos]] |= ANOMALY_ABOVE_OPTIMAL
+        return flags
+
+    # ==================== QUERIES ====================
+
+    def state(self, key):
+        """Current statistics for one key."""
+        pos = self._index[key]
+        count = int(self.count[pos])
+        return {
+            "count": count,
+            "mean": float(self.mean[pos]),
+            "std": float(np.sqrt(self.m2[pos] / (count - 1))) if count > 1 else 0.0,
+            "ewma": float(self.ewma[pos]),
+            "ew_std": float(np.sqrt(self.ewvar[pos])),
+            "last_day": date.fromordinal(int(self.last_day[pos])) if self.last_day[pos] > 0 else None,
+        }
+
+    # ==================== PERSISTENCE ====================
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        n = self._size
+        tmp = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp,
+            keys=np.array(self._keys, dtype=str),
+            count=self.count[:n], last_day=self.last_day[:n],
+            **{name: getattr(self, name)[:n] for name in _FLOAT_FIELDS}
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """Load saved state, or return an empty detector if ``path`` is missing."""
+        if not os.path.exists(path):
+            return cls(**kwargs)
+        with np.load(path) as data:
+            keys = data["keys"].tolist()
+            detector = cls(capacity=max(len(keys), 1024), **kwargs)
+            n = len(keys)
+            for name in _FLOAT_FIELDS + ("count", "last_day"):
+                getattr(detector, name)[:n] = data[name]
+        detector._keys = keys
+        detector._index = {key: i for i, key in enumerate(keys)}
+        detector._size = n
+        return detector
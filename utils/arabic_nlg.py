@@ -0,0 +1,308 @@
+# utils/arabic_nlg.py - Arabic report generator (Egyptian dialect)
+"""
+Farmer-friendly reports in Egyptian Arabic.
+
+Reports use emoji status indicators and box-drawing characters so they
+render well in the dashboard, SMS and WhatsApp.
+
+Phrase templates (``TEMPLATES``) are parsed once at import into literal
+and field parts, and per-crop fragments (header, advice) are built
+once per generator, so rendering a report is a handful of string joins.
+Use the shared ``get_report_generator()`` instance, and ``render_many()`` for
+nightly SMS/WhatsApp runs: it renders a stream of farms and writes reports
+straight to a file, queue or callback without keeping them in memory.
+"""
+import json
+import string
+import threading
+
+from config import CROPS_CONFIG, IRRIGATION_TYPES, WATER_EFFICIENCY
+from utils.metrics import span, timed
+
+LINE = "━" * 32
+
+STATUS_TITLES = {
+    "Healthy": "المحصول بصحة كويسة",
+    "Needs Attention": "المحصول محتاج متابعة",
+    "Critical": "المحصول في خطر",
+    "Unknown": "مفيش صورة صافية للمزرعة",
+}
+
+CROP_ADVICE = {
+    "Wheat": "القمح محتاج ري منتظم وقت طرد السنابل، وخلي بالك من المن في الجو الدافي.",
+    "Citrus": "الموالح محتاجة ري خفيف ومنتظم، وراقب الذبابة البيضاء تحت الأوراق.",
+    "Tomato": "الطماطم حساسة للعطش وقت العقد، وافحص الأوراق كل يومين.",
+    "Corn": "الدرة محتاجة نيتروجين كفاية في مرحلة النمو الخضري، وراقب دودة الحشد.",
+}
+DEFAULT_ADVICE = "تابع الزرعة بانتظام واسأل المرشد الزراعي لو في حاجة غريبة."
+
+# ``{field}`` placeholders, optionally with a format spec (``{value:.2f}``)
+TEMPLATES = {
+    "header": "┏" + LINE + "┓\n  {title}\n┗" + LINE + "┛",
+    "health_title": "🌾 تقرير صحة المحصول - {crop_name} ({crop_en})",
+    "area": "📏 المساحة: {area} فدان",
+    "status": "{emoji} الحالة: {title}",
+    "description": "💬 {description}",
+    "ndvi": "🌱 مؤشر الخضرة (NDVI): {ndvi}",
+    "ndwi": "💧 مؤشر المية (NDWI): {ndwi}",
+    "advice": "💡 {advice}",
+    "irrigation_type": "🚿 نوع الري: {irrigation_type}",
+    "efficiency": "📊 كفاءة الري: {percent}%",
+    "interval": "📅 الري كل {days} أيام تقريباً",
+    "growth_stage": "🌿 مرحلة النمو: {growth_stage}",
+    "fertilizer_schedule": "📋 مواعيد التسميد: {schedule}",
+    "pest_item": "  • {pest}",
+}
+
+IRRIGATION_ADVICE = (
+    (60, "🚨 الأرض عطشانة، اروي النهارده أو بكرة بالكتير"),
+    (30, "⚠️ اروي خلال يومين تلاتة"),
+    (0, "✅ الري تمام، كمل على نفس الجدول"),
+)
+PEST_LEVELS = (
+    (60, "🔴 خطر عالي - افحص الزرعة النهارده"),
+    (30, "🟡 خطر متوسط - راقب كويس"),
+    (0, "🟢 خطر قليل - كمل متابعة عادية"),
+)
+FERTILIZER_TIP = "💡 حط السماد بعد الري مش قبله عشان الجذور تستفيد"
+
+STREAM_FLUSH_EVERY = 256  # reports buffered per write to a file sink
+
+
+# ==================== TEMPLATE COMPILER ====================
+
+class CompiledTemplate:
+    """
+    A phrase template parsed once into literal and field parts.
+
+    ``render(**fields)`` formats the fields into their slots and joins the
+    parts, like the equivalent f-string; unknown extra fields are ignored
+    and missing ones raise ``TypeError``.
+    """
+
+    CONVERSIONS = {"s": str, "r": repr, "a": ascii}
+
+    def __init__(self, source):
+        self.source = source
+        self.fields, self._parts, self._slots = [], [], []
+        for literal, field, spec, conversion in string.Formatter().parse(source):
+            if literal:
+                self._parts.append(literal)
+            if field is None:
+                continue
+            if not field.isidentifier() or "{" in (spec or ""):
+                raise ValueError(f"Unsupported template field {field!r} in {source!r}")
+            if field not in self.fields:
+                self.fields.append(field)
+            self._slots.append((len(self._parts), field, self.CONVERSIONS.get(conversion), spec or ""))
+            self._parts.append(None)
+
+    def render(self, **fields):
+        parts = self._parts.copy()
+        for index, field, convert, spec in self._slots:
+            try:
+                value = fields[field]
+            except KeyError:
+                raise TypeError(f"{self!r} missing field {field!r}") from None
+            parts[index] = format(value if convert is None else convert(value), spec)
+        return "".join(parts)
+
+    def __repr__(self):
+        return f"CompiledTemplate({self.source!r})"
+
+
+COMPILED = {name: CompiledTemplate(source) for name, source in TEMPLATES.items()}
+
+
+def _threshold_text(table, score):
+    for threshold, text in table:
+        if score >= threshold:
+            return text
+    return table[-1][1]
+
+
+# ==================== GENERATOR ====================
+
+class ArabicReportGenerator:
+    """Generate Egyptian-dialect reports from analysis results."""
+
+    def __init__(self, templates=None):
+        self.t = COMPILED if templates is None else {
+            name: CompiledTemplate(source) for name, source in {**TEMPLATES, **templates}.items()
+        }
+        self._crop_parts = {}
+        self._lock = threading.Lock()
+
+    def _header(self, title):
+        return self.t["header"].render(title=title)
+
+    def _crop(self, crop_name):
+        """Per-crop fragments (health header, advice line), built once."""
+        parts = self._crop_parts.get(crop_name)
+        if parts is None:
+            crop_en = CROPS_CONFIG.get(crop_name, {}).get("en_name", crop_name)
+            parts = {
+                "health_header": self._header(
+                    self.t["health_title"].render(crop_name=crop_name, crop_en=crop_en)
+                ),
+                "advice": self.t["advice"].render(advice=self.get_crop_advice(crop_name)),
+            }
+            with self._lock:
+                self._crop_parts[crop_name] = parts
+        return parts
+
+    @timed("nlg.health")
+    def generate_health_report(self, status, crop_name, area_size_feddan):
+        """Health status report for one farm."""
+        t = self.t
+        crop = self._crop(crop_name)
+        state = status.get("status", "Healthy")
+        lines = [
+            crop["health_header"],
+            t["area"].render(area=area_size_feddan),
+            t["status"].render(emoji=status.get("emoji", "✅"), title=STATUS_TITLES.get(state, state)),
+        ]
+        if status.get("description"):
+            lines.append(t["description"].render(description=status["description"]))
+        if status.get("ndvi") is not None:
+            lines.append(t["ndvi"].render(ndvi=status["ndvi"]))
+        if status.get("ndwi") is not None:
+            lines.append(t["ndwi"].render(ndwi=status["ndwi"]))
+        lines.append(LINE)
+        lines.append(crop["advice"])
+        return "\n".join(lines)
+
+    def generate_irrigation_recommendation(self, water_need_score, irrigation_type, crop_name=None):
+        """Watering advice from a 0-100 irrigation need score."""
+        t = self.t
+        method = IRRIGATION_TYPES.get(irrigation_type, irrigation_type)
+        efficiency = WATER_EFFICIENCY.get(str(method).lower())
+        lines = [
+            self._header("💧 توصية الري"),
+            _threshold_text(IRRIGATION_ADVICE, water_need_score),
+            t["irrigation_type"].render(irrigation_type=irrigation_type),
+        ]
+        if efficiency is not None:
+            lines.append(t["efficiency"].render(percent=int(efficiency * 100)))
+        if crop_name in CROPS_CONFIG:
+            lines.append(t["interval"].render(days=CROPS_CONFIG[crop_name]["irrigation_interval"]))
+        return "\n".join(lines)
+
+    def generate_fertilizer_recommendation(self, growth_stage, crop_name):
+        """Nutrient advice for the current growth stage."""
+        schedule = CROPS_CONFIG.get(crop_name, {}).get("fertilizer_schedule", [])
+        lines = [self._header("🥗 توصية التسميد"), self.t["growth_stage"].render(growth_stage=growth_stage)]
+        if schedule:
+            lines.append(self.t["fertilizer_schedule"].render(schedule=" ← ".join(schedule)))
+        lines.append(FERTILIZER_TIP)
+        return "\n".join(lines)
+
+    def generate_pest_alert(self, pest_risk_score, pests):
+        """Pest warning from a 0-100 risk score and a list of pest names."""
+        lines = [self._header("🐛 تنبيه الآفات"), _threshold_text(PEST_LEVELS, pest_risk_score)]
+        lines.extend(self.t["pest_item"].render(pest=pest) for pest in pests)
+        return "\n".join(lines)
+
+    @timed("nlg.summary")
+    def generate_summary_report(self, status, crop_name, area_size_feddan,
+                                water_need_score=None, irrigation_type=None,
+                                pest_risk_score=None, pests=None):
+        """Comprehensive report combining health, irrigation and pests."""
+        sections = [self.generate_health_report(status, crop_name, area_size_feddan)]
+        if water_need_score is not None and irrigation_type is not None:
+            sections.append(self.generate_irrigation_recommendation(
+                water_need_score, irrigation_type, crop_name
+            ))
+        if pest_risk_score is not None:
+            sections.append(self.generate_pest_alert(
+                pest_risk_score, pests or CROPS_CONFIG.get(crop_name, {}).get("pest_risks", [])
+            ))
+        return "\n\n".join(sections)
+
+    def get_crop_advice(self, crop_name):
+        """One line of crop-specific guidance."""
+        crop_en = CROPS_CONFIG.get(crop_name, {}).get("en_name")
+        return CROP_ADVICE.get(crop_en, DEFAULT_ADVICE)
+
+    # ==================== BATCH RENDERING ====================
+
+    def iter_reports(self, farms, kind="summary"):
+        """
+        Yield ``(farm_id, report)`` for each farm dict, lazily.
+
+        Farm dicts use the batch/CSV field names: ``farm_id``, ``status``
+        (dict as returned by ``classify_health_status``), ``crop``,
+        ``size_feddan`` and optionally ``water_need_score``,
+        ``irrigation_type``, ``pest_risk`` and ``pests``. ``kind`` is
+        ``"summary"`` or ``"health"``.
+        """
+        for farm in farms:
+            status = farm.get("status") or {}
+            if isinstance(status, str):
+                status = {"status": status}
+            if kind == "health":
+                report = self.generate_health_report(status, farm["crop"], farm["size_feddan"])
+            else:
+                report = self.generate_summary_report(
+                    status, farm["crop"], farm["size_feddan"],
+                    water_need_score=farm.get("water_need_score"),
+                    irrigation_type=farm.get("irrigation_type"),
+                    pest_risk_score=farm.get("pest_risk"),
+                    pests=farm.get("pests"),
+                )
+            yield farm.get("farm_id"), report
+
+    def render_many(self, farms, out=None, kind="summary"):
+        """
+        Render reports for an iterable of farms into ``out``.
+
+        ``out`` may be a text file (one JSON line ``{"farm_id", "report"}``
+        per farm, written in buffered chunks), a queue (``put((farm_id,
+        report))``) or a callable ``out(farm_id, report)``. Without ``out``
+        the ``(farm_id, report)`` list is returned. Returns the number of
+        reports rendered otherwise.
+        """
+        with span("nlg.render_many"):
+            return self._render_many(farms, out, kind)
+
+    def _render_many(self, farms, out, kind):
+        reports = self.iter_reports(farms, kind)
+        if out is None:
+            return list(reports)
+
+        count = 0
+        if hasattr(out, "write"):
+            encode = json.JSONEncoder(ensure_ascii=False).encode
+            chunk = []
+            for farm_id, report in reports:
+                chunk.append(encode({"farm_id": farm_id, "report": report}))
+                count += 1
+                if len(chunk) >= STREAM_FLUSH_EVERY:
+                    chunk.append("")
+                    out.write("\n".join(chunk))
+                    chunk.clear()
+            if chunk:
+                chunk.append("")
+                out.write("\n".join(chunk))
+        elif hasattr(out, "put"):
+            for item in reports:
+                out.put(item)
+                count += 1
+        else:
+            for farm_id, report in reports:
+                out(farm_id, report)
+                count += 1
+        return count
+
+
+_generator = None
+_generator_lock = threading.Lock()
+
+
+def get_report_generator():
+    """Shared ArabicReportGenerator for the process."""
+    global _generator
+    with _generator_lock:
+        if _generator is None:
+            _generator = ArabicReportGenerator()
+    return _generator
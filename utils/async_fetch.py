@@ -0,0 +1,155 @@
+# utils/async_fetch.py - Concurrent Sentinel Hub fetching with asyncio/aiohttp
+"""
+Async fetch path for the Sentinel Hub process API.
+
+``AsyncSceneFetcher`` runs many process-API requests concurrently over one
+pooled ``aiohttp`` session. All requests share a ``TokenBucket`` so the
+account-wide ``API_RATE_LIMIT`` still holds, failed requests are retried with
+exponential backoff on 429/5xx, connection errors and timeouts (each attempt
+gets ``FETCH_TIMEOUT_SECONDS``), and identical in-flight requests are
+collapsed into one download.
+
+The endpoints come from the owning ``SentinelHubClient``, so the fetcher can
+be pointed at a local stub HTTP server.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import time
+
+import aiohttp
+
+from config import API_RATE_LIMIT, FETCH_CONCURRENCY, FETCH_MAX_RETRIES, FETCH_TIMEOUT_SECONDS
+from utils.metrics import increment
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Async token bucket: ``rate`` tokens per second, bursts up to ``capacity``."""
+
+    def __init__(self, rate=API_RATE_LIMIT, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+
+class FetchError(Exception):
+    """Raised when a request still fails after all retries."""
+
+    def __init__(self, status, message):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+
+def request_key(payload):
+    """Deduplication key for a process-API payload."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class AsyncSceneFetcher:
+    """
+    Fetch many process-API payloads concurrently.
+
+    ``token_provider`` is a (sync) callable returning a bearer token; it is
+    called off the event loop so token refreshes do not block other requests.
+    """
+
+    def __init__(self, process_url, token_provider, rate=API_RATE_LIMIT,
+                 concurrency=FETCH_CONCURRENCY, max_retries=FETCH_MAX_RETRIES,
+                 backoff_base=0.5, accept="image/tiff", timeout=FETCH_TIMEOUT_SECONDS):
+        self.process_url = process_url
+        self.token_provider = token_provider
+        self.bucket = TokenBucket(rate)
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.accept = accept
+        self.timeout = timeout
+        self._in_flight = {}
+        self._session = None
+        self.stats = {"requests": 0, "retries": 0, "deduplicated": 0, "bytes": 0}
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=30)
+        self._session = aiohttp.ClientSession(
+            connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+        self._session = None
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff_base * (2 ** attempt) * (0.5 + random.random())
+
+    async def _download(self, payload):
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            token = await asyncio.to_thread(self.token_provider)
+            headers = {"Authorization": f"Bearer {token}", "Accept": self.accept}
+            self.stats["requests"] += 1
+            try:
+                async with self._session.post(self.process_url, json=payload, headers=headers) as resp:
+                    if resp.status == 200:
+                        body = await resp.read()
+                        self.stats["bytes"] += len(body)
+                        increment("bytes_fetched", len(body), source="sentinelhub")
+                        return body
+                    message = (await resp.text())[:200]
+                    last_error = FetchError(resp.status, message)
+                    if resp.status not in RETRY_STATUSES:
+                        raise last_error
+                    delay = self._backoff(attempt, resp.headers.get("Retry-After"))
+            except aiohttp.ClientError as exc:
+                last_error = FetchError(0, str(exc))
+                delay = self._backoff(attempt)
+            except asyncio.TimeoutError:
+                last_error = FetchError(0, f"timed out after {self.timeout:g} s")
+                delay = self._backoff(attempt)
+
+            if attempt < self.max_retries:
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay)
+        raise last_error
+
+    async def fetch(self, payload):
+        """Fetch one payload, joining an identical request already in flight."""
+        key = request_key(payload)
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.stats["deduplicated"] += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(self._download(payload))
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def fetch_all(self, payloads, return_exceptions=True):
+        """Fetch all payloads concurrently; results keep the input order."""
+        return await asyncio.gather(
+            *(self.fetch(payload) for payload in payloads),
+            return_exceptions=return_exceptions
+        )
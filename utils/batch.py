@@ -0,0 +1,529 @@
+# utils/batch.py - Headless multi-farm analysis
+"""
+Nightly batch analysis for many farms.
+
+Farms are read from CSV (``farm_id,lat,lon,crop,size_feddan,irrigation_type``)
+or GeoJSON (Point or Polygon features with the same properties). Farms whose
+bounding boxes overlap are grouped so each scene is fetched once; groups are
+analysed in a process pool (indices, health classification, Arabic report)
+and finished farms are appended to a checkpoint so an interrupted run can be
+resumed. The final results are written in one go when all groups are done.
+
+    python -m utils.batch farms.csv results.jsonl --workers 8 --metrics batch.prom
+"""
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from config import (
+    CROPS_CONFIG, IRRIGATION_TYPES, DEMO_MODE, BANDS_SCRIPT, BATCH_WORKERS,
+    BATCH_MAX_GROUP_SPAN_DEG, SCENE_RESOLUTION_M, ANOMALY_STATE_PATH, PEST_STATE_PATH,
+    SCENE_WINDOW_DAYS
+)
+from utils import metrics
+from utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+FEDDAN_M2 = 4200.83
+METERS_PER_DEG = 111320.0
+MAX_SCENE_PX = 2048
+
+# ==================== INPUT ====================
+
+
+def farm_bbox(lat, lon, size_feddan):
+    """Square bbox ``[min_lon, min_lat, max_lon, max_lat]`` covering the farm area."""
+    half = math.sqrt(size_feddan * FEDDAN_M2) / 2
+    dlat = half / METERS_PER_DEG
+    dlon = half / (METERS_PER_DEG * math.cos(math.radians(lat)))
+    return [lon - dlon, lat - dlat, lon + dlon, lat + dlat]
+
+
+def _make_farm(props, lat, lon, bbox=None, index=0):
+    size = float(props.get("size_feddan") or 5.0)
+    farm = {
+        "farm_id": str(props.get("farm_id") or props.get("id") or index),
+        "lat": float(lat),
+        "lon": float(lon),
+        "crop": props.get("crop") or next(iter(CROPS_CONFIG)),
+        "size_feddan": size,
+        "irrigation_type": props.get("irrigation_type") or next(iter(IRRIGATION_TYPES)),
+    }
+    farm["bbox"] = bbox or farm_bbox(farm["lat"], farm["lon"], size)
+    return farm
+
+
+def load_farms(path):
+    """Read farms from a CSV or GeoJSON file."""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as handle:
+            return [
+                _make_farm(row, row["lat"], row["lon"], index=i)
+                for i, row in enumerate(csv.DictReader(handle))
+            ]
+
+    with open(path, encoding="utf-8") as handle:
+        collection = json.load(handle)
+
+    farms = []
+    for i, feature in enumerate(collection.get("features", [])):
+        geometry = feature["geometry"]
+        props = feature.get("properties") or {}
+        if geometry["type"] == "Point":
+            lon, lat = geometry["coordinates"][:2]
+            farms.append(_make_farm(props, lat, lon, index=i))
+            continue
+
+        coords = np.asarray(
+            [pt for ring in _rings(geometry) for pt in ring], dtype=np.float64
+        )
+        bbox = [coords[:, 0].min(), coords[:, 1].min(), coords[:, 0].max(), coords[:, 1].max()]
+        bbox = [float(v) for v in bbox]
+        farms.append(_make_farm(
+            props, (bbox[1] + bbox[3]) / 2, (bbox[0] + bbox[2]) / 2, bbox, index=i
+        ))
+    return farms
+
+
+def _rings(geometry):
+    if geometry["type"] == "Polygon":
+        return geometry["coordinates"]
+    if geometry["type"] == "MultiPolygon":
+        return [ring for polygon in geometry["coordinates"] for ring in polygon]
+    raise ValueError(f"Unsupported geometry type: {geometry['type']}")
+
+# ==================== GROUPING ====================
+
+
+def _intersects(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def _union(a, b):
+    return [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+
+
+def group_farms(farms, max_span=BATCH_MAX_GROUP_SPAN_DEG):
+    """
+    Group farms with overlapping bboxes into shared scenes.
+
+    Sweeps farms by ``min_lon``; a farm joins the first open group it
+    overlaps as long as the merged scene stays within ``max_span`` degrees.
+    Returns a list of ``{"bbox": [...], "farms": [...]}``.
+    """
+    groups, active = [], []
+    for farm in sorted(farms, key=lambda f: f["bbox"][0]):
+        bbox = farm["bbox"]
+        # groups ending west of this farm can never overlap a later farm
+        active = [g for g in active if g["bbox"][2] >= bbox[0]]
+        for group in active:
+            if not _intersects(group["bbox"], bbox):
+                continue
+            merged = _union(group["bbox"], bbox)
+            if merged[2] - merged[0] <= max_span and merged[3] - merged[1] <= max_span:
+                group["bbox"] = merged
+                group["farms"].append(farm)
+                break
+        else:
+            group = {"bbox": list(bbox), "farms": [farm]}
+            groups.append(group)
+            active.append(group)
+    return groups
+
+
+def scene_size(bbox):
+    """Pixel size (width, height) of a bbox at ``SCENE_RESOLUTION_M``."""
+    lat = (bbox[1] + bbox[3]) / 2
+    width_m = (bbox[2] - bbox[0]) * METERS_PER_DEG * math.cos(math.radians(lat))
+    height_m = (bbox[3] - bbox[1]) * METERS_PER_DEG
+    clamp = lambda px: int(min(max(round(px), 8), MAX_SCENE_PX))  # noqa: E731
+    return clamp(width_m / SCENE_RESOLUTION_M), clamp(height_m / SCENE_RESOLUTION_M)
+
+
+def farm_window(scene_bbox, shape, bbox):
+    """Row/col slices of ``bbox`` inside a scene raster (north-up)."""
+    height, width = shape
+    x_res = (scene_bbox[2] - scene_bbox[0]) / width
+    y_res = (scene_bbox[3] - scene_bbox[1]) / height
+    col0 = int(np.clip(math.floor((bbox[0] - scene_bbox[0]) / x_res), 0, width - 1))
+    col1 = int(np.clip(math.ceil((bbox[2] - scene_bbox[0]) / x_res), col0 + 1, width))
+    row0 = int(np.clip(math.floor((scene_bbox[3] - bbox[3]) / y_res), 0, height - 1))
+    row1 = int(np.clip(math.ceil((scene_bbox[3] - bbox[1]) / y_res), row0 + 1, height))
+    return slice(row0, row1), slice(col0, col1)
+
+# ==================== WORKER ====================
+
+def fetch_scene_bands(bbox, date_from, date_to, demo):
+    """
+    Bands and SCL of the least cloudy acquisition in the latest window.
+
+    The acquisition is chosen from catalog metadata, so only one clear day
+    is downloaded; if the catalog has nothing usable the whole range is
+    requested as before and clouds are left to the SCL mask.
+    """
+    from utils.satellite import select_clear_scenes
+
+    size = scene_size(bbox)
+    if demo:
+        from utils.demo_mode import DemoDataLoader
+
+        loader = DemoDataLoader()
+        scenes = select_clear_scenes(loader.get_demo_available_data(bbox, date_from, date_to))
+        day = date.fromisoformat(scenes[-1]["date"]) if scenes else date_to
+        bands = loader.get_demo_satellite_data(bbox, size, day)
+        return bands["B02"], bands["B03"], bands["B04"], bands["B08"], bands["SCL"]
+
+    from utils.satellite import get_satellite_client
+
+    client = get_satellite_client()
+    clear_dates = client.get_clear_dates(bbox, date_from, date_to)
+    if clear_dates:
+        date_from = date_to = clear_dates[-1]
+    data = client.fetch_satellite_data(bbox, date_from, date_to, BANDS_SCRIPT, size=size)
+    return data[0], data[1], data[2], data[3], data[4]
+
+
+def fetch_scene_indices(bbox, date_from, date_to, demo):
+    """
+    Index rasters (float32, NaN = invalid) and the ``clear`` mask of the
+    latest clear acquisition.
+
+    Sentinel Hub computes them server-side with the quantized multi-output
+    evalscript (one small request instead of five float32 bands); demo
+    scenes go through the same quantization locally. The STAC backend reads
+    COG bands, so its indices are still computed here.
+    """
+    from utils.evalscripts import decode_index_response, quantize_indices
+    from utils.indices import SpectralIndices
+
+    if not demo:
+        from utils.satellite import get_satellite_client
+
+        client = get_satellite_client()
+        if hasattr(client, "fetch_index_data"):
+            clear_dates = client.get_clear_dates(bbox, date_from, date_to)
+            if clear_dates:
+                date_from = date_to = clear_dates[-1]
+            return _live_indices(client, bbox, date_from, date_to)
+
+    blue, green, red, nir, scl = fetch_scene_bands(bbox, date_from, date_to, demo)
+    indices = SpectralIndices.calculate_all_tiled(red, green, blue, nir, scl=scl)
+    if demo:
+        return decode_index_response(quantize_indices(indices))
+    indices["clear"] = ~np.isnan(indices["ndvi"])
+    return indices
+
+
+def _live_indices(client, bbox, date_from, date_to):
+    """Indices of a live scene for exactly this range (no clear-date selection)."""
+    from utils.evalscripts import decode_index_response
+    from utils.indices import SpectralIndices
+
+    size = scene_size(bbox)
+    if hasattr(client, "fetch_index_data"):
+        return decode_index_response(client.fetch_index_data(bbox, date_from, date_to, size=size))
+    data = client.fetch_satellite_data(bbox, date_from, date_to, BANDS_SCRIPT, size=size)
+    indices = SpectralIndices.calculate_all_tiled(data[2], data[1], data[0], data[3], scl=data[4])
+    indices["clear"] = ~np.isnan(indices["ndvi"])
+    return indices
+
+
+def fetch_history_stats(bbox, days):
+    """
+    ``{day: {index: stats}}`` from the live scene of each acquisition day,
+    as a ``HistoryStore.update()`` loader.
+    """
+    from utils.history_store import raster_stats
+    from utils.satellite import get_satellite_client
+
+    client = get_satellite_client()
+    stats = {}
+    for day in days:
+        indices = _live_indices(client, bbox, str(day), str(day))
+        indices.pop("clear")
+        stats[day] = {name: raster_stats(raster) for name, raster in indices.items()}
+    return stats
+
+
+def fetch_ndvi_stack(bbox, day, scenes, demo):
+    """
+    ``(dates, stack)``: the NDVI ``(time, y, x)`` stack of the last
+    ``scenes`` clear acquisitions up to ``day``, one per
+    ``SCENE_WINDOW_DAYS`` window (for per-pixel change maps).
+
+    Live scenes are read through the satellite client, i.e. from the scene
+    cache when already fetched; ``stack`` is None when the catalog has no
+    clear acquisition in range.
+    """
+    if demo:
+        from utils.demo_mode import DemoDataLoader
+
+        dates = [day - timedelta(days=SCENE_WINDOW_DAYS * i) for i in range(scenes - 1, -1, -1)]
+        return dates, DemoDataLoader().get_demo_ndvi_stack(bbox, dates)
+
+    from utils.satellite import get_satellite_client
+
+    client = get_satellite_client()
+    # twice the windows needed, so fully cloudy windows do not shorten the stack
+    date_from = day - timedelta(days=2 * SCENE_WINDOW_DAYS * scenes)
+    # ISO strings as in fetch_scene_indices(), so both read the same cache entries
+    clear_dates = client.get_clear_dates(bbox, date_from, day)[-scenes:]
+    dates = [date.fromisoformat(d) for d in clear_dates]
+    if not dates:
+        return dates, None
+    return dates, np.stack([_live_indices(client, bbox, d, d)["ndvi"] for d in clear_dates])
+
+
+def process_group(group, date_from, date_to, demo=DEMO_MODE):
+    """Analyse every farm of a group from one shared scene."""
+    from utils.indices import SpectralIndices, TimeSeriesAnalysis, valid_mean
+    from utils.arabic_nlg import get_report_generator
+
+    report_gen = get_report_generator()
+
+    with span("batch.scene_fetch"):
+        indices = fetch_scene_indices(group["bbox"], date_from, date_to, demo)
+    clear = indices.pop("clear")
+
+    results = []
+    for farm in group["farms"]:
+        window = farm_window(group["bbox"], clear.shape, farm["bbox"])
+        # a fully cloud-masked farm gets None means/pest risk and status "Unknown"
+        means = {name: valid_mean(raster[window]) for name, raster in indices.items()}
+        status = SpectralIndices.classify_health_status(indices["ndvi"][window], indices["ndwi"][window])
+        pest_risk = TimeSeriesAnalysis.predict_pest_risk(indices["ndvi"][window], farm["crop"])
+        results.append({
+            "farm_id": farm["farm_id"],
+            "lat": farm["lat"],
+            "lon": farm["lon"],
+            "crop": farm["crop"],
+            **{name: None if value is None else round(value, 4) for name, value in means.items()},
+            "clear_fraction": round(float(np.mean(clear[window])), 3),
+            "status": status["status"],
+            "pest_risk": pest_risk,
+            "report": report_gen.generate_health_report(status, farm["crop"], farm["size_feddan"]),
+        })
+    return results
+
+
+def _process_group_with_metrics(group, date_from, date_to, demo):
+    """``process_group()`` in a pool worker, plus the worker's metrics since its last group."""
+    with span("batch.group"):
+        results = process_group(group, date_from, date_to, demo)
+    return results, metrics.drain()
+
+# ==================== RUNNER ====================
+
+
+def _inputs_key(farm, date_from, date_to, demo):
+    """Hash of everything a farm's result depends on, stored with its checkpoint line."""
+    payload = json.dumps([farm, date_from.isoformat(), date_to.isoformat(), bool(demo)], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _read_checkpoint(path, keys):
+    """
+    Checkpointed results by farm id, for farms whose line was written with
+    the same inputs key (``keys``): lines from an earlier day, another
+    window or changed farm rows are ignored.
+    """
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                entry = json.loads(line)
+            except ValueError:  # torn last line after a crash
+                continue
+            result = entry.get("result") or {}
+            key = keys.get(result.get("farm_id"))
+            if key is not None and entry.get("inputs") == key:
+                done[result["farm_id"]] = result
+    return done
+
+
+def _pest_column(pest):
+    """CSV column of one pest's risk, e.g. ``pest_hessian_flies_risk``."""
+    return f"pest_{pest.lower().replace(' ', '_')}_risk"
+
+
+def _csv_row(result):
+    """``result`` with ``pest_risks`` spread over one column per pest."""
+    row = {key: value for key, value in result.items() if key != "pest_risks"}
+    for pest, score in (result.get("pest_risks") or {}).items():
+        row[_pest_column(pest)] = score
+    return row
+
+
+def _write_results(path, results):
+    tmp = f"{path}.tmp"
+    if path.lower().endswith(".csv"):
+        rows = [_csv_row(result) for result in results]
+        # farms of different crops have different pests: union of columns, first seen order
+        fieldnames = list(dict.fromkeys(key for row in rows for key in row)) or ["farm_id"]
+        with open(tmp, "w", newline="", encoding="utf-8") as handle:
+            writer = csv.DictWriter(handle, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(tmp, "w", encoding="utf-8") as handle:
+            for result in results:
+                handle.write(json.dumps(result, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+
+def _flag_anomalies(results, day):
+    """Update the persistent streaming detector and annotate results."""
+    from utils.anomaly import StreamingAnomalyDetector
+
+    detector = StreamingAnomalyDetector.load(ANOMALY_STATE_PATH)
+    flags = detector.update(
+        [result["farm_id"] for result in results],
+        [result["ndvi"] for result in results],
+        day=day,
+        crops=[result["crop"] for result in results],
+    )
+    for result, flag in zip(results, flags):
+        result["anomaly_flags"] = int(flag)
+    detector.save(ANOMALY_STATE_PATH)
+
+
+def _update_pest_risk(results, day):
+    """
+    Add ``day``'s temperatures (from the weather store) to the persistent
+    degree-day tracker and annotate results with per-pest risk. Farms
+    without stored weather keep their accumulators and the NDVI stress score.
+    """
+    from utils.pest_risk import PestRiskTracker
+    from utils.weather import get_weather_store
+
+    lats = [result["lat"] for result in results]
+    lons = [result["lon"] for result in results]
+    tmax, tmin = np.full(len(results), np.nan), np.full(len(results), np.nan)
+    dates, values = get_weather_store().interpolate(lats, lons, ["temp_max", "temp_min"])
+    if dates is not None and day in dates:
+        tmax, tmin = values["temp_max"][:, dates.index(day)], values["temp_min"][:, dates.index(day)]
+
+    tracker = PestRiskTracker.load(PEST_STATE_PATH)
+    keys = [result["farm_id"] for result in results]
+    tracker.update(
+        keys, tmax, tmin, day=day,
+        crops=[result["crop"] for result in results],
+        ndvi=[result["ndvi"] for result in results],
+    )
+    for result, key in zip(results, keys):
+        result["pest_risks"] = tracker.farm_pests(key) if tracker.state(key)["days"] else {}
+        if result["pest_risks"]:
+            result["pest_risk"] = max(result["pest_risks"].values())
+    tracker.save(PEST_STATE_PATH)
+
+
+def run_batch(farms_path, output_path, workers=BATCH_WORKERS, days=10,
+              demo=DEMO_MODE, checkpoint_path=None, metrics_path=None):
+    """
+    Analyse all farms in ``farms_path`` and write ``output_path``.
+
+    Finished farms are checkpointed to ``checkpoint_path`` (default
+    ``<output>.checkpoint.jsonl``) with a hash of their inputs; rerunning
+    after a crash on the same day skips them.
+    Spans and counters from all workers are written to ``metrics_path`` in
+    Prometheus text format when given. Returns a summary dict including
+    farms/min throughput.
+    """
+    checkpoint_path = checkpoint_path or f"{output_path}.checkpoint.jsonl"
+    date_to = datetime.now().date()
+    date_from = date_to - timedelta(days=days)
+
+    farms = load_farms(farms_path)
+    keys = {farm["farm_id"]: _inputs_key(farm, date_from, date_to, demo) for farm in farms}
+    done = _read_checkpoint(checkpoint_path, keys)
+    remaining = [farm for farm in farms if farm["farm_id"] not in done]
+    groups = group_farms(remaining)
+    logger.info("%d farms (%d already done), %d scenes to fetch",
+                len(farms), len(done), len(groups))
+
+    start = time.perf_counter()
+    processed, failed = 0, 0
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_process_group_with_metrics, group, date_from, date_to, demo): group
+            for group in groups
+        }
+        for future in as_completed(futures):
+            try:
+                results, worker_metrics = future.result()
+                metrics.merge(worker_metrics)
+            except Exception:
+                failed += len(futures[future]["farms"])
+                logger.exception("Group at %s failed", futures[future]["bbox"])
+                continue
+
+            for result in results:
+                entry = {"inputs": keys[result["farm_id"]], "result": result}
+                checkpoint.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                done[result["farm_id"]] = result
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+
+            processed += len(results)
+            elapsed = time.perf_counter() - start
+            logger.info("%d/%d farms, %.0f farms/min", processed, len(remaining),
+                        processed / elapsed * 60 if elapsed else 0.0)
+
+    ordered = [done[farm["farm_id"]] for farm in farms if farm["farm_id"] in done]
+    with span("batch.anomalies"):
+        _flag_anomalies(ordered, date_to)
+    with span("batch.pest_risk"):
+        _update_pest_risk(ordered, date_to)
+    _write_results(output_path, ordered)
+    if not failed:
+        os.remove(checkpoint_path)
+
+    elapsed = time.perf_counter() - start
+    metrics.increment("batch_farms", processed, result="processed")
+    metrics.increment("batch_farms", failed, result="failed")
+    if metrics_path:
+        metrics.write_textfile(metrics_path)
+    return {
+        "farms": len(farms),
+        "processed": processed,
+        "resumed": len(farms) - len(remaining),
+        "failed": failed,
+        "scenes": len(groups),
+        "seconds": round(elapsed, 2),
+        "farms_per_min": round(processed / elapsed * 60, 1) if elapsed else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Agri-Mind batch farm analysis")
+    parser.add_argument("farms", help="CSV or GeoJSON file of farms")
+    parser.add_argument("output", help="results file (.jsonl or .csv)")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--days", type=int, default=10, help="composite window in days")
+    parser.add_argument("--metrics", help="write Prometheus text metrics to this file")
+    parser.add_argument("--demo", action=argparse.BooleanOptionalAction, default=DEMO_MODE,
+                        help="use synthetic demo scenes instead of Sentinel Hub")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    with metrics.profiling("batch"):
+        summary = run_batch(args.farms, args.output, args.workers, args.days, args.demo,
+                            metrics_path=args.metrics)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
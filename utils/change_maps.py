@@ -0,0 +1,145 @@
+# utils/change_maps.py - Per-pixel NDVI change maps over scene stacks
+"""
+Per-pixel anomaly maps: every pixel's NDVI compared with its own rolling
+baseline (mean of the previous ``window`` valid scenes).
+
+Stacks are ``(time, y, x)`` cubes, typically ``np.memmap`` files, and are
+processed in bands of rows sized to ``CHANGE_MAP_BUDGET_MB``. Rolling means
+come from NaN-aware cumulative sums along time (one pass, no Python loops
+over pixels or dates), so a year of scenes for a governorate runs in a
+fixed amount of memory.
+"""
+import base64
+import io
+
+import numpy as np
+
+from config import ANOMALY_THRESHOLD, CHANGE_MAP_WINDOW, CHANGE_MAP_BUDGET_MB
+
+# peak bytes per (time, pixel) cell inside _rolling_change: float32 input,
+# mask and masked copy, float64 sums/baseline/ratio, int32 counts and
+# float32 output
+_BYTES_PER_CELL = 56
+
+
+def rows_per_chunk(shape, budget_mb=CHANGE_MAP_BUDGET_MB):
+    """Number of image rows whose full time series fits in ``budget_mb``."""
+    times, _, width = shape
+    per_row = (times + 1) * width * _BYTES_PER_CELL
+    return max(1, int(budget_mb * 1024 * 1024 // per_row))
+
+
+def _rolling_change(chunk, window, min_valid):
+    """Relative change of each scene vs the mean of the previous ``window``."""
+    valid = ~np.isnan(chunk)
+    sums = np.zeros((chunk.shape[0] + 1,) + chunk.shape[1:], dtype=np.float64)
+    counts = np.zeros(sums.shape, dtype=np.int32)
+    np.cumsum(np.where(valid, chunk, 0.0), axis=0, out=sums[1:])
+    np.cumsum(valid, axis=0, out=counts[1:])
+
+    # baseline for scene t covers scenes [t - window, t)
+    base_sum = sums[window:-1] - sums[:-window - 1]
+    base_count = counts[window:-1] - counts[:-window - 1]
+    current = chunk[window:]
+
+    change = np.full(chunk.shape, np.nan, dtype=np.float32)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        baseline = base_sum / base_count
+        rel = (current - baseline) / np.abs(baseline)
+    ok = (base_count >= min_valid) & ~np.isnan(current) & np.isfinite(rel)
+    change[window:][ok] = rel[ok]
+    return change
+
+
+def change_cube(stack, window=CHANGE_MAP_WINDOW, out=None, budget_mb=CHANGE_MAP_BUDGET_MB,
+                min_valid=None):
+    """
+    Relative NDVI change for every scene of a ``(time, y, x)`` stack.
+
+    Scene ``t`` is compared with the NaN-aware mean of scenes
+    ``t - window .. t - 1``; the first ``window`` scenes and pixels with
+    fewer than ``min_valid`` (default ``window // 2 + 1``) valid baseline
+    scenes are NaN. ``out`` may be a preallocated float32 array or memmap.
+    """
+    times, height, width = stack.shape
+    if times <= window:
+        raise ValueError(f"Need more than {window} scenes, got {times}")
+    min_valid = min_valid or window // 2 + 1
+    if out is None:
+        out = np.empty(stack.shape, dtype=np.float32)
+
+    step = rows_per_chunk(stack.shape, budget_mb)
+    for y0 in range(0, height, step):
+        rows = slice(y0, min(y0 + step, height))
+        chunk = np.asarray(stack[:, rows, :], dtype=np.float32)
+        out[:, rows, :] = _rolling_change(chunk, window, min_valid)
+    return out
+
+
+def latest_change_map(stack, window=CHANGE_MAP_WINDOW, budget_mb=CHANGE_MAP_BUDGET_MB,
+                      min_valid=None):
+    """
+    Change map of the most recent scene only: a ``(y, x)`` float32 raster.
+
+    Reads just the last ``window + 1`` scenes of the stack.
+    """
+    tail = stack[-(window + 1):]
+    min_valid = min_valid or window // 2 + 1
+    height = tail.shape[1]
+    out = np.empty(tail.shape[1:], dtype=np.float32)
+    step = rows_per_chunk(tail.shape, budget_mb)
+    for y0 in range(0, height, step):
+        rows = slice(y0, min(y0 + step, height))
+        chunk = np.asarray(tail[:, rows, :], dtype=np.float32)
+        out[rows] = _rolling_change(chunk, window, min_valid)[-1]
+    return out
+
+
+def classify_change(change, threshold=ANOMALY_THRESHOLD):
+    """int8 raster: -1 decline beyond threshold, +1 gain, 0 normal/no data."""
+    result = np.zeros(change.shape, dtype=np.int8)
+    result[change < -threshold] = -1
+    result[change > threshold] = 1
+    return result
+
+
+# ==================== MAP OVERLAY ====================
+
+def change_map_rgba(change, threshold=ANOMALY_THRESHOLD, max_change=0.5):
+    """
+    Colour a change map: declines in red, gains in green, alpha growing
+    with magnitude; changes within ``threshold`` and no-data are transparent.
+    """
+    magnitude = np.clip((np.abs(np.nan_to_num(change)) - threshold) / (max_change - threshold), 0, 1)
+    rgba = np.zeros(change.shape + (4,), dtype=np.uint8)
+    decline = change < -threshold
+    gain = change > threshold
+    rgba[decline] = (211, 47, 47, 0)
+    rgba[gain] = (46, 125, 50, 0)
+    rgba[..., 3] = np.where(decline | gain, 90 + magnitude * 165, 0).astype(np.uint8)
+    return rgba
+
+
+def change_map_png(change, threshold=ANOMALY_THRESHOLD):
+    """PNG bytes of ``change_map_rgba``."""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.fromarray(change_map_rgba(change, threshold)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def folium_change_overlay(change, bbox, threshold=ANOMALY_THRESHOLD, name="NDVI change"):
+    """
+    ``folium.raster_layers.ImageOverlay`` for a change map covering
+    ``bbox`` = ``[min_lon, min_lat, max_lon, max_lat]``.
+    """
+    import folium
+
+    data_url = "data:image/png;base64," + base64.b64encode(change_map_png(change, threshold)).decode()
+    return folium.raster_layers.ImageOverlay(
+        image=data_url,
+        bounds=[[bbox[1], bbox[0]], [bbox[3], bbox[2]]],
+        name=name,
+        opacity=1.0,
+    )
@@ -0,0 +1,61 @@
+# utils/colormaps.py - Colour maps for index rasters
+"""
+Lookup-table colour maps for NDVI/NDWI rendering.
+
+Values are quantized to 256 levels and mapped through a precomputed RGBA
+table, so colouring a raster is a single ``np.take``. NaN (no data) maps to
+fully transparent.
+"""
+import numpy as np
+
+# (value, (r, g, b)) stops; alpha is added by build_lut
+COLORMAP_STOPS = {
+    "ndvi": [
+        (-0.2, (165, 0, 38)),
+        (0.1, (244, 109, 67)),
+        (0.3, (254, 224, 139)),
+        (0.5, (166, 217, 106)),
+        (0.7, (26, 152, 80)),
+        (0.9, (0, 104, 55)),
+    ],
+    "ndwi": [
+        (-0.6, (140, 81, 10)),
+        (-0.3, (223, 194, 125)),
+        (-0.1, (245, 245, 245)),
+        (0.1, (128, 205, 193)),
+        (0.4, (1, 102, 94)),
+    ],
+}
+COLORMAP_STOPS["savi"] = COLORMAP_STOPS["ndvi"]
+COLORMAP_STOPS["evi"] = COLORMAP_STOPS["ndvi"]
+
+_luts = {}
+
+
+def build_lut(name, alpha=210):
+    """256-entry RGBA lookup table spanning the first to the last stop."""
+    if name not in _luts:
+        stops = COLORMAP_STOPS[name]
+        values = np.array([v for v, _ in stops], dtype=np.float64)
+        colors = np.array([c for _, c in stops], dtype=np.float64)
+        samples = np.linspace(values[0], values[-1], 256)
+        lut = np.empty((257, 4), dtype=np.uint8)
+        for channel in range(3):
+            lut[:256, channel] = np.round(np.interp(samples, values, colors[:, channel]))
+        lut[:256, 3] = alpha
+        lut[256] = (0, 0, 0, 0)  # no data
+        _luts[name] = (lut, values[0], values[-1])
+    return _luts[name]
+
+
+def apply_colormap(raster, name="ndvi"):
+    """Colour a float raster into an ``(H, W, 4)`` uint8 RGBA array."""
+    lut, vmin, vmax = build_lut(name)
+    raster = np.asarray(raster, dtype=np.float32)
+    nodata = np.isnan(raster)
+    scaled = (raster - vmin) * (255.0 / (vmax - vmin))
+    scaled[nodata] = 0
+    np.clip(scaled, 0, 255, out=scaled)
+    codes = scaled.astype(np.int16)
+    codes[nodata] = 256
+    return np.take(lut, codes, axis=0)
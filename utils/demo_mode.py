@@ -0,0 +1,213 @@
+# utils/demo_mode.py - Demo data loader (offline fallback)
+"""
+Offline stand-in for the satellite and weather APIs.
+
+Uses the demo GeoTIFF at ``DEMO_DATA_PATH`` when it exists and otherwise
+synthesizes realistic Sentinel-2 reflectances. Synthetic data is seeded from
+the request (bbox, date) so repeated calls return the same scene.
+"""
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from config import (
+    DEMO_DATA_PATH, CROPS_CONFIG, WATER_EFFICIENCY, IRRIGATION_TYPES,
+    CARBON_SEQUESTRATION, HISTORICAL_DAYS, FORECAST_DAYS
+)
+from utils.indices import SpectralIndices
+
+DEMO_BANDS = ("B02", "B03", "B04", "B08", "B11")
+FEDDAN_TO_HECTARE = 0.42
+SCL_CLOUD_SHADOW, SCL_VEGETATION, SCL_CLOUD_HIGH = 3, 4, 9
+
+
+def _seed(*parts):
+    digest = hashlib.sha256(repr(parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+class DemoDataLoader:
+    """Deterministic demo data for every dashboard section."""
+
+    def __init__(self, data_path=DEMO_DATA_PATH):
+        self.data_path = data_path
+
+    def get_demo_satellite_data(self, bbox=None, size=(512, 512), date=None):
+        """
+        Sentinel-2 reflectances (0-1, float32) keyed by band name.
+
+        Reads ``DEMO_DATA_PATH`` when present (bands B02, B03, B04, B08, B11),
+        otherwise generates field-like patterns for ``bbox``. ``SCL`` holds
+        the scene classification; dated synthetic scenes may contain a
+        cloud with its shadow.
+        """
+        if os.path.exists(self.data_path):
+            import rasterio
+
+            with rasterio.open(self.data_path) as dataset:
+                data = dataset.read(out_shape=(dataset.count, size[1], size[0]))
+            scale = np.float32(1e-4) if data.dtype.kind in "iu" else np.float32(1.0)
+            bands = {name: data[i].astype(np.float32) * scale for i, name in enumerate(DEMO_BANDS)}
+            bands["SCL"] = np.full(data.shape[1:], SCL_VEGETATION, dtype=np.uint8)
+            return bands
+
+        rng = np.random.default_rng(_seed(tuple(bbox or ()), str(date), size))
+        width, height = size
+        yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+        # parcels of different vigour plus smooth within-field variation
+        parcels = rng.uniform(0.3, 1.0, (8, 8)).astype(np.float32)
+        vigour = parcels[(yy * 8 // height).astype(int), (xx * 8 // width).astype(int)]
+        vigour *= 0.9 + 0.1 * np.sin(xx / 37.0) * np.cos(yy / 53.0)
+        noise = rng.normal(0, 0.01, (5, height, width)).astype(np.float32)
+
+        bands = {
+            "B02": 0.04 + 0.02 * (1 - vigour) + noise[0],
+            "B03": 0.07 + 0.02 * (1 - vigour) + noise[1],
+            "B04": 0.03 + 0.12 * (1 - vigour) + noise[2],
+            "B08": 0.20 + 0.30 * vigour + noise[3],
+            "B11": 0.15 + 0.10 * (1 - vigour) + noise[4],
+        }
+        bands = {name: np.clip(band, 0.0, 1.0) for name, band in bands.items()}
+
+        scl = np.full((height, width), SCL_VEGETATION, dtype=np.uint8)
+        if date is not None and rng.random() < 0.3:  # partly cloudy acquisition
+            cy, cx = rng.uniform(0.2, 0.8, 2) * (height, width)
+            radius = rng.uniform(0.1, 0.25) * min(height, width)
+            shadow = (yy - cy - radius * 0.5) ** 2 + (xx - cx - radius * 0.5) ** 2 < radius ** 2
+            cloud = (yy - cy) ** 2 + (xx - cx) ** 2 < radius ** 2
+            scl[shadow] = SCL_CLOUD_SHADOW
+            scl[cloud] = SCL_CLOUD_HIGH
+            for name in ("B02", "B03", "B04", "B08"):
+                bands[name][cloud] = 0.6
+        bands["SCL"] = scl
+        return bands
+
+    def get_demo_available_data(self, bbox=None, date_from=None, date_to=None):
+        """Catalog-style acquisitions (every 5 days) with cloud cover, like ``get_available_data``."""
+        scenes = []
+        day = date_from
+        while day <= date_to:
+            rng = np.random.default_rng(_seed(tuple(bbox or ()), "catalog", str(day)))
+            scenes.append({
+                "id": f"demo-{day}",
+                "date": str(day),
+                "cloud_cover": round(float(rng.choice([0.0, 5.0, 30.0, 80.0]) + rng.uniform(0, 5)), 1),
+            })
+            day += timedelta(days=5)
+        return scenes
+
+    def get_demo_indices(self, bbox=None, size=(512, 512), date=None):
+        """NDVI/NDWI/SAVI/EVI rasters for the demo scene (cloud-masked)."""
+        bands = self.get_demo_satellite_data(bbox, size, date)
+        return SpectralIndices.calculate_all_tiled(
+            bands["B04"], bands["B03"], bands["B02"], bands["B08"], scl=bands["SCL"]
+        )
+
+    def get_demo_ndvi_stack(self, bbox=None, dates=(), size=(256, 256)):
+        """
+        ``(time, y, x)`` NDVI stack for ``dates``: one field layout with
+        seasonal drift, noise, occasional cloud gaps and a stressed patch
+        developing in the most recent scenes.
+        """
+        base = self.get_demo_indices(bbox, size)["ndvi"]
+        width, height = size
+        stack = np.empty((len(dates), height, width), dtype=np.float32)
+        for t, day in enumerate(dates):
+            rng = np.random.default_rng(_seed(tuple(bbox or ()), "stack", str(day)))
+            seasonal = 1.0 + 0.05 * np.sin(day.timetuple().tm_yday / 365.0 * 2 * np.pi)
+            stack[t] = base * seasonal + rng.normal(0, 0.02, base.shape)
+            if rng.random() < 0.2:  # partly cloudy acquisition
+                y0 = rng.integers(0, height // 2)
+                stack[t, y0:y0 + height // 3] = np.nan
+        if len(dates) > 1:
+            stress = slice(height // 4, height // 2), slice(width // 2, 3 * width // 4)
+            stack[-1][stress] *= 0.6
+        return stack
+
+    def get_demo_weather_forecast(self, days=FORECAST_DAYS, lat=None, lon=None):
+        """Daily forecast: dates, max temperature (°C) and rain (mm)."""
+        rng = np.random.default_rng(_seed("weather", lat, lon, datetime.now().date()))
+        start = datetime.now().date() + timedelta(days=1)
+        return {
+            "date": [start + timedelta(days=i) for i in range(days)],
+            "temp": np.round(27 + rng.normal(0, 2.5, days), 1).tolist(),
+            "rain": np.round(np.where(rng.random(days) < 0.2, rng.uniform(1, 10, days), 0.0), 1).tolist(),
+        }
+
+    def get_demo_onecall(self, lat, lon, issued=None):
+        """
+        OpenWeatherMap One Call response (``daily`` only, metric units) for
+        ``issued`` (default today) and the following ``FORECAST_DAYS`` days.
+        Smooth in space so neighbouring grid nodes get similar weather.
+        """
+        issued = issued or datetime.now().date()
+        rng = np.random.default_rng(_seed("onecall", round(lat, 2), round(lon, 2), issued))
+        base = 27 + 0.8 * (30 - lat) + 0.3 * np.sin(lon)
+        daily = []
+        for i in range(FORECAST_DAYS + 1):
+            day = issued + timedelta(days=i)
+            t_max = base + 2.5 * np.sin(i / 2.0) + rng.normal(0, 0.8)
+            entry = {
+                "dt": int(datetime(day.year, day.month, day.day, 10).timestamp()),
+                "temp": {"min": round(t_max - 10 - rng.uniform(0, 3), 2), "max": round(t_max, 2)},
+                "humidity": int(rng.integers(25, 70)),
+                "wind_speed": round(float(rng.uniform(1, 7)), 2),
+            }
+            if rng.random() < 0.15:
+                entry["rain"] = round(float(rng.uniform(0.5, 8)), 2)
+            daily.append(entry)
+        return {"lat": lat, "lon": lon, "timezone": "Africa/Cairo", "timezone_offset": 7200, "daily": daily}
+
+    def get_demo_index_stats(self, farm_id, dates):
+        """
+        Daily NDVI/NDWI statistics for ``dates`` in the ``HistoryStore``
+        format (``{date: {index: {"mean": ..., ...}}}``). Each day is
+        generated independently, so loading only new dates is cheap.
+        """
+        stats = {}
+        for day in dates:
+            seasonal = 0.05 * np.sin(day.timetuple().tm_yday / 365.0 * 2 * np.pi)
+            stats[day] = {}
+            for index, base, spread in (("ndvi", 0.62, 0.02), ("ndwi", -0.1, 0.03)):
+                rng = np.random.default_rng(_seed(farm_id, index, day))
+                mean = float(base + seasonal + rng.normal(0, spread))
+                stats[day][index] = {
+                    "mean": round(mean, 4),
+                    "std": round(spread * 2, 4),
+                    "valid_fraction": 1.0,
+                }
+        return stats
+
+    def get_demo_historical_data(self, days=HISTORICAL_DAYS, farm_id="demo", end=None):
+        """Daily mean NDVI/NDWI for the last ``days`` days."""
+        end = end or datetime.now().date()
+        dates = [end - timedelta(days=days - 1 - i) for i in range(days)]
+        stats = self.get_demo_index_stats(farm_id, dates)
+        return {
+            "date": dates,
+            "ndvi": [stats[day]["ndvi"]["mean"] for day in dates],
+            "ndwi": [stats[day]["ndwi"]["mean"] for day in dates],
+        }
+
+    def get_demo_health_classification(self, bbox=None):
+        indices = self.get_demo_indices(bbox, size=(128, 128))
+        return SpectralIndices.classify_health_status(indices["ndvi"], indices["ndwi"])
+
+    def get_demo_recommendations(self, crop_type):
+        config = CROPS_CONFIG[crop_type]
+        return {
+            "irrigation": f"every {config['irrigation_interval']} days",
+            "fertilizer": config["fertilizer_schedule"],
+            "pests": config["pest_risks"],
+        }
+
+    def get_demo_sustainability_metrics(self, farm_size_feddan, irrigation_type):
+        method = IRRIGATION_TYPES.get(irrigation_type, irrigation_type).lower()
+        efficiency = WATER_EFFICIENCY.get(method, WATER_EFFICIENCY["flood"])
+        hectares = farm_size_feddan * FEDDAN_TO_HECTARE
+        return {
+            "water_savings_pct": round((efficiency - WATER_EFFICIENCY["flood"]) * 100, 1),
+            "carbon_tonnes": round(hectares * CARBON_SEQUESTRATION["rate_per_hectare"], 2),
+        }
@@ -0,0 +1,119 @@
+# utils/evalscripts.py - Generated multi-output index evalscript
+"""
+One Sentinel Hub request per scene for all indices.
+
+``build_index_evalscript()`` generates an evalscript that computes the
+requested indices on the server with the same formulas as
+``SpectralIndices`` and returns two outputs:
+
+* ``indices``: INT16, one band per index, ``round(value * INDEX_QUANT_SCALE)``
+  with ``INDEX_QUANT_NODATA`` for cloudy/invalid pixels (``SCL`` in
+  ``SCL_INVALID_CLASSES`` or outside the data footprint) and zero
+  denominators;
+* ``mask``: UINT8, 1 where the pixel is clear.
+
+That replaces separate NDVI/NDWI/true-colour requests plus float32 raw
+bands (20 bytes per pixel for ``BANDS_SCRIPT``) with 2 bytes per index and
+1 byte of mask per pixel. Responses with several outputs arrive as a tar
+archive of GeoTIFFs; ``decode_index_response()`` turns the quantized
+outputs into float32 rasters (see ``utils.quantize``).
+"""
+import numpy as np
+
+from config import INDEX_QUANT_SCALE, INDEX_QUANT_NODATA, SCL_INVALID_CLASSES
+from utils.indices import INDEX_NAMES, SAVI_L
+from utils.quantize import QUANT_LIMIT, dequantize, quantize
+
+INDEX_OUTPUTS = ("indices", "mask")
+
+# evalscript expressions per index (sample fields are reflectances 0-1)
+INDEX_FORMULAS = {
+    "ndvi": ("s.B08 - s.B04", "s.B08 + s.B04"),
+    "ndwi": ("s.B03 - s.B08", "s.B03 + s.B08"),
+    "savi": (f"{1.0 + SAVI_L} * (s.B08 - s.B04)", f"s.B08 + s.B04 + {SAVI_L}"),
+    "evi": ("2.5 * (s.B08 - s.B04)", "s.B08 + 6.0 * s.B04 - 7.5 * s.B02 + 1.0"),
+}
+INDEX_BANDS = {"ndvi": ("B04", "B08"), "ndwi": ("B03", "B08"), "savi": ("B04", "B08"), "evi": ("B02", "B04", "B08")}
+
+_TEMPLATE = """//VERSION=3
+function setup() {{
+  return {{
+    input: [{{bands: {bands}}}],
+    output: [
+      {{id: "indices", bands: {count}, sampleType: "INT16"}},
+      {{id: "mask", bands: 1, sampleType: "UINT8"}}
+    ]
+  }};
+}}
+
+var INVALID = {invalid};
+var NODATA = {nodata};
+var EMPTY = {empty};
+
+function q(num, den) {{
+  if (den === 0) return NODATA;
+  return Math.max(-{limit}, Math.min({limit}, Math.round(num / den * {scale})));
+}}
+
+function evaluatePixel(s) {{
+  if (s.dataMask === 0 || INVALID.indexOf(s.SCL) >= 0) {{
+    return {{indices: EMPTY, mask: [0]}};
+  }}
+  return {{
+    indices: [
+{values}
+    ],
+    mask: [1]
+  }};
+}}
+"""
+
+
+def build_index_evalscript(indices=INDEX_NAMES, invalid_classes=SCL_INVALID_CLASSES,
+                           scale=INDEX_QUANT_SCALE, nodata=INDEX_QUANT_NODATA):
+    """Evalscript returning quantized ``indices`` (in this order) and the clear mask."""
+    bands = sorted({band for name in indices for band in INDEX_BANDS[name]}) + ["SCL", "dataMask"]
+    values = ",\n".join(f"      q({INDEX_FORMULAS[name][0]}, {INDEX_FORMULAS[name][1]})" for name in indices)
+    return _TEMPLATE.format(
+        bands="[" + ", ".join(f'"{band}"' for band in bands) + "]",
+        count=len(indices),
+        invalid="[" + ", ".join(str(code) for code in sorted(invalid_classes)) + "]",
+        nodata=nodata,
+        empty="[" + ", ".join([str(nodata)] * len(indices)) + "]",
+        limit=QUANT_LIMIT,
+        scale=scale,
+        values=values,
+    )
+
+
+INDEX_EVALSCRIPT = build_index_evalscript()
+
+
+def quantize_indices(rasters, indices=INDEX_NAMES):
+    """
+    Local equivalent of the evalscript's outputs from index rasters (NaN =
+    invalid), e.g. for demo scenes: ``{"indices": (n, H, W) int16, "mask": uint8}``.
+    A pixel is clear when any index is defined.
+    """
+    first = np.asarray(rasters[indices[0]])
+    quantized = np.empty((len(indices),) + first.shape, dtype=np.int16)
+    for i, name in enumerate(indices):
+        quantize(rasters[name], out=quantized[i])
+    mask = (quantized != INDEX_QUANT_NODATA).any(axis=0).astype(np.uint8)
+    return {"indices": quantized, "mask": mask}
+
+
+def decode_index_response(outputs, indices=INDEX_NAMES):
+    """
+    Float32 rasters ``{name: (H, W)}`` plus the boolean ``clear`` mask from
+    the quantized ``indices`` and ``mask`` outputs (one float32 buffer is
+    allocated for all indices and filled in place).
+    """
+    quantized = np.asarray(outputs["indices"])
+    if quantized.ndim == 2:
+        quantized = quantized[None]
+    mask = np.asarray(outputs["mask"]).reshape(quantized.shape[1:])
+    values = dequantize(quantized, out=np.empty(quantized.shape, dtype=np.float32), mask=mask[None])
+    decoded = {name: values[i] for i, name in enumerate(indices)}
+    decoded["clear"] = mask.astype(bool)
+    return decoded
@@ -0,0 +1,188 @@
+# utils/history_store.py - Persistent per-farm index history
+"""
+Incremental store of daily per-farm index statistics.
+
+One SQLite table clustered on ``(farm_id, index_name, date)`` (``WITHOUT
+ROWID``), so "last N days of NDVI for farm X" is a single B-tree range scan
+that touches only the pages holding that farm's rows. New acquisitions are
+appended with ``INSERT OR IGNORE``; existing dates are never recomputed.
+WAL mode lets several Streamlit workers read while one writes.
+
+Rows are keyed by ``history_key()``: synthetic demo statistics are stored
+under ``demo:<farm_id>``, so they can never take the place of a farm's real
+statistics for the same dates.
+"""
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from config import HISTORY_DB_PATH, HISTORICAL_DAYS
+from utils.quantize import QUANT_DTYPE, quantized_stats
+
+STAT_COLUMNS = ("mean", "std", "p10", "p50", "p90", "valid_fraction")
+DEMO_PREFIX = "demo:"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS index_history (
+    farm_id TEXT NOT NULL,
+    index_name TEXT NOT NULL,
+    date TEXT NOT NULL,
+    mean REAL,
+    std REAL,
+    p10 REAL,
+    p50 REAL,
+    p90 REAL,
+    valid_fraction REAL,
+    PRIMARY KEY (farm_id, index_name, date)
+) WITHOUT ROWID
+"""
+
+
+def history_key(farm_id, demo=False):
+    """Store key of a farm's history; demo rows are namespaced apart from real ones."""
+    return f"{DEMO_PREFIX}{farm_id}" if demo else str(farm_id)
+
+
+def _iso(day):
+    return day.strftime("%Y-%m-%d") if isinstance(day, (date, datetime)) else str(day)
+
+
+def raster_stats(raster):
+    """
+    Summary statistics of one index raster (NaN = no data). Quantized
+    int16 rasters are summarised without decoding them.
+    """
+    if np.asarray(raster).dtype == QUANT_DTYPE:
+        stats = quantized_stats(raster)
+        return {col: stats[col] for col in STAT_COLUMNS}
+    values = np.asarray(raster, dtype=np.float32).ravel()
+    valid = values[~np.isnan(values)]
+    if valid.size == 0:
+        empty = dict.fromkeys(STAT_COLUMNS)
+        empty["valid_fraction"] = 0.0
+        return empty
+    p10, p50, p90 = np.percentile(valid, (10, 50, 90))
+    return {
+        "mean": float(valid.mean()),
+        "std": float(valid.std()),
+        "p10": float(p10),
+        "p50": float(p50),
+        "p90": float(p90),
+        "valid_fraction": valid.size / values.size,
+    }
+
+
+class HistoryStore:
+    """Append-only daily index statistics per farm."""
+
+    def __init__(self, path=HISTORY_DB_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    # ==================== WRITES ====================
+
+    def append(self, farm_id, day, stats):
+        """
+        Add one acquisition. ``stats`` maps index name to a dict of
+        ``STAT_COLUMNS`` (missing columns are stored as NULL). Dates already
+        present are left untouched. Returns the number of rows inserted.
+        """
+        rows = [
+            (farm_id, index_name, _iso(day), *(values.get(col) for col in STAT_COLUMNS))
+            for index_name, values in stats.items()
+        ]
+        with self._lock, self._conn:
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO index_history VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        return cursor.rowcount
+
+    def append_rasters(self, farm_id, day, rasters):
+        """Append statistics computed from index rasters (name -> array)."""
+        return self.append(farm_id, day, {name: raster_stats(r) for name, r in rasters.items()})
+
+    def update(self, farm_id, candidate_dates, loader, index_name="ndvi"):
+        """
+        Load only the candidate dates that are not stored yet.
+
+        ``loader(dates)`` must return ``{date: {index_name: stats}}`` for
+        the requested dates (dates without an acquisition may be omitted).
+        Returns the list of dates that were added.
+        """
+        candidate_dates = sorted(candidate_dates)
+        if not candidate_dates:
+            return []
+        with self._lock:
+            stored = {
+                row[0] for row in self._conn.execute(
+                    "SELECT date FROM index_history WHERE farm_id = ? AND index_name = ? "
+                    "AND date BETWEEN ? AND ?",
+                    (farm_id, index_name, _iso(candidate_dates[0]), _iso(candidate_dates[-1])),
+                )
+            }
+        new_dates = [d for d in candidate_dates if _iso(d) not in stored]
+        if not new_dates:
+            return []
+        added = []
+        for day, stats in loader(new_dates).items():
+            if self.append(farm_id, day, stats):
+                added.append(day)
+        return added
+
+    # ==================== READS ====================
+
+    def latest_date(self, farm_id, index_name="ndvi"):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(date) FROM index_history WHERE farm_id = ? AND index_name = ?",
+                (farm_id, index_name),
+            ).fetchone()
+        return row[0]
+
+    def query(self, farm_id, index_name="ndvi", days=HISTORICAL_DAYS, end=None,
+              columns=("mean",)):
+        """
+        Statistics for the last ``days`` days up to ``end`` (default today).
+
+        Returns ``{"date": [datetime.date, ...], column: np.ndarray, ...}``
+        sorted by date.
+        """
+        end = end or datetime.now().date()
+        start = end - timedelta(days=days - 1)
+        for col in columns:
+            if col not in STAT_COLUMNS:
+                raise ValueError(f"Unknown statistic: {col}")
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT date, {', '.join(columns)} FROM index_history "
+                "WHERE farm_id = ? AND index_name = ? AND date BETWEEN ? AND ? ORDER BY date",
+                (farm_id, index_name, _iso(start), _iso(end)),
+            ).fetchall()
+
+        result = {"date": [date.fromisoformat(row[0]) for row in rows]}
+        for i, col in enumerate(columns, start=1):
+            result[col] = np.array([row[i] for row in rows], dtype=np.float64)
+        return result
+
+
+_store = None
+
+
+def get_history_store():
+    """Shared HistoryStore for the process."""
+    global _store
+    if _store is None:
+        _store = HistoryStore()
+    return _store
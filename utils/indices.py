@@ -0,0 +1,417 @@
+# utils/indices.py - Spectral index calculations and time-series analysis
+"""
+Vegetation and water indices for Sentinel-2 bands.
+
+All index functions expect surface reflectance in the 0-1 range and work in
+float32. Pixels whose denominator is zero are returned as NaN (no data).
+
+For full-scene rasters use ``SpectralIndices.calculate_all_tiled()``: it walks
+the scene in fixed-size tiles, computes NDVI/NDWI/SAVI/EVI in a single pass
+over the input bands and writes into preallocated outputs (optionally
+``np.memmap`` files), so memory use is bounded by the tile size instead of
+the scene size.
+
+Passing the Sentinel-2 scene classification layer (``scl``) masks clouds,
+cloud shadows, cirrus, snow and no-data pixels inside the same pass: the
+mask is folded into the division's validity mask, so masked pixels come out
+as NaN without a separate masking step over the outputs.
+
+``calculate_all_quantized()`` writes the same indices as scaled int16
+(``utils.quantize``), half the memory of float32; ``save_indices()`` there
+stores either form compressed.
+"""
+import warnings
+
+import numpy as np
+
+from config import (
+    CROPS_CONFIG, NDVI_THRESHOLDS, NDWI_THRESHOLDS, ANOMALY_THRESHOLD,
+    INDEX_TILE_SIZE, SCL_INVALID_CLASSES
+)
+from utils.metrics import timed
+from utils.quantize import QUANT_DTYPE, quantize
+
+INDEX_NAMES = ("ndvi", "ndwi", "savi", "evi")
+SAVI_L = 0.5
+
+
+def _as_float32(band):
+    return np.asarray(band, dtype=np.float32)
+
+
+def _safe_divide(num, den):
+    """num / den with NaN wherever den == 0."""
+    out = np.full(num.shape, np.nan, dtype=np.float32)
+    np.divide(num, den, out=out, where=den != 0)
+    return out
+
+
+def valid_mean(values):
+    """Mean of the non-NaN values, or None when there are none (fully masked scene)."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # "Mean of empty slice"
+        mean = float(np.nanmean(values))
+    return None if np.isnan(mean) else mean
+
+
+def _scl_invalid_bits(invalid_classes=SCL_INVALID_CLASSES):
+    # SCL classes are 0-11, so one bit per class fits in a uint16 and the
+    # per-pixel test is a shift and an AND (several times faster than isin)
+    return np.uint16(sum(1 << code for code in invalid_classes))
+
+
+def _scl_clear_into(codes, invalid_bits, scratch, out):
+    np.left_shift(np.uint16(1), codes, out=scratch)
+    np.bitwise_and(scratch, invalid_bits, out=scratch)
+    np.equal(scratch, 0, out=out)
+
+
+def scl_clear_mask(scl, invalid_classes=SCL_INVALID_CLASSES):
+    """Boolean raster, True where the SCL class is usable (clear land/water)."""
+    codes = np.empty(np.shape(scl), dtype=np.uint16)
+    with np.errstate(invalid="ignore"):
+        np.copyto(codes, np.nan_to_num(scl, nan=0), casting="unsafe")
+    out = np.empty(codes.shape, dtype=bool)
+    _scl_clear_into(codes, _scl_invalid_bits(invalid_classes), codes, out)
+    return out
+
+
+def iter_tiles(shape, tile_size=INDEX_TILE_SIZE):
+    """Yield (row_slice, col_slice) windows covering a 2-D raster."""
+    height, width = shape
+    for y0 in range(0, height, tile_size):
+        for x0 in range(0, width, tile_size):
+            yield (slice(y0, min(y0 + tile_size, height)),
+                   slice(x0, min(x0 + tile_size, width)))
+
+
+def allocate_index_outputs(shape, indices=INDEX_NAMES, directory=None, dtype=np.float32):
+    """
+    Allocate float32 output rasters for ``calculate_all_tiled`` (or int16
+    ones, ``dtype=QUANT_DTYPE``, for ``calculate_all_quantized``).
+
+    With ``directory`` set the outputs are ``.npy`` memory maps on disk, so a
+    full 10980x10980 Sentinel-2 tile does not have to fit in RAM.
+    """
+    if directory is None:
+        return {name: np.empty(shape, dtype=dtype) for name in indices}
+
+    import os
+    os.makedirs(directory, exist_ok=True)
+    return {
+        name: np.lib.format.open_memmap(
+            os.path.join(directory, f"{name}.npy"), mode="w+",
+            dtype=dtype, shape=shape
+        )
+        for name in indices
+    }
+
+
+class _TileBuffers:
+    """Scratch buffers reused across tiles (no per-formula temporaries)."""
+
+    def __init__(self, tile_size):
+        shape = (tile_size, tile_size)
+        self.red = np.empty(shape, dtype=np.float32)
+        self.green = np.empty(shape, dtype=np.float32)
+        self.blue = np.empty(shape, dtype=np.float32)
+        self.nir = np.empty(shape, dtype=np.float32)
+        self.t0 = np.empty(shape, dtype=np.float32)
+        self.t1 = np.empty(shape, dtype=np.float32)
+        self.t2 = np.empty(shape, dtype=np.float32)
+        self.t3 = np.empty(shape, dtype=np.float32)
+        self.valid = np.empty(shape, dtype=bool)
+        self.scl = np.empty(shape, dtype=np.uint16)
+        self.clear = np.empty(shape, dtype=bool)
+
+    def view(self, rows, cols):
+        """Return views of every buffer trimmed to a (rows, cols) tile."""
+        return {
+            name: buf[:rows, :cols] for name, buf in vars(self).items()
+        }
+
+
+class SpectralIndices:
+    """Vegetation and water index calculations."""
+
+    # ==================== PER-INDEX FUNCTIONS ====================
+
+    @staticmethod
+    @timed("indices.ndvi")
+    def calculate_ndvi(red, nir):
+        """NDVI = (NIR - Red) / (NIR + Red)"""
+        red, nir = _as_float32(red), _as_float32(nir)
+        return _safe_divide(nir - red, nir + red)
+
+    @staticmethod
+    @timed("indices.ndwi")
+    def calculate_ndwi(green, nir):
+        """NDWI = (Green - NIR) / (Green + NIR)"""
+        green, nir = _as_float32(green), _as_float32(nir)
+        return _safe_divide(green - nir, green + nir)
+
+    @staticmethod
+    @timed("indices.savi")
+    def calculate_savi(red, nir, L=SAVI_L):
+        """SAVI = (1 + L) * (NIR - Red) / (NIR + Red + L)"""
+        red, nir = _as_float32(red), _as_float32(nir)
+        return _safe_divide((1.0 + L) * (nir - red), nir + red + L)
+
+    @staticmethod
+    @timed("indices.evi")
+    def calculate_evi(blue, red, nir):
+        """EVI = 2.5 * (NIR - Red) / (NIR + 6 * Red - 7.5 * Blue + 1)"""
+        blue, red, nir = _as_float32(blue), _as_float32(red), _as_float32(nir)
+        return _safe_divide(2.5 * (nir - red), nir + 6.0 * red - 7.5 * blue + 1.0)
+
+    # ==================== TILED EXECUTION ====================
+
+    @staticmethod
+    def iter_index_tiles(red, green, blue, nir, tile_size=INDEX_TILE_SIZE,
+                         scale_factor=None, scl=None):
+        """
+        Stream all four indices tile by tile.
+
+        Yields ``(window, tile)`` where ``window`` is a ``(row_slice,
+        col_slice)`` pair and ``tile`` maps index name to a float32 array.
+        The tile arrays are reused between iterations; copy them if they
+        must outlive the loop. Band inputs can be any 2-D arrays or memory
+        maps of the same shape; integer DNs are converted with
+        ``scale_factor`` (e.g. 1e-4 for Sentinel-2 L2A). Pixels whose
+        ``scl`` class is invalid are NaN in every index.
+        """
+        buffers = _TileBuffers(tile_size)
+        invalid_bits = _scl_invalid_bits()
+        outputs = {name: np.empty((tile_size, tile_size), dtype=np.float32)
+                   for name in INDEX_NAMES}
+
+        for window in iter_tiles(np.shape(red), tile_size):
+            rows = window[0].stop - window[0].start
+            cols = window[1].stop - window[1].start
+            tile = {name: buf[:rows, :cols] for name, buf in outputs.items()}
+            SpectralIndices._compute_tile(
+                buffers.view(rows, cols), red, green, blue, nir, window,
+                tile, scale_factor, scl, invalid_bits
+            )
+            yield window, tile
+
+    @staticmethod
+    @timed("indices.all_tiled")
+    def calculate_all_tiled(red, green, blue, nir, tile_size=INDEX_TILE_SIZE,
+                            out=None, scale_factor=None, scl=None):
+        """
+        Compute NDVI, NDWI, SAVI and EVI in one pass over the input bands.
+
+        Results match the per-index functions for the same float32 inputs.
+        ``out`` may hold preallocated rasters (see
+        ``allocate_index_outputs``); only the indices present in ``out`` are
+        written. With ``scl`` (Sentinel-2 scene classification), cloudy,
+        shadowed and no-data pixels are NaN. Returns the dict of output
+        rasters.
+        """
+        shape = np.shape(red)
+        if out is None:
+            out = allocate_index_outputs(shape)
+
+        buffers = _TileBuffers(tile_size)
+        invalid_bits = _scl_invalid_bits()
+        for window in iter_tiles(shape, tile_size):
+            rows = window[0].stop - window[0].start
+            cols = window[1].stop - window[1].start
+            tile = {name: raster[window] for name, raster in out.items()}
+            SpectralIndices._compute_tile(
+                buffers.view(rows, cols), red, green, blue, nir, window,
+                tile, scale_factor, scl, invalid_bits
+            )
+        return out
+
+    @staticmethod
+    @timed("indices.all_quantized")
+    def calculate_all_quantized(red, green, blue, nir, tile_size=INDEX_TILE_SIZE,
+                                out=None, scale_factor=None, scl=None):
+        """
+        ``calculate_all_tiled()`` with int16 outputs (``utils.quantize``
+        encoding, nodata for NaN). Each float32 tile is quantized straight
+        into ``out``, so no full-size float raster is allocated.
+        """
+        if out is None:
+            out = allocate_index_outputs(np.shape(red), dtype=QUANT_DTYPE)
+        for window, tile in SpectralIndices.iter_index_tiles(
+            red, green, blue, nir, tile_size, scale_factor, scl
+        ):
+            for name, raster in out.items():
+                quantize(tile[name], out=raster[window])
+        return out
+
+    @staticmethod
+    def _compute_tile(buf, red, green, blue, nir, window, tile, scale_factor,
+                      scl=None, invalid_bits=None):
+        r, g, b, n = buf["red"], buf["green"], buf["blue"], buf["nir"]
+        t0, t1, t2, t3 = buf["t0"], buf["t1"], buf["t2"], buf["t3"]
+        valid = buf["valid"]
+
+        for dst, src in ((r, red), (g, green), (b, blue), (n, nir)):
+            np.copyto(dst, src[window], casting="unsafe")
+            if scale_factor is not None:
+                np.multiply(dst, np.float32(scale_factor), out=dst)
+
+        clear = None
+        if scl is not None:
+            with np.errstate(invalid="ignore"):
+                np.copyto(buf["scl"], scl[window], casting="unsafe")
+            clear = buf["clear"]
+            _scl_clear_into(buf["scl"], invalid_bits, buf["scl"], clear)
+
+        def divide_into(target, num, den):
+            target.fill(np.nan)
+            np.not_equal(den, 0, out=valid)
+            if clear is not None:
+                np.logical_and(valid, clear, out=valid)
+            np.divide(num, den, out=target, where=valid)
+
+        np.subtract(n, r, out=t0)                    # NIR - Red
+
+        if "ndvi" in tile:
+            np.add(n, r, out=t1)
+            divide_into(tile["ndvi"], t0, t1)
+
+        if "savi" in tile:
+            np.add(n, r, out=t1)
+            np.add(t1, SAVI_L, out=t1)
+            np.multiply(t0, 1.0 + SAVI_L, out=t2)
+            divide_into(tile["savi"], t2, t1)
+
+        if "evi" in tile:
+            np.multiply(r, 6.0, out=t1)
+            np.add(n, t1, out=t1)
+            np.multiply(b, 7.5, out=t2)
+            np.subtract(t1, t2, out=t1)
+            np.add(t1, 1.0, out=t1)
+            np.multiply(t0, 2.5, out=t3)
+            divide_into(tile["evi"], t3, t1)
+
+        if "ndwi" in tile:
+            np.subtract(g, n, out=t0)
+            np.add(g, n, out=t1)
+            divide_into(tile["ndwi"], t0, t1)
+
+    # ==================== CLASSIFICATION ====================
+
+    @staticmethod
+    @timed("indices.classify_health")
+    def classify_health_status(ndvi, ndwi=None):
+        """
+        Classify crop health from mean NDVI (and NDWI when available).
+
+        Returns a dict with ``status``, ``emoji`` and an Arabic
+        ``description`` as used by the dashboard and report generator.
+        ``status`` is ``"Unknown"`` (and ``ndvi``/``ndwi`` None) when no
+        NDVI pixel is valid, e.g. a fully cloud-masked farm.
+        """
+        ndvi_mean = valid_mean(ndvi)
+        ndwi_mean = valid_mean(ndwi) if ndwi is not None else None
+
+        if ndvi_mean is None:
+            return {"status": "Unknown", "emoji": "☁️",
+                    "description": "مفيش بيانات صافية للمزرعة في الصورة دي",
+                    "ndvi": None, "ndwi": None}
+        if ndvi_mean >= NDVI_THRESHOLDS["healthy_min"] and (
+            ndwi_mean is None or ndwi_mean >= NDWI_THRESHOLDS["healthy_min"]
+        ):
+            status = {"status": "Healthy", "emoji": "✅",
+                      "description": "الحمد لله المحصول بخير"}
+        elif ndvi_mean >= NDVI_THRESHOLDS["attention_min"] and (
+            ndwi_mean is None or ndwi_mean >= NDWI_THRESHOLDS["attention_min"]
+        ):
+            status = {"status": "Needs Attention", "emoji": "⚠️",
+                      "description": "المحصول محتاج متابعة"}
+        else:
+            status = {"status": "Critical", "emoji": "🚨",
+                      "description": "المحصول في خطر ومحتاج تدخل سريع"}
+
+        status["ndvi"] = round(ndvi_mean, 2)
+        status["ndwi"] = round(ndwi_mean, 2) if ndwi_mean is not None else None
+        return status
+
+
+class TimeSeriesAnalysis:
+    """Temporal analysis of index histories."""
+
+    @staticmethod
+    @timed("timeseries.detect_anomalies")
+    def detect_anomalies(values, threshold=ANOMALY_THRESHOLD):
+        """
+        Flag observations that changed by more than ``threshold`` (relative)
+        compared with the previous observation.
+
+        Returns a boolean array aligned with ``values``; the first
+        observation is never flagged. For alerting on new scenes without
+        reloading history use ``utils.anomaly.StreamingAnomalyDetector``.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        flags = np.zeros(values.shape, dtype=bool)
+        if values.size < 2:
+            return flags
+
+        prev = values[:-1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = np.abs(values[1:] - prev) / np.abs(prev)
+        flags[1:] = np.nan_to_num(change, nan=0.0) > threshold
+        return flags
+
+    @staticmethod
+    @timed("timeseries.pixel_anomalies")
+    def detect_pixel_anomalies(stack, window=None, threshold=ANOMALY_THRESHOLD):
+        """
+        Per-pixel version of ``detect_anomalies`` for a ``(time, y, x)``
+        NDVI stack: the latest scene against each pixel's rolling baseline.
+
+        Returns ``(change, classes)`` where ``change`` is the relative change
+        raster and ``classes`` is -1 (decline), 0 or +1 (gain). See
+        ``utils.change_maps`` for chunked processing of full cubes.
+        """
+        from utils.change_maps import latest_change_map, classify_change
+
+        change = latest_change_map(stack) if window is None else latest_change_map(stack, window)
+        return change, classify_change(change, threshold)
+
+    @staticmethod
+    @timed("timeseries.irrigation_need")
+    def forecast_irrigation_need(ndwi, rain_forecast_mm, crop_type):
+        """
+        Irrigation need score (0-100) from current NDWI and forecast rain.
+
+        The score grows as NDWI falls below the crop's optimal water range
+        and is reduced by expected rainfall. For daily schedules of many
+        farms use ``utils.water_balance.IrrigationScheduler``. Returns None
+        when no NDWI pixel is valid.
+        """
+        low, high = CROPS_CONFIG[crop_type]["optimal_water"]
+        ndwi_mean = valid_mean(ndwi)
+        if ndwi_mean is None:
+            return None
+        deficit = np.clip((high - ndwi_mean) / (high - low + 1e-9), 0.0, 2.0)
+        rain = float(np.sum(rain_forecast_mm))
+        score = deficit * 50.0 - min(rain, 20.0) * 1.5
+        return int(np.clip(round(score), 0, 100))
+
+    @staticmethod
+    @timed("timeseries.pest_risk")
+    def predict_pest_risk(ndvi, crop_type, temperature_c=None):
+        """
+        Stress-based pest risk score (0-100).
+
+        Stressed vegetation (NDVI below the crop's optimal range) and warm
+        temperatures raise the risk. For per-pest, degree-day based risk over
+        many farms use ``utils.pest_risk.PestRiskTracker``. Returns None when
+        no NDVI pixel is valid.
+        """
+        low, _ = CROPS_CONFIG[crop_type]["optimal_ndvi"]
+        ndvi_mean = valid_mean(ndvi)
+        if ndvi_mean is None:
+            return None
+        stress = np.clip((low - ndvi_mean) / low, 0.0, 1.0)
+        score = 15.0 + stress * 60.0
+        if temperature_c is not None and temperature_c > 25:
+            score += min(temperature_c - 25, 10) * 2.5
+        return int(np.clip(round(score), 0, 100))
@@ -0,0 +1,552 @@
+# utils/jobs.py - SQLite job queue and analysis worker service
+"""
+Heavy analysis (scene fetch, index computation, PDF reports) off the
+Streamlit script thread.
+
+Dashboard sessions ``submit()`` a job — a task name from ``TASKS`` and JSON
+parameters — to the queue in ``JOB_QUEUE_PATH`` and poll ``status()``;
+worker processes claim queued jobs, run the task and store its pickled
+result in the same database:
+
+    queue = get_job_queue()
+    job_id = queue.submit("farm_analysis", bbox=bbox, crop="قمح", day="2026-01-10")
+    queue.status(job_id)["state"]             # queued, running, done or failed
+    queue.result(job_id, timeout=0)           # raises TimeoutError until done
+
+A job's id is the hash of its task, parameters and ``CACHE_VERSION``, so
+identical jobs submitted by several sessions (or replicas sharing the file)
+are queued and computed once, and finished results are reused for
+``CACHE_TTL_HOURS``. Failed jobs run again when they are submitted again.
+Workers hold a lease on a running job and renew it until the task returns;
+the job of a worker that died is claimed again once its lease expires, up
+to ``JOB_MAX_ATTEMPTS`` times.
+
+The worker service runs in its own container (see ``docker-compose.yml``):
+
+    python -m utils.jobs worker --workers 4
+    python -m utils.jobs status               # job counts per state as JSON
+
+Without it, the dashboard starts ``JOB_EMBEDDED_WORKERS`` workers itself,
+as a ``python -m utils.jobs worker`` subprocess that exits with the
+dashboard (spawned children of the Streamlit process would re-run the
+script as their ``__main__``). Results are unpickled by the dashboard, so only trusted services may
+write to the queue file.
+"""
+import argparse
+import atexit
+import hashlib
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import pickle
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from config import (
+    CACHE_VERSION, CACHE_TTL_HOURS, CHANGE_MAP_WINDOW, DEMO_MODE, HISTORICAL_DAYS, JOB_QUEUE_PATH, JOB_WORKERS,
+    JOB_EMBEDDED_WORKERS, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_POLL_SECONDS
+)
+from utils.metrics import increment, span
+
+logger = logging.getLogger(__name__)
+
+# task name -> "module:function", called as function(**params) in a worker
+TASKS = {
+    "farm_analysis": "utils.jobs:farm_analysis",
+    "scene_index": "utils.jobs:scene_index",
+    "index_history": "utils.jobs:index_history",
+    "index_layer": "utils.jobs:index_layer",
+    "change_map": "utils.jobs:change_map",
+    "pdf_report": "utils.pdf_export:_render_to_cache",
+}
+SCENE_DAYS = 10              # acquisition window ending on the analysis day
+PURGE_INTERVAL_SECONDS = 600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    task TEXT NOT NULL,
+    params TEXT NOT NULL,
+    state TEXT NOT NULL,
+    result BLOB,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+)
+"""
+QUEUE_INDEX = "CREATE INDEX IF NOT EXISTS jobs_by_state ON jobs (state, created)"
+
+
+class JobFailed(RuntimeError):
+    """The task raised in the worker; the message is the worker's error."""
+
+
+# ==================== QUEUE ====================
+
+class JobQueue:
+    """Deduplicating job queue with results, stored in one SQLite file."""
+
+    def __init__(self, path=JOB_QUEUE_PATH, result_ttl_hours=CACHE_TTL_HOURS,
+                 lease_seconds=JOB_LEASE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS):
+        self.path = path
+        self.result_ttl_seconds = result_ttl_hours * 3600
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # autocommit mode: writes use explicit BEGIN IMMEDIATE transactions
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(SCHEMA)
+            self._conn.execute(QUEUE_INDEX)
+        self._futures = {}
+        self._futures_lock = threading.Lock()
+        self._poller = None
+
+    def close(self):
+        self._conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def job_id(task, params):
+        """Content address of a job: equal tasks and parameters share one id."""
+        payload = json.dumps({"task": task, "params": params, "version": CACHE_VERSION}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # ==================== CLIENTS ====================
+
+    def submit(self, task, **params):
+        """
+        Queue ``task(**params)`` unless the same job is queued, running or
+        finished within the result TTL. Returns the job id.
+        """
+        if task not in TASKS:
+            raise ValueError(f"Unknown task: {task}")
+        job_id = self.job_id(task, params)
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT state, finished FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                conn.execute(
+                    "INSERT INTO jobs (id, task, params, state, created) VALUES (?, ?, ?, 'queued', ?)",
+                    (job_id, task, json.dumps(params, sort_keys=True), now),
+                )
+                outcome = "queued"
+            elif row[0] == "failed" or (row[0] == "done" and now - row[1] > self.result_ttl_seconds):
+                conn.execute(
+                    "UPDATE jobs SET state = 'queued', result = NULL, error = NULL, attempts = 0, "
+                    "worker = NULL, lease_until = NULL, created = ?, started = NULL, finished = NULL "
+                    "WHERE id = ?",
+                    (now, job_id),
+                )
+                outcome = "queued"
+            else:
+                outcome = "cached" if row[0] == "done" else "shared"
+        increment("job_requests", task=task, result=outcome)
+        return job_id
+
+    def status(self, job_id):
+        """Job snapshot without its result, or None for an unknown id."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT task, state, error, attempts, created, started, finished FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("task", "state", "error", "attempts", "created", "started", "finished")
+        return dict(zip(keys, row), id=job_id)
+
+    def result(self, job_id, timeout=None):
+        """
+        The job's return value, waiting up to ``timeout`` seconds (forever
+        when ``None``). Raises ``JobFailed``, ``TimeoutError`` while the job
+        is still pending, or ``KeyError`` for an unknown id.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT state, result, error FROM jobs WHERE id = ?", (job_id,)
+                ).fetchone()
+            if row is None:
+                raise KeyError(job_id)
+            if row[0] == "done":
+                return pickle.loads(row[1])
+            if row[0] == "failed":
+                raise JobFailed(row[2])
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"Job {job_id} is {row[0]}")
+            time.sleep(JOB_POLL_SECONDS)
+
+    def submit_future(self, task, **params):
+        """``submit()`` returning a ``concurrent.futures.Future`` completed by a poller thread."""
+        job_id = self.submit(task, **params)
+        future = Future()
+        future.set_running_or_notify_cancel()
+        with self._futures_lock:
+            self._futures.setdefault(job_id, []).append(future)
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll_futures, name="job-futures", daemon=True)
+                self._poller.start()
+        return future
+
+    def _poll_futures(self):
+        while True:
+            time.sleep(JOB_POLL_SECONDS)
+            with self._futures_lock:
+                pending = list(self._futures)
+            for job_id in pending:
+                try:
+                    value, error = self.result(job_id, timeout=0), None
+                except TimeoutError:
+                    continue
+                except Exception as exc:  # JobFailed, or the row was purged
+                    value, error = None, exc
+                with self._futures_lock:
+                    futures = self._futures.pop(job_id, [])
+                for future in futures:
+                    if error is None:
+                        future.set_result(value)
+                    else:
+                        future.set_exception(error)
+
+    # ==================== WORKERS ====================
+
+    def claim(self, worker):
+        """
+        Take the oldest queued job (or one whose worker's lease expired).
+        Returns ``(job_id, task, params)`` or None when there is nothing to do.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = 'failed', error = 'worker lost', finished = ? "
+                "WHERE state = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT id, task, params FROM jobs "
+                "WHERE state = 'queued' OR (state = 'running' AND lease_until < ?) "
+                "ORDER BY created LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET state = 'running', worker = ?, lease_until = ?, started = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                (worker, now + self.lease_seconds, now, row[0]),
+            )
+        return row[0], row[1], json.loads(row[2])
+
+    def renew(self, job_id, worker):
+        """Extend the lease of a running job; False if another worker took it over."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND state = 'running'",
+                (time.time() + self.lease_seconds, job_id, worker),
+            )
+        return cursor.rowcount == 1
+
+    def finish(self, job_id, worker, result=None, error=None):
+        """Store a result (or an error message) for a job this worker holds."""
+        payload = None if error is not None else pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET state = ?, result = ?, error = ?, finished = ?, lease_until = NULL "
+                "WHERE id = ? AND worker = ? AND state = 'running'",
+                ("failed" if error is not None else "done", payload, error, time.time(), job_id, worker),
+            )
+        return cursor.rowcount == 1
+
+    def purge(self):
+        """Delete finished jobs older than the result TTL; returns the count."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE state IN ('done', 'failed') AND finished < ?",
+                (time.time() - self.result_ttl_seconds,),
+            )
+        return cursor.rowcount
+
+    def counts(self):
+        """Number of jobs per state."""
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return {state: 0 for state in ("queued", "running", "done", "failed")} | dict(rows)
+
+
+# ==================== WORKER SERVICE ====================
+
+def run_task(task, params):
+    module, name = TASKS[task].split(":")
+    return getattr(importlib.import_module(module), name)(**params)
+
+
+def _keep_lease(queue, job_id, worker, stop):
+    while not stop.wait(queue.lease_seconds / 3):
+        if not queue.renew(job_id, worker):
+            return
+
+
+def worker_loop(path=JOB_QUEUE_PATH, stop=None, poll=JOB_POLL_SECONDS):
+    """Claim and run jobs until ``stop`` (a ``threading.Event``) is set, or forever."""
+    queue = JobQueue(path)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    last_purge = 0.0
+    while stop is None or not stop.is_set():
+        if time.time() - last_purge > PURGE_INTERVAL_SECONDS:
+            queue.purge()
+            last_purge = time.time()
+        claimed = queue.claim(worker)
+        if claimed is None:
+            time.sleep(poll)
+            continue
+
+        job_id, task, params = claimed
+        lease_stop = threading.Event()
+        threading.Thread(
+            target=_keep_lease, args=(queue, job_id, worker, lease_stop), daemon=True
+        ).start()
+        try:
+            with span(f"job.{task}"):
+                result = run_task(task, params)
+            queue.finish(job_id, worker, result=result)
+            increment("jobs_finished", task=task, state="done")
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed", job_id[:12], task)
+            queue.finish(job_id, worker, error=f"{type(exc).__name__}: {exc}")
+            increment("jobs_finished", task=task, state="failed")
+        finally:
+            lease_stop.set()
+
+
+def start_workers(count, path=JOB_QUEUE_PATH):
+    """Start ``count`` daemon worker processes (spawned, not forked); returns them."""
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=worker_loop, args=(path,), name=f"job-worker-{i}", daemon=True)
+        for i in range(count)
+    ]
+    for process in processes:
+        process.start()
+    return processes
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_embedded = None
+_embedded_lock = threading.Lock()
+
+
+def _stop_embedded():
+    if _embedded is not None and _embedded.poll() is None:
+        _embedded.terminate()
+
+
+def ensure_embedded_workers(count=JOB_EMBEDDED_WORKERS, path=JOB_QUEUE_PATH):
+    """Keep a worker service with ``count`` workers running next to the dashboard (restarted if it died)."""
+    global _embedded
+    if count <= 0 or multiprocessing.current_process().daemon:
+        return
+    with _embedded_lock:
+        if _embedded is not None and _embedded.poll() is None:
+            return
+        if _embedded is None:
+            atexit.register(_stop_embedded)
+        env = dict(os.environ, JOB_QUEUE_PATH=path, JOB_EMBEDDED_WORKERS="0")
+        _embedded = subprocess.Popen(
+            [sys.executable, "-m", "utils.jobs", "worker", "--workers", str(count),
+             "--parent", str(os.getpid())],
+            cwd=ROOT, env=env
+        )
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Shared JobQueue for the process (starts the embedded workers, if any)."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+    ensure_embedded_workers()
+    return _queue
+
+
+# ==================== TASKS ====================
+
+def farm_analysis(bbox, crop, day, demo=DEMO_MODE):
+    """
+    Health status, index means, clear fraction and pest risk of a farm's
+    latest clear scene up to ``day`` (ISO date). ``status`` is None when
+    the scene has no clear pixel.
+    """
+    import numpy as np
+    from utils.batch import fetch_scene_indices
+    from utils.indices import SpectralIndices, TimeSeriesAnalysis
+
+    day = date.fromisoformat(day)
+    indices = fetch_scene_indices(bbox, day - timedelta(days=SCENE_DAYS), day, demo)
+    clear = indices.pop("clear")
+    if not clear.any():
+        return {"status": None, "means": {}, "clear_fraction": 0.0, "pest_risk": None}
+    return {
+        "status": SpectralIndices.classify_health_status(indices["ndvi"], indices["ndwi"]),
+        "means": {name: round(float(np.nanmean(raster)), 4) for name, raster in indices.items()},
+        "clear_fraction": round(float(np.mean(clear)), 3),
+        "pest_risk": TimeSeriesAnalysis.predict_pest_risk(indices["ndvi"], crop),
+    }
+
+
+def scene_index(bbox, day, index="ndvi", demo=DEMO_MODE):
+    """
+    One index raster of the latest clear scene over ``bbox`` up to ``day``
+    (ISO date), for zonal statistics on the map.
+    """
+    from utils.batch import fetch_scene_indices
+
+    day = date.fromisoformat(day)
+    return fetch_scene_indices(list(bbox), day - timedelta(days=SCENE_DAYS), day, demo)[index]
+
+
+def index_layer(bbox, day, demo=DEMO_MODE):
+    """
+    Publish the index rasters of the latest clear scene over ``bbox`` up to
+    ``day`` (ISO date) for tile serving; returns the layer id.
+    """
+    from utils.tiles import publish_index_layer
+
+    def rasters():
+        if demo:
+            from utils.demo_mode import DemoDataLoader
+
+            return DemoDataLoader().get_demo_indices(bbox, size=(1024, 1024))
+        from utils.batch import fetch_scene_indices
+
+        end = date.fromisoformat(day)
+        indices = fetch_scene_indices(list(bbox), end - timedelta(days=SCENE_DAYS), end, demo=False)
+        indices.pop("clear")
+        return indices
+
+    return publish_index_layer(bbox, rasters, f"demo-{day}" if demo else day)
+
+
+def change_map(bbox, day, window=CHANGE_MAP_WINDOW, demo=DEMO_MODE):
+    """
+    Per-pixel NDVI change of the latest clear scene over ``bbox`` up to
+    ``day`` (ISO date) against each pixel's baseline of ``window`` earlier
+    scenes; an empty array when fewer than two scenes are clear.
+    """
+    import numpy as np
+    from utils.batch import fetch_ndvi_stack
+    from utils.indices import TimeSeriesAnalysis
+
+    _, ndvi_stack = fetch_ndvi_stack(list(bbox), date.fromisoformat(day), window + 1, demo)
+    if ndvi_stack is None or len(ndvi_stack) < 2:
+        return np.empty((0, 0), dtype=np.float32)
+    return TimeSeriesAnalysis.detect_pixel_anomalies(ndvi_stack)[0]
+
+
+def index_history(farm_id, bbox, day, days=HISTORICAL_DAYS, demo=DEMO_MODE):
+    """
+    Add statistics for the farm's acquisitions in the ``days`` up to ``day``
+    (ISO date) that the history store does not have yet; returns how many
+    dates were added. Live statistics come from the clear scenes in the
+    catalog, demo ones from the demo catalog under the ``demo:`` key.
+    """
+    from utils.history_store import get_history_store, history_key
+
+    day = date.fromisoformat(day)
+    first = day - timedelta(days=days - 1)
+    if demo:
+        from utils.demo_mode import DemoDataLoader
+
+        loader = DemoDataLoader()
+        dates = [date.fromisoformat(scene["date"])
+                 for scene in loader.get_demo_available_data(bbox, first, day)]
+        load = lambda new: loader.get_demo_index_stats(farm_id, new)  # noqa: E731
+    else:
+        from utils.batch import fetch_history_stats
+        from utils.satellite import get_satellite_client
+
+        clear_dates = get_satellite_client().get_clear_dates(bbox, str(first), str(day))
+        dates = [date.fromisoformat(d) for d in clear_dates]
+        load = lambda new: fetch_history_stats(bbox, new)  # noqa: E731
+    return len(get_history_store().update(history_key(farm_id, demo), dates, load))
+
+
+# ==================== CLI ====================
+
+def _stop(signum, frame):
+    raise SystemExit(0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analysis job queue and worker service")
+    commands = parser.add_subparsers(dest="command", required=True)
+    worker = commands.add_parser("worker", help="run worker processes until stopped")
+    worker.add_argument("--workers", type=int, default=JOB_WORKERS)
+    worker.add_argument("--parent", type=int, help="exit when this process (the dashboard) exits")
+    commands.add_parser("status", help="job counts per state")
+    commands.add_parser("purge", help="delete expired finished jobs")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        summary = JobQueue().counts()
+    elif args.command == "purge":
+        summary = {"purged": JobQueue().purge()}
+    else:
+        signal.signal(signal.SIGTERM, _stop)
+        processes = start_workers(args.workers)
+        logger.info("%d workers on %s", len(processes), JOB_QUEUE_PATH)
+        try:
+            while args.parent is None or os.getppid() == args.parent:
+                time.sleep(1)
+                for i, process in enumerate(processes):
+                    if not process.is_alive():
+                        logger.warning("Worker %s exited (%s); restarting", process.name, process.exitcode)
+                        processes[i] = start_workers(1)[0]
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
+        return None
+    print(json.dumps(summary, indent=2))
+    return summary
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    main()
@@ -0,0 +1,325 @@
+# utils/metrics.py - Timing spans, counters and a Prometheus text endpoint
+"""
+Built-in instrumentation for the dashboard, batch pipelines and services.
+
+``span(name)`` (context manager) and ``timed(name)`` (decorator) record how
+long a block takes into a per-name histogram; ``increment(name, **labels)``
+adds to a counter (cache hits/misses, bytes fetched) and ``set_gauge()``
+records a current value (resident session memory). All are process-wide
+and cost a ``perf_counter()`` pair and a lock per call.
+
+``prometheus_text()`` renders everything in the Prometheus text exposition
+format. It is served at ``/metrics`` by ``start_metrics_server()`` (the
+dashboard starts it when ``METRICS_PORT`` is set) and by the tile service;
+batch runs can write it to a file for the node_exporter textfile collector.
+Worker processes return ``drain()`` snapshots that the parent ``merge()``s.
+
+``profiling(name)`` wraps a whole run in cProfile or pyinstrument when
+``PROFILE_MODE`` is set and writes the result to ``PROFILE_DIR``.
+"""
+import contextlib
+import functools
+import logging
+import os
+import threading
+import time
+import uuid
+
+from config import METRICS_PORT, PROFILE_MODE, PROFILE_DIR
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "agrimind"
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_spans = {}     # name -> [count, total, max, bucket counts]
+_counters = {}  # (name, ((label, value), ...)) -> value
+_gauges = {}    # (name, ((label, value), ...)) -> value
+
+
+# ==================== RECORDING ====================
+
+def observe(name, seconds):
+    """Record one duration for ``name``."""
+    with _lock:
+        entry = _spans.get(name)
+        if entry is None:
+            entry = _spans[name] = [0, 0.0, 0.0, [0] * len(BUCKETS)]
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+        buckets = entry[3]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                buckets[i] += 1
+                break
+
+
+@contextlib.contextmanager
+def span(name):
+    """Time the enclosed block as ``name`` (recorded even if it raises)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def timed(name):
+    """Decorator recording every call of a function as ``name``."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def increment(name, value=1, **labels):
+    """Add ``value`` to the counter ``name`` with ``labels``."""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    """Set the gauge ``name`` with ``labels`` to ``value``."""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _gauges[key] = value
+
+
+# ==================== SNAPSHOTS ====================
+
+def snapshot():
+    """Picklable copy of all spans and counters."""
+    with _lock:
+        return {
+            "spans": {name: [c, t, m, list(b)] for name, (c, t, m, b) in _spans.items()},
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+        }
+
+
+def drain():
+    """``snapshot()`` and reset, for worker processes reporting to a parent."""
+    with _lock:
+        data = {"spans": dict(_spans), "counters": dict(_counters), "gauges": dict(_gauges)}
+        _spans.clear()
+        _counters.clear()
+        _gauges.clear()
+    return data
+
+
+def merge(data):
+    """Add a ``snapshot()``/``drain()`` from another process."""
+    with _lock:
+        for name, (count, total, longest, buckets) in data["spans"].items():
+            entry = _spans.get(name)
+            if entry is None:
+                _spans[name] = [count, total, longest, list(buckets)]
+                continue
+            entry[0] += count
+            entry[1] += total
+            entry[2] = max(entry[2], longest)
+            entry[3] = [a + b for a, b in zip(entry[3], buckets)]
+        for key, value in data["counters"].items():
+            _counters[key] = _counters.get(key, 0) + value
+        _gauges.update(data.get("gauges", {}))  # latest value wins
+
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+        _gauges.clear()
+
+
+def summary():
+    """Per-span count / total / mean / max (seconds), slowest total first."""
+    data = snapshot()
+    rows = {
+        name: {"count": c, "total_s": round(t, 3), "mean_ms": round(t / c * 1000, 2), "max_ms": round(m * 1000, 2)}
+        for name, (c, t, m, _) in data["spans"].items()
+    }
+    return dict(sorted(rows.items(), key=lambda item: -item[1]["total_s"]))
+
+
+# ==================== PROMETHEUS ====================
+
+def _metric_name(name):
+    return f"{PREFIX}_" + "".join(ch if ch.isalnum() else "_" for ch in name)
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+def prometheus_text():
+    """All spans (one histogram, labelled by span), counters and gauges as exposition text."""
+    data = snapshot()
+    lines = []
+    if data["spans"]:
+        metric = f"{PREFIX}_span_seconds"
+        lines += [f"# HELP {metric} Duration of instrumented spans.", f"# TYPE {metric} histogram"]
+        for name in sorted(data["spans"]):
+            count, total, _, buckets = data["spans"][name]
+            cumulative = 0
+            for bound, hits in zip(BUCKETS, buckets):
+                cumulative += hits
+                lines.append(f'{metric}_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{span="{name}",le="+Inf"}} {count}')
+            lines.append(f'{metric}_sum{{span="{name}"}} {total:.6f}')
+            lines.append(f'{metric}_count{{span="{name}"}} {count}')
+
+    by_name = {}
+    for (name, labels), value in data["counters"].items():
+        by_name.setdefault(name, []).append((labels, value))
+    for name in sorted(by_name):
+        metric = f"{_metric_name(name)}_total"
+        lines.append(f"# TYPE {metric} counter")
+        for labels, value in sorted(by_name[name]):
+            lines.append(f"{metric}{_labels(labels)} {value}")
+
+    by_name = {}
+    for (name, labels), value in data["gauges"].items():
+        by_name.setdefault(name, []).append((labels, value))
+    for name in sorted(by_name):
+        metric = _metric_name(name)
+        lines.append(f"# TYPE {metric} gauge")
+        for labels, value in sorted(by_name[name]):
+            lines.append(f"{metric}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path):
+    """Write ``prometheus_text()`` atomically (node_exporter textfile collector)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as handle:
+        handle.write(prometheus_text())
+    os.replace(tmp, path)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=METRICS_PORT, host="0.0.0.0"):
+    """
+    Serve ``GET /metrics`` from a daemon thread (once per process).
+    Returns the bound port, or ``None`` when ``port`` is 0.
+    """
+    global _server
+    if not port:
+        return None
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), Handler)
+            except OSError as exc:  # another process (or replica) holds the port
+                logger.warning("Metrics endpoint not started on port %s: %s", port, exc)
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+    return _server.server_address[1]
+
+
+# ==================== PROFILING ====================
+
+class Profiler:
+    """
+    cProfile or pyinstrument session for one run, written to ``directory``
+    on ``stop()``: ``<name>-<time>.prof`` (open with snakeviz or ``pstats``)
+    or ``<name>-<time>.html``. With any other ``mode`` it does nothing.
+    """
+
+    def __init__(self, name, mode=PROFILE_MODE, directory=PROFILE_DIR):
+        self.name = name
+        self.mode = mode if mode in ("cprofile", "pyinstrument") else None
+        self.directory = directory
+        self._profiler = None
+
+    def start(self):
+        if self.mode == "pyinstrument":
+            from pyinstrument import Profiler as PyinstrumentProfiler
+
+            self._profiler = PyinstrumentProfiler()
+            self._profiler.start()
+        elif self.mode == "cprofile":
+            import cProfile
+
+            self._profiler = cProfile.Profile()
+            try:
+                self._profiler.enable()
+            except ValueError:  # another run in this process is being profiled
+                self._profiler = None
+        return self
+
+    def stop(self):
+        """Stop profiling and write the dump; returns its path (or ``None``)."""
+        profiler, self._profiler = self._profiler, None
+        if profiler is None:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        stem = os.path.join(self.directory, f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}")
+        if self.mode == "pyinstrument":
+            profiler.stop()
+            path = f"{stem}.html"
+            with open(path, "w", encoding="utf-8") as handle:
+                handle.write(profiler.output_html())
+        else:
+            profiler.disable()
+            path = f"{stem}.prof"
+            profiler.dump_stats(path)
+        return path
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+_active = threading.local()
+
+
+def start_profiling(name):
+    """
+    Start a ``Profiler`` for a script run, stopping one left running on this
+    thread by a run that did not reach its ``stop()`` (e.g. ``st.rerun``).
+    """
+    previous = getattr(_active, "profiler", None)
+    if previous is not None:
+        previous.stop()
+    _active.profiler = Profiler(name).start()
+    return _active.profiler
+
+
+def profiling(name):
+    """``with profiling("batch"):`` profiles the block when ``PROFILE_MODE`` is set."""
+    return Profiler(name)
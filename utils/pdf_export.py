@@ -0,0 +1,543 @@
+# utils/pdf_export.py - PDF farm reports rendered in a background worker pool
+"""
+PDF export of the comprehensive farm report.
+
+Each PDF holds the Arabic report (shaped with HarfBuzz and laid out right to
+left by fpdf2's bidi algorithm), an NDVI map snapshot, the NDVI history
+chart and the index table. Rendering runs in a pool of
+worker processes (the dashboard's exporter uses the analysis worker queue,
+``utils.jobs``), so the Streamlit script thread only submits a job and
+polls its progress:
+
+    exporter = get_pdf_exporter()
+    job_id = exporter.submit(farm)            # or submit_bulk(farms)
+    exporter.status(job_id)                   # {"state", "done", "total", ...}
+    exporter.status(job_id)["path"]           # PDF (bulk: zip) once done
+
+Rendered files are cached on disk under ``PDF_CACHE_DIR`` keyed by the
+report inputs (farm, date, history length, ``CACHE_VERSION``), so repeated
+exports and exports from other replicas sharing the directory are free.
+Bulk exports of a cooperative's farms from the command line:
+
+    python -m utils.pdf_export farms.csv reports.zip --workers 4
+"""
+import argparse
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from config import (
+    CACHE_VERSION, DEMO_MODE, HISTORICAL_DAYS, PDF_CACHE_DIR, PDF_CACHE_MAX_MB,
+    PDF_FONT_PATH, PDF_WORKERS
+)
+from utils.metrics import increment, timed
+
+logger = logging.getLogger(__name__)
+
+LAYOUT_VERSION = 1           # bump when the PDF layout changes
+SCENE_DAYS = 10              # acquisition window ending on the report date
+MAX_JOBS = 256               # finished jobs kept for polling
+SNAPSHOT_PX = 384            # long side of the NDVI map snapshot
+FONT = "report"
+
+_fonts = {}
+
+
+# ==================== RTL TEXT ====================
+
+def _font_codepoints(path):
+    if path not in _fonts:
+        from fontTools.ttLib import TTFont
+
+        _fonts[path] = frozenset(TTFont(path).getBestCmap())
+    return _fonts[path]
+
+
+def printable(text, font_path=PDF_FONT_PATH):
+    """Drop characters the font has no glyph for (emoji in report text)."""
+    codepoints = _font_codepoints(font_path)
+    return "".join(ch for ch in text if ord(ch) in codepoints).strip()
+
+
+# ==================== RENDERING ====================
+
+def report_inputs(farm, day=None, history_days=HISTORICAL_DAYS, demo=DEMO_MODE):
+    """Everything a PDF depends on (batch/CSV farm field names), JSON-serializable."""
+    from utils.batch import farm_bbox
+
+    bbox = farm.get("bbox") or farm_bbox(farm["lat"], farm["lon"], farm["size_feddan"])
+    return {
+        "farm_id": str(farm["farm_id"]),
+        "lat": round(float(farm["lat"]), 6),
+        "lon": round(float(farm["lon"]), 6),
+        "crop": farm["crop"],
+        "size_feddan": float(farm["size_feddan"]),
+        "irrigation_type": farm.get("irrigation_type"),
+        "bbox": [round(float(v), 6) for v in bbox],
+        "day": str(day or datetime.now().date()),
+        "history_days": int(history_days),
+        "demo": bool(demo),
+    }
+
+
+def report_key(inputs):
+    payload = json.dumps({**inputs, "version": CACHE_VERSION, "layout": LAYOUT_VERSION}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def ndvi_snapshot_png(ndvi, max_px=SNAPSHOT_PX):
+    """Colour-mapped NDVI raster on a white background, as PNG bytes."""
+    from PIL import Image
+    from utils.colormaps import apply_colormap
+
+    rgba = Image.fromarray(apply_colormap(ndvi, "ndvi"))
+    scale = max_px / max(rgba.size)
+    rgba = rgba.resize((max(1, round(rgba.width * scale)), max(1, round(rgba.height * scale))),
+                       Image.NEAREST)
+    image = Image.new("RGB", rgba.size, (255, 255, 255))
+    image.paste(rgba, mask=rgba.getchannel("A"))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _farm_analysis(inputs):
+    """Index rasters, health status, pest risk and NDVI history for the report."""
+    from utils.batch import fetch_scene_bands
+    from utils.history_store import get_history_store, history_key
+    from utils.indices import SpectralIndices, TimeSeriesAnalysis
+    from utils.jobs import index_history
+
+    day = datetime.strptime(inputs["day"], "%Y-%m-%d").date()
+    blue, green, red, nir, scl = fetch_scene_bands(
+        inputs["bbox"], day - timedelta(days=SCENE_DAYS), day, inputs["demo"]
+    )
+    indices = SpectralIndices.calculate_all_tiled(red, green, blue, nir, scl=scl)
+    status = SpectralIndices.classify_health_status(indices["ndvi"], indices["ndwi"])
+    pest_risk = TimeSeriesAnalysis.predict_pest_risk(indices["ndvi"], inputs["crop"])
+
+    index_history(inputs["farm_id"], inputs["bbox"], inputs["day"], inputs["history_days"], inputs["demo"])
+    history = get_history_store().query(
+        history_key(inputs["farm_id"], inputs["demo"]), "ndvi", days=inputs["history_days"], end=day
+    )
+    return indices, status, pest_risk, history
+
+
+def _draw_colorbar(pdf, x, y, width, height=4):
+    from utils.colormaps import build_lut
+
+    lut, vmin, vmax = build_lut("ndvi")
+    steps = 32
+    for i in range(steps):
+        r, g, b, _ = lut[i * 255 // (steps - 1)]
+        pdf.set_fill_color(int(r), int(g), int(b))
+        pdf.rect(x + i * width / steps, y, width / steps + 0.1, height, style="F")
+    pdf.set_font(FONT, size=7)
+    pdf.set_xy(x, y + height)
+    pdf.cell(width / 2, 4, f"{vmin:.1f}")
+    pdf.cell(width / 2, 4, f"{vmax:.1f}", align="R")
+
+
+def _draw_history_chart(pdf, history, x, y, width, height, threshold=0.6):
+    """NDVI mean over time with the healthy threshold (vector drawing)."""
+    pdf.set_draw_color(120, 120, 120)
+    pdf.set_line_width(0.2)
+    pdf.rect(x, y, width, height)
+    values = np.asarray(history["mean"], dtype=np.float64)
+    valid = ~np.isnan(values)
+    if not valid.any():
+        pdf.set_xy(x, y + height / 2 - 3)
+        pdf.cell(width, 6, printable("لا توجد بيانات سابقة"), align="C")
+        return
+
+    low = min(float(values[valid].min()), threshold) - 0.05
+    high = max(float(values[valid].max()), threshold) + 0.05
+    to_y = lambda v: y + height - (v - low) / (high - low) * height  # noqa: E731
+    step = width / max(1, len(values) - 1)
+
+    pdf.set_draw_color(46, 125, 50)
+    pdf.set_dash_pattern(dash=1.5, gap=1.5)
+    pdf.line(x, to_y(threshold), x + width, to_y(threshold))
+    pdf.set_dash_pattern()
+
+    pdf.set_draw_color(25, 118, 210)
+    pdf.set_line_width(0.5)
+    points = [(x + i * step, to_y(v)) for i, v in enumerate(values) if not np.isnan(v)]
+    if len(points) > 1:
+        pdf.polyline(points)
+    pdf.set_line_width(0.2)
+
+    pdf.set_font(FONT, size=7)
+    for value in (low, threshold, high):
+        pdf.set_xy(x - 12, to_y(value) - 2)
+        pdf.cell(11, 4, f"{value:.2f}", align="R")
+    pdf.set_xy(x, y + height + 1)
+    pdf.cell(width / 2, 4, str(history["date"][0]))
+    pdf.cell(width / 2, 4, str(history["date"][-1]), align="R")
+
+
+@timed("pdf.render")
+def render_pdf(inputs):
+    """Render the farm report described by ``report_inputs()`` to PDF bytes."""
+    from fpdf import FPDF
+    from fpdf.enums import XPos, YPos
+    from utils.arabic_nlg import get_report_generator
+    from utils.indices import valid_mean
+
+    indices, status, pest_risk, history = _farm_analysis(inputs)
+    report = get_report_generator().generate_summary_report(
+        status, inputs["crop"], inputs["size_feddan"],
+        water_need_score=None, irrigation_type=inputs["irrigation_type"],
+        pest_risk_score=pest_risk,
+    )
+
+    pdf = FPDF(format="A4")
+    pdf.set_margins(15, 15, 15)
+    pdf.set_auto_page_break(True, margin=15)
+    pdf.set_title(f"Agri-Mind report {inputs['farm_id']} {inputs['day']}")
+    pdf.set_creator("Agri-Mind")
+    pdf.add_font(FONT, "", PDF_FONT_PATH)
+    pdf.set_text_shaping(True)
+    pdf.add_page()
+    width = pdf.epw
+
+    pdf.set_font(FONT, size=16)
+    pdf.cell(width, 10, printable("🌾 أجري مايند - التقرير الشامل للمزرعة"), align="C",
+             new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.set_font(FONT, size=9)
+    pdf.set_text_color(90, 90, 90)
+    pdf.cell(width, 5, f"{inputs['farm_id']}  |  {inputs['lat']:.4f}, {inputs['lon']:.4f}  |  "
+                       f"{inputs['size_feddan']:g} feddan  |  {inputs['day']}", align="C",
+             new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.set_text_color(0, 0, 0)
+    pdf.ln(3)
+
+    # Arabic report text, right aligned
+    pdf.set_font(FONT, size=10)
+    for line in report.split("\n"):
+        pdf.multi_cell(width, 5.5, printable(line), align="R",
+                       new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.ln(4)
+
+    # NDVI snapshot (left) and index table (right)
+    top = pdf.get_y()
+    image_w = width * 0.36
+    image_h = image_w * indices["ndvi"].shape[0] / indices["ndvi"].shape[1]
+    if top + image_h + 10 > pdf.h - pdf.b_margin:
+        pdf.add_page()
+        top = pdf.get_y()
+    pdf.image(io.BytesIO(ndvi_snapshot_png(indices["ndvi"])), x=pdf.l_margin, y=top, w=image_w)
+    _draw_colorbar(pdf, pdf.l_margin, top + image_h + 1, image_w)
+
+    table_x = pdf.l_margin + image_w + 8
+    table_w = width - image_w - 8
+    pdf.set_xy(table_x, top)
+    pdf.set_font(FONT, size=11)
+    pdf.cell(table_w, 7, printable("📊 مؤشرات النبات"), align="R", new_x=XPos.LEFT, new_y=YPos.NEXT)
+    pdf.set_font(FONT, size=9)
+    clear = float(np.mean(~np.isnan(indices["ndvi"])))
+    means = {name: valid_mean(raster) for name, raster in indices.items()}
+    rows = [(name.upper(), "-" if mean is None else f"{mean:.3f}") for name, mean in means.items()]
+    rows += [("Clear pixels", f"{clear:.0%}"),
+             ("Pest risk", "-" if pest_risk is None else f"{pest_risk}/100")]
+    for label, value in rows:
+        pdf.set_x(table_x)
+        pdf.cell(table_w * 0.6, 6, label, border="B")
+        pdf.cell(table_w * 0.4, 6, value, border="B", align="R", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+    # NDVI history chart
+    pdf.set_y(max(pdf.get_y(), top + image_h + 8) + 6)
+    if pdf.get_y() + 60 > pdf.h - pdf.b_margin:
+        pdf.add_page()
+    pdf.set_font(FONT, size=11)
+    pdf.cell(width, 7, printable(f"📈 تطور NDVI خلال آخر {inputs['history_days']} يوم"), align="R",
+             new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    _draw_history_chart(pdf, history, pdf.l_margin + 12, pdf.get_y() + 2, width - 12, 45)
+    return bytes(pdf.output())
+
+
+# ==================== DISK CACHE ====================
+
+def _cache_path(cache_dir, key, suffix):
+    return os.path.join(cache_dir, f"{key}{suffix}")
+
+
+def _cached(path):
+    """True for a cache hit (and refresh its LRU timestamp)."""
+    if not os.path.exists(path):
+        return False
+    os.utime(path)
+    return True
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as handle:
+        handle.write(data)
+    os.replace(tmp, path)
+
+
+def evict(cache_dir=PDF_CACHE_DIR, max_bytes=PDF_CACHE_MAX_MB * 1024 * 1024):
+    """Remove least recently used files until the directory fits ``max_bytes``."""
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.is_file() and not entry.name.endswith(".tmp"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except FileNotFoundError:
+            pass
+
+
+def _render_to_cache(inputs, path):
+    """Worker entry point: render one PDF into the cache, return its path."""
+    if not _cached(path):
+        _write_atomic(path, render_pdf(inputs))
+    return path
+
+
+# ==================== JOBS ====================
+
+class PdfExporter:
+    """
+    Asynchronous PDF rendering on a process pool with job ids and progress.
+
+    Jobs are kept in this process; rendered files live in the shared disk
+    cache. ``submit``/``submit_bulk`` return immediately. With a ``queue``
+    (``utils.jobs.JobQueue``) PDFs are rendered by the analysis workers
+    instead of a pool owned by this process.
+    """
+
+    def __init__(self, workers=PDF_WORKERS, cache_dir=PDF_CACHE_DIR,
+                 max_bytes=PDF_CACHE_MAX_MB * 1024 * 1024, queue=None):
+        self.workers = workers
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.queue = queue
+        os.makedirs(cache_dir, exist_ok=True)
+        self._pool = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        # spawn: forking a threaded server process is unsafe
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def _render(self, inputs, path):
+        """Future for rendering one PDF into ``path``."""
+        if self.queue is not None:
+            return self.queue.submit_future("pdf_report", inputs=inputs, path=path)
+        return self._executor().submit(_render_to_cache, inputs, path)
+
+    def _new_job(self, total, path, name):
+        job = {
+            "id": uuid.uuid4().hex, "state": "queued", "done": 0, "total": total,
+            "path": path, "name": name, "errors": [], "created": time.time(), "finished": None,
+        }
+        with self._lock:
+            self._jobs[job["id"]] = job
+            finished = [j for j in self._jobs.values() if j["finished"] is not None]
+            for old in sorted(finished, key=lambda j: j["finished"])[:max(0, len(finished) - MAX_JOBS)]:
+                del self._jobs[old["id"]]
+        return job
+
+    def _finish(self, job, state):
+        with self._lock:
+            job["state"] = state
+            job["finished"] = time.time()
+        evict(self.cache_dir, self.max_bytes)
+
+    def submit(self, farm, day=None, history_days=HISTORICAL_DAYS, demo=DEMO_MODE):
+        """Queue one farm's PDF; returns the job id."""
+        inputs = report_inputs(farm, day, history_days, demo)
+        path = _cache_path(self.cache_dir, report_key(inputs), ".pdf")
+        job = self._new_job(1, path, f"agrimind_{inputs['farm_id']}_{inputs['day']}.pdf")
+        cached = _cached(path)
+        increment("cache_requests", cache="pdf", result="hit" if cached else "miss")
+        if cached:
+            job["done"] = 1
+            self._finish(job, "done")
+            return job["id"]
+
+        def on_done(future):
+            error = future.exception()
+            with self._lock:
+                if error is None:
+                    job["done"] = 1
+                else:
+                    job["errors"].append(f"{inputs['farm_id']}: {error}")
+            self._finish(job, "failed" if error else "done")
+
+        job["state"] = "running"
+        self._render(inputs, path).add_done_callback(on_done)
+        return job["id"]
+
+    def submit_bulk(self, farms, day=None, history_days=HISTORICAL_DAYS, demo=DEMO_MODE,
+                    name="agrimind_reports"):
+        """
+        Queue PDFs for many farms (e.g. a cooperative's ``load_farms`` list).
+        The job's file is a zip with one PDF per farm; farms that fail are
+        listed in ``errors`` and left out of the zip.
+        """
+        inputs = [report_inputs(farm, day, history_days, demo) for farm in farms]
+        keys = [report_key(item) for item in inputs]
+        bulk_key = hashlib.sha256("".join(keys).encode("ascii")).hexdigest()
+        job = self._new_job(len(inputs), _cache_path(self.cache_dir, bulk_key, ".zip"), f"{name}.zip")
+        if _cached(job["path"]) or not inputs:
+            job["done"] = len(inputs)
+            self._finish(job, "done")
+            return job["id"]
+
+        paths = [_cache_path(self.cache_dir, key, ".pdf") for key in keys]
+        remaining = [len(inputs)]
+
+        def on_done(item, future):
+            error = future.exception()
+            with self._lock:
+                job["done"] += 1
+                remaining[0] -= 1
+                last = remaining[0] == 0
+                if error is not None:
+                    job["errors"].append(f"{item['farm_id']}: {error}")
+            if last:
+                self._build_zip(job, inputs, paths)
+
+        job["state"] = "running"
+        for item, path in zip(inputs, paths):
+            if _cached(path):
+                on_done(item, _done_future(path))
+            else:
+                self._render(item, path).add_done_callback(
+                    lambda future, item=item: on_done(item, future)
+                )
+        return job["id"]
+
+    def _build_zip(self, job, inputs, paths):
+        rendered = [(item, path) for item, path in zip(inputs, paths) if os.path.exists(path)]
+        if not rendered:
+            self._finish(job, "failed")
+            return
+        buffer = io.BytesIO()
+        # PDFs are already compressed
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+            for item, path in rendered:
+                archive.write(path, f"{item['farm_id']}_{item['day']}.pdf")
+        if job["errors"]:
+            # partial archives are not cached under the full key
+            job["path"] = _cache_path(self.cache_dir, uuid.uuid4().hex, ".partial.zip")
+        _write_atomic(job["path"], buffer.getvalue())
+        self._finish(job, "done")
+
+    def status(self, job_id):
+        """Job snapshot with ``progress`` in [0, 1], or None for an unknown id."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = dict(job, errors=list(job["errors"]))
+        snapshot["progress"] = snapshot["done"] / snapshot["total"] if snapshot["total"] else 1.0
+        return snapshot
+
+    def wait(self, job_id, timeout=None, poll=0.2):
+        """Block until the job finishes (for scripts); returns its status."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            status = self.status(job_id)
+            if status is None or status["state"] in ("done", "failed"):
+                return status
+            if deadline is not None and time.monotonic() > deadline:
+                return status
+            time.sleep(poll)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+def _done_future(result):
+    from concurrent.futures import Future
+
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def get_pdf_exporter():
+    """Shared PdfExporter for the process, rendering on the analysis workers."""
+    from utils.jobs import get_job_queue
+
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = PdfExporter(queue=get_job_queue())
+    return _exporter
+
+
+# ==================== CLI ====================
+
+def main(argv=None):
+    from utils.batch import load_farms
+
+    parser = argparse.ArgumentParser(description="Export farm PDF reports to a zip file")
+    parser.add_argument("farms", help="CSV or GeoJSON of farms")
+    parser.add_argument("output", help="zip file to write")
+    parser.add_argument("--workers", type=int, default=PDF_WORKERS)
+    parser.add_argument("--days", type=int, default=HISTORICAL_DAYS, help="NDVI history length")
+    parser.add_argument("--demo", action=argparse.BooleanOptionalAction, default=DEMO_MODE,
+                        help="use synthetic demo scenes instead of live satellite data")
+    args = parser.parse_args(argv)
+
+    farms = load_farms(args.farms)
+    exporter = PdfExporter(workers=args.workers)
+    start = time.perf_counter()
+    job_id = exporter.submit_bulk(farms, history_days=args.days, demo=args.demo)
+    status = exporter.status(job_id)
+    while status["state"] not in ("done", "failed"):
+        time.sleep(0.5)
+        status = exporter.status(job_id)
+        logger.info("%d/%d reports", status["done"], status["total"])
+    exporter.shutdown()
+
+    if status["state"] == "done":
+        with open(status["path"], "rb") as src, open(args.output, "wb") as dst:
+            dst.write(src.read())
+    summary = {
+        "farms": status["total"],
+        "failed": len(status["errors"]),
+        "errors": status["errors"],
+        "output": args.output if status["state"] == "done" else None,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    return summary
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    main()
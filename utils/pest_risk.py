@@ -0,0 +1,288 @@
+# utils/pest_risk.py - Degree-day pest risk for many farms
+"""
+Pest risk from growing degree-day (GDD) accumulation, for many farms at once.
+
+``PestRiskTracker`` keeps a ``(farms, pests)`` GDD accumulator and a short
+activity average for every pest in ``PEST_MODELS``, plus each farm's crop and
+latest NDVI stress. Each day's temperatures update all farms in one
+vectorized call (O(1) per farm and pest), so the season is never recomputed.
+Risk per pest combines:
+
+* population pressure: generations completed this season
+  (``1 - exp(-GDD / generation_dd)``),
+* current activity: recent degree-days relative to the pest's maximum, and
+* crop stress: NDVI below the crop's optimal range.
+
+Pests that do not attack the farm's crop (``pest_risks`` in
+``CROPS_CONFIG``) score 0. State is saved as a compact ``.npz`` file, like
+``utils.anomaly.StreamingAnomalyDetector``.
+"""
+import os
+import threading
+from datetime import date
+
+import numpy as np
+
+from config import CROPS_CONFIG, PEST_MODELS, PEST_ACTIVITY_ALPHA, PEST_STATE_PATH
+
+PEST_NAMES = list(PEST_MODELS)
+CROP_NAMES = list(CROPS_CONFIG)
+BASE_C = np.array([PEST_MODELS[pest]["base_c"] for pest in PEST_NAMES], dtype=np.float32)
+UPPER_C = np.array([PEST_MODELS[pest]["upper_c"] for pest in PEST_NAMES], dtype=np.float32)
+GENERATION_DD = np.array([PEST_MODELS[pest]["generation_dd"] for pest in PEST_NAMES], dtype=np.float32)
+# (crops, pests) host table; row -1 (unknown crop) hosts nothing
+HOSTS = np.array(
+    [[pest in CROPS_CONFIG[crop]["pest_risks"] for pest in PEST_NAMES] for crop in CROP_NAMES]
+    + [[False] * len(PEST_NAMES)]
+)
+OPTIMAL_NDVI_LOW = np.array([CROPS_CONFIG[crop]["optimal_ndvi"][0] for crop in CROP_NAMES] + [np.nan])
+
+# score = RISK_BASE + weighted components, each in 0..1
+RISK_BASE = 10.0
+RISK_WEIGHTS = {"pressure": 40.0, "activity": 35.0, "stress": 15.0}
+
+_FIELDS = ("gdd", "activity")
+
+
+def degree_days(tmax, tmin):
+    """
+    Daily degree-days ``(N, P)`` for every pest from ``(N,)`` temperatures:
+    average method with horizontal cutoffs at each pest's thresholds.
+    """
+    tmax = np.minimum(np.asarray(tmax, dtype=np.float32)[:, None], UPPER_C)
+    tmin = np.maximum(np.asarray(tmin, dtype=np.float32)[:, None], BASE_C)
+    return np.maximum((tmax + tmin) / 2 - BASE_C, 0.0)
+
+
+def risk_scores(gdd, activity, stress, hosts):
+    """0-100 risk from state arrays (``stress`` broadcasts over pests)."""
+    score = RISK_BASE + (
+        RISK_WEIGHTS["pressure"] * (1 - np.exp(-gdd / GENERATION_DD))
+        + RISK_WEIGHTS["activity"] * np.clip(activity, 0.0, 1.0)
+        + RISK_WEIGHTS["stress"] * stress
+    )
+    return np.where(hosts, np.clip(np.round(score), 0, 100), 0).astype(np.uint8)
+
+
+def risk_level(score):
+    """("🔴"/"🟡"/"🟢", Arabic label) for a 0-100 score."""
+    if score >= 60:
+        return "🔴", "خطر عالي"
+    if score >= 30:
+        return "🟡", "خطر متوسط"
+    return "🟢", "خطر قليل"
+
+
+class PestRiskTracker:
+    """Per-farm, per-pest GDD state updated one day at a time."""
+
+    def __init__(self, alpha=PEST_ACTIVITY_ALPHA, capacity=1024):
+        self.alpha = alpha
+        self._index = {}
+        self._keys = []
+        self._size = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = getattr(self, "gdd", None)
+        new_state = {name: np.zeros((capacity, len(PEST_NAMES)), dtype=np.float32) for name in _FIELDS}
+        new_state["stress"] = np.zeros(capacity, dtype=np.float32)
+        new_state["crop"] = np.full(capacity, -1, dtype=np.int16)
+        new_state["last_day"] = np.full(capacity, -1, dtype=np.int32)
+        new_state["days"] = np.zeros(capacity, dtype=np.int32)
+        if old is not None:
+            for name, array in new_state.items():
+                array[:self._size] = getattr(self, name)[:self._size]
+        for name, array in new_state.items():
+            setattr(self, name, array)
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, key):
+        return key in self._index
+
+    # ==================== REGISTRATION ====================
+
+    def _positions(self, keys, crops=None):
+        """Array positions for ``keys``, registering unknown ones."""
+        positions = np.empty(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys):
+            pos = self._index.get(key)
+            if pos is None:
+                if self._size == len(self.days):
+                    self._allocate(len(self.days) * 2)
+                pos = self._size
+                self._index[key] = pos
+                self._keys.append(key)
+                self._size += 1
+            if crops is not None and crops[i] in CROPS_CONFIG:
+                self.crop[pos] = CROP_NAMES.index(crops[i])
+            positions[i] = pos
+        return positions
+
+    def reset(self, keys):
+        """Start a new season for ``keys`` (after planting or harvest)."""
+        positions = np.array([self._index[key] for key in keys if key in self._index], dtype=np.int64)
+        for name in _FIELDS + ("days",):
+            getattr(self, name)[positions] = 0
+        self.last_day[positions] = -1
+
+    # ==================== UPDATE ====================
+
+    def _stress(self, crop, ndvi):
+        low = OPTIMAL_NDVI_LOW[crop]
+        stress = np.clip((low - ndvi) / low, 0.0, 1.0)
+        return np.nan_to_num(stress, nan=0.0)
+
+    def update(self, keys, tmax, tmin, day=None, crops=None, ndvi=None):
+        """
+        Add one day of temperatures (°C, one per key) and return ``(len(keys),
+        pests)`` risk scores.
+
+        NaN temperatures (no data) leave a farm's accumulators unchanged.
+        ``day`` (date or ordinal) makes updates idempotent: keys already
+        updated on or after ``day`` are skipped. ``crops`` sets each key's
+        crop; ``ndvi`` (mean, NaN = unknown) updates its stress.
+        """
+        positions = self._positions(keys, crops)
+        tmax = np.asarray(tmax, dtype=np.float32)
+        tmin = np.asarray(tmin, dtype=np.float32)
+        day = day.toordinal() if isinstance(day, date) else (day if day is not None else date.today().toordinal())
+        if ndvi is not None:
+            ndvi = np.asarray(ndvi, dtype=np.float32)
+            known = ~np.isnan(ndvi)
+            self.stress[positions[known]] = self._stress(self.crop[positions[known]], ndvi[known])
+
+        fresh = ~np.isnan(tmax) & ~np.isnan(tmin) & (self.last_day[positions] < day)
+        pos = positions[fresh]
+        dd = degree_days(tmax[fresh], tmin[fresh])
+        first = (self.days[pos] == 0)[:, None]
+        ratio = dd / (UPPER_C - BASE_C)
+        self.gdd[pos] += dd
+        self.activity[pos] = np.where(first, ratio, self.activity[pos] + self.alpha * (ratio - self.activity[pos]))
+        self.days[pos] += 1
+        self.last_day[pos] = day
+        return self.risk(positions)
+
+    # ==================== QUERIES ====================
+
+    def risk(self, positions=None):
+        """``(farms, pests)`` risk scores for array positions (default: all)."""
+        positions = np.arange(self._size) if positions is None else positions
+        return risk_scores(
+            self.gdd[positions], self.activity[positions],
+            self.stress[positions][:, None], HOSTS[self.crop[positions]]
+        )
+
+    def farm_risk(self, positions=None):
+        """Highest pest risk per farm."""
+        return self.risk(positions).max(axis=1)
+
+    def forecast(self, keys, tmax, tmin, crops, ndvi=None):
+        """
+        Projected ``(len(keys), days, pests)`` risk over ``(len(keys), days)``
+        forecast temperatures, without changing the stored state. Unknown
+        keys start from an empty season.
+        """
+        positions = np.array([self._index.get(key, -1) for key in keys], dtype=np.int64)
+        known = positions >= 0
+        crop = np.array([CROP_NAMES.index(c) if c in CROPS_CONFIG else -1 for c in crops], dtype=np.int64)
+        gdd = np.where(known[:, None], self.gdd[positions], 0.0)
+        activity = np.where(known[:, None], self.activity[positions], 0.0)
+        started = known & (self.days[positions] > 0)
+        stress = np.where(known, self.stress[positions], 0.0)
+        if ndvi is not None:
+            ndvi = np.asarray(ndvi, dtype=np.float32)
+            stress = np.where(np.isnan(ndvi), stress, self._stress(crop, ndvi))
+
+        tmax = np.atleast_2d(np.asarray(tmax, dtype=np.float32))
+        tmin = np.atleast_2d(np.asarray(tmin, dtype=np.float32))
+        hosts = HOSTS[crop]
+        risks = np.empty((len(keys), tmax.shape[1], len(PEST_NAMES)), dtype=np.uint8)
+        for d in range(tmax.shape[1]):
+            dd = degree_days(tmax[:, d], tmin[:, d])
+            ratio = dd / (UPPER_C - BASE_C)
+            gdd = gdd + dd
+            activity = np.where(started[:, None], activity + self.alpha * (ratio - activity), ratio)
+            started = np.ones_like(started)
+            risks[:, d] = risk_scores(gdd, activity, stress[:, None], hosts)
+        return risks
+
+    def farm_pests(self, key):
+        """``{pest: score}`` for the pests of one farm's crop, highest first."""
+        pos = self._index[key]
+        scores = self.risk(np.array([pos]))[0]
+        hosts = HOSTS[self.crop[pos]]
+        return dict(sorted(
+            ((PEST_NAMES[p], int(scores[p])) for p in np.flatnonzero(hosts)),
+            key=lambda item: -item[1]
+        ))
+
+    def state(self, key):
+        """Season accumulators for one key."""
+        pos = self._index[key]
+        return {
+            "crop": CROP_NAMES[self.crop[pos]] if self.crop[pos] >= 0 else None,
+            "days": int(self.days[pos]),
+            "gdd": {pest: round(float(self.gdd[pos, p]), 1) for p, pest in enumerate(PEST_NAMES)},
+            "last_day": date.fromordinal(int(self.last_day[pos])) if self.last_day[pos] > 0 else None,
+        }
+
+    # ==================== PERSISTENCE ====================
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        n = self._size
+        tmp = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp,
+            keys=np.array(self._keys, dtype=str),
+            pests=np.array(PEST_NAMES, dtype=str),
+            crops=np.array(CROP_NAMES, dtype=str),
+            **{name: getattr(self, name)[:n] for name in _FIELDS + ("stress", "crop", "last_day", "days")}
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """
+        Load saved state, or return an empty tracker if ``path`` is missing.
+        Pests or crops added to the config since the save start from zero.
+        """
+        if not os.path.exists(path):
+            return cls(**kwargs)
+        with np.load(path) as data:
+            keys = data["keys"].tolist()
+            tracker = cls(capacity=max(len(keys), 1024), **kwargs)
+            n = len(keys)
+            saved_pests = data["pests"].tolist()
+            columns = [PEST_NAMES.index(pest) for pest in saved_pests if pest in PEST_NAMES]
+            kept = [i for i, pest in enumerate(saved_pests) if pest in PEST_NAMES]
+            for name in _FIELDS:
+                getattr(tracker, name)[:n, columns] = data[name][:, kept]
+            crop_map = np.array([CROP_NAMES.index(c) if c in CROP_NAMES else -1
+                                 for c in data["crops"].tolist()] + [-1])
+            tracker.crop[:n] = crop_map[data["crop"]]
+            for name in ("stress", "last_day", "days"):
+                getattr(tracker, name)[:n] = data[name]
+        tracker._keys = keys
+        tracker._index = {key: i for i, key in enumerate(keys)}
+        tracker._size = n
+        return tracker
+
+
+_tracker = None
+_tracker_mtime = None
+_tracker_lock = threading.Lock()
+
+
+def get_pest_tracker(path=PEST_STATE_PATH):
+    """Saved tracker for read-only queries, reloaded when the file changes."""
+    global _tracker, _tracker_mtime
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    with _tracker_lock:
+        if _tracker is None or mtime != _tracker_mtime:
+            _tracker = PestRiskTracker.load(path)
+            _tracker_mtime = mtime
+    return _tracker
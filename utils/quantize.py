@@ -0,0 +1,309 @@
+# utils/quantize.py - Scaled int16 representation of index rasters
+"""
+Quantized index rasters.
+
+Index values (NDVI, NDWI, SAVI, EVI) are stored and transferred as
+``int16 = round(value * INDEX_QUANT_SCALE)`` with ``INDEX_QUANT_NODATA`` for
+NaN (cloud, no data, zero denominator): 2 bytes per pixel instead of 4-8,
+at 1e-4 precision over roughly [-3.27, 3.27]. The multi-output evalscript in
+``utils.evalscripts`` produces the same encoding on the Sentinel Hub side.
+
+``dequantize()`` decodes into a float32 buffer (optionally preallocated)
+without intermediate float64 or boolean full-size temporaries, and
+``quantized_stats()`` / ``quantized_mean()`` summarise int16 rasters with
+exact integer sums and a 65536-bin histogram instead of widening them to
+float.
+
+On disk, ``save_indices()`` writes rasters as an ``.npz`` of chunks of
+``INDEX_CHUNK_ROWS`` rows, each compressed with ``INDEX_CODEC`` (zstd, lz4
+or zlib), so a row range can be read without decoding the whole raster.
+``save_chunked()`` / ``load_chunked()`` store any arrays (e.g. scene cache
+bands) the same way without quantizing them.
+"""
+import functools
+import json
+import logging
+import os
+import zlib
+
+import numpy as np
+
+from config import INDEX_QUANT_SCALE, INDEX_QUANT_NODATA, INDEX_CODEC, INDEX_CHUNK_ROWS
+
+logger = logging.getLogger(__name__)
+
+QUANT_DTYPE = np.int16
+QUANT_LIMIT = np.iinfo(np.int16).max  # largest encodable |value| * scale
+FORMAT_VERSION = 1
+SUM_BLOCK = 1 << 20  # values widened to int64 at a time for sums of squares
+
+# ==================== ENCODING ====================
+
+
+def quantize(values, scale=INDEX_QUANT_SCALE, nodata=INDEX_QUANT_NODATA, out=None):
+    """Encode a float raster as int16; NaN becomes ``nodata``, out-of-range values saturate."""
+    values = np.asarray(values, dtype=np.float32)
+    out = np.empty(values.shape, dtype=QUANT_DTYPE) if out is None else out
+    scaled = np.multiply(values, np.float32(scale))
+    np.clip(scaled, -QUANT_LIMIT, QUANT_LIMIT, out=scaled)
+    np.add(scaled, np.float32(0.5), out=scaled)  # round half up, like JavaScript's Math.round
+    np.floor(scaled, out=scaled)
+    with np.errstate(invalid="ignore"):
+        np.copyto(out, scaled, casting="unsafe")
+    np.copyto(out, QUANT_DTYPE(nodata), where=np.isnan(values))
+    return out
+
+
+def dequantize(quantized, scale=INDEX_QUANT_SCALE, nodata=INDEX_QUANT_NODATA, out=None, mask=None):
+    """
+    Decode int16 values into float32 ``out`` (allocated if ``None``).
+
+    ``nodata`` pixels, and pixels where ``mask`` (e.g. the evalscript's
+    uint8 validity band) is 0, become NaN. ``out`` may be a memory map.
+    """
+    quantized = np.asarray(quantized)
+    out = np.empty(quantized.shape, dtype=np.float32) if out is None else out
+    np.multiply(quantized, np.float32(1.0 / scale), out=out, dtype=np.float32)
+    np.copyto(out, np.float32(np.nan), where=quantized == nodata)
+    if mask is not None:
+        np.copyto(out, np.float32(np.nan), where=np.asarray(mask) == 0)
+    return out
+
+
+# ==================== STATISTICS ====================
+
+def _valid_values(quantized, nodata, mask):
+    values = np.asarray(quantized).reshape(-1)
+    keep = values != nodata
+    if mask is not None:
+        np.logical_and(keep, np.asarray(mask).reshape(-1) != 0, out=keep)
+    return values[keep], values.size
+
+
+def quantized_mean(quantized, scale=INDEX_QUANT_SCALE, nodata=INDEX_QUANT_NODATA, mask=None):
+    """Mean of the valid pixels of an int16 raster (NaN when there are none)."""
+    values = np.asarray(quantized)
+    valid = values != nodata
+    if mask is not None:
+        np.logical_and(valid, np.asarray(mask) != 0, out=valid)
+    count = np.count_nonzero(valid)
+    if not count:
+        return float("nan")
+    return float(np.sum(values, where=valid, dtype=np.int64)) / count / scale
+
+
+def _histogram(valid):
+    """Counts of every int16 value, index ``i`` holding value ``i - 32768``."""
+    counts = np.zeros(1 << 16, dtype=np.int64)
+    for start in range(0, valid.size, SUM_BLOCK):
+        # the uint16 view orders 0..32767 before the negatives; rolled back below
+        counts += np.bincount(valid[start:start + SUM_BLOCK].view(np.uint16), minlength=1 << 16)
+    return np.roll(counts, 1 << 15)
+
+
+def _percentiles(cumulative, count, percents):
+    """``np.percentile`` (linear interpolation) of the values behind a cumulative histogram."""
+    results = []
+    for percent in percents:
+        position = (count - 1) * percent / 100
+        lower = int(position)
+        ranks = np.array([lower, min(lower + 1, count - 1)])
+        low, high = np.searchsorted(cumulative, ranks, side="right") - (1 << 15)
+        results.append(low + (position - lower) * (high - low))
+    return results
+
+
+def quantized_stats(quantized, scale=INDEX_QUANT_SCALE, nodata=INDEX_QUANT_NODATA, mask=None):
+    """
+    ``mean``, ``std``, ``p10``/``p50``/``p90``, ``min``, ``max`` and
+    ``valid_fraction`` of an int16 raster, like ``history_store.raster_stats()``
+    on the decoded floats. Sums are exact int64; only blocks of
+    ``SUM_BLOCK`` values are widened, for the sum of squares and the
+    histogram the percentiles are read from.
+    """
+    valid, total = _valid_values(quantized, nodata, mask)
+    if valid.size == 0:
+        stats = dict.fromkeys(("mean", "std", "p10", "p50", "p90", "min", "max"))
+        stats["valid_fraction"] = 0.0
+        return stats
+
+    count = valid.size
+    total_sum = int(np.sum(valid, dtype=np.int64))
+    total_sq = 0
+    for start in range(0, count, SUM_BLOCK):
+        block = valid[start:start + SUM_BLOCK].astype(np.int64)
+        total_sq += int(np.dot(block, block))
+    mean = total_sum / count
+    variance = max(total_sq / count - mean * mean, 0.0)
+    cumulative = np.cumsum(_histogram(valid))
+    p10, p50, p90 = _percentiles(cumulative, count, (10, 50, 90))
+    return {
+        "mean": mean / scale,
+        "std": variance ** 0.5 / scale,
+        "p10": float(p10) / scale,
+        "p50": float(p50) / scale,
+        "p90": float(p90) / scale,
+        "min": int(valid.min()) / scale,
+        "max": int(valid.max()) / scale,
+        "valid_fraction": count / total,
+    }
+
+# ==================== CHUNKED STORAGE ====================
+
+
+@functools.lru_cache(maxsize=None)
+def _fallback(module):
+    logger.warning("%s is not installed; compressing rasters with zlib", module)
+    return "zlib"
+
+
+def _codec(name):
+    """``(name, compress, decompress)``, with zlib standing in for a missing module."""
+    if name == "zstd":
+        try:
+            import zstandard
+
+            return name, zstandard.ZstdCompressor(level=3).compress, zstandard.ZstdDecompressor().decompress
+        except ImportError:
+            name = _fallback("zstandard")
+    if name == "lz4":
+        try:
+            import lz4.frame
+
+            return name, lz4.frame.compress, lz4.frame.decompress
+        except ImportError:
+            name = _fallback("lz4")
+    if name == "zlib":
+        return name, lambda data: zlib.compress(data, 6), zlib.decompress
+    if name == "none":
+        return name, bytes, bytes
+    raise ValueError(f"Unknown codec: {name}")
+
+
+def _row_shape(shape):
+    """``(rows, columns)`` an array is chunked as; leading axes are stacked as rows."""
+    if len(shape) < 2:
+        return 1, int(np.prod(shape))
+    return int(np.prod(shape[:-1])), shape[-1]
+
+
+def _pack(rows, compress, chunk_rows, encode=None, dtype=None):
+    """Compressed chunks of ``rows`` as ``(data uint8, offsets int64)``; ``encode`` converts each block."""
+    chunks = []
+    scratch = None
+    for start in range(0, rows.shape[0], chunk_rows):
+        block = rows[start:start + chunk_rows]
+        if encode is not None:
+            if scratch is None:
+                scratch = np.empty((chunk_rows, rows.shape[1]), dtype=dtype)
+            block = encode(block, scratch[:block.shape[0]])
+        chunks.append(compress(np.ascontiguousarray(block).tobytes()))
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    np.cumsum([len(chunk) for chunk in chunks], out=offsets[1:])
+    data = np.frombuffer(b"".join(chunks), dtype=np.uint8)
+    return data, offsets
+
+
+def _write_npz(path, arrays, meta):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as handle:
+        np.savez(handle, meta=np.array(json.dumps(meta)), **arrays)
+    os.replace(tmp, path)
+
+
+def save_chunked(path, arrays, codec=INDEX_CODEC, chunk_rows=INDEX_CHUNK_ROWS, meta=None, encode=None):
+    """
+    Write arrays (name -> array) as compressed row chunks to ``path``
+    (``.npz``, replaced atomically). ``encode(block, out)`` may convert
+    each block before compression (see ``save_indices``). Returns the
+    number of bytes written.
+    """
+    codec, compress, _ = _codec(codec)
+    file_meta = dict(meta or {}, format=FORMAT_VERSION, codec=codec, chunk_rows=chunk_rows, arrays={})
+    packed = {}
+    for name, array in arrays.items():
+        array = np.asarray(array)
+        dtype = np.dtype(QUANT_DTYPE) if encode is not None else array.dtype
+        data, offsets = _pack(array.reshape(_row_shape(array.shape)), compress, chunk_rows, encode, dtype)
+        packed[f"{name}.data"] = data
+        packed[f"{name}.offsets"] = offsets
+        file_meta["arrays"][name] = {"shape": list(array.shape), "dtype": dtype.str}
+    _write_npz(path, packed, file_meta)
+    return os.path.getsize(path)
+
+
+def read_meta(path):
+    """The JSON metadata of a ``save_chunked()`` file."""
+    with np.load(path) as archive:
+        return json.loads(str(archive["meta"]))
+
+
+def load_chunked(path, names=None, rows=None):
+    """
+    Read arrays written by ``save_chunked()`` (all, or ``names``).
+
+    ``rows`` (a slice over the second-to-last axis of 2-D arrays) decodes
+    only the chunks that overlap it. Each chunk is decompressed straight
+    into the output array. Returns ``(arrays, meta)``.
+    """
+    with np.load(path) as archive:
+        meta = json.loads(str(archive["meta"]))
+        _, _, decompress = _codec(meta["codec"])
+        chunk_rows = meta["chunk_rows"]
+        arrays = {}
+        for name in names or meta["arrays"]:
+            info = meta["arrays"][name]
+            shape, dtype = tuple(info["shape"]), np.dtype(info["dtype"])
+            data, offsets = archive[f"{name}.data"], archive[f"{name}.offsets"]
+            total_rows, columns = _row_shape(shape)
+
+            first, last = 0, total_rows
+            if rows is not None:
+                if len(shape) != 2:
+                    raise ValueError("rows can only be selected from 2-D arrays")
+                first, last, _ = rows.indices(total_rows)
+            c0, c1 = first // chunk_rows, -(-last // chunk_rows)
+            out = np.empty((max(last - first, 0), columns), dtype=dtype)
+            for chunk in range(c0, max(c1, c0)):
+                start = chunk * chunk_rows
+                block = np.frombuffer(
+                    decompress(data[offsets[chunk]:offsets[chunk + 1]].tobytes()), dtype=dtype
+                ).reshape(-1, columns)
+                lo, hi = max(first, start), min(last, start + block.shape[0])
+                out[lo - first:hi - first] = block[lo - start:hi - start]
+            arrays[name] = out if rows is not None else out.reshape(shape)
+    return arrays, meta
+
+
+def save_indices(path, rasters, codec=INDEX_CODEC, chunk_rows=INDEX_CHUNK_ROWS,
+                 scale=INDEX_QUANT_SCALE, nodata=INDEX_QUANT_NODATA):
+    """
+    Store index rasters (name -> float array, NaN = invalid, or already
+    quantized int16) as compressed int16 chunks. Float rasters are
+    quantized one chunk at a time, so memory-mapped full tiles never need
+    a full-size int16 copy. Returns the number of bytes written.
+    """
+    def encode(block, out):
+        if block.dtype == QUANT_DTYPE:
+            return block
+        return quantize(block, scale, nodata, out=out)
+
+    return save_chunked(
+        path, rasters, codec, chunk_rows, meta={"scale": scale, "nodata": nodata}, encode=encode
+    )
+
+
+def load_indices(path, names=None, rows=None, quantized=False):
+    """
+    Index rasters from ``save_indices()``: float32 with NaN for nodata, or
+    the stored int16 values with ``quantized=True`` (for ``quantized_stats``).
+    """
+    arrays, meta = load_chunked(path, names, rows)
+    if quantized:
+        return arrays
+    # decode into a float32 buffer per raster; the int16 arrays are dropped
+    return {
+        name: dequantize(values, meta["scale"], meta["nodata"])
+        for name, values in arrays.items()
+    }
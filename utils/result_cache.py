@@ -0,0 +1,365 @@
+# utils/result_cache.py - Two-tier result cache shared across replicas
+"""
+Cache for expensive results (scene fetches, index statistics, reports) that
+is shared by every Streamlit replica and batch worker.
+
+Lookups go to a per-process LRU first and then to a shared store: Redis
+(``RESULT_CACHE_URL=redis://host:6379/0``) or ``MemoryStore``, an in-process
+stand-in with the same semantics used when no URL is configured and in
+tests, bounded to ``RESULT_CACHE_MEMORY_ENTRIES`` entries and
+``RESULT_CACHE_MEMORY_MB`` (least recently used evicted). Keys embed ``CACHE_VERSION`` so a version bump orphans old entries,
+and every entry expires after ``CACHE_TTL_HOURS``.
+
+``get_or_compute()`` is single-flight: concurrent misses for the same key
+(threads in this process, or other replicas through a ``SET NX`` lock in the
+shared store) wait for one computation instead of all recomputing it.
+
+Values are pickled into the shared store, so only trusted services may
+write to it. Results are shared objects and must not be mutated.
+"""
+import functools
+import hashlib
+import logging
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from config import (
+    CACHE_VERSION, CACHE_TTL_HOURS, RESULT_CACHE_URL, RESULT_CACHE_LOCAL_ENTRIES,
+    RESULT_CACHE_MAX_VALUE_MB, RESULT_CACHE_MEMORY_ENTRIES, RESULT_CACHE_MEMORY_MB
+)
+from utils.metrics import increment
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "agrimind"
+LOCK_TTL_SECONDS = 120     # a crashed computation releases its lock after this
+WAIT_POLL_SECONDS = 0.05
+EXPIRY_SWEEP_SECONDS = 60  # MemoryStore drops expired entries on write at most this often
+
+
+class _Missing:
+    def __repr__(self):
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+
+# ==================== SHARED STORES ====================
+
+class MemoryStore:
+    """
+    In-process stand-in for the Redis store (bytes values with TTL).
+
+    Like Redis with ``allkeys-lru`` it is bounded: writes drop expired
+    entries and then the least recently used ones beyond ``max_entries`` /
+    ``max_bytes``.
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_MEMORY_ENTRIES,
+                 max_bytes=int(RESULT_CACHE_MEMORY_MB * 1024 * 1024)):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (value, expires), least recent first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    def _live(self, key, now):
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            self._pop(key)
+            return None
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+
+    def _pop(self, key):
+        value, _ = self._data.pop(key)
+        self._bytes -= len(value)
+
+    def _put(self, key, value, ttl, now):
+        if key in self._data:
+            self._pop(key)
+        self._data[key] = (value, None if ttl is None else now + ttl)
+        self._bytes += len(value)
+        if now >= self._next_sweep:
+            self._next_sweep = now + EXPIRY_SWEEP_SECONDS
+            for expired in [k for k, (_, expires) in self._data.items() if expires is not None and expires <= now]:
+                self._pop(expired)
+        while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            self._pop(next(iter(self._data)))
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            return None if entry is None else entry[0]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._put(key, value, ttl, time.monotonic())
+
+    def add(self, key, value, ttl=None):
+        """Set only if absent (``SET NX``); returns True when set."""
+        with self._lock:
+            now = time.monotonic()
+            if self._live(key, now) is not None:
+                return False
+            self._put(key, value, ttl, now)
+            return True
+
+    def delete(self, key, expected=None):
+        """Delete ``key`` (only if its value is ``expected`` when given)."""
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            if entry is not None and (expected is None or entry[0] == expected):
+                self._pop(key)
+
+    def flush(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+
+class RedisStore:
+    """Shared store on Redis; errors degrade to cache misses."""
+
+    # compare-and-delete so a lock is only released by its owner
+    _RELEASE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, url):
+        import redis
+
+        self._errors = redis.RedisError
+        self._client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+        self._release = self._client.register_script(self._RELEASE)
+
+    def _call(self, fn, *args, default=None, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except (self._errors, OSError) as exc:
+            logger.warning("Result cache store unavailable: %s", exc)
+            return default
+
+    def get(self, key):
+        return self._call(self._client.get, key)
+
+    def set(self, key, value, ttl=None):
+        self._call(self._client.set, key, value, ex=None if ttl is None else max(1, int(ttl)))
+
+    def add(self, key, value, ttl=None):
+        # if Redis is down, report the lock as acquired so callers compute
+        return bool(self._call(self._client.set, key, value, nx=True,
+                               ex=None if ttl is None else max(1, int(ttl)), default=True))
+
+    def delete(self, key, expected=None):
+        if expected is None:
+            self._call(self._client.delete, key)
+        else:
+            self._call(self._release, keys=[key], args=[expected])
+
+    def flush(self):
+        for key in self._call(self._client.scan_iter, f"{KEY_PREFIX}:*", default=[]):
+            self._call(self._client.delete, key)
+
+
+def open_store(url=RESULT_CACHE_URL):
+    """Shared store for ``url``: ``redis://...`` or empty / ``memory://``."""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStore(url)
+    if url in ("", "memory://"):
+        return MemoryStore()
+    raise ValueError(f"Unsupported RESULT_CACHE_URL: {url}")
+
+
+# ==================== TWO-TIER CACHE ====================
+
+class ResultCache:
+    """Per-process LRU in front of a shared store, with single-flight fills."""
+
+    def __init__(self, store=None, local_entries=RESULT_CACHE_LOCAL_ENTRIES,
+                 ttl_seconds=CACHE_TTL_HOURS * 3600, version=CACHE_VERSION,
+                 max_value_bytes=int(RESULT_CACHE_MAX_VALUE_MB * 1024 * 1024)):
+        self.store = store if store is not None else MemoryStore()
+        self.local_entries = local_entries
+        self.ttl_seconds = ttl_seconds
+        self.version = version
+        self.max_value_bytes = max_value_bytes
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "computed": 0, "waited": 0}
+
+    def key(self, namespace, *parts):
+        """Versioned key ``agrimind:<version>:<namespace>:<digest of parts>``."""
+        digest = hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()[:32]
+        return f"{KEY_PREFIX}:{self.version}:{namespace}:{digest}"
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    # -------------------- local tier --------------------
+
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return MISSING
+            if entry[1] <= time.monotonic():
+                del self._local[key]
+                return MISSING
+            self._local.move_to_end(key)
+            return entry[0]
+
+    def _local_set(self, key, value, ttl):
+        if self.local_entries <= 0:
+            return
+        with self._lock:
+            self._local[key] = (value, time.monotonic() + ttl)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_entries:
+                self._local.popitem(last=False)
+
+    # -------------------- public API --------------------
+
+    def get(self, key, local=True):
+        """Cached value for ``key`` or ``MISSING``."""
+        if local:
+            value = self._local_get(key)
+            if value is not MISSING:
+                self._count("local_hits")
+                increment("cache_requests", cache="result", result="local_hit")
+                return value
+
+        payload = self.store.get(key)
+        if payload is None:
+            self._count("misses")
+            increment("cache_requests", cache="result", result="miss")
+            return MISSING
+        value = pickle.loads(payload)
+        self._count("shared_hits")
+        increment("cache_requests", cache="result", result="shared_hit")
+        if local:
+            self._local_set(key, value, self.ttl_seconds)
+        return value
+
+    def set(self, key, value, ttl=None, local=True):
+        ttl = self.ttl_seconds if ttl is None else ttl
+        if local:
+            self._local_set(key, value, ttl)
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) <= self.max_value_bytes:
+            self.store.set(key, payload, ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+        self.store.delete(key)
+
+    def get_or_compute(self, key, compute, ttl=None, local=True, wait_timeout=LOCK_TTL_SECONDS):
+        """
+        Return the cached value for ``key``, computing it once on a miss.
+
+        Other threads asking for the same key wait for the running
+        computation; other processes wait on a lock in the shared store and
+        then read the stored result. If the lock holder does not deliver
+        within ``wait_timeout`` seconds the value is computed here.
+        ``local=False`` skips the in-process tier (for large values that
+        already have a local copy, e.g. memory-mapped scenes).
+        """
+        value = self.get(key, local)
+        if value is not MISSING:
+            return value
+
+        # in-process single flight
+        with self._lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+        if not leader:
+            event.wait(wait_timeout)
+            self._count("waited")
+            value = self.get(key, local)
+            if value is not MISSING:
+                return value
+
+        try:
+            return self._compute_shared(key, compute, ttl, local, wait_timeout)
+        finally:
+            if leader:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                event.set()
+
+    def _compute_shared(self, key, compute, ttl, local, wait_timeout):
+        lock_key = f"{key}:lock"
+        token = uuid.uuid4().hex.encode()
+        deadline = time.monotonic() + wait_timeout
+        while not self.store.add(lock_key, token, LOCK_TTL_SECONDS):
+            # another replica is computing this key
+            time.sleep(WAIT_POLL_SECONDS)
+            payload = self.store.get(key)
+            if payload is not None:
+                self._count("waited")
+                value = pickle.loads(payload)
+                if local:
+                    self._local_set(key, value, self.ttl_seconds)
+                return value
+            if time.monotonic() > deadline:
+                logger.warning("Timed out waiting for %s; computing locally", key)
+                token = None
+                break
+
+        try:
+            value = compute()
+            self._count("computed")
+            self.set(key, value, ttl, local)
+            return value
+        finally:
+            if token is not None:
+                self.store.delete(lock_key, expected=token)
+
+    def cached(self, namespace, ttl=None, local=True):
+        """Decorator memoizing a function on its arguments (which need a stable repr)."""
+        return _memoizer(lambda: self, namespace, ttl, local)
+
+
+def _memoizer(get_cache, namespace, ttl, local):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            cache = get_cache()
+            key = cache.key(namespace, args, sorted(kwargs.items()))
+            return cache.get_or_compute(key, lambda: fn(*args, **kwargs), ttl, local)
+        return wrapper
+    return decorator
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Process-wide ResultCache on the store configured by ``RESULT_CACHE_URL``."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache(open_store())
+    return _cache
+
+
+def cached(namespace, ttl=None, local=True):
+    """Like ``ResultCache.cached`` on the process-wide cache (resolved at call time)."""
+    return _memoizer(get_result_cache, namespace, ttl, local)
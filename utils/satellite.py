@@ -0,0 +1,404 @@
+# utils/satellite.py - Sentinel Hub OAuth2 client
+"""
+Sentinel-2 L2A access through the Sentinel Hub process and catalog APIs.
+
+``SentinelHubClient`` handles OAuth2 client-credentials tokens (refreshed
+automatically), enforces ``API_RATE_LIMIT`` and stores decoded scenes in the
+shared on-disk ``SceneCache``. ``fetch_many()`` downloads several dates and
+evalscripts concurrently through ``utils.async_fetch``.
+
+Before downloading pixels, ``select_clear_scenes()`` uses catalog metadata
+to keep only the least cloudy acquisition of every ``SCENE_WINDOW_DAYS``
+window, so cloudy dates are never fetched. ``get_satellite_client()``
+returns this client or the STAC/COG backend in ``utils.stac``, depending on
+``SATELLITE_BACKEND``.
+"""
+import asyncio
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+import requests
+
+from config import (
+    SENTINELHUB_CLIENT_ID, SENTINELHUB_CLIENT_SECRET, SENTINELHUB_BASE_URL,
+    SENTINELHUB_TOKEN_URL, API_RATE_LIMIT, SCENE_MAX_CLOUD_COVER, SCENE_WINDOW_DAYS,
+    SATELLITE_BACKEND, RESULT_CACHE_URL
+)
+from utils.metrics import increment, span
+from utils.scene_cache import get_scene_cache, scene_key
+
+DEFAULT_SIZE = (512, 512)
+
+
+def decode_tiff(content):
+    """Decode a process-API GeoTIFF response into a (bands, H, W) array."""
+    from rasterio.io import MemoryFile
+
+    with MemoryFile(content) as memfile:
+        with memfile.open() as dataset:
+            return dataset.read()
+
+
+def decode_tar(content):
+    """Decode a multi-output (tar) process-API response into ``{output id: array}``."""
+    import io
+    import tarfile
+
+    outputs = {}
+    with tarfile.open(fileobj=io.BytesIO(content)) as archive:
+        for member in archive.getmembers():
+            name, ext = os.path.splitext(os.path.basename(member.name))
+            if member.isfile() and ext == ".tif":
+                outputs[name] = decode_tiff(archive.extractfile(member).read())
+    return outputs
+
+
+class SentinelHubClient:
+    """OAuth2 client for the Sentinel Hub process and catalog APIs."""
+
+    def __init__(self, client_id=SENTINELHUB_CLIENT_ID, client_secret=SENTINELHUB_CLIENT_SECRET,
+                 base_url=SENTINELHUB_BASE_URL, token_url=SENTINELHUB_TOKEN_URL,
+                 rate_limit=API_RATE_LIMIT, cache=None):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.base_url = base_url.rstrip("/")
+        self.token_url = token_url
+        self.rate_limit = rate_limit
+        self.cache = cache if cache is not None else get_scene_cache()
+        self.session = requests.Session()
+
+        self._token = None
+        self._token_expires = 0.0
+        self._token_lock = threading.Lock()
+        self._rate_lock = threading.Lock()
+        self._last_request = 0.0
+
+    @property
+    def process_url(self):
+        return f"{self.base_url}/api/v1/process"
+
+    @property
+    def catalog_url(self):
+        return f"{self.base_url}/api/v1/catalog/1.0.0/search"
+
+    # ==================== AUTH & RATE LIMITING ====================
+
+    def _get_access_token(self):
+        """Return a valid bearer token, refreshing it 60 s before expiry."""
+        with self._token_lock:
+            if self._token and time.time() < self._token_expires - 60:
+                return self._token
+
+            with span("sentinelhub.token_refresh"):
+                response = self.session.post(
+                    self.token_url,
+                    data={
+                        "grant_type": "client_credentials",
+                        "client_id": self.client_id,
+                        "client_secret": self.client_secret,
+                    },
+                    timeout=30,
+                )
+            response.raise_for_status()
+            payload = response.json()
+            self._token = payload["access_token"]
+            self._token_expires = time.time() + payload.get("expires_in", 3600)
+            return self._token
+
+    def _rate_limit(self):
+        """Block until the next request is allowed by ``API_RATE_LIMIT``."""
+        with self._rate_lock:
+            wait = self._last_request + 1.0 / self.rate_limit - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_request = time.monotonic()
+
+    def _headers(self, accept="application/json"):
+        return {"Authorization": f"Bearer {self._get_access_token()}", "Accept": accept}
+
+    # ==================== PROCESS API ====================
+
+    def build_process_request(self, bbox, date_from, date_to, script,
+                              size=DEFAULT_SIZE, max_cloud_cover=50, outputs=("default",)):
+        """
+        Process-API payload for a bbox ``[min_lon, min_lat, max_lon, max_lat]``.
+        ``outputs`` are the evalscript's output ids (several = tar response).
+        """
+        return {
+            "input": {
+                "bounds": {
+                    "bbox": list(bbox),
+                    "properties": {"crs": "http://www.opengis.net/def/crs/EPSG/0/4326"},
+                },
+                "data": [{
+                    "type": "sentinel-2-l2a",
+                    "dataFilter": {
+                        "timeRange": {
+                            "from": f"{date_from}T00:00:00Z",
+                            "to": f"{date_to}T23:59:59Z",
+                        },
+                        "maxCloudCoverage": max_cloud_cover,
+                    },
+                }],
+            },
+            "output": {
+                "width": size[0],
+                "height": size[1],
+                "responses": [
+                    {"identifier": output, "format": {"type": "image/tiff"}} for output in outputs
+                ],
+            },
+            "evalscript": script,
+        }
+
+    def fetch_satellite_data(self, bbox, date_from, date_to, script,
+                             size=DEFAULT_SIZE, max_cloud_cover=50):
+        """
+        Fetch one Sentinel-2 L2A composite as a (bands, H, W) array.
+
+        Results are served from the scene cache when available.
+        """
+        def fetch():
+            payload = self.build_process_request(
+                bbox, date_from, date_to, script, size, max_cloud_cover
+            )
+            self._rate_limit()
+            with span("sentinelhub.process"):
+                response = self.session.post(
+                    self.process_url, json=payload,
+                    headers=self._headers("image/tiff"), timeout=120
+                )
+            response.raise_for_status()
+            increment("bytes_fetched", len(response.content), source="sentinelhub")
+            with span("sentinelhub.decode"):
+                return {"data": decode_tiff(response.content)}
+
+        return self.cache.get_or_fetch(
+            bbox, date_from, date_to, script, shared_fetch(bbox, date_from, date_to, script, fetch)
+        )["data"]
+
+    def fetch_index_data(self, bbox, date_from, date_to, size=DEFAULT_SIZE,
+                         max_cloud_cover=SCENE_MAX_CLOUD_COVER):
+        """
+        All indices and the clear mask in one request, as quantized arrays
+        ``{"indices": (n, H, W) int16, "mask": (1, H, W) uint8}`` in
+        ``INDEX_NAMES`` order (see ``utils.evalscripts``). The scene cache
+        keeps them quantized; decode with ``decode_index_response()``.
+        """
+        from utils.evalscripts import INDEX_EVALSCRIPT, INDEX_OUTPUTS
+
+        def fetch():
+            payload = self.build_process_request(
+                bbox, date_from, date_to, INDEX_EVALSCRIPT, size, max_cloud_cover, INDEX_OUTPUTS
+            )
+            self._rate_limit()
+            with span("sentinelhub.process"):
+                response = self.session.post(
+                    self.process_url, json=payload,
+                    headers=self._headers("application/tar"), timeout=120
+                )
+            response.raise_for_status()
+            increment("bytes_fetched", len(response.content), source="sentinelhub")
+            with span("sentinelhub.decode"):
+                return decode_tar(response.content)
+
+        return self.cache.get_or_fetch(
+            bbox, date_from, date_to, INDEX_EVALSCRIPT,
+            shared_fetch(bbox, date_from, date_to, INDEX_EVALSCRIPT, fetch)
+        )
+
+    def fetch_many(self, bbox, dates, scripts, size=DEFAULT_SIZE, max_cloud_cover=50):
+        """
+        Fetch every (date, script) combination concurrently.
+
+        ``dates`` are single acquisition days and ``scripts`` a dict of
+        name -> evalscript. Returns ``{(date, name): array or Exception}``.
+        Scenes in the scene cache or the shared result cache (see
+        ``shared_fetch()``) are not requested again, downloads are stored in
+        both, and all requests share one token bucket so ``API_RATE_LIMIT``
+        is respected.
+        """
+        return asyncio.run(
+            self.fetch_many_async(bbox, dates, scripts, size, max_cloud_cover)
+        )
+
+    async def fetch_many_async(self, bbox, dates, scripts, size=DEFAULT_SIZE, max_cloud_cover=50):
+        from utils.async_fetch import AsyncSceneFetcher
+
+        results, pending = {}, []
+        for day in dates:
+            day = day.strftime("%Y-%m-%d") if isinstance(day, date) else str(day)
+            for name, script in scripts.items():
+                cached = self.cache.get(scene_key(bbox, day, day, script))
+                shared = shared_scene(bbox, day, day, script) if cached is None else None
+                if cached is not None:
+                    results[(day, name)] = cached[0]["data"]
+                elif shared is not None:
+                    # another replica fetched it: keep a local copy like the sync path
+                    results[(day, name)] = self.cache.get_or_fetch(
+                        bbox, day, day, script, lambda shared=shared: shared
+                    )["data"]
+                else:
+                    pending.append((day, name, script))
+
+        if pending:
+            payloads = [
+                self.build_process_request(bbox, day, day, script, size, max_cloud_cover)
+                for day, _, script in pending
+            ]
+            with span("sentinelhub.fetch_many"):
+                async with AsyncSceneFetcher(
+                    self.process_url, self._get_access_token, rate=self.rate_limit
+                ) as fetcher:
+                    bodies = await fetcher.fetch_all(payloads)
+
+            for (day, name, script), body in zip(pending, bodies):
+                if isinstance(body, Exception):
+                    results[(day, name)] = body
+                    continue
+                with span("sentinelhub.decode"):
+                    data = decode_tiff(body)
+                results[(day, name)] = self.cache.get_or_fetch(
+                    bbox, day, day, script,
+                    shared_fetch(bbox, day, day, script, lambda data=data: {"data": data})
+                )["data"]
+        return results
+
+    # ==================== CATALOG API ====================
+
+    def get_available_data(self, bbox, date_from, date_to, max_cloud_cover=100, limit=100):
+        """
+        List Sentinel-2 L2A acquisitions over ``bbox`` in a date range.
+
+        Returns dicts with ``id``, ``date`` and ``cloud_cover``, sorted by date.
+        """
+        self._rate_limit()
+        with span("sentinelhub.catalog"):
+            response = self.session.post(
+                self.catalog_url,
+                json={
+                    "collections": ["sentinel-2-l2a"],
+                    "bbox": list(bbox),
+                    "datetime": f"{date_from}T00:00:00Z/{date_to}T23:59:59Z",
+                    "limit": limit,
+                    "filter": f"eo:cloud_cover <= {max_cloud_cover}",
+                },
+                headers=self._headers(),
+                timeout=30,
+            )
+        response.raise_for_status()
+        increment("bytes_fetched", len(response.content), source="sentinelhub_catalog")
+        scenes = [
+            {
+                "id": feature["id"],
+                "date": feature["properties"]["datetime"][:10],
+                "cloud_cover": feature["properties"].get("eo:cloud_cover"),
+            }
+            for feature in response.json().get("features", [])
+        ]
+        return sorted(scenes, key=lambda scene: scene["date"])
+
+    def get_clear_dates(self, bbox, date_from, date_to, window_days=SCENE_WINDOW_DAYS,
+                        max_cloud_cover=SCENE_MAX_CLOUD_COVER):
+        """Least cloudy acquisition date of each window, from catalog metadata only."""
+        scenes = self.get_available_data(bbox, date_from, date_to, max_cloud_cover)
+        return [scene["date"] for scene in select_clear_scenes(scenes, window_days, max_cloud_cover)]
+
+
+def select_clear_scenes(scenes, window_days=SCENE_WINDOW_DAYS,
+                        max_cloud_cover=SCENE_MAX_CLOUD_COVER):
+    """
+    Keep the least cloudy acquisition per ``window_days`` window.
+
+    ``scenes`` are ``get_available_data()`` dicts. Several granules of the
+    same day are merged using their worst cloud cover, windows are counted
+    from the most recent acquisition backwards (so the latest window is
+    always complete), and days above ``max_cloud_cover`` are dropped.
+    Returns one scene dict per window, sorted by date.
+    """
+    by_day = {}
+    for scene in scenes:
+        cover = scene.get("cloud_cover")
+        cover = 100.0 if cover is None else float(cover)
+        if scene["date"] not in by_day or cover > by_day[scene["date"]]["cloud_cover"]:
+            by_day[scene["date"]] = {**scene, "cloud_cover": cover}
+    if not by_day:
+        return []
+
+    latest = date.fromisoformat(max(by_day))
+    best = {}
+    for day in sorted(by_day, reverse=True):  # ties go to the most recent day
+        scene = by_day[day]
+        if scene["cloud_cover"] > max_cloud_cover:
+            continue
+        window = (latest - date.fromisoformat(day)).days // window_days
+        if window not in best or scene["cloud_cover"] < best[window]["cloud_cover"]:
+            best[window] = scene
+    return sorted(best.values(), key=lambda scene: scene["date"])
+
+
+def _shared_key(results, bbox, date_from, date_to, script):
+    return results.key("scene", scene_key(bbox, date_from, date_to, script))
+
+
+def shared_scene(bbox, date_from, date_to, script):
+    """A scene another replica already put in the shared result cache, or None."""
+    from utils.result_cache import MISSING, get_result_cache
+
+    if not RESULT_CACHE_URL:
+        return None
+    results = get_result_cache()
+    value = results.get(_shared_key(results, bbox, date_from, date_to, script), local=False)
+    return None if value is MISSING else value
+
+
+def shared_fetch(bbox, date_from, date_to, script, fetch):
+    """
+    Wrap a scene download so replicas share it through the result cache.
+
+    The host-local ``SceneCache`` stays the first tier; on a miss the scene
+    is taken from the shared store if another replica already fetched it,
+    and concurrent misses for the same scene download it only once.
+    Without ``RESULT_CACHE_URL`` there is nothing to share with, so
+    ``fetch`` is returned as is: the process-local store would only keep a
+    second in-memory copy of what the ``SceneCache`` holds on disk.
+    """
+    from utils.result_cache import get_result_cache
+
+    if not RESULT_CACHE_URL:
+        return fetch
+
+    def fetch_once():
+        results = get_result_cache()
+        key = _shared_key(results, bbox, date_from, date_to, script)
+        return results.get_or_compute(key, fetch, local=False)
+    return fetch_once
+
+
+def date_range_days(date_from, date_to):
+    """All calendar days between two dates, inclusive."""
+    days = (date_to - date_from).days
+    return [date_from + timedelta(days=offset) for offset in range(days + 1)]
+
+
+_client = None
+
+
+def get_sentinel_client():
+    """Shared SentinelHubClient for the process."""
+    global _client
+    if _client is None:
+        _client = SentinelHubClient()
+    return _client
+
+
+def get_satellite_client():
+    """Client for the configured ``SATELLITE_BACKEND`` (Sentinel Hub or STAC/COG)."""
+    if SATELLITE_BACKEND == "stac":
+        from utils.stac import get_stac_client
+
+        return get_stac_client()
+    return get_sentinel_client()
+
@@ -0,0 +1,299 @@
+# utils/scene_cache.py - Content-addressed on-disk cache for fetched scenes
+"""
+Local scene store shared by all Streamlit workers on a host.
+
+Each scene is keyed by (bbox, date range, evalscript, ``CACHE_VERSION``) and
+stored as one ``.npy`` file per band plus a ``meta.json``. Bands are read back
+with ``np.load(mmap_mode="r")``, so a cache hit costs no copy and pages are
+shared between processes through the OS page cache. With
+``SCENE_CACHE_CODEC`` set (zstd, lz4 or zlib) the bands of an entry are
+instead stored losslessly as compressed row chunks in one ``bands.npz``
+(``utils.quantize.save_chunked``) and decoded on read: smaller on disk,
+especially for the int16 index scenes, at the cost of the zero-copy hit.
+
+Concurrency: entries are written into a private temp directory and published
+with an atomic ``os.rename``; eviction runs under an exclusive ``fcntl`` lock
+and removes entries by renaming them out of the tree first. Readers never
+take a lock — a memory map opened before an eviction stays valid.
+
+Eviction walks every entry, so ``put`` does not sweep on each write: it
+tracks the bytes it has added since the last sweep and sweeps only once that
+estimate exceeds the budget or ``SCENE_CACHE_SWEEP_SECONDS`` have passed
+(writes from other processes are picked up by the next sweep).
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+from config import (
+    CACHE_VERSION, CACHE_TTL_HOURS, SCENE_CACHE_DIR, SCENE_CACHE_MAX_GB, SCENE_CACHE_CODEC,
+    SCENE_CACHE_SWEEP_SECONDS
+)
+from utils.metrics import increment
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development only
+    fcntl = None
+
+META_FILE = "meta.json"
+CHUNKED_FILE = "bands.npz"
+
+
+def scene_key(bbox, date_from, date_to, evalscript, version=CACHE_VERSION):
+    """Stable content address for a scene request."""
+    payload = json.dumps({
+        "bbox": [round(float(v), 6) for v in bbox],
+        "date_from": str(date_from),
+        "date_to": str(date_to),
+        "evalscript": evalscript.strip(),
+        "version": version,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SceneCache:
+    """Memory-mapped scene store with TTL and LRU eviction by disk budget."""
+
+    def __init__(self, root=SCENE_CACHE_DIR, max_bytes=None, ttl_hours=CACHE_TTL_HOURS,
+                 codec=SCENE_CACHE_CODEC, sweep_seconds=SCENE_CACHE_SWEEP_SECONDS):
+        self.root = root
+        self.codec = codec
+        self.max_bytes = int(SCENE_CACHE_MAX_GB * 1024 ** 3) if max_bytes is None else max_bytes
+        self.ttl_seconds = ttl_hours * 3600
+        self.sweep_seconds = sweep_seconds
+        self._tracked_bytes = None  # size estimate since the last sweep; None = never swept
+        self._last_sweep = 0.0
+        self._objects = os.path.join(root, "objects")
+        self._tmp = os.path.join(root, "tmp")
+        os.makedirs(self._objects, exist_ok=True)
+        os.makedirs(self._tmp, exist_ok=True)
+
+    # ==================== PATHS & LOCKING ====================
+
+    def _entry_dir(self, key):
+        return os.path.join(self._objects, key[:2], key)
+
+    @contextmanager
+    def _lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.root, ".lock"), "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _read_meta(self, entry_dir):
+        try:
+            with open(os.path.join(entry_dir, META_FILE), encoding="utf-8") as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return None
+
+    def _is_expired(self, meta, now=None):
+        return (now or time.time()) - meta["created_at"] > self.ttl_seconds
+
+    # ==================== PUBLIC API ====================
+
+    def get(self, key):
+        """
+        Return ``(bands, meta)`` for a cached scene or ``None``.
+
+        ``bands`` maps band name to a read-only ``np.memmap`` (a decoded
+        array for compressed entries).
+        """
+        entry_dir = self._entry_dir(key)
+        meta = self._read_meta(entry_dir)
+        if meta is None or self._is_expired(meta):
+            increment("cache_requests", cache="scene", result="miss")
+            return None
+
+        try:
+            if meta.get("codec", "none") != "none":
+                from utils.quantize import load_chunked
+
+                bands = load_chunked(os.path.join(entry_dir, CHUNKED_FILE), meta["bands"])[0]
+            else:
+                bands = {
+                    name: np.load(os.path.join(entry_dir, f"{name}.npy"), mmap_mode="r")
+                    for name in meta["bands"]
+                }
+        except OSError:  # evicted between reading meta and opening bands
+            increment("cache_requests", cache="scene", result="miss")
+            return None
+        increment("cache_requests", cache="scene", result="hit")
+
+        # mtime of meta.json doubles as the LRU timestamp
+        try:
+            os.utime(os.path.join(entry_dir, META_FILE))
+        except OSError:
+            pass
+        return bands, meta
+
+    def put(self, key, bands, meta=None):
+        """
+        Store ``bands`` (name -> array) under ``key``.
+
+        If another process published the same key first, its entry is kept
+        and this write is discarded. Returns the stored ``(bands, meta)``.
+        """
+        staging = os.path.join(self._tmp, f"{key}.{os.getpid()}.{uuid.uuid4().hex}")
+        os.makedirs(staging)
+        nbytes = 0
+        codec = self.codec
+        try:
+            if codec != "none":
+                from utils.quantize import read_meta, save_chunked
+
+                path = os.path.join(staging, CHUNKED_FILE)
+                nbytes = save_chunked(path, bands, codec)
+                codec = read_meta(path)["codec"]  # zlib when the module is missing
+            else:
+                for name, array in bands.items():
+                    path = os.path.join(staging, f"{name}.npy")
+                    np.save(path, np.ascontiguousarray(array))
+                    nbytes += os.path.getsize(path)
+
+            entry_meta = dict(meta or {})
+            entry_meta.update({
+                "key": key,
+                "bands": list(bands),
+                "nbytes": nbytes,
+                "codec": codec,
+                "created_at": time.time(),
+                "version": CACHE_VERSION,
+            })
+            with open(os.path.join(staging, META_FILE), "w", encoding="utf-8") as handle:
+                json.dump(entry_meta, handle)
+
+            entry_dir = self._entry_dir(key)
+            os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+            with self._lock():
+                existing = self._read_meta(entry_dir)
+                if existing is not None and self._is_expired(existing):
+                    self._remove(entry_dir)
+                    existing = None
+                if existing is None:
+                    if os.path.isdir(entry_dir):  # half-removed leftovers
+                        self._remove(entry_dir)
+                    os.rename(staging, entry_dir)
+                    staging = None
+                    if self._tracked_bytes is not None:
+                        self._tracked_bytes += nbytes
+                sweep = (self._tracked_bytes is None or self._tracked_bytes > self.max_bytes
+                         or time.time() - self._last_sweep >= self.sweep_seconds)
+        finally:
+            if staging is not None:
+                shutil.rmtree(staging, ignore_errors=True)
+
+        if sweep:
+            self.evict()
+        stored = self.get(key)
+        if stored is None:  # larger than the whole budget: serve from memory
+            return bands, entry_meta
+        return stored
+
+    def get_or_fetch(self, bbox, date_from, date_to, evalscript, fetch_fn, meta=None):
+        """
+        Return cached bands for the request, calling ``fetch_fn()`` on a miss.
+
+        ``fetch_fn`` must return a dict of band name -> array.
+        """
+        key = scene_key(bbox, date_from, date_to, evalscript)
+        cached = self.get(key)
+        if cached is not None:
+            return cached[0]
+
+        entry_meta = {"bbox": list(bbox), "date_from": str(date_from), "date_to": str(date_to)}
+        entry_meta.update(meta or {})
+        return self.put(key, fetch_fn(), entry_meta)[0]
+
+    def invalidate(self, key):
+        with self._lock():
+            self._remove(self._entry_dir(key))
+
+    # ==================== EVICTION ====================
+
+    def _entries(self):
+        """Yield (entry_dir, meta, last_access) for every published entry."""
+        for prefix in os.listdir(self._objects):
+            prefix_dir = os.path.join(self._objects, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for key in os.listdir(prefix_dir):
+                entry_dir = os.path.join(prefix_dir, key)
+                meta = self._read_meta(entry_dir)
+                if meta is None:
+                    continue
+                try:
+                    last_access = os.path.getmtime(os.path.join(entry_dir, META_FILE))
+                except OSError:
+                    continue
+                yield entry_dir, meta, last_access
+
+    def _remove(self, entry_dir):
+        if not os.path.isdir(entry_dir):
+            return
+        trash = os.path.join(self._tmp, f"evicted.{uuid.uuid4().hex}")
+        try:
+            os.rename(entry_dir, trash)
+        except OSError:
+            return
+        shutil.rmtree(trash, ignore_errors=True)
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones over budget."""
+        now = time.time()
+        with self._lock():
+            live = []
+            for entry_dir, meta, last_access in self._entries():
+                if self._is_expired(meta, now):
+                    self._remove(entry_dir)
+                else:
+                    live.append((last_access, meta["nbytes"], entry_dir))
+
+            # staging dirs left behind by crashed workers
+            for name in os.listdir(self._tmp):
+                path = os.path.join(self._tmp, name)
+                try:
+                    if now - os.path.getmtime(path) > 3600:
+                        shutil.rmtree(path, ignore_errors=True)
+                except OSError:
+                    pass
+
+            total = sum(nbytes for _, nbytes, _ in live)
+            for _, nbytes, entry_dir in sorted(live):
+                if total <= self.max_bytes:
+                    break
+                self._remove(entry_dir)
+                total -= nbytes
+            self._tracked_bytes = total
+            self._last_sweep = now
+
+    def stats(self):
+        entries = list(self._entries())
+        return {
+            "entries": len(entries),
+            "bytes": sum(meta["nbytes"] for _, meta, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+_default_cache = None
+
+
+def get_scene_cache():
+    """Process-wide SceneCache using the configured directory and budget."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = SceneCache()
+    return _default_cache
@@ -0,0 +1,290 @@
+# utils/session_store.py - Bounded per-session memory for dashboard state
+"""
+Session state that does not grow with the rasters it refers to.
+
+``st.session_state`` lives as long as the browser session, so anything put
+there stays pinned. Views store values through ``SessionStore.put()``
+instead and keep the returned ``SessionHandle`` in session state (see
+``ui.session``). Arrays (or dicts of arrays) of ``SESSION_ARRAY_MIN_KB`` and
+more are written to the shared scene cache (``utils.scene_cache``), so
+sessions computing the same thing share one entry on disk; an array stored
+without a shareable key gets one entry per session and name, rewritten only
+when its contents change and removed with the session. Other values are
+only held in memory.
+
+The resident copies are accounted per session and for the whole process
+and evicted least recently used when a session exceeds
+``SESSION_BUDGET_MB`` or all sessions exceed ``SESSION_GLOBAL_BUDGET_MB``;
+sessions idle for ``SESSION_IDLE_MINUTES`` are dropped like ``drop(session)``,
+and a value larger
+than the session budget is never held resident. Eviction only
+forgets the resident copy: ``get()`` reopens an evicted array from the
+scene cache (memory-mapped), and returns ``None`` when the cache no longer
+has it or the value was not an array, so the caller recomputes.
+
+Resident bytes and sessions are exported as the ``session_resident_bytes``,
+``session_resident_bytes_max`` and ``sessions`` gauges; evictions count as
+``session_evictions`` by reason.
+"""
+import hashlib
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from config import (
+    CACHE_VERSION, SESSION_ARRAY_MIN_KB, SESSION_BUDGET_MB, SESSION_GLOBAL_BUDGET_MB,
+    SESSION_IDLE_MINUTES
+)
+from utils.metrics import increment, set_gauge
+
+MB = 1024 * 1024
+SINGLE = "data"  # band name of a value that was one array
+IDLE_CHECK_SECONDS = 60
+
+
+def _arrays(value):
+    """``value`` as a dict of arrays, or None if it is not an array / dict of arrays."""
+    if isinstance(value, np.ndarray):
+        return {SINGLE: value}
+    if isinstance(value, dict) and value and all(isinstance(v, np.ndarray) for v in value.values()):
+        return value
+    return None
+
+
+def _digest(arrays):
+    """Content hash of a dict of arrays, to skip rewriting an unchanged value."""
+    digest = hashlib.blake2b(digest_size=16)
+    for name, array in arrays.items():
+        digest.update(repr((name, array.dtype.str, array.shape)).encode("utf-8"))
+        digest.update(np.ascontiguousarray(array).data)
+    return digest.hexdigest()
+
+
+def _sizeof(value):
+    """Approximate resident size of a non-array value."""
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:  # unpicklable (figures with callbacks, locks)
+        return sys.getsizeof(value)
+
+
+class SessionHandle:
+    """What session state holds instead of a value: its name, size and scene cache key."""
+
+    def __init__(self, name, nbytes, key=None, single=False):
+        self.name = name
+        self.nbytes = nbytes
+        self.key = key          # scene cache entry, None for in-memory values
+        self.single = single    # one array, not a dict of arrays
+
+    def __repr__(self):
+        where = "cache" if self.key else "memory"
+        return f"SessionHandle({self.name!r}, {self.nbytes / MB:.1f} MB, {where})"
+
+
+class SessionStore:
+    """Per-session values with resident copies bounded by LRU budgets."""
+
+    def __init__(self, cache=None, session_budget=None, global_budget=None,
+                 idle_seconds=SESSION_IDLE_MINUTES * 60, min_array_bytes=SESSION_ARRAY_MIN_KB * 1024):
+        self._cache = cache
+        self.session_budget = int(SESSION_BUDGET_MB * MB) if session_budget is None else session_budget
+        self.global_budget = int(SESSION_GLOBAL_BUDGET_MB * MB) if global_budget is None else global_budget
+        self.idle_seconds = idle_seconds
+        self.min_array_bytes = min_array_bytes
+        self._entries = OrderedDict()  # (session, name) -> (handle, value), least recent first
+        self._private = {}             # (session, name) -> digest of its unkeyed scene cache entry
+        self._sessions = {}            # session -> [resident bytes, last access]
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._next_idle_check = 0.0
+        self.stats = {"hits": 0, "reloads": 0, "lost": 0, "evictions": 0}
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            from utils.scene_cache import get_scene_cache
+
+            self._cache = get_scene_cache()
+        return self._cache
+
+    @staticmethod
+    def cache_key(*parts):
+        """Scene cache key for a session value (same parts -> shared entry)."""
+        payload = repr(("session", CACHE_VERSION) + parts).encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    # ==================== PUBLIC API ====================
+
+    def put(self, session, name, value, key=None):
+        """
+        Store ``value`` as ``name`` of ``session`` and return its handle.
+
+        Large arrays go to the scene cache under ``cache_key(*key)``, so an
+        equal ``key`` from another session reuses the stored entry. Without
+        a ``key`` the entry belongs to ``(session, name)``: the previous
+        value stored there is replaced, so reruns do not pile up copies, and
+        nothing is written when the contents did not change.
+        """
+        entry_key = (session, name)
+        arrays = _arrays(value)
+        nbytes = sum(a.nbytes for a in arrays.values()) if arrays is not None else _sizeof(value)
+        handle = SessionHandle(name, nbytes)
+        released = []
+        if arrays is not None and nbytes >= self.min_array_bytes:
+            handle.key = self.cache_key(*(key if key is not None else ("private",) + entry_key))
+            handle.single = not isinstance(value, dict)
+            with self._lock:
+                entry = self._entries.get(entry_key)
+                if entry is not None and entry[1] is value and entry[0].key == handle.key:
+                    self._entries.move_to_end(entry_key)
+                    self._sessions[session][1] = time.monotonic()
+                    return entry[0]
+            if key is None:
+                digest = _digest(arrays)
+                with self._lock:
+                    unchanged = self._private.get(entry_key) == digest
+                if not unchanged or self.cache.get(handle.key) is None:
+                    # the cache keeps the first entry under a key
+                    self.cache.invalidate(handle.key)
+                    self.cache.put(handle.key, arrays, {"session_value": name})
+                    with self._lock:
+                        self._private[entry_key] = digest
+            else:
+                if self.cache.get(handle.key) is None:
+                    self.cache.put(handle.key, arrays, {"session_value": name})
+                with self._lock:
+                    released = self._release([entry_key])
+        self._admit(session, handle, value)
+        self._invalidate(released)
+        return handle
+
+    def get(self, session, handle):
+        """The value behind ``handle`` or None if it has to be recomputed."""
+        if handle is None:
+            return None
+        entry_key = (session, handle.name)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry[0] is handle:
+                self._entries.move_to_end(entry_key)
+                self._sessions[session][1] = time.monotonic()
+                self.stats["hits"] += 1
+                return entry[1]
+        if handle.key is None:
+            self.stats["lost"] += 1
+            return None
+
+        cached = self.cache.get(handle.key)
+        if cached is None:
+            self.stats["lost"] += 1
+            return None
+        self.stats["reloads"] += 1
+        value = cached[0][SINGLE] if handle.single else cached[0]
+        self._admit(session, handle, value)
+        return value
+
+    def drop(self, session, name=None):
+        """
+        Forget one value, or the whole session when it ended: its resident
+        copies and its unkeyed scene cache entries. Shared entries stay.
+        """
+        def matches(entry_key):
+            return entry_key[0] == session and (name is None or entry_key[1] == name)
+
+        with self._lock:
+            for entry_key in [k for k in self._entries if matches(k)]:
+                self._remove(entry_key)
+            if name is None:
+                self._sessions.pop(session, None)
+            released = self._release([k for k in self._private if matches(k)])
+            self._publish()
+        self._invalidate(released)
+
+    def usage(self):
+        """Resident bytes in total and per session (largest first)."""
+        with self._lock:
+            sessions = sorted(self._sessions.items(), key=lambda item: -item[1][0])
+            return {
+                "resident_mb": round(self._bytes / MB, 2),
+                "global_budget_mb": round(self.global_budget / MB, 2),
+                "session_budget_mb": round(self.session_budget / MB, 2),
+                "sessions": {session: round(used / MB, 2) for session, (used, _) in sessions},
+                **self.stats,
+            }
+
+    # ==================== ACCOUNTING & EVICTION ====================
+
+    def _admit(self, session, handle, value):
+        now = time.monotonic()
+        entry_key = (session, handle.name)
+        with self._lock:
+            if entry_key in self._entries:
+                self._remove(entry_key)
+            state = self._sessions.setdefault(session, [0, now])
+            state[1] = now
+            if handle.nbytes <= self.session_budget:
+                self._entries[entry_key] = (handle, value)
+                state[0] += handle.nbytes
+                self._bytes += handle.nbytes
+            released = self._evict(session, now)
+            self._publish()
+        self._invalidate(released)
+
+    def _remove(self, entry_key):
+        handle, _ = self._entries.pop(entry_key)
+        self._sessions[entry_key[0]][0] -= handle.nbytes
+        self._bytes -= handle.nbytes
+
+    def _release(self, entry_keys):
+        """Stop tracking unkeyed cache entries; returns them for ``_invalidate`` outside the lock."""
+        return [entry_key for entry_key in entry_keys if self._private.pop(entry_key, None) is not None]
+
+    def _invalidate(self, entry_keys):
+        for entry_key in entry_keys:
+            self.cache.invalidate(self.cache_key("private", *entry_key))
+
+    def _evict_one(self, session, reason):
+        entry_key = next(k for k in self._entries if session is None or k[0] == session)
+        self._remove(entry_key)
+        self.stats["evictions"] += 1
+        increment("session_evictions", reason=reason)
+
+    def _evict(self, session, now):
+        """Apply the budgets; returns the unkeyed cache entries of idle sessions to invalidate."""
+        released = []
+        if now >= self._next_idle_check:
+            self._next_idle_check = now + IDLE_CHECK_SECONDS
+            for idle in [s for s, (_, seen) in self._sessions.items() if now - seen > self.idle_seconds]:
+                for entry_key in [k for k in self._entries if k[0] == idle]:
+                    self._remove(entry_key)
+                    increment("session_evictions", reason="idle")
+                del self._sessions[idle]
+                released += self._release([k for k in self._private if k[0] == idle])
+        while self._sessions[session][0] > self.session_budget:
+            self._evict_one(session, "session")
+        while self._bytes > self.global_budget:
+            self._evict_one(None, "global")
+        return released
+
+    def _publish(self):
+        set_gauge("session_resident_bytes", self._bytes)
+        set_gauge("session_resident_bytes_max", max((s[0] for s in self._sessions.values()), default=0))
+        set_gauge("sessions", len(self._sessions))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """Process-wide SessionStore shared by all dashboard sessions."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore()
+        return _store
@@ -0,0 +1,279 @@
+# utils/stac.py - STAC catalog + Cloud-Optimized GeoTIFF backend
+"""
+Alternative to the Sentinel Hub process API: search a STAC catalog and read
+only the farm window from Cloud-Optimized GeoTIFFs.
+
+``stackstac`` turns the matching items into a lazy ``xarray`` cube backed by
+dask. Every chunk is a windowed rasterio read (a few HTTP range requests)
+and GDAL picks the COG overview closest to the requested resolution, so a
+small farm never downloads a full 110 km granule. Chunks are read in
+parallel on a thread pool when the cube is computed. Select the backend
+with ``SATELLITE_BACKEND=stac``.
+
+``STAC_API_URL`` may also be a local directory of STAC item JSON files
+(see ``write_local_item``) whose assets point at local COGs. This stub
+catalog is searched in-process, so the backend can be exercised offline.
+"""
+import glob
+import json
+import os
+import threading
+
+import numpy as np
+
+from config import (
+    STAC_API_URL, STAC_COLLECTION, STAC_ASSETS, STAC_CHUNK_SIZE, STAC_READ_THREADS,
+    SCENE_MAX_CLOUD_COVER, SCENE_WINDOW_DAYS, SCL_INVALID_CLASSES
+)
+from utils.metrics import span
+from utils.satellite import DEFAULT_SIZE, select_clear_scenes, shared_fetch
+from utils.scene_cache import get_scene_cache
+
+# GDAL options for range-request reads of remote COGs
+GDAL_HTTP_OPTIONS = {
+    "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+    "GDAL_HTTP_MULTIRANGE": "YES",
+    "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": "YES",
+    "CPL_VSIL_CURL_ALLOWED_EXTENSIONS": ".tif,.tiff",
+    "VSI_CACHE": "TRUE",
+}
+
+
+def _item_date(item):
+    return item["properties"]["datetime"][:10]
+
+
+def _intersects(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+class LocalCatalog:
+    """Stub STAC API over a directory of item JSON files."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._items = None
+        self._lock = threading.Lock()
+
+    def items(self):
+        with self._lock:
+            if self._items is None:
+                items = []
+                pattern = os.path.join(self.directory, "**", "*.json")
+                for path in sorted(glob.glob(pattern, recursive=True)):
+                    with open(path, encoding="utf-8") as handle:
+                        item = json.load(handle)
+                    if item.get("type") != "Feature":
+                        continue
+                    # relative asset hrefs are relative to the item file
+                    for asset in item.get("assets", {}).values():
+                        href = asset["href"]
+                        if "://" not in href and not os.path.isabs(href):
+                            asset["href"] = os.path.normpath(os.path.join(os.path.dirname(path), href))
+                    items.append(item)
+                self._items = items
+        return self._items
+
+    def search(self, collection, bbox, date_from, date_to, max_cloud_cover=100, limit=100):
+        matches = [
+            item for item in self.items()
+            if item.get("collection", collection) == collection
+            and _intersects(item["bbox"], bbox)
+            and str(date_from) <= _item_date(item) <= str(date_to)
+            and (item["properties"].get("eo:cloud_cover") or 0) <= max_cloud_cover
+        ]
+        return sorted(matches, key=_item_date)[:limit]
+
+
+def write_local_item(directory, item_id, day, asset_paths, cloud_cover=0.0,
+                     collection=STAC_COLLECTION):
+    """
+    Write a STAC item JSON for local COGs (asset key -> file path) so a
+    directory can serve as a ``LocalCatalog``. Projection metadata is read
+    from the first asset. Returns the item path.
+    """
+    import rasterio
+    from rasterio.warp import transform_bounds
+
+    with rasterio.open(next(iter(asset_paths.values()))) as dataset:
+        bbox = list(transform_bounds(dataset.crs, "EPSG:4326", *dataset.bounds))
+        proj = {
+            "proj:epsg": dataset.crs.to_epsg(),
+            "proj:shape": [dataset.height, dataset.width],
+            "proj:transform": list(dataset.transform)[:6],
+        }
+
+    item = {
+        "type": "Feature",
+        "stac_version": "1.0.0",
+        "stac_extensions": ["https://stac-extensions.github.io/projection/v1.1.0/schema.json"],
+        "id": item_id,
+        "collection": collection,
+        "bbox": bbox,
+        "geometry": {
+            "type": "Polygon",
+            "coordinates": [[[bbox[0], bbox[1]], [bbox[2], bbox[1]], [bbox[2], bbox[3]],
+                             [bbox[0], bbox[3]], [bbox[0], bbox[1]]]],
+        },
+        "properties": {"datetime": f"{day}T00:00:00Z", "eo:cloud_cover": cloud_cover, **proj},
+        "assets": {
+            key: {"href": os.path.abspath(path), "type": "image/tiff; application=geotiff; profile=cloud-optimized"}
+            for key, path in asset_paths.items()
+        },
+        "links": [],
+    }
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{item_id}.json")
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(item, handle)
+    return path
+
+
+class StacSceneClient:
+    """
+    Scene access through STAC search and windowed COG reads.
+
+    Mirrors the ``SentinelHubClient`` methods used by the pipeline
+    (``get_available_data``, ``get_clear_dates``, ``fetch_satellite_data``)
+    so either backend can be returned by ``get_satellite_client()``.
+    """
+
+    def __init__(self, api_url=STAC_API_URL, collection=STAC_COLLECTION, assets=None,
+                 chunk_size=STAC_CHUNK_SIZE, read_threads=STAC_READ_THREADS, cache=None):
+        self.api_url = api_url
+        self.collection = collection
+        self.assets = dict(assets or STAC_ASSETS)
+        self.chunk_size = chunk_size
+        self.read_threads = read_threads
+        self.cache = cache if cache is not None else get_scene_cache()
+        self._catalog = None
+
+    def _open_catalog(self):
+        if self._catalog is None:
+            if os.path.isdir(self.api_url):
+                self._catalog = LocalCatalog(self.api_url)
+            else:
+                from pystac_client import Client
+
+                self._catalog = Client.open(self.api_url)
+        return self._catalog
+
+    # ==================== SEARCH ====================
+
+    def search(self, bbox, date_from, date_to, max_cloud_cover=100, limit=100):
+        """STAC item dicts over ``bbox`` in a date range, sorted by date."""
+        catalog = self._open_catalog()
+        if isinstance(catalog, LocalCatalog):
+            return catalog.search(self.collection, bbox, date_from, date_to, max_cloud_cover, limit)
+
+        search = catalog.search(
+            collections=[self.collection],
+            bbox=list(bbox),
+            datetime=f"{date_from}/{date_to}",
+            query={"eo:cloud_cover": {"lte": max_cloud_cover}},
+            max_items=limit,
+        )
+        return sorted((item.to_dict() for item in search.items()), key=_item_date)
+
+    def get_available_data(self, bbox, date_from, date_to, max_cloud_cover=100, limit=100):
+        """Acquisitions as ``id``/``date``/``cloud_cover`` dicts, like the Sentinel Hub catalog."""
+        return [
+            {
+                "id": item["id"],
+                "date": _item_date(item),
+                "cloud_cover": item["properties"].get("eo:cloud_cover"),
+            }
+            for item in self.search(bbox, date_from, date_to, max_cloud_cover, limit)
+        ]
+
+    def get_clear_dates(self, bbox, date_from, date_to, window_days=SCENE_WINDOW_DAYS,
+                        max_cloud_cover=SCENE_MAX_CLOUD_COVER):
+        """Least cloudy acquisition date of each window, from item metadata only."""
+        scenes = self.get_available_data(bbox, date_from, date_to, max_cloud_cover)
+        return [scene["date"] for scene in select_clear_scenes(scenes, window_days, max_cloud_cover)]
+
+    # ==================== READING ====================
+
+    def load_cube(self, bbox, date_from, date_to, size=DEFAULT_SIZE, bands=None,
+                  max_cloud_cover=SCENE_MAX_CLOUD_COVER, items=None):
+        """
+        Lazy ``(time, band, y, x)`` float32 cube on a north-up EPSG:4326 grid
+        of ``size`` = ``(width, height)`` pixels over ``bbox``.
+
+        Nothing is read until the cube (or a slice of it) is computed.
+        Reflectances are rescaled with the items' ``raster:bands`` metadata
+        and ``band`` coordinates use the keys of ``STAC_ASSETS``.
+        """
+        import stackstac
+        from rasterio.enums import Resampling
+
+        if items is None:
+            items = self.search(bbox, date_from, date_to, max_cloud_cover)
+        if not items:
+            raise ValueError(f"No {self.collection} items for {list(bbox)} {date_from}..{date_to}")
+
+        bands = list(bands or self.assets)
+        width, height = size
+        cube = stackstac.stack(
+            items,
+            assets=[self.assets[band] for band in bands],
+            epsg=4326,
+            bounds=tuple(bbox),
+            resolution=((bbox[2] - bbox[0]) / width, (bbox[3] - bbox[1]) / height),
+            snap_bounds=False,
+            chunksize=self.chunk_size,
+            resampling=Resampling.nearest,
+            # rescaling needs a float64 target (stackstac checks the cast of
+            # the scale); chunks are narrowed to float32 as they are read
+            dtype="float64",
+            fill_value=np.nan,
+            rescale=True,
+            gdal_env=stackstac.DEFAULT_GDAL_ENV.updated(always=GDAL_HTTP_OPTIONS),
+        )
+        cube = cube.isel(y=slice(0, height), x=slice(0, width)).astype(np.float32)
+        return cube.assign_coords(band=bands)
+
+    def compute(self, cube):
+        """Evaluate a lazy cube with parallel window reads."""
+        return cube.compute(scheduler="threads", num_workers=self.read_threads)
+
+    def fetch_satellite_data(self, bbox, date_from, date_to, script=None,
+                             size=DEFAULT_SIZE, max_cloud_cover=SCENE_MAX_CLOUD_COVER):
+        """
+        Most-recent mosaic of the date range as a ``(bands, H, W)`` array in
+        ``STAC_ASSETS`` order (the ``BANDS_SCRIPT`` layout). ``script`` is
+        accepted for interface compatibility; evalscripts cannot run against
+        COGs. Results are served from the scene cache when available.
+        """
+        import stackstac
+
+        def fetch():
+            with span("stac.fetch"):
+                cube = self.load_cube(bbox, date_from, date_to, size, max_cloud_cover=max_cloud_cover)
+                mosaic = stackstac.mosaic(cube, dim="time")  # latest item on top
+                return {"data": np.asarray(self.compute(mosaic).values, dtype=np.float32)}
+
+        key_script = f"stac:{self.api_url}:{self.collection}:{','.join(self.assets.values())}"
+        return self.cache.get_or_fetch(
+            bbox, date_from, date_to, key_script, shared_fetch(bbox, date_from, date_to, key_script, fetch)
+        )["data"]
+
+
+def ndvi_cube(cube, invalid_classes=SCL_INVALID_CLASSES):
+    """Lazy NDVI ``(time, y, x)`` from a ``load_cube`` result, SCL-masked when present."""
+    red, nir = cube.sel(band="B04"), cube.sel(band="B08")
+    ndvi = (nir - red) / (nir + red)
+    if "SCL" in cube.band.values:
+        ndvi = ndvi.where(~cube.sel(band="SCL").isin(list(invalid_classes)))
+    return ndvi.drop_vars("band", errors="ignore")
+
+
+_client = None
+
+
+def get_stac_client():
+    """Shared StacSceneClient for the process."""
+    global _client
+    if _client is None:
+        _client = StacSceneClient()
+    return _client
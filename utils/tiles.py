@@ -0,0 +1,222 @@
+# utils/tiles.py - XYZ tile rendering of index rasters
+"""
+Server-side map tiles for NDVI/NDWI layers.
+
+Index rasters are published into the ``SceneCache`` (``publish_index_layer``)
+and served as colour-mapped 256x256 PNG tiles from a small aiohttp service:
+
+    python -m utils.tiles --port 8502
+    GET /tiles/<layer>/<index>/<z>/<x>/<y>.png
+
+Each layer gets an overview pyramid (2x2 NaN-aware means) so low zoom levels
+read a decimated raster, and encoded tiles are kept in a byte-bounded LRU.
+The dashboard adds a ``folium.TileLayer`` pointing at ``TILE_SERVER_URL``,
+so the browser fetches only the tiles in view instead of one huge overlay.
+"""
+import argparse
+import asyncio
+import io
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from config import TILE_CACHE_MAX_MB, TILE_SERVER_PORT
+from utils.colormaps import apply_colormap
+from utils.metrics import increment, prometheus_text, span
+from utils.scene_cache import get_scene_cache, scene_key
+
+TILE_SIZE = 256
+MAX_PYRAMIDS = 16
+
+
+def tile_bounds(z, x, y):
+    """``[min_lon, min_lat, max_lon, max_lat]`` of a Web Mercator tile."""
+    n = 2 ** z
+    lon = lambda tx: tx / n * 360.0 - 180.0  # noqa: E731
+    lat = lambda ty: math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))  # noqa: E731
+    return [lon(x), lat(y + 1), lon(x + 1), lat(y)]
+
+
+def build_overviews(raster, min_size=TILE_SIZE):
+    """Pyramid ``[full, 1/2, 1/4, ...]`` using NaN-aware 2x2 means."""
+    levels = [np.asarray(raster, dtype=np.float32)]
+    while min(levels[-1].shape) >= 2 * min_size:
+        level = levels[-1]
+        h, w = (level.shape[0] // 2) * 2, (level.shape[1] // 2) * 2
+        blocks = level[:h, :w].reshape(h // 2, 2, w // 2, 2)
+        valid = ~np.isnan(blocks)
+        total = np.where(valid, blocks, 0).sum(axis=(1, 3))
+        count = valid.sum(axis=(1, 3))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            levels.append((total / count).astype(np.float32))
+    return levels
+
+
+def publish_index_layer(bbox, rasters, label, cache=None):
+    """
+    Store index rasters (name -> 2-D array over ``bbox``) for tile serving.
+
+    ``label`` identifies the source (e.g. scene date). ``rasters`` may be a
+    callable returning the dict; it is only called when the layer is not
+    published yet. Returns the layer id used in tile URLs.
+    """
+    cache = cache or get_scene_cache()
+    layer = scene_key(bbox, label, label, "index-layer")
+    if cache.get(layer) is None:
+        cache.put(layer, rasters() if callable(rasters) else rasters,
+                  {"bbox": list(bbox), "label": str(label)})
+    return layer
+
+
+class TileRenderer:
+    """Render and cache PNG tiles for published layers."""
+
+    def __init__(self, cache=None, max_bytes=None):
+        self.cache = cache or get_scene_cache()
+        self.max_bytes = TILE_CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        self._tiles = OrderedDict()
+        self._tile_bytes = 0
+        self._pyramids = OrderedDict()
+        self._lock = threading.Lock()
+        self._empty = None
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _pyramid(self, layer, index):
+        key = (layer, index)
+        with self._lock:
+            if key in self._pyramids:
+                self._pyramids.move_to_end(key)
+                return self._pyramids[key]
+
+        cached = self.cache.get(layer)
+        if cached is None or index not in cached[0]:
+            return None
+        bands, meta = cached
+        pyramid = (build_overviews(bands[index]), meta["bbox"])
+        with self._lock:
+            self._pyramids[key] = pyramid
+            while len(self._pyramids) > MAX_PYRAMIDS:
+                self._pyramids.popitem(last=False)
+        return pyramid
+
+    def empty_tile(self):
+        if self._empty is None:
+            self._empty = self._encode(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8))
+        return self._empty
+
+    @staticmethod
+    def _encode(rgba):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.fromarray(rgba).save(buffer, format="PNG", optimize=False, compress_level=6)
+        return buffer.getvalue()
+
+    def render(self, layer, index, z, x, y):
+        """PNG bytes for one tile, or ``None`` if the layer is unknown."""
+        key = (layer, index, z, x, y)
+        with self._lock:
+            if key in self._tiles:
+                self._tiles.move_to_end(key)
+                self.stats["hits"] += 1
+                increment("cache_requests", cache="tile", result="hit")
+                return self._tiles[key]
+        self.stats["misses"] += 1
+        increment("cache_requests", cache="tile", result="miss")
+
+        pyramid = self._pyramid(layer, index)
+        if pyramid is None:
+            return None
+        with span("tiles.render"):
+            png = self._render_tile(pyramid, index, z, x, y)
+
+        with self._lock:
+            if key not in self._tiles:
+                self._tiles[key] = png
+                self._tile_bytes += len(png)
+            while self._tile_bytes > self.max_bytes and self._tiles:
+                _, evicted = self._tiles.popitem(last=False)
+                self._tile_bytes -= len(evicted)
+        return png
+
+    def _render_tile(self, pyramid, index, z, x, y):
+        levels, bbox = pyramid
+        tb = tile_bounds(z, x, y)
+        if tb[2] <= bbox[0] or tb[0] >= bbox[2] or tb[3] <= bbox[1] or tb[1] >= bbox[3]:
+            return self.empty_tile()
+
+        # coarsest overview that still has at least one pixel per tile pixel
+        full = levels[0]
+        src_dpp = (bbox[2] - bbox[0]) / full.shape[1]
+        tile_dpp = (tb[2] - tb[0]) / TILE_SIZE
+        level = int(np.clip(math.floor(math.log2(max(tile_dpp / src_dpp, 1.0))), 0, len(levels) - 1))
+        raster = levels[level]
+        height, width = raster.shape
+
+        # pixel-centre coordinates of the tile (Mercator rows are non-linear)
+        n = 2 ** z
+        steps = (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE
+        lons = (x + steps) / n * 360.0 - 180.0
+        lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + steps) / n))))
+
+        cols = np.floor((lons - bbox[0]) / (bbox[2] - bbox[0]) * width).astype(np.int64)
+        rows = np.floor((bbox[3] - lats) / (bbox[3] - bbox[1]) * height).astype(np.int64)
+        col_ok = (cols >= 0) & (cols < width)
+        row_ok = (rows >= 0) & (rows < height)
+
+        values = raster[np.clip(rows, 0, height - 1)][:, np.clip(cols, 0, width - 1)]
+        values[~row_ok, :] = np.nan
+        values[:, ~col_ok] = np.nan
+        return self._encode(apply_colormap(values, index))
+
+
+# ==================== HTTP SERVICE ====================
+
+def create_app(renderer=None):
+    from aiohttp import web
+
+    renderer = renderer or TileRenderer()
+
+    async def tile(request):
+        try:
+            z, x = int(request.match_info["z"]), int(request.match_info["x"])
+            y = int(request.match_info["y"])
+        except ValueError:
+            raise web.HTTPBadRequest()
+        png = await asyncio.get_running_loop().run_in_executor(
+            None, renderer.render, request.match_info["layer"], request.match_info["index"], z, x, y
+        )
+        if png is None:
+            raise web.HTTPNotFound()
+        return web.Response(body=png, content_type="image/png", headers={
+            "Cache-Control": "public, max-age=3600",
+            "Access-Control-Allow-Origin": "*",
+        })
+
+    async def health(request):
+        return web.json_response({"status": "ok", **renderer.stats})
+
+    async def metrics(request):
+        return web.Response(text=prometheus_text(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/tiles/{layer}/{index}/{z}/{x}/{y}.png", tile)
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics)
+    return app
+
+
+def main(argv=None):
+    from aiohttp import web
+
+    parser = argparse.ArgumentParser(description="Agri-Mind index tile server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=TILE_SERVER_PORT)
+    args = parser.parse_args(argv)
+    web.run_app(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
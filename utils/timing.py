@@ -0,0 +1,67 @@
+# utils/timing.py - Startup and rerun timing for the dashboard
+"""
+Import and script-run timings for the Streamlit app.
+
+Streamlit re-executes ``app.py`` on every interaction but keeps imported
+modules, so this module's state lives for the whole server process.
+``timed_import()`` loads a view or dependency on first use and records how
+long that took (including whatever it pulled in for the first time);
+``record_run()`` keeps the last script run times. ``report()`` summarises
+both and is shown in the sidebar when ``TIMING_REPORT=true``.
+``benchmarks/bench_startup.py`` measures the same numbers from a cold
+process for tracking across releases.
+"""
+import importlib
+import sys
+import threading
+import time
+from collections import deque
+
+PROCESS_START = time.perf_counter()
+MAX_RUNS = 200
+
+_lock = threading.Lock()
+_imports = {}
+_runs = deque(maxlen=MAX_RUNS)
+_first_run = None
+
+
+def timed_import(name):
+    """Import ``name`` on first use and record the import time."""
+    module = sys.modules.get(name)
+    # a module another session is still importing is already in sys.modules;
+    # import_module() waits for it to finish
+    if module is not None and not getattr(module.__spec__, "_initializing", False):
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    with _lock:
+        _imports.setdefault(name, time.perf_counter() - start)
+    return module
+
+
+def record_run(seconds):
+    """Record one full script run (the first one is kept as the cold run)."""
+    global _first_run
+    with _lock:
+        if _first_run is None:
+            _first_run = seconds
+        _runs.append(seconds)
+
+
+def report():
+    """Dict of import times (slowest first) and script run statistics, in seconds."""
+    with _lock:
+        last_run = _runs[-1] if _runs else None
+        runs = sorted(_runs)
+        imports = sorted(_imports.items(), key=lambda item: -item[1])
+        first_run = _first_run
+    return {
+        "uptime_s": round(time.perf_counter() - PROCESS_START, 1),
+        "imports_s": {name: round(seconds, 3) for name, seconds in imports},
+        "first_run_s": None if first_run is None else round(first_run, 3),
+        "runs": len(runs),
+        "last_run_s": None if last_run is None else round(last_run, 3),
+        "median_run_s": round(runs[len(runs) // 2], 3) if runs else None,
+        "p95_run_s": round(runs[min(len(runs) - 1, int(len(runs) * 0.95))], 3) if runs else None,
+    }
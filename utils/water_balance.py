@@ -0,0 +1,280 @@
+# utils/water_balance.py - Vectorized irrigation scheduling (FAO-56 water balance)
+"""
+Root-zone water balance and irrigation schedules for many farms at once.
+
+``IrrigationScheduler`` holds ``(farms, days)`` arrays for:
+
+* reference evapotranspiration ET0 (Hargreaves: daily min/max temperature
+  and extraterrestrial radiation from latitude and day of year),
+* crop evapotranspiration ETc = ET0 x Kc, with Kc following the FAO-56
+  growth stages of each crop (``kc``/``kc_stages`` in ``CROPS_CONFIG``),
+* root-zone depletion after effective rainfall, and
+* irrigation events: the root zone is refilled when depletion reaches the
+  readily available water (``depletion_fraction`` x ``taw_mm``) or the
+  crop's ``irrigation_interval`` has passed. Gross depth is the net depth
+  divided by ``WATER_EFFICIENCY`` of the irrigation type.
+
+Days depend on each other and are stepped in a loop; every step processes
+all farms together. A new NDWI or weather observation recomputes only the
+affected farms from the observation day on (``update_ndwi``,
+``update_weather``).
+"""
+import numpy as np
+
+from config import CROPS_CONFIG, FORECAST_DAYS, IRRIGATION_TYPES, WATER_EFFICIENCY
+
+EFFECTIVE_RAIN_FRACTION = 0.8  # share of rainfall that reaches the root zone
+DIURNAL_RANGE_C = 12.0         # assumed Tmax - Tmin when only Tmax is known
+M3_PER_MM_FEDDAN = 4.2         # 1 mm over one feddan (4200 m2)
+SOLAR_CONSTANT = 0.0820        # MJ m-2 min-1
+
+# trigger codes in ``IrrigationScheduler.trigger``
+TRIGGER_NONE, TRIGGER_DEPLETION, TRIGGER_INTERVAL = 0, 1, 2
+
+
+def extraterrestrial_radiation(lat_deg, day_of_year):
+    """FAO-56 Ra (MJ m-2 day-1) for latitudes ``(N, 1)`` and days ``(D,)``."""
+    phi = np.radians(lat_deg)
+    angle = 2 * np.pi * np.asarray(day_of_year, dtype=np.float64) / 365
+    dr = 1 + 0.033 * np.cos(angle)
+    delta = 0.409 * np.sin(angle - 1.39)
+    omega = np.arccos(np.clip(-np.tan(phi) * np.tan(delta), -1.0, 1.0))
+    return (24 * 60 / np.pi) * SOLAR_CONSTANT * dr * (
+        omega * np.sin(phi) * np.sin(delta) + np.cos(phi) * np.cos(delta) * np.sin(omega)
+    )
+
+
+def hargreaves_et0(tmax, tmin, ra):
+    """Reference ET (mm/day) from temperatures (°C) and Ra (MJ m-2 day-1)."""
+    tmean = (tmax + tmin) / 2
+    return 0.0023 * 0.408 * ra * (tmean + 17.8) * np.sqrt(np.maximum(tmax - tmin, 0.0))
+
+
+CROP_NAMES = list(CROPS_CONFIG)
+
+
+def _crop_table(key, reduce=None):
+    values = [CROPS_CONFIG[crop][key] for crop in CROP_NAMES]
+    return np.array([reduce(v) for v in values] if reduce else values, dtype=np.float64)
+
+
+def crop_kc(crop_codes, days_after_planting):
+    """FAO-56 Kc curve for ``(N,)`` crop codes at ``(N, D)`` days after planting."""
+    kc = np.full(days_after_planting.shape, np.nan, dtype=np.float64)
+    for code in np.unique(crop_codes):
+        config = CROPS_CONFIG[CROP_NAMES[code]]
+        season = float(np.mean(config["growing_season"]))
+        ini, mid, end = config["kc"]
+        breaks = np.concatenate([[0.0], np.cumsum(config["kc_stages"])])
+        rows = crop_codes == code
+        fraction = (days_after_planting[rows] % season) / season
+        kc[rows] = np.interp(fraction, breaks, [ini, ini, mid, mid, end])
+    return kc
+
+
+def _efficiency(irrigation_type):
+    method = IRRIGATION_TYPES.get(irrigation_type, irrigation_type)
+    return WATER_EFFICIENCY.get(str(method).lower(), min(WATER_EFFICIENCY.values()))
+
+
+def _column(farms, key, default=np.nan):
+    return np.fromiter((farm.get(key, default) for farm in farms), dtype=np.float64, count=len(farms))
+
+
+class IrrigationScheduler:
+    """
+    Water balance for N farms over D days.
+
+    ``farms`` use the batch/CSV field names: ``crop``, ``lat``,
+    ``irrigation_type`` and optionally ``farm_id``, ``ndwi`` (current mean,
+    sets the starting depletion), ``days_after_planting`` (default: middle
+    of the season) and ``days_since_irrigation`` (default: half the
+    interval). ``weather`` holds ``(N, D)`` arrays ``temp`` (max °C),
+    ``rain`` (mm) and optionally ``temp_min``; ``dates`` are the D days.
+    """
+
+    def __init__(self, farms, weather, dates):
+        self.dates = list(dates)
+        self.farm_ids = [str(farm.get("farm_id", i)) for i, farm in enumerate(farms)]
+        self._index = {farm_id: i for i, farm_id in enumerate(self.farm_ids)}
+        n, d = len(farms), len(self.dates)
+
+        # per-crop parameters are gathered by crop code
+        codes = {crop: i for i, crop in enumerate(CROP_NAMES)}
+        self.crop_codes = np.fromiter((codes[farm["crop"]] for farm in farms), dtype=np.int64, count=n)
+        types = [farm.get("irrigation_type") for farm in farms]
+        efficiency = {t: _efficiency(t) for t in set(types)}
+        self.efficiency = np.fromiter((efficiency[t] for t in types), dtype=np.float64, count=n)
+        self.lat = _column(farms, "lat")[:, None]
+        self.taw = _crop_table("taw_mm")[self.crop_codes]
+        self.raw = self.taw * _crop_table("depletion_fraction")[self.crop_codes]
+        self.interval = _crop_table("irrigation_interval")[self.crop_codes]
+        self.water_range = _crop_table("optimal_water")[self.crop_codes]
+        dap = _column(farms, "days_after_planting")
+        half_season = _crop_table("growing_season", np.mean)[self.crop_codes] / 2
+        dap = np.where(np.isnan(dap), half_season, dap)
+        self.days_after_planting = dap[:, None] + np.arange(d)
+        self.day_of_year = np.array([day.timetuple().tm_yday for day in self.dates])
+
+        self.tmax = np.array(weather["temp"], dtype=np.float64).reshape(n, d)
+        tmin = weather.get("temp_min")
+        self.tmin = (self.tmax - DIURNAL_RANGE_C) if tmin is None else np.array(tmin, dtype=np.float64).reshape(n, d)
+        self.rain = np.array(weather["rain"], dtype=np.float64).reshape(n, d)
+
+        # state at the start of day 0
+        self.depletion0 = self.depletion_from_ndwi(_column(farms, "ndwi"))
+        since = _column(farms, "days_since_irrigation")
+        self.since0 = np.where(np.isnan(since), self.interval / 2, since)
+
+        self.kc = crop_kc(self.crop_codes, self.days_after_planting)
+        self.et0 = np.empty((n, d))
+        self.etc = np.empty((n, d))
+        self.depletion = np.empty((n, d))   # end of day, before irrigation (mm)
+        self.net_mm = np.empty((n, d))
+        self.gross_mm = np.empty((n, d))
+        self.trigger = np.empty((n, d), dtype=np.uint8)
+        self._since = np.empty((n, d))      # days since irrigation at end of day
+        self._update_et(slice(None), slice(None))
+        self._run(np.arange(n), 0)
+
+    def __len__(self):
+        return len(self.farm_ids)
+
+    def index(self, farm_id):
+        return self._index[str(farm_id)]
+
+    def depletion_from_ndwi(self, ndwi, rows=slice(None)):
+        """
+        Starting depletion (mm): 0 at the top of the crop's optimal NDWI
+        range, RAW at its bottom; unknown NDWI starts at RAW / 2.
+        """
+        low, high = self.water_range[rows, 0], self.water_range[rows, 1]
+        fraction = np.clip((high - ndwi) / (high - low), 0.0, 1.5)
+        return np.where(np.isnan(fraction), 0.5, fraction) * self.raw[rows]
+
+    # ==================== ENGINE ====================
+
+    def _update_et(self, rows, days):
+        ra = extraterrestrial_radiation(self.lat[rows], self.day_of_year[days])
+        self.et0[rows, days] = hargreaves_et0(self.tmax[rows, days], self.tmin[rows, days], ra)
+        self.etc[rows, days] = self.et0[rows, days] * self.kc[rows, days]
+
+    def _run(self, rows, first_day, depletion=None):
+        """Step the balance for ``rows`` from ``first_day`` to the end."""
+        if first_day == 0:
+            since = self.since0[rows].copy()
+            dr = self.depletion0[rows].copy() if depletion is None else depletion
+        else:
+            since = self._since[rows, first_day - 1].copy()
+            dr = (self.depletion[rows, first_day - 1] - self.net_mm[rows, first_day - 1]
+                  if depletion is None else depletion)
+
+        taw, raw = self.taw[rows], self.raw[rows]
+        interval, efficiency = self.interval[rows], self.efficiency[rows]
+        for day in range(first_day, len(self.dates)):
+            peff = EFFECTIVE_RAIN_FRACTION * self.rain[rows, day]
+            dr = np.clip(dr + self.etc[rows, day] - peff, 0.0, taw)
+            since = since + 1
+            by_depletion = dr >= raw
+            by_interval = ~by_depletion & (since >= interval) & (dr > 0)
+            net = np.where(by_depletion | by_interval, dr, 0.0)
+
+            self.depletion[rows, day] = dr
+            self.net_mm[rows, day] = net
+            self.gross_mm[rows, day] = net / efficiency
+            self.trigger[rows, day] = np.where(
+                by_depletion, TRIGGER_DEPLETION, np.where(by_interval, TRIGGER_INTERVAL, TRIGGER_NONE)
+            )
+            dr = dr - net
+            since = np.where(net > 0, 0.0, since)
+            self._since[rows, day] = since
+
+    # ==================== INCREMENTAL UPDATES ====================
+
+    def update_ndwi(self, farm_ids, ndwi, day=0):
+        """
+        New NDWI observations (one per farm) at the start of ``day`` (index
+        or date): reset those farms' depletion and recompute them from that
+        day on.
+        """
+        rows = np.array([self.index(farm_id) for farm_id in np.atleast_1d(farm_ids)])
+        day = self._day_index(day)
+        depletion = self.depletion_from_ndwi(np.atleast_1d(np.asarray(ndwi, dtype=np.float64)), rows)
+        if day == 0:
+            self.depletion0[rows] = depletion
+        self._run(rows, day, depletion)
+
+    def update_weather(self, day, temp=None, temp_min=None, rain=None, farm_ids=None):
+        """
+        Replace weather for ``day`` (index or date) with new observations or
+        a newer forecast, for all farms or ``farm_ids`` (values per farm or
+        scalars), and recompute the affected farms from that day on.
+        """
+        rows = (np.arange(len(self)) if farm_ids is None
+                else np.array([self.index(farm_id) for farm_id in np.atleast_1d(farm_ids)]))
+        day = self._day_index(day)
+        for name, values in (("tmax", temp), ("tmin", temp_min), ("rain", rain)):
+            if values is not None:
+                getattr(self, name)[rows, day] = values
+        self._update_et(rows, slice(day, day + 1))
+        self._run(rows, day)
+
+    def _day_index(self, day):
+        return day if isinstance(day, (int, np.integer)) else self.dates.index(day)
+
+    # ==================== RESULTS ====================
+
+    def need_scores(self):
+        """0-100 irrigation need per farm: first-day depletion relative to RAW."""
+        return np.clip(np.round(100 * self.depletion[:, 0] / self.raw), 0, 100).astype(np.int64)
+
+    def volumes_m3_per_feddan(self):
+        return self.gross_mm * M3_PER_MM_FEDDAN
+
+    def farm_schedule(self, farm_id):
+        """Irrigation events for one farm as a list of dicts."""
+        i = self.index(farm_id)
+        return [
+            {
+                "date": self.dates[day],
+                "gross_mm": round(float(self.gross_mm[i, day]), 1),
+                "volume_m3_per_feddan": round(float(self.gross_mm[i, day] * M3_PER_MM_FEDDAN), 1),
+                "trigger": int(self.trigger[i, day]),
+                "rain_mm": round(float(self.rain[i, day]), 1),
+                "etc_mm": round(float(self.etc[i, day]), 2),
+            }
+            for day in np.flatnonzero(self.net_mm[i] > 0)
+        ]
+
+
+def forecast_weather(farms, days=FORECAST_DAYS):
+    """
+    ``(dates, weather)`` for farms from the gridded forecast store, with the
+    demo forecast for farms the store does not cover.
+    """
+    from utils.weather import farm_forecast, get_weather_store
+
+    lats = np.array([float(farm["lat"]) for farm in farms])
+    lons = np.array([float(farm["lon"]) for farm in farms])
+    first = farm_forecast(lats[0], lons[0], days)
+    dates = first["date"]
+    weather = {name: np.full((len(farms), days), np.nan) for name in ("temp", "temp_min", "rain")}
+    store_dates, values = get_weather_store().interpolate(lats, lons, ["temp_max", "temp_min", "rain"])
+    if store_dates is not None and set(dates) <= set(store_dates):
+        columns = [store_dates.index(day) for day in dates]
+        weather["temp"][:] = values["temp_max"][:, columns]
+        weather["temp_min"][:] = values["temp_min"][:, columns]
+        weather["rain"][:] = values["rain"][:, columns]
+
+    for i in np.flatnonzero(np.isnan(weather["temp"]).any(axis=1)):
+        forecast = first if i == 0 else farm_forecast(lats[i], lons[i], days)
+        weather["temp"][i] = forecast["temp"]
+        weather["rain"][i] = forecast["rain"]
+        weather["temp_min"][i] = forecast.get("temp_min", np.asarray(forecast["temp"]) - DIURNAL_RANGE_C)
+    return dates, weather
+
+
+def schedule_farms(farms, days=FORECAST_DAYS):
+    """IrrigationScheduler for farms on the current forecast."""
+    dates, weather = forecast_weather(farms, days)
+    return IrrigationScheduler(farms, weather, dates)
@@ -0,0 +1,453 @@
+# utils/weather.py - Gridded weather forecast ingestion and per-farm lookups
+"""
+Daily weather forecasts on a regular lat/lon grid.
+
+Forecasts are ingested offline in bulk, one request per grid node per update
+cycle, instead of per farm per rerun:
+
+    python -m utils.weather ingest --farms farms.csv      # nodes around farms
+    python -m utils.weather ingest --bbox 29.8 29.9 31.6 31.3
+    python -m utils.weather ingest --source fixtures/weather
+
+Nodes are fetched from OpenWeatherMap's One Call API (``OPENWEATHER_API_KEY``)
+or read from a fixture directory of the same JSON responses
+(``<lat>_<lon>.json``), so ingestion runs without network. All variables
+live in one ``.npz`` file at ``WEATHER_STORE_PATH`` as ``(day, lat, lon)``
+float32 arrays. It is published atomically and small enough to keep in
+memory: the whole Egypt grid for a week is a few MB.
+
+Farm lookups (``WeatherStore.interpolate``) bilinearly interpolate any number
+of points at once; missing nodes are skipped by renormalizing the weights.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+from config import (
+    FORECAST_DAYS, OPENWEATHER_API_KEY, OPENWEATHER_URL, WEATHER_GRID_BBOX,
+    WEATHER_GRID_STEP_DEG, WEATHER_RATE_LIMIT, WEATHER_SOURCE, WEATHER_STORE_PATH,
+    WEATHER_UPDATE_HOURS, FETCH_CONCURRENCY, FETCH_MAX_RETRIES
+)
+from utils.metrics import increment
+
+logger = logging.getLogger(__name__)
+
+# One Call ``daily`` fields -> stored variables
+VARIABLES = {
+    "temp_max": lambda day: day["temp"]["max"],
+    "temp_min": lambda day: day["temp"]["min"],
+    "rain": lambda day: day.get("rain", 0.0),
+    "humidity": lambda day: day.get("humidity", np.nan),
+    "wind_speed": lambda day: day.get("wind_speed", np.nan),
+}
+STORE_DAYS = FORECAST_DAYS + 1  # One Call returns today + 7 days
+
+
+# ==================== GRID ====================
+
+class WeatherGrid:
+    """Regular grid of nodes ``lat = min_lat + i*step``, ``lon = min_lon + j*step``."""
+
+    def __init__(self, bbox=WEATHER_GRID_BBOX, step=WEATHER_GRID_STEP_DEG):
+        self.bbox = tuple(float(v) for v in bbox)
+        self.step = float(step)
+        self.nx = int(round((self.bbox[2] - self.bbox[0]) / self.step)) + 1
+        self.ny = int(round((self.bbox[3] - self.bbox[1]) / self.step)) + 1
+
+    @property
+    def shape(self):
+        return self.ny, self.nx
+
+    def node(self, iy, ix):
+        """``(lat, lon)`` of a node."""
+        return (round(self.bbox[1] + iy * self.step, 6), round(self.bbox[0] + ix * self.step, 6))
+
+    def fractional_index(self, lats, lons):
+        """Fractional ``(y, x)`` node coordinates of points, clipped to the grid."""
+        fy = (np.asarray(lats, dtype=np.float64) - self.bbox[1]) / self.step
+        fx = (np.asarray(lons, dtype=np.float64) - self.bbox[0]) / self.step
+        return np.clip(fy, 0, self.ny - 1), np.clip(fx, 0, self.nx - 1)
+
+    def nodes_around(self, lats, lons):
+        """Sorted ``(iy, ix)`` nodes needed to interpolate the given points."""
+        fy, fx = self.fractional_index(lats, lons)
+        y0, x0 = np.floor(fy).astype(np.int64), np.floor(fx).astype(np.int64)
+        y1, x1 = np.minimum(y0 + 1, self.ny - 1), np.minimum(x0 + 1, self.nx - 1)
+        nodes = set()
+        for ys in (y0, y1):
+            for xs in (x0, x1):
+                nodes.update(zip(ys.tolist(), xs.tolist()))
+        return sorted(nodes)
+
+    def nodes_in_bbox(self, bbox):
+        (y0, y1), (x0, x1) = (
+            (max(0, math.floor((bbox[1] - self.bbox[1]) / self.step)),
+             min(self.ny - 1, math.ceil((bbox[3] - self.bbox[1]) / self.step))),
+            (max(0, math.floor((bbox[0] - self.bbox[0]) / self.step)),
+             min(self.nx - 1, math.ceil((bbox[2] - self.bbox[0]) / self.step))),
+        )
+        return [(iy, ix) for iy in range(y0, y1 + 1) for ix in range(x0, x1 + 1)]
+
+    def all_nodes(self):
+        return [(iy, ix) for iy in range(self.ny) for ix in range(self.nx)]
+
+
+def fixture_name(lat, lon):
+    return f"{lat:.2f}_{lon:.2f}.json"
+
+
+def parse_onecall(response):
+    """``(first_date, {variable: [value per day]})`` from a One Call response."""
+    offset = response.get("timezone_offset", 0)
+    daily = response["daily"]
+    first = datetime.fromtimestamp(daily[0]["dt"] + offset, timezone.utc).date()
+    return first, {name: [float(get(day)) for day in daily] for name, get in VARIABLES.items()}
+
+
+# ==================== SOURCES ====================
+
+class FixtureSource:
+    """Node forecasts from a directory of One Call JSON files (no network)."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def fetch_many(self, points):
+        """``{(lat, lon): response}`` for the points that have a fixture."""
+        responses = {}
+        for lat, lon in points:
+            path = os.path.join(self.directory, fixture_name(lat, lon))
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as handle:
+                    responses[(lat, lon)] = json.load(handle)
+        return responses
+
+
+class DemoSource:
+    """Synthetic One Call responses (``DemoDataLoader.get_demo_onecall``)."""
+
+    def fetch_many(self, points):
+        from utils.demo_mode import DemoDataLoader
+
+        loader = DemoDataLoader()
+        return {(lat, lon): loader.get_demo_onecall(lat, lon) for lat, lon in points}
+
+
+class OpenWeatherSource:
+    """
+    One Call API client: concurrent GETs under a shared ``TokenBucket``
+    (``WEATHER_RATE_LIMIT`` per second) with retries on 429/5xx.
+    """
+
+    def __init__(self, api_key=OPENWEATHER_API_KEY, url=OPENWEATHER_URL, rate=WEATHER_RATE_LIMIT,
+                 concurrency=FETCH_CONCURRENCY, max_retries=FETCH_MAX_RETRIES, backoff_base=0.5):
+        if not api_key:
+            raise ValueError("OPENWEATHER_API_KEY is not set")
+        self.api_key = api_key
+        self.url = url
+        self.rate = rate
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+
+    async def _fetch(self, session, bucket, lat, lon):
+        from utils.async_fetch import FetchError, RETRY_STATUSES
+        import aiohttp
+
+        params = {"lat": lat, "lon": lon, "units": "metric", "appid": self.api_key,
+                  "exclude": "current,minutely,hourly,alerts"}
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            try:
+                async with session.get(self.url, params=params) as resp:
+                    if resp.status == 200:
+                        body = await resp.read()
+                        increment("bytes_fetched", len(body), source="openweather")
+                        return json.loads(body)
+                    last_error = FetchError(resp.status, (await resp.text())[:200])
+                    if resp.status not in RETRY_STATUSES:
+                        raise last_error
+            except aiohttp.ClientError as exc:
+                last_error = FetchError(0, str(exc))
+            if attempt < self.max_retries:
+                await asyncio.sleep(self.backoff_base * (2 ** attempt) * (0.5 + random.random()))
+        raise last_error
+
+    async def _fetch_all(self, points):
+        from utils.async_fetch import TokenBucket
+        import aiohttp
+
+        bucket = TokenBucket(self.rate)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        async with aiohttp.ClientSession(connector=connector,
+                                         timeout=aiohttp.ClientTimeout(total=60)) as session:
+            return await asyncio.gather(
+                *(self._fetch(session, bucket, lat, lon) for lat, lon in points),
+                return_exceptions=True
+            )
+
+    def fetch_many(self, points):
+        responses = {}
+        for point, result in zip(points, asyncio.run(self._fetch_all(points))):
+            if isinstance(result, Exception):
+                logger.warning("Weather fetch failed for %s: %s", point, result)
+            else:
+                responses[point] = result
+        return responses
+
+
+def open_source(source=WEATHER_SOURCE):
+    """``openweather``, ``demo`` or a fixture directory."""
+    if source == "openweather":
+        return OpenWeatherSource()
+    if source == "demo":
+        return DemoSource()
+    if os.path.isdir(source):
+        return FixtureSource(source)
+    raise ValueError(f"Unknown WEATHER_SOURCE: {source}")
+
+
+# ==================== STORE ====================
+
+class WeatherStore:
+    """
+    Forecast arrays for the grid in one ``.npz`` file.
+
+    The file is loaded once and reloaded when another process publishes a
+    new cycle (checked by mtime), so lookups never touch the disk.
+    """
+
+    def __init__(self, path=WEATHER_STORE_PATH, grid=None):
+        self.path = path
+        self.grid = grid or WeatherGrid()
+        self._data = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _empty(self, start):
+        shape = (STORE_DAYS,) + self.grid.shape
+        return {
+            "start": start,
+            "updated": np.zeros(self.grid.shape, dtype=np.float64),
+            **{name: np.full(shape, np.nan, dtype=np.float32) for name in VARIABLES},
+        }
+
+    def load(self):
+        """Current arrays (``start`` date, ``updated`` epoch per node, variables) or None."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if mtime != self._mtime:
+                with np.load(self.path) as npz:
+                    if (tuple(npz["bbox"]) != self.grid.bbox or float(npz["step"]) != self.grid.step):
+                        logger.warning("Weather store %s was built for another grid; ignoring it", self.path)
+                        data = None
+                    else:
+                        data = {name: npz[name] for name in ("updated",) + tuple(VARIABLES)}
+                        data["start"] = date.fromordinal(int(npz["start"]))
+                self._data, self._mtime = data, mtime
+            return self._data
+
+    def save(self, data):
+        """Publish arrays atomically (write a temp file, then rename)."""
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        tmp = os.path.join(directory, f".{uuid.uuid4().hex}.tmp.npz")
+        np.savez(
+            tmp, bbox=np.array(self.grid.bbox), step=np.array(self.grid.step),
+            start=np.array(data["start"].toordinal()),
+            **{name: data[name] for name in ("updated",) + tuple(VARIABLES)}
+        )
+        os.replace(tmp, self.path)
+
+    def stale_nodes(self, nodes, max_age_hours=WEATHER_UPDATE_HOURS, now=None):
+        """Nodes not updated within ``max_age_hours``."""
+        data = self.load()
+        if data is None:
+            return list(nodes)
+        cutoff = (now or time.time()) - max_age_hours * 3600
+        return [(iy, ix) for iy, ix in nodes if data["updated"][iy, ix] < cutoff]
+
+    def ingest(self, source, nodes, now=None):
+        """
+        Fetch ``nodes`` from ``source`` (one request each) and merge them into
+        the store. The cycle's window starts at the earliest forecast day
+        received; overlapping days of older cycles are kept for other nodes.
+        Returns the number of nodes written.
+        """
+        points = [self.grid.node(iy, ix) for iy, ix in nodes]
+        responses = source.fetch_many(points)
+        parsed = {point: parse_onecall(response) for point, response in responses.items()}
+        if not parsed:
+            return 0
+
+        start = min(first for first, _ in parsed.values())
+        data = self._empty(start)
+        old = self.load()
+        if old is not None:
+            shift = (start - old["start"]).days
+            if 0 <= shift < STORE_DAYS:
+                for name in VARIABLES:
+                    data[name][:STORE_DAYS - shift] = old[name][shift:]
+                data["updated"][:] = old["updated"]
+
+        stamp = now or time.time()
+        index = dict(zip(points, nodes))
+        for point, (first, values) in parsed.items():
+            iy, ix = index[point]
+            offset = (first - start).days
+            for name, series in values.items():
+                series = series[:STORE_DAYS - offset]
+                data[name][offset:offset + len(series), iy, ix] = series
+            data["updated"][iy, ix] = stamp
+        self.save(data)
+        return len(parsed)
+
+    def interpolate(self, lats, lons, variables=None):
+        """
+        Bilinear interpolation at many points.
+
+        Returns ``(dates, {variable: (n_points, days) float32})``, or
+        ``(None, None)`` when the store is empty. Nodes without data are left
+        out of the weights; a point with no valid corner gets NaN.
+        """
+        data = self.load()
+        if data is None:
+            return None, None
+        fy, fx = self.grid.fractional_index(np.atleast_1d(lats), np.atleast_1d(lons))
+        y0, x0 = np.floor(fy).astype(np.int64), np.floor(fx).astype(np.int64)
+        y1, x1 = np.minimum(y0 + 1, self.grid.ny - 1), np.minimum(x0 + 1, self.grid.nx - 1)
+        wy, wx = (fy - y0)[:, None], (fx - x0)[:, None]
+        corners = (
+            (y0, x0, (1 - wy) * (1 - wx)), (y0, x1, (1 - wy) * wx),
+            (y1, x0, wy * (1 - wx)), (y1, x1, wy * wx),
+        )
+
+        result = {}
+        for name in variables or VARIABLES:
+            grid = data[name]
+            total = np.zeros((len(fy), STORE_DAYS), dtype=np.float64)
+            weight = np.zeros_like(total)
+            for ys, xs, w in corners:
+                values = grid[:, ys, xs].T  # (points, days)
+                valid = ~np.isnan(values)
+                total += np.where(valid, values, 0.0) * w
+                weight += valid * w
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result[name] = (total / weight).astype(np.float32)
+        dates = [data["start"] + timedelta(days=i) for i in range(STORE_DAYS)]
+        return dates, result
+
+
+_store = None
+
+
+def get_weather_store():
+    """Shared WeatherStore for the process."""
+    global _store
+    if _store is None:
+        _store = WeatherStore()
+    return _store
+
+
+def farm_forecast(lat, lon, days=FORECAST_DAYS, today=None):
+    """
+    Daily forecast for one location from tomorrow: ``date``, ``temp`` (max
+    °C), ``rain`` (mm) and the other stored variables, plus ``source``
+    ("grid" or "demo"). Falls back to the demo forecast when the store has
+    no complete forecast for the location.
+    """
+    today = today or datetime.now().date()
+    dates, values = get_weather_store().interpolate([lat], [lon])
+    if dates is not None:
+        wanted = [i for i, day in enumerate(dates) if day > today][:days]
+        if len(wanted) == days and not np.isnan(values["temp_max"][0, wanted]).any():
+            forecast = {"date": [dates[i] for i in wanted], "source": "grid"}
+            for name, series in values.items():
+                key = "temp" if name == "temp_max" else name
+                forecast[key] = np.round(series[0, wanted].astype(np.float64), 1).tolist()
+            return forecast
+
+    from utils.demo_mode import DemoDataLoader
+
+    forecast = DemoDataLoader().get_demo_weather_forecast(days, lat, lon)
+    forecast["source"] = "demo"
+    return forecast
+
+
+# ==================== CLI ====================
+
+def write_fixtures(directory, nodes, grid=None, issued=None):
+    """Write demo One Call responses for ``nodes`` as fixture files."""
+    from utils.demo_mode import DemoDataLoader
+
+    grid = grid or WeatherGrid()
+    loader = DemoDataLoader()
+    os.makedirs(directory, exist_ok=True)
+    for iy, ix in nodes:
+        lat, lon = grid.node(iy, ix)
+        with open(os.path.join(directory, fixture_name(lat, lon)), "w", encoding="utf-8") as handle:
+            json.dump(loader.get_demo_onecall(lat, lon, issued), handle, indent=1)
+    return len(nodes)
+
+
+def _select_nodes(grid, args):
+    if args.farms:
+        from utils.batch import load_farms
+
+        farms = load_farms(args.farms)
+        return grid.nodes_around([f["lat"] for f in farms], [f["lon"] for f in farms])
+    if args.bbox:
+        return grid.nodes_in_bbox(args.bbox)
+    return grid.all_nodes()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gridded weather forecast store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("ingest", "fixtures"):
+        command = sub.add_parser(name)
+        command.add_argument("--farms", help="CSV/GeoJSON: only nodes around these farms")
+        command.add_argument("--bbox", nargs=4, type=float, metavar=("MIN_LON", "MIN_LAT", "MAX_LON", "MAX_LAT"))
+    sub.choices["ingest"].add_argument("--source", default=WEATHER_SOURCE,
+                                       help="openweather, demo or a fixture directory")
+    sub.choices["ingest"].add_argument("--force", action="store_true", help="refetch fresh nodes too")
+    sub.choices["fixtures"].add_argument("directory")
+    sub.choices["fixtures"].add_argument("--issued", type=date.fromisoformat, default=None)
+    args = parser.parse_args(argv)
+
+    store = get_weather_store()
+    nodes = _select_nodes(store.grid, args)
+    if args.command == "fixtures":
+        summary = {"fixtures": write_fixtures(args.directory, nodes, store.grid, args.issued)}
+    else:
+        todo = nodes if args.force else store.stale_nodes(nodes)
+        start = time.perf_counter()
+        written = store.ingest(open_source(args.source), todo) if todo else 0
+        summary = {
+            "nodes": len(nodes),
+            "requested": len(todo),
+            "written": written,
+            "store": store.path,
+            "seconds": round(time.perf_counter() - start, 2),
+        }
+    print(json.dumps(summary, indent=2))
+    return summary
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    main()
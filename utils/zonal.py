@@ -0,0 +1,239 @@
+# utils/zonal.py - Zonal statistics for drawn farm boundaries
+"""
+Polygon-clipped statistics of index rasters.
+
+Polygons are burned into a label raster (0 = outside every polygon,
+``i + 1`` = polygon ``i``) and every statistic is computed for all zones in a
+single vectorized pass with ``np.bincount`` — no per-polygon clipping.
+Overlapping polygons go into separate label rasters (one pass each), so a
+polygon's statistics never depend on the polygons batched with it.
+Results are cached per (scene, geometry hash, index) in the shared result
+cache, so redrawing the same boundaries, or another replica analysing the
+same farm, costs nothing.
+"""
+import hashlib
+import json
+
+import numpy as np
+
+from config import NDVI_THRESHOLDS
+from utils.result_cache import MISSING, get_result_cache
+
+PERCENTILES = (10, 50, 90)
+HIST_BINS = np.linspace(-1.0, 1.0, 21)
+
+
+def geometry_hash(geometry):
+    """Stable hash of a GeoJSON geometry (coordinates rounded to ~1 cm)."""
+    def rounded(value):
+        if isinstance(value, (list, tuple)):
+            return [rounded(v) for v in value]
+        return round(float(value), 7) if isinstance(value, (int, float)) else value
+
+    payload = json.dumps(
+        {"type": geometry["type"], "coordinates": rounded(geometry["coordinates"])},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _polygon_rings(geometry):
+    if geometry["type"] == "Polygon":
+        return [geometry["coordinates"]]
+    if geometry["type"] == "MultiPolygon":
+        return geometry["coordinates"]
+    raise ValueError(f"Unsupported geometry type: {geometry['type']}")
+
+
+def geometries_bbox(geometries):
+    """``[min_lon, min_lat, max_lon, max_lat]`` enclosing all geometries."""
+    coords = np.array([
+        pt for geometry in geometries for polygon in _polygon_rings(geometry)
+        for ring in polygon for pt in ring
+    ], dtype=np.float64)
+    return [coords[:, 0].min(), coords[:, 1].min(), coords[:, 0].max(), coords[:, 1].max()]
+
+
+def polygon_mask(geometry, bbox, shape):
+    """
+    Boolean raster of the pixels of a GeoJSON (Multi)Polygon.
+
+    Uses an even-odd scanline fill at pixel centres, so holes are honoured.
+    """
+    height, width = shape
+    mask = np.zeros(shape, dtype=bool)
+    x_res = (bbox[2] - bbox[0]) / width
+    y_res = (bbox[3] - bbox[1]) / height
+    row_centres = bbox[3] - (np.arange(height) + 0.5) * y_res
+
+    for polygon in _polygon_rings(geometry):
+        edges = []
+        for ring in polygon:
+            ring = np.asarray(ring, dtype=np.float64)[:, :2]
+            edges.append(np.hstack([ring[:-1], ring[1:]]))
+        edges = np.vstack(edges)                       # (E, 4): x0 y0 x1 y1
+        x0, y0, x1, y1 = edges.T
+
+        # crossings of every edge with every row centre line
+        ys = row_centres[:, None]
+        crosses = (y0 <= ys) != (y1 <= ys)              # (H, E)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            xs = x0 + (ys - y0) * (x1 - x0) / (y1 - y0)
+        xs = np.where(crosses, xs, np.inf)
+        xs.sort(axis=1)
+
+        # pair consecutive crossings into filled spans (even-odd rule)
+        n_cross = crosses.sum(axis=1)
+        max_pairs = int(n_cross.max()) // 2 if n_cross.size else 0
+        if max_pairs == 0:
+            continue
+        starts = xs[:, 0:2 * max_pairs:2]
+        ends = xs[:, 1:2 * max_pairs:2]
+        rows = np.broadcast_to(np.arange(height)[:, None], starts.shape)
+        ok = np.isfinite(ends)
+        col0 = np.clip(np.ceil((starts[ok] - bbox[0]) / x_res - 0.5), 0, width).astype(np.int64)
+        col1 = np.clip(np.floor((ends[ok] - bbox[0]) / x_res - 0.5) + 1, 0, width).astype(np.int64)
+
+        spans = np.zeros((height, width + 1), dtype=np.int32)
+        np.add.at(spans, (rows[ok], col0), 1)
+        np.add.at(spans, (rows[ok], col1), -1)
+        mask |= np.cumsum(spans[:, :width], axis=1) > 0
+    return mask
+
+
+def rasterize_polygons(geometries, bbox, shape):
+    """
+    Burn GeoJSON (Multi)Polygons into an int32 label raster.
+
+    Later polygons overwrite earlier ones where they overlap; use
+    ``rasterize_layers()`` when every polygon needs all of its pixels.
+    """
+    labels = np.zeros(shape, dtype=np.int32)
+    for label, geometry in enumerate(geometries, start=1):
+        labels[polygon_mask(geometry, bbox, shape)] = label
+    return labels
+
+
+def rasterize_layers(geometries, bbox, shape):
+    """
+    Burn polygons into as few label rasters as possible without overlaps.
+
+    Returns a list of ``(labels, members)``: label ``j + 1`` of ``labels``
+    is geometry ``members[j]``. Each geometry goes into the first layer it
+    does not overlap, so disjoint boundaries (the usual case) share one
+    raster and overlapping ones get another pass.
+    """
+    layers = []
+    for i, geometry in enumerate(geometries):
+        mask = polygon_mask(geometry, bbox, shape)
+        for labels, members in layers:
+            if not labels[mask].any():
+                break
+        else:
+            labels, members = np.zeros(shape, dtype=np.int32), []
+            layers.append((labels, members))
+        members.append(i)
+        labels[mask] = len(members)
+    return layers
+
+
+def zonal_stats(raster, labels, n_zones, stress_threshold=NDVI_THRESHOLDS["healthy_min"],
+                bins=HIST_BINS):
+    """
+    Statistics of ``raster`` for zones ``1..n_zones`` of ``labels``.
+
+    Returns a list (one dict per zone) with pixel count, mean, std,
+    percentiles, histogram counts over ``bins`` and the stressed-area
+    fraction (pixels below ``stress_threshold``). NaN pixels are ignored.
+    """
+    raster = np.asarray(raster, dtype=np.float64)
+    valid = (labels > 0) & ~np.isnan(raster)
+    zone = labels[valid]
+    values = raster[valid]
+    size = n_zones + 1
+
+    count = np.bincount(zone, minlength=size)
+    total = np.bincount(zone, weights=values, minlength=size)
+    total_sq = np.bincount(zone, weights=values * values, minlength=size)
+    stressed = np.bincount(zone, weights=values < stress_threshold, minlength=size)
+
+    n_bins = len(bins) - 1
+    bin_idx = np.clip(np.digitize(values, bins) - 1, 0, n_bins - 1)
+    hist = np.bincount(zone * n_bins + bin_idx, minlength=size * n_bins).reshape(size, n_bins)
+
+    # percentiles: sort once by (zone, value) and interpolate inside each zone
+    order = np.lexsort((values, zone))
+    sorted_values = values[order]
+    starts = np.concatenate([[0], np.cumsum(count)[:-1]])
+    pct = {}
+    for q in PERCENTILES:
+        pos = starts + (count - 1).clip(min=0) * (q / 100.0)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, starts + count - 1)
+        frac = pos - lo
+        if sorted_values.size:
+            lo_v = sorted_values[np.clip(lo, 0, sorted_values.size - 1)]
+            hi_v = sorted_values[np.clip(hi, 0, sorted_values.size - 1)]
+            pct[q] = lo_v + (hi_v - lo_v) * frac
+        else:
+            pct[q] = np.full(size, np.nan)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = total / count
+        std = np.sqrt(np.maximum(total_sq / count - mean * mean, 0.0))
+        stressed_fraction = stressed / count
+
+    results = []
+    for z in range(1, size):
+        empty = count[z] == 0
+        results.append({
+            "pixels": int(count[z]),
+            "mean": None if empty else float(mean[z]),
+            "std": None if empty else float(std[z]),
+            **{f"p{q}": None if empty else float(pct[q][z]) for q in PERCENTILES},
+            "stressed_fraction": None if empty else float(stressed_fraction[z]),
+            "histogram": hist[z].tolist(),
+        })
+    return results
+
+
+class ZonalStatsCache:
+    """Zonal statistics cached per (scene id, index, geometry hash) in the result cache."""
+
+    def __init__(self, cache=None):
+        self._cache = cache
+
+    @property
+    def cache(self):
+        return self._cache or get_result_cache()
+
+    def get_many(self, scene_id, index_name, raster, bbox, geometries, **kwargs):
+        """
+        Zonal statistics for each geometry over ``raster`` covering ``bbox``.
+
+        Only geometries missing from the cache are rasterized; they are
+        computed together in one pass per ``rasterize_layers()`` layer, so
+        overlapping boundaries each keep all of their pixels.
+        """
+        cache = self.cache
+        options = sorted(kwargs.items())
+        keys = [cache.key("zonal", scene_id, index_name, geometry_hash(g), options) for g in geometries]
+        results = [cache.get(key) for key in keys]
+        missing = [i for i, stats in enumerate(results) if stats is MISSING]
+
+        layers = rasterize_layers([geometries[i] for i in missing], bbox, np.shape(raster))
+        for labels, members in layers:
+            computed = zonal_stats(raster, labels, len(members), **kwargs)
+            for j, stats in zip(members, computed):
+                i = missing[j]
+                results[i] = stats
+                cache.set(keys[i], stats)
+        return results
+
+
+_cache = ZonalStatsCache()
+
+
+def get_zonal_stats(scene_id, index_name, raster, bbox, geometries, **kwargs):
+    """Cached zonal statistics using the process-wide result cache."""
+    return _cache.get_many(scene_id, index_name, raster, bbox, geometries, **kwargs)